@@ -1,3 +1,5 @@
+import array
+import collections
 import threading
 
 from hydrus.core import HydrusData
@@ -27,6 +29,8 @@ basic_permission_to_str_lookup[ CLIENT_API_PERMISSION_MANAGE_COOKIES ] = 'manage
 basic_permission_to_str_lookup[ CLIENT_API_PERMISSION_MANAGE_DATABASE ] = 'manage database'
 
 SEARCH_RESULTS_CACHE_TIMEOUT = 4 * 3600
+MAX_PAGED_SEARCHES = 10
+MAX_PAGED_SEARCH_FILE_IDS = 5000000
 
 SESSION_EXPIRY = 86400
 
@@ -232,9 +236,22 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
         self._last_search_results = None
         self._search_results_timeout = 0
         
+        # search_key -> ( hash_ids, timeout ), least recently used first
+        self._paged_searches = collections.OrderedDict()
+        self._num_paged_search_hash_ids = 0
+        
         self._lock = threading.Lock()
         
     
+    def _DeletePagedSearch( self, search_key ):
+        
+        ( hash_ids, timeout ) = self._paged_searches[ search_key ]
+        
+        del self._paged_searches[ search_key ]
+        
+        self._num_paged_search_hash_ids -= len( hash_ids )
+        
+    
     def _GetSerialisableInfo( self ):
         
         serialisable_access_key = self._access_key.hex()
@@ -260,6 +277,28 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
         self._search_tag_filter = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_search_tag_filter )
         
     
+    def AddLastSearchResults( self, hash_ids ):
+        
+        # for paged and streamed searches, where the results come in bits
+        
+        with self._lock:
+            
+            if self._search_tag_filter.AllowsEverything():
+                
+                return
+                
+            
+            if self._last_search_results is None:
+                
+                self._last_search_results = set()
+                
+            
+            self._last_search_results.update( hash_ids )
+            
+            self._search_results_timeout = HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT
+            
+        
+    
     def CheckAtLeastOnePermission( self, permissions ):
         
         with self._lock:
@@ -392,6 +431,36 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
             
         
     
+    def GetPagedSearchResults( self, search_key, offset, page_size ):
+        
+        with self._lock:
+            
+            if search_key not in self._paged_searches:
+                
+                raise HydrusExceptions.BadRequestException( 'It looks like that search is no longer available--please run the search again!' )
+                
+            
+            ( hash_ids, timeout ) = self._paged_searches[ search_key ]
+            
+            page_hash_ids = list( hash_ids[ offset : offset + page_size ] )
+            
+            there_are_more = offset + page_size < len( hash_ids )
+            
+            if there_are_more:
+                
+                self._paged_searches[ search_key ] = ( hash_ids, HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT )
+                
+                self._paged_searches.move_to_end( search_key )
+                
+            else:
+                
+                self._DeletePagedSearch( search_key )
+                
+            
+            return ( page_hash_ids, there_are_more )
+            
+        
+    
     def GetSearchTagFilter( self ):
         
         with self._lock:
@@ -417,6 +486,14 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
                 self._last_search_results = None
                 
             
+            for ( search_key, ( hash_ids, timeout ) ) in list( self._paged_searches.items() ):
+                
+                if HydrusData.TimeHasPassed( timeout ):
+                    
+                    self._DeletePagedSearch( search_key )
+                    
+                
+            
         
     
     def SetLastSearchResults( self, hash_ids ):
@@ -442,6 +519,32 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
             
         
     
+    def StartPagedSearch( self, hash_ids ):
+        
+        # we run a paged search once and hand out slices of it, rather than running it again for every page
+        # the ids are held packed, and we drop the least recently used searches if we are holding too many
+        
+        search_key = HydrusData.GenerateKey()
+        
+        hash_ids = array.array( 'I', hash_ids )
+        
+        with self._lock:
+            
+            self._paged_searches[ search_key ] = ( hash_ids, HydrusData.GetNow() + SEARCH_RESULTS_CACHE_TIMEOUT )
+            
+            self._num_paged_search_hash_ids += len( hash_ids )
+            
+            while len( self._paged_searches ) > 1 and ( len( self._paged_searches ) > MAX_PAGED_SEARCHES or self._num_paged_search_hash_ids > MAX_PAGED_SEARCH_FILE_IDS ):
+                
+                least_recently_used_search_key = next( iter( self._paged_searches.keys() ) )
+                
+                self._DeletePagedSearch( least_recently_used_search_key )
+                
+            
+        
+        return search_key
+        
+    
     def ToHumanString( self ):
         
         s = 'API Permissions ({}): '.format( self._name )
@@ -1,5 +1,7 @@
 import collections
+import hashlib
 import json
+import numpy
 import os
 import threading
 import time
@@ -7,6 +9,7 @@ import time
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusImageHandling
+from hydrus.core import HydrusPaths
 from hydrus.core import HydrusThreading
 from hydrus.core import HydrusData
 from hydrus.core import HydrusGlobals as HG
@@ -17,20 +20,165 @@ from hydrus.client import ClientImageHandling
 from hydrus.client import ClientParsing
 from hydrus.client import ClientRendering
 
+class DataCacheEvictionPolicyLRU( object ):
+    
+    def __init__( self ):
+        
+        self._keys = collections.OrderedDict()
+        
+    
+    def AddKey( self, key, size ):
+        
+        self._keys[ key ] = size
+        
+    
+    def Clear( self ):
+        
+        self._keys = collections.OrderedDict()
+        
+    
+    def GetVictimKey( self ):
+        
+        return next( iter( self._keys ) )
+        
+    
+    def RemoveKey( self, key ):
+        
+        if key in self._keys:
+            
+            del self._keys[ key ]
+            
+        
+    
+    def SetCacheSize( self, cache_size ):
+        
+        pass
+        
+    
+    def TouchKey( self, key ):
+        
+        if key in self._keys:
+            
+            self._keys.move_to_end( key )
+            
+        
+    
+class DataCacheEvictionPolicySLRU( object ):
+    
+    # segmented lru. new data goes into 'probation', and only graduates to 'protected' if it is hit again
+    # we evict from probation first, so a one-off flood of new data (like scrolling through a big page) cannot push out the stuff you keep coming back to
+    
+    def __init__( self, protected_ratio = 0.8 ):
+        
+        self._protected_ratio = protected_ratio
+        
+        self._protected_limit = 0
+        
+        self._probation_keys_to_sizes = collections.OrderedDict()
+        self._protected_keys_to_sizes = collections.OrderedDict()
+        
+        self._protected_size = 0
+        
+    
+    def AddKey( self, key, size ):
+        
+        self._probation_keys_to_sizes[ key ] = size
+        
+    
+    def Clear( self ):
+        
+        self._probation_keys_to_sizes = collections.OrderedDict()
+        self._protected_keys_to_sizes = collections.OrderedDict()
+        
+        self._protected_size = 0
+        
+    
+    def GetVictimKey( self ):
+        
+        if len( self._probation_keys_to_sizes ) > 0:
+            
+            return next( iter( self._probation_keys_to_sizes ) )
+            
+        else:
+            
+            return next( iter( self._protected_keys_to_sizes ) )
+            
+        
+    
+    def RemoveKey( self, key ):
+        
+        if key in self._probation_keys_to_sizes:
+            
+            del self._probation_keys_to_sizes[ key ]
+            
+        elif key in self._protected_keys_to_sizes:
+            
+            self._protected_size -= self._protected_keys_to_sizes[ key ]
+            
+            del self._protected_keys_to_sizes[ key ]
+            
+        
+    
+    def SetCacheSize( self, cache_size ):
+        
+        self._protected_limit = int( cache_size * self._protected_ratio )
+        
+    
+    def TouchKey( self, key ):
+        
+        if key in self._protected_keys_to_sizes:
+            
+            self._protected_keys_to_sizes.move_to_end( key )
+            
+        elif key in self._probation_keys_to_sizes:
+            
+            size = self._probation_keys_to_sizes[ key ]
+            
+            del self._probation_keys_to_sizes[ key ]
+            
+            self._protected_keys_to_sizes[ key ] = size
+            self._protected_size += size
+            
+            while self._protected_size > self._protected_limit and len( self._protected_keys_to_sizes ) > 1:
+                
+                ( demotee_key, demotee_size ) = self._protected_keys_to_sizes.popitem( last = False )
+                
+                self._protected_size -= demotee_size
+                
+                self._probation_keys_to_sizes[ demotee_key ] = demotee_size
+                
+            
+        
+    
 class DataCache( object ):
     
-    def __init__( self, controller, name, cache_size, timeout = 1200 ):
+    def __init__( self, controller, name, cache_size, timeout = 1200, eviction_policy = None ):
+        
+        if eviction_policy is None:
+            
+            eviction_policy = DataCacheEvictionPolicyLRU()
+            
         
         self._controller = controller
         self._name = name
         self._cache_size = cache_size
         self._timeout = timeout
         
+        self._eviction_policy = eviction_policy
+        
+        self._eviction_policy.SetCacheSize( self._cache_size )
+        
         self._keys_to_data = {}
+        self._keys_to_sizes = {}
         self._keys_fifo = collections.OrderedDict()
         
         self._total_estimated_memory_footprint = 0
         
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_evictions = 0
+        self._num_timeouts = 0
+        
         self._lock = threading.Lock()
         
         self._controller.sub( self, 'MaintainCache', 'memory_maintenance_pulse' )
@@ -45,7 +193,16 @@ class DataCache( object ):
         
         del self._keys_to_data[ key ]
         
-        self._RecalcMemoryUsage()
+        self._total_estimated_memory_footprint -= self._keys_to_sizes[ key ]
+        
+        del self._keys_to_sizes[ key ]
+        
+        if key in self._keys_fifo:
+            
+            del self._keys_fifo[ key ]
+            
+        
+        self._eviction_policy.RemoveKey( key )
         
         if HG.cache_report_mode:
             
@@ -55,34 +212,32 @@ class DataCache( object ):
     
     def _DeleteItem( self ):
         
-        ( deletee_key, last_access_time ) = self._keys_fifo.popitem( last = False )
+        deletee_key = self._eviction_policy.GetVictimKey()
         
         self._Delete( deletee_key )
         
-    
-    def _RecalcMemoryUsage( self ):
-        
-        self._total_estimated_memory_footprint = sum( ( data.GetEstimatedMemoryFootprint() for data in self._keys_to_data.values() ) )
+        self._num_evictions += 1
         
     
     def _TouchKey( self, key ):
         
-        # have to delete first, rather than overwriting, so the ordereddict updates its internal order
-        if key in self._keys_fifo:
-            
-            del self._keys_fifo[ key ]
-            
-        
         self._keys_fifo[ key ] = HydrusData.GetNow()
         
+        self._keys_fifo.move_to_end( key )
+        
+        self._eviction_policy.TouchKey( key )
+        
     
     def Clear( self ):
         
         with self._lock:
             
             self._keys_to_data = {}
+            self._keys_to_sizes = {}
             self._keys_fifo = collections.OrderedDict()
             
+            self._eviction_policy.Clear()
+            
             self._total_estimated_memory_footprint = 0
             
         
@@ -93,16 +248,21 @@ class DataCache( object ):
             
             if key not in self._keys_to_data:
                 
-                while self._total_estimated_memory_footprint > self._cache_size:
+                size = data.GetEstimatedMemoryFootprint()
+                
+                while len( self._keys_to_data ) > 0 and self._total_estimated_memory_footprint + size > self._cache_size:
                     
                     self._DeleteItem()
                     
                 
                 self._keys_to_data[ key ] = data
+                self._keys_to_sizes[ key ] = size
                 
-                self._TouchKey( key )
+                self._total_estimated_memory_footprint += size
+                
+                self._keys_fifo[ key ] = HydrusData.GetNow()
                 
-                self._RecalcMemoryUsage()
+                self._eviction_policy.AddKey( key, size )
                 
                 if HG.cache_report_mode:
                     
@@ -110,7 +270,7 @@ class DataCache( object ):
                         'Cache "{}" adding "{}" ({}). Current size {}.'.format(
                             self._name,
                             key,
-                            HydrusData.ToHumanBytes( data.GetEstimatedMemoryFootprint() ),
+                            HydrusData.ToHumanBytes( size ),
                             HydrusData.ConvertValueRangeToBytes( self._total_estimated_memory_footprint, self._cache_size )
                         )
                     )
@@ -133,9 +293,13 @@ class DataCache( object ):
             
             if key not in self._keys_to_data:
                 
+                self._num_misses += 1
+                
                 raise Exception( 'Cache error! Looking for {}, but it was missing.'.format( key ) )
                 
             
+            self._num_hits += 1
+            
             self._TouchKey( key )
             
             return self._keys_to_data[ key ]
@@ -148,17 +312,38 @@ class DataCache( object ):
             
             if key in self._keys_to_data:
                 
+                self._num_hits += 1
+                
                 self._TouchKey( key )
                 
                 return self._keys_to_data[ key ]
                 
             else:
                 
+                self._num_misses += 1
+                
                 return None
                 
             
         
     
+    def GetPrettyStatistics( self ):
+        
+        statistics = self.GetStatistics()
+        
+        num_lookups = statistics[ 'num_hits' ] + statistics[ 'num_misses' ]
+        
+        return '{}: {} items, {}. {} hit rate over {} lookups. {} evicted for space, {} timed out.'.format(
+            statistics[ 'name' ],
+            HydrusData.ToHumanInt( statistics[ 'num_items' ] ),
+            HydrusData.ConvertValueRangeToBytes( statistics[ 'size' ], statistics[ 'size_limit' ] ),
+            HydrusData.ConvertFloatToPercentage( statistics[ 'num_hits' ] / max( num_lookups, 1 ) ),
+            HydrusData.ToHumanInt( num_lookups ),
+            HydrusData.ToHumanInt( statistics[ 'num_evictions' ] ),
+            HydrusData.ToHumanInt( statistics[ 'num_timeouts' ] )
+        )
+        
+    
     def GetSizeLimit( self ):
         
         with self._lock:
@@ -167,6 +352,23 @@ class DataCache( object ):
             
         
     
+    def GetStatistics( self ):
+        
+        with self._lock:
+            
+            return {
+                'name' : self._name,
+                'num_items' : len( self._keys_to_data ),
+                'size' : self._total_estimated_memory_footprint,
+                'size_limit' : self._cache_size,
+                'num_hits' : self._num_hits,
+                'num_misses' : self._num_misses,
+                'num_evictions' : self._num_evictions,
+                'num_timeouts' : self._num_timeouts
+            }
+            
+        
+    
     def HasData( self, key ):
         
         with self._lock:
@@ -191,7 +393,9 @@ class DataCache( object ):
                     
                     if HydrusData.TimeHasPassed( last_access_time + self._timeout ):
                         
-                        self._DeleteItem()
+                        self._Delete( key )
+                        
+                        self._num_timeouts += 1
                         
                     else:
                         
@@ -200,6 +404,11 @@ class DataCache( object ):
                     
                 
             
+            while len( self._keys_to_data ) > 0 and self._total_estimated_memory_footprint > self._cache_size:
+                
+                self._DeleteItem()
+                
+            
         
     
     def SetCacheSizeAndTimeout( self, cache_size, timeout ):
@@ -209,6 +418,8 @@ class DataCache( object ):
             self._cache_size = cache_size
             self._timeout = timeout
             
+            self._eviction_policy.SetCacheSize( self._cache_size )
+            
         
         self.MaintainCache()
         
@@ -479,7 +690,7 @@ class ImageRendererCache( object ):
         cache_size = self._controller.options[ 'fullscreen_cache_size' ]
         cache_timeout = self._controller.new_options.GetInteger( 'image_cache_timeout' )
         
-        self._data_cache = DataCache( self._controller, 'image cache', cache_size, timeout = cache_timeout )
+        self._data_cache = DataCache( self._controller, 'image cache', cache_size, timeout = cache_timeout, eviction_policy = DataCacheEvictionPolicySLRU() )
         
         self._controller.sub( self, 'NotifyNewOptions', 'notify_new_options' )
         
@@ -518,6 +729,11 @@ class ImageRendererCache( object ):
         return image_renderer
         
     
+    def GetPrettyStatistics( self ):
+        
+        return self._data_cache.GetPrettyStatistics()
+        
+    
     def HasImageRenderer( self, hash ):
         
         key = hash
@@ -556,7 +772,7 @@ class ImageTileCache( object ):
         cache_size = self._controller.new_options.GetInteger( 'image_tile_cache_size' )
         cache_timeout = self._controller.new_options.GetInteger( 'image_tile_cache_timeout' )
         
-        self._data_cache = DataCache( self._controller, 'image tile cache', cache_size, timeout = cache_timeout )
+        self._data_cache = DataCache( self._controller, 'image tile cache', cache_size, timeout = cache_timeout, eviction_policy = DataCacheEvictionPolicySLRU() )
         
         self._controller.sub( self, 'NotifyNewOptions', 'notify_new_options' )
         
@@ -566,6 +782,11 @@ class ImageTileCache( object ):
         self._data_cache.Clear()
         
     
+    def GetPrettyStatistics( self ):
+        
+        return self._data_cache.GetPrettyStatistics()
+        
+    
     def GetTile( self, image_renderer: ClientRendering.ImageRenderer, media, clip_rect, target_resolution ):
         
         hash = media.GetHash()
@@ -584,7 +805,36 @@ class ImageTileCache( object ):
         
         if result is None:
             
-            qt_pixmap = image_renderer.GetQtPixmap( clip_rect = clip_rect, target_resolution = target_resolution )
+            numpy_image = None
+            
+            # a 100% zoom tile is just a slice of the renderer's image, so only the resized ones are worth keeping on disk
+            if target_resolution != clip_rect.size():
+                
+                rendered_image_disk_cache = self._controller.rendered_image_disk_cache
+                
+                numpy_image = rendered_image_disk_cache.GetNumPyImage( key )
+                
+                if numpy_image is None:
+                    
+                    numpy_image = image_renderer.GetNumPyImage( clip_rect = clip_rect, target_resolution = target_resolution )
+                    
+                    if numpy_image is not None:
+                        
+                        self._controller.CallToThread( rendered_image_disk_cache.AddNumPyImage, key, numpy_image )
+                        
+                    
+                
+            
+            if numpy_image is None:
+                
+                qt_pixmap = image_renderer.GetQtPixmap( clip_rect = clip_rect, target_resolution = target_resolution )
+                
+            else:
+                
+                ( height, width, depth ) = numpy_image.shape
+                
+                qt_pixmap = self._controller.bitmap_manager.GetQtPixmapFromBuffer( width, height, depth * 8, numpy_image.data )
+                
             
             tile = ClientRendering.ImageTile( hash, clip_rect, qt_pixmap )
             
@@ -606,6 +856,245 @@ class ImageTileCache( object ):
         self._data_cache.SetCacheSizeAndTimeout( cache_size, cache_timeout )
         
     
+class RenderedImageDiskCache( object ):
+    
+    # a second tier under the image and tile caches, so restarts and memory evictions do not mean decoding big originals all over again
+    # each entry is a raw .npy that we memory map on load, so a hit is basically free until the pixels are actually touched
+    
+    def __init__( self, controller, cache_dir, cache_size ):
+        
+        self._controller = controller
+        self._cache_dir = cache_dir
+        self._cache_size = cache_size
+        
+        self._paths_to_sizes = collections.OrderedDict()
+        
+        self._total_size = 0
+        
+        self._lock = threading.Lock()
+        
+        HydrusPaths.MakeSureDirectoryExists( self._cache_dir )
+        
+        self._controller.CallToThread( self._InitialiseIndex )
+        
+        self._controller.sub( self, 'NotifyNewOptions', 'notify_new_options' )
+        
+    
+    def _DeletePath( self, path ):
+        
+        if path in self._paths_to_sizes:
+            
+            self._total_size -= self._paths_to_sizes[ path ]
+            
+            del self._paths_to_sizes[ path ]
+            
+        
+        try:
+            
+            os.remove( path )
+            
+        except Exception as e:
+            
+            # if it is still memory mapped somewhere on windows, it'll get picked up again on next boot and cleared then
+            pass
+            
+        
+    
+    def _GetPath( self, key ):
+        
+        encoded_key = hashlib.sha256( repr( key ).encode( 'utf-8' ) ).hexdigest()
+        
+        return os.path.join( self._cache_dir, encoded_key[:2], encoded_key + '.npy' )
+        
+    
+    def _InitialiseIndex( self ):
+        
+        mtimes_paths_and_sizes = []
+        
+        for ( dirpath, dirnames, filenames ) in os.walk( self._cache_dir ):
+            
+            for filename in filenames:
+                
+                path = os.path.join( dirpath, filename )
+                
+                try:
+                    
+                    stat_result = os.stat( path )
+                    
+                except:
+                    
+                    continue
+                    
+                
+                if not filename.endswith( '.npy' ):
+                    
+                    # an old temp file is from an interrupted write. a young one may be a write still going on
+                    if HydrusData.TimeHasPassedFloat( stat_result.st_mtime + 3600 ):
+                        
+                        HydrusPaths.DeletePath( path )
+                        
+                    
+                    continue
+                    
+                
+                mtimes_paths_and_sizes.append( ( stat_result.st_mtime, path, stat_result.st_size ) )
+                
+            
+        
+        mtimes_paths_and_sizes.sort()
+        
+        with self._lock:
+            
+            # anything added while we were scanning is the most recent stuff, so it goes on the end
+            
+            paths_to_sizes = collections.OrderedDict( ( ( path, size ) for ( mtime, path, size ) in mtimes_paths_and_sizes if path not in self._paths_to_sizes ) )
+            
+            paths_to_sizes.update( self._paths_to_sizes )
+            
+            self._paths_to_sizes = paths_to_sizes
+            
+            self._total_size = sum( self._paths_to_sizes.values() )
+            
+            self._Prune()
+            
+        
+    
+    def _Prune( self ):
+        
+        while len( self._paths_to_sizes ) > 0 and self._total_size > self._cache_size:
+            
+            deletee_path = next( iter( self._paths_to_sizes ) )
+            
+            self._DeletePath( deletee_path )
+            
+        
+    
+    def AddNumPyImage( self, key, numpy_image: numpy.ndarray ):
+        
+        num_bytes = numpy_image.nbytes
+        
+        with self._lock:
+            
+            # one giganto image should not be able to flush everything
+            if num_bytes > self._cache_size / 4:
+                
+                return
+                
+            
+            path = self._GetPath( key )
+            
+            if path in self._paths_to_sizes:
+                
+                return
+                
+            
+        
+        temp_path = '{}.{}.tmp'.format( path, os.urandom( 4 ).hex() )
+        
+        try:
+            
+            HydrusPaths.MakeSureDirectoryExists( os.path.dirname( path ) )
+            
+            with open( temp_path, 'wb' ) as f:
+                
+                numpy.save( f, numpy_image, allow_pickle = False )
+                
+            
+            os.replace( temp_path, path )
+            
+            size = os.path.getsize( path )
+            
+        except Exception as e:
+            
+            HydrusData.Print( 'Could not write to the rendered image disk cache:' )
+            HydrusData.PrintException( e, do_wait = False )
+            
+            HydrusPaths.DeletePath( temp_path )
+            
+            return
+            
+        
+        with self._lock:
+            
+            if path not in self._paths_to_sizes:
+                
+                self._paths_to_sizes[ path ] = size
+                
+                self._total_size += size
+                
+            
+            self._Prune()
+            
+        
+    
+    def Clear( self ):
+        
+        with self._lock:
+            
+            for path in list( self._paths_to_sizes.keys() ):
+                
+                self._DeletePath( path )
+                
+            
+        
+    
+    def GetNumPyImage( self, key ):
+        
+        path = self._GetPath( key )
+        
+        with self._lock:
+            
+            if path not in self._paths_to_sizes:
+                
+                return None
+                
+            
+            self._paths_to_sizes.move_to_end( path )
+            
+        
+        try:
+            
+            # copy on write, so we get a writeable array that never touches the file
+            numpy_image = numpy.load( path, mmap_mode = 'c', allow_pickle = False )
+            
+            os.utime( path )
+            
+        except Exception as e:
+            
+            with self._lock:
+                
+                self._DeletePath( path )
+                
+            
+            return None
+            
+        
+        if HG.cache_report_mode:
+            
+            HydrusData.ShowText( 'Rendered image disk cache loaded "{}".'.format( key ) )
+            
+        
+        return numpy_image
+        
+    
+    def GetPrettyStatistics( self ):
+        
+        with self._lock:
+            
+            return 'rendered image disk cache: {} items, {}.'.format( HydrusData.ToHumanInt( len( self._paths_to_sizes ) ), HydrusData.ConvertValueRangeToBytes( self._total_size, self._cache_size ) )
+            
+        
+    
+    def NotifyNewOptions( self ):
+        
+        with self._lock:
+            
+            self._cache_size = self._controller.new_options.GetInteger( 'rendered_image_disk_cache_size' )
+            
+            self._Prune()
+            
+        
+    
 class ThumbnailCache( object ):
     
     def __init__( self, controller ):
@@ -615,7 +1104,7 @@ class ThumbnailCache( object ):
         cache_size = self._controller.options[ 'thumbnail_cache_size' ]
         cache_timeout = self._controller.new_options.GetInteger( 'thumbnail_cache_timeout' )
         
-        self._data_cache = DataCache( self._controller, 'thumbnail cache', cache_size, timeout = cache_timeout )
+        self._data_cache = DataCache( self._controller, 'thumbnail cache', cache_size, timeout = cache_timeout, eviction_policy = DataCacheEvictionPolicySLRU() )
         
         self._magic_mime_thumbnail_ease_score_lookup = {}
         
@@ -1054,6 +1543,11 @@ class ThumbnailCache( object ):
             
         
     
+    def GetPrettyStatistics( self ):
+        
+        return self._data_cache.GetPrettyStatistics()
+        
+    
     def GetThumbnail( self, media ):
         
         display_media = media.GetDisplayMedia()
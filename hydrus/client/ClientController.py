@@ -1084,6 +1084,8 @@ class Controller( HydrusController.HydrusController ):
         self.frame_splash_status.SetSubtext( 'image caches' )
         
         # careful: outside of qt since they don't need qt for init, seems ok _for now_
+        self.rendered_image_disk_cache = ClientCaches.RenderedImageDiskCache( self, os.path.join( self.db_dir, 'client_render_cache' ), self.new_options.GetInteger( 'rendered_image_disk_cache_size' ) )
+        
         self._caches[ 'images' ] = ClientCaches.ImageRendererCache( self )
         self._caches[ 'image_tiles' ] = ClientCaches.ImageTileCache( self )
         self._caches[ 'thumbnail' ] = ClientCaches.ThumbnailCache( self )
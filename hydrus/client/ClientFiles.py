@@ -21,6 +21,7 @@ from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientImageHandling
 from hydrus.client import ClientPaths
 from hydrus.client import ClientThreading
+from hydrus.client import ClientWorkerProcesses
 from hydrus.client.gui import QtPorting as QP
 
 REGENERATE_FILE_DATA_JOB_FILE_METADATA = 0
@@ -108,6 +109,9 @@ regen_file_enum_to_overruled_jobs[ REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_
 regen_file_enum_to_overruled_jobs[ REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA ] = [ REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP ]
 regen_file_enum_to_overruled_jobs[ REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP ] = []
 
+# these are the CPU-heavy ones worth sending to a worker process
+WORKER_PROCESS_JOB_TYPES = { REGENERATE_FILE_DATA_JOB_FILE_METADATA, REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL, REGENERATE_FILE_DATA_JOB_OTHER_HASHES, REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA }
+
 ALL_REGEN_JOBS_IN_PREFERRED_ORDER = [ REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_URL, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA, REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE, REGENERATE_FILE_DATA_JOB_FILE_METADATA, REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL, REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL, REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA, REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP, REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS, REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP, REGENERATE_FILE_DATA_JOB_OTHER_HASHES, REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES ]
 
 def GetAllFilePaths( raw_paths, do_human_sort = True ):
@@ -380,16 +384,8 @@ class ClientFilesManager( object ):
     def _GenerateThumbnailBytes( self, file_path, media ):
         
         hash = media.GetHash()
-        mime = media.GetMime()
-        ( width, height ) = media.GetResolution()
-        duration = media.GetDuration()
-        num_frames = media.GetNumFrames()
-        
-        bounding_dimensions = HG.client_controller.options[ 'thumbnail_dimensions' ]
-        
-        target_resolution = HydrusImageHandling.GetThumbnailResolution( ( width, height ), bounding_dimensions )
         
-        percentage_in = self._controller.new_options.GetInteger( 'video_thumbnail_percentage_in' )
+        ( file_path, target_resolution, mime, duration, num_frames, percentage_in ) = self._GetThumbnailGenerationArgs( file_path, media )
         
         try:
             
@@ -403,6 +399,22 @@ class ClientFilesManager( object ):
         return thumbnail_bytes
         
     
+    def _GetThumbnailGenerationArgs( self, file_path, media ):
+        
+        mime = media.GetMime()
+        ( width, height ) = media.GetResolution()
+        duration = media.GetDuration()
+        num_frames = media.GetNumFrames()
+        
+        bounding_dimensions = HG.client_controller.options[ 'thumbnail_dimensions' ]
+        
+        target_resolution = HydrusImageHandling.GetThumbnailResolution( ( width, height ), bounding_dimensions )
+        
+        percentage_in = self._controller.new_options.GetInteger( 'video_thumbnail_percentage_in' )
+        
+        return ( file_path, target_resolution, mime, duration, num_frames, percentage_in )
+        
+    
     def _GetRecoverTuple( self ):
         
         all_locations = { location for location in list(self._prefixes_to_locations.values()) }
@@ -1067,6 +1079,24 @@ class ClientFilesManager( object ):
             
         
     
+    def GenerateThumbnailBytes( self, media ):
+        
+        hash = media.GetHash()
+        mime = media.GetMime()
+        
+        with self._rwlock.read:
+            
+            file_path = self._GenerateExpectedFilePath( hash, mime )
+            
+            if not os.path.exists( file_path ):
+                
+                raise HydrusExceptions.FileMissingException( 'The thumbnail for file ' + hash.hex() + ' could not be regenerated from the original file because the original file is missing! This event could indicate hard drive corruption. Please check everything is ok.')
+                
+            
+            return self._GenerateThumbnailBytes( file_path, media )
+            
+        
+    
     def GetFilePath( self, hash, mime = None, check_file_exists = True ):
         
         with self._rwlock.read:
@@ -1112,6 +1142,11 @@ class ClientFilesManager( object ):
         return self._missing_locations
         
     
+    def GetThumbnailGenerationArgs( self, file_path, media ):
+        
+        return self._GetThumbnailGenerationArgs( file_path, media )
+        
+    
     def GetThumbnailPath( self, media ):
         
         hash = media.GetHash()
@@ -1245,17 +1280,7 @@ class ClientFilesManager( object ):
             return
             
         
-        with self._rwlock.read:
-            
-            file_path = self._GenerateExpectedFilePath( hash, mime )
-            
-            if not os.path.exists( file_path ):
-                
-                raise HydrusExceptions.FileMissingException( 'The thumbnail for file ' + hash.hex() + ' could not be regenerated from the original file because the original file is missing! This event could indicate hard drive corruption. Please check everything is ok.')
-                
-            
-            thumbnail_bytes = self._GenerateThumbnailBytes( file_path, media )
-            
+        thumbnail_bytes = self.GenerateThumbnailBytes( media )
         
         with self._rwlock.write:
             
@@ -1323,6 +1348,8 @@ class FilesMaintenanceManager( object ):
         
         self._jobs_since_last_gc_collect = 0
         
+        self._worker_process_pool = ClientWorkerProcesses.WorkerProcessPool( 'file maintenance' )
+        
         self._ReInitialiseWorkRules()
         
         self._maintenance_lock = threading.Lock()
@@ -1570,7 +1597,7 @@ class FilesMaintenanceManager( object ):
             
         
     
-    def _RegenFileMetadata( self, media_result ):
+    def _RegenFileMetadata( self, media_result, future = None ):
         
         hash = media_result.GetHash()
         original_mime = media_result.GetMime()
@@ -1579,7 +1606,7 @@ class FilesMaintenanceManager( object ):
             
             path = self._controller.client_files_manager.GetFilePath( hash, original_mime )
             
-            ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = HydrusFileHandling.GetFileInfo( path, ok_to_look_for_hydrus_updates = True )
+            ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = self._worker_process_pool.GetResult( future, ClientWorkerProcesses.GetFileInfo, path )
             
             additional_data = ( size, mime, width, height, duration, num_frames, has_audio, num_words )
             
@@ -1633,7 +1660,7 @@ class FilesMaintenanceManager( object ):
             
         
     
-    def _RegenFileOtherHashes( self, media_result ):
+    def _RegenFileOtherHashes( self, media_result, future = None ):
         
         hash = media_result.GetHash()
         mime = media_result.GetMime()
@@ -1647,7 +1674,7 @@ class FilesMaintenanceManager( object ):
             
             path = self._controller.client_files_manager.GetFilePath( hash, mime )
             
-            ( md5, sha1, sha512 ) = HydrusFileHandling.GetExtraHashesFromPath( path )
+            ( md5, sha1, sha512 ) = self._worker_process_pool.GetResult( future, ClientWorkerProcesses.GetExtraHashes, path )
             
             additional_data = ( md5, sha1, sha512 )
             
@@ -1659,7 +1686,7 @@ class FilesMaintenanceManager( object ):
             
         
     
-    def _RegenSimilarFilesMetadata( self, media_result ):
+    def _RegenSimilarFilesMetadata( self, media_result, future = None ):
         
         hash = media_result.GetHash()
         mime = media_result.GetMime()
@@ -1680,12 +1707,19 @@ class FilesMaintenanceManager( object ):
             return None
             
         
-        phashes = ClientImageHandling.GenerateShapePerceptualHashes( path, mime )
+        if future is None:
+            
+            phashes = ClientImageHandling.GenerateShapePerceptualHashes( path, mime )
+            
+        else:
+            
+            phashes = self._worker_process_pool.GetResult( future, ClientImageHandling.GenerateShapePerceptualHashes, path, mime )
+            
         
         return phashes
         
     
-    def _RegenFileThumbnailForce( self, media_result ):
+    def _RegenFileThumbnailForce( self, media_result, future = None ):
         
         mime = media_result.GetMime()
         
@@ -1696,7 +1730,31 @@ class FilesMaintenanceManager( object ):
         
         try:
             
-            self._controller.client_files_manager.RegenerateThumbnail( media_result )
+            if future is None:
+                
+                self._controller.client_files_manager.RegenerateThumbnail( media_result )
+                
+            else:
+                
+                hash = media_result.GetHash()
+                
+                try:
+                    
+                    thumbnail_bytes = self._worker_process_pool.GetResult( future, self._controller.client_files_manager.GenerateThumbnailBytes, media_result )
+                    
+                except HydrusExceptions.FileMissingException:
+                    
+                    raise
+                    
+                except Exception as e:
+                    
+                    HydrusData.PrintException( e )
+                    
+                    raise HydrusExceptions.FileMissingException( 'The thumbnail for file ' + hash.hex() + ' could not be regenerated from the original file for the above reason. This event could indicate hard drive corruption. Please check everything is ok.' )
+                    
+                
+                self._controller.client_files_manager.AddThumbnailFromBytes( hash, thumbnail_bytes )
+                
             
         except HydrusExceptions.FileMissingException:
             
@@ -1741,11 +1799,15 @@ class FilesMaintenanceManager( object ):
         
         self._active_work_rules.AddRule( HC.BANDWIDTH_TYPE_REQUESTS, file_maintenance_active_throttle_time_delta, file_maintenance_active_throttle_files * NORMALISED_BIG_JOB_WEIGHT )
         
+        self._worker_process_pool.SetNumProcesses( self._controller.new_options.GetInteger( 'file_maintenance_num_worker_processes' ) )
+        
     
     def _RunJob( self, media_results, job_type, job_key, job_done_hook = None ):
         
         next_gc_collect = HydrusData.GetNow() + 10
         
+        hashes_to_futures = {}
+        
         try:
             
             cleared_jobs = []
@@ -1757,6 +1819,8 @@ class FilesMaintenanceManager( object ):
                 HydrusData.ShowText( 'file maintenance: {} for {} files'.format( regen_file_enum_to_str_lookup[ job_type ], HydrusData.ToHumanInt( num_to_do ) ) )
                 
             
+            hashes_to_futures = self._SubmitWorkerProcessJobs( media_results, job_type )
+            
             for ( i, media_result ) in enumerate( media_results ):
                 
                 hash = media_result.GetHash()
@@ -1773,11 +1837,13 @@ class FilesMaintenanceManager( object ):
                 
                 additional_data = None
                 
+                future = hashes_to_futures.pop( hash, None )
+                
                 try:
                     
                     if job_type == REGENERATE_FILE_DATA_JOB_FILE_METADATA:
                         
-                        additional_data = self._RegenFileMetadata( media_result )
+                        additional_data = self._RegenFileMetadata( media_result, future = future )
                         
                     elif job_type == REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP:
                         
@@ -1785,11 +1851,11 @@ class FilesMaintenanceManager( object ):
                         
                     elif job_type == REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
                         
-                        additional_data = self._RegenFileOtherHashes( media_result )
+                        additional_data = self._RegenFileOtherHashes( media_result, future = future )
                         
                     elif job_type == REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL:
                         
-                        self._RegenFileThumbnailForce( media_result )
+                        self._RegenFileThumbnailForce( media_result, future = future )
                         
                     elif job_type == REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
                         
@@ -1821,7 +1887,7 @@ class FilesMaintenanceManager( object ):
                         
                     elif job_type == REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA:
                         
-                        additional_data = self._RegenSimilarFilesMetadata( media_result )
+                        additional_data = self._RegenSimilarFilesMetadata( media_result, future = future )
                         
                     elif job_type == REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS:
                         
@@ -1884,6 +1950,12 @@ class FilesMaintenanceManager( object ):
             
         finally:
             
+            # if we were cancelled, don't leave the workers chewing on stuff we don't want
+            for future in hashes_to_futures.values():
+                
+                future.cancel()
+                
+            
             if len( cleared_jobs ) > 0:
                 
                 self._controller.Write( 'file_maintenance_clear_jobs', cleared_jobs )
@@ -1891,6 +1963,90 @@ class FilesMaintenanceManager( object ):
             
         
     
+    def _SubmitWorkerProcessJobs( self, media_results, job_type ):
+        
+        hashes_to_futures = {}
+        
+        if job_type not in WORKER_PROCESS_JOB_TYPES or not self._worker_process_pool.IsActive():
+            
+            return hashes_to_futures
+            
+        
+        client_files_manager = self._controller.client_files_manager
+        
+        force_pil = self._controller.new_options.GetBoolean( 'load_images_with_pil' )
+        
+        for media_result in media_results:
+            
+            hash = media_result.GetHash()
+            mime = media_result.GetMime()
+            
+            try:
+                
+                if job_type == REGENERATE_FILE_DATA_JOB_FILE_METADATA:
+                    
+                    path = client_files_manager.GetFilePath( hash, mime )
+                    
+                    future = self._worker_process_pool.Submit( ClientWorkerProcesses.GetFileInfo, path )
+                    
+                elif job_type == REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
+                    
+                    if mime in HC.HYDRUS_UPDATE_FILES:
+                        
+                        continue
+                        
+                    
+                    path = client_files_manager.GetFilePath( hash, mime )
+                    
+                    future = self._worker_process_pool.Submit( ClientWorkerProcesses.GetExtraHashes, path )
+                    
+                elif job_type == REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA:
+                    
+                    if mime not in HC.MIMES_WE_CAN_PHASH:
+                        
+                        continue
+                        
+                    
+                    path = client_files_manager.GetFilePath( hash, mime )
+                    
+                    future = self._worker_process_pool.Submit( ClientWorkerProcesses.GenerateShapePerceptualHashes, path, mime, force_pil )
+                    
+                elif job_type == REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL:
+                    
+                    if mime not in HC.MIMES_WITH_THUMBNAILS:
+                        
+                        continue
+                        
+                    
+                    path = client_files_manager.GetFilePath( hash, mime )
+                    
+                    thumbnail_generation_args = client_files_manager.GetThumbnailGenerationArgs( path, media_result )
+                    
+                    future = self._worker_process_pool.Submit( ClientWorkerProcesses.GenerateThumbnailBytes, *thumbnail_generation_args )
+                    
+                else:
+                    
+                    continue
+                    
+                
+            except HydrusExceptions.FileMissingException:
+                
+                # the normal in-process job will deal with this
+                continue
+                
+            
+            if future is None:
+                
+                # pool is off or broken, so the rest will be done in-process
+                break
+                
+            
+            hashes_to_futures[ hash ] = future
+            
+        
+        return hashes_to_futures
+        
+    
     def CancelJobs( self, job_type ):
         
         with self._lock:
@@ -2088,7 +2244,17 @@ class FilesMaintenanceManager( object ):
                             
                             self._ClearJobs( missing_hashes, job_type )
                             
-                            for media_result in media_results:
+                            # with worker processes, we hand out one file per worker at a time. the throttle is checked per batch
+                            if job_type in WORKER_PROCESS_JOB_TYPES and self._worker_process_pool.IsActive():
+                                
+                                batch_size = self._worker_process_pool.GetNumProcesses()
+                                
+                            else:
+                                
+                                batch_size = 1
+                                
+                            
+                            for batch_of_media_results in HydrusData.SplitListIntoChunks( media_results, batch_size ):
                                 
                                 wait_on_maintenance()
                                 
@@ -2099,16 +2265,18 @@ class FilesMaintenanceManager( object ):
                                 
                                 with self._lock:
                                     
-                                    self._RunJob( ( media_result, ), job_type, job_key )
+                                    self._RunJob( batch_of_media_results, job_type, job_key )
                                     
                                 
                                 time.sleep( 0.0001 )
                                 
-                                i += 1
-                                
-                                if i % 100 == 0:
+                                for media_result in batch_of_media_results:
                                     
-                                    self._controller.pub( 'notify_files_maintenance_done' )
+                                    i += 1
+                                    
+                                    if i % 100 == 0:
+                                        
+                                        self._controller.pub( 'notify_files_maintenance_done' )
                                     
                                 
                             
@@ -2223,6 +2391,8 @@ class FilesMaintenanceManager( object ):
         
         self._wake_background_event.set()
         
+        self._worker_process_pool.Shutdown()
+        
     
     def Start( self ):
         
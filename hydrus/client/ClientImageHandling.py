@@ -39,6 +39,10 @@ def GenerateShapePerceptualHashes( path, mime ):
     
     numpy_image = GenerateNumPyImage( path, mime )
     
+    return GenerateShapePerceptualHashesNumPy( numpy_image )
+    
+def GenerateShapePerceptualHashesNumPy( numpy_image ):
+    
     if HG.phash_generation_report_mode:
         
         HydrusData.ShowText( 'phash generation: image shape: {}'.format( numpy_image.shape ) )
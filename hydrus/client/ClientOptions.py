@@ -144,6 +144,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'booleans' ][ 'elide_page_tab_names' ] = True
         
         self._dictionary[ 'booleans' ][ 'maintain_similar_files_duplicate_pairs_during_idle' ] = False
+        self._dictionary[ 'booleans' ][ 'similar_files_use_in_memory_index' ] = False
         
         self._dictionary[ 'booleans' ][ 'show_namespaces' ] = True
         self._dictionary[ 'booleans' ][ 'replace_tag_underscores_with_spaces' ] = False
@@ -322,6 +323,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'max_network_jobs' ] = 15
         self._dictionary[ 'integers' ][ 'max_network_jobs_per_domain' ] = 3
         
+        self._dictionary[ 'integers' ][ 'repository_update_download_num_concurrent' ] = 3
+        
         self._dictionary[ 'integers' ][ 'max_simultaneous_subscriptions' ] = 1
         
         self._dictionary[ 'integers' ][ 'gallery_page_wait_period_pages' ] = 15
@@ -352,6 +355,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'thumbnail_cache_timeout' ] = 86400
         self._dictionary[ 'integers' ][ 'image_cache_timeout' ] = 600
         self._dictionary[ 'integers' ][ 'image_tile_cache_timeout' ] = 300
+        self._dictionary[ 'integers' ][ 'rendered_image_disk_cache_size' ] = 1024 * 1024 * 1024
         
         self._dictionary[ 'integers' ][ 'image_cache_storage_limit_percentage' ] = 25
         self._dictionary[ 'integers' ][ 'image_cache_prefetch_limit_percentage' ] = 10
@@ -369,6 +373,10 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
         self._dictionary[ 'integers' ][ 'file_maintenance_active_throttle_files' ] = 1
         self._dictionary[ 'integers' ][ 'file_maintenance_active_throttle_time_delta' ] = 20
         
+        self._dictionary[ 'integers' ][ 'file_maintenance_num_worker_processes' ] = 0
+        
+        self._dictionary[ 'integers' ][ 'file_import_num_worker_threads' ] = 1
+        
         self._dictionary[ 'integers' ][ 'subscription_network_error_delay' ] = 12 * 3600
         self._dictionary[ 'integers' ][ 'subscription_other_error_delay' ] = 36 * 3600
         self._dictionary[ 'integers' ][ 'downloader_network_error_delay' ] = 90 * 60
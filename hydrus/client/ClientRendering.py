@@ -190,7 +190,24 @@ class ImageRenderer( object ):
         
         self._path = client_files_manager.GetFilePath( self._hash, self._mime )
         
-        self._numpy_image = ClientImageHandling.GenerateNumPyImage( self._path, self._mime )
+        rendered_image_disk_cache = HG.client_controller.rendered_image_disk_cache
+        
+        disk_cache_key = ( self._hash, self._resolution )
+        
+        numpy_image = rendered_image_disk_cache.GetNumPyImage( disk_cache_key )
+        
+        if numpy_image is None:
+            
+            numpy_image = ClientImageHandling.GenerateNumPyImage( self._path, self._mime )
+            
+            if not self._this_is_for_metadata_alone:
+                
+                # the media viewer is waiting on us, so the write happens elsewhere
+                HG.client_controller.CallToThread( rendered_image_disk_cache.AddNumPyImage, disk_cache_key, numpy_image )
+                
+            
+        
+        self._numpy_image = numpy_image
         
         if not self._this_is_for_metadata_alone:
             
@@ -235,6 +252,37 @@ class ImageRenderer( object ):
     
     def GetResolution( self ): return self._resolution
     
+    def GetNumPyImage( self, clip_rect = None, target_resolution = None ):
+        
+        ( my_width, my_height ) = self._resolution
+        
+        if clip_rect is None:
+            
+            clip_rect = QC.QRect( QC.QPoint( 0, 0 ), QC.QSize( my_width, my_height ) )
+            
+        
+        if target_resolution is None:
+            
+            target_resolution = clip_rect.size()
+            
+        
+        my_full_rect = QC.QRect( 0, 0, my_width, my_height )
+        
+        if my_full_rect.contains( clip_rect ):
+            
+            try:
+                
+                return self._GetNumPyImage( clip_rect, target_resolution )
+                
+            except Exception as e:
+                
+                HydrusData.PrintException( e, do_wait = False )
+                
+            
+        
+        return None
+        
+    
     def GetQtImage( self, clip_rect = None, target_resolution = None ):
         
         if clip_rect is None:
@@ -272,24 +320,15 @@ class ImageRenderer( object ):
             target_resolution = clip_rect.size()
             
         
-        my_full_rect = QC.QRect( 0, 0, my_width, my_height )
+        numpy_image = self.GetNumPyImage( clip_rect = clip_rect, target_resolution = target_resolution )
         
-        if my_full_rect.contains( clip_rect ):
+        if numpy_image is not None:
             
-            try:
-                
-                numpy_image = self._GetNumPyImage( clip_rect, target_resolution )
-                
-                ( height, width, depth ) = numpy_image.shape
-                
-                data = numpy_image.data
-                
-                return HG.client_controller.bitmap_manager.GetQtPixmapFromBuffer( width, height, depth * 8, data )
-                
-            except Exception as e:
-                
-                HydrusData.PrintException( e, do_wait = False )
-                
+            ( height, width, depth ) = numpy_image.shape
+            
+            data = numpy_image.data
+            
+            return HG.client_controller.bitmap_manager.GetQtPixmapFromBuffer( width, height, depth * 8, data )
             
         
         HydrusData.Print( 'Failed to produce a tile! Info is: {}, {}, {}, {}'.format( self._hash.hex(), ( my_width, my_height ), clip_rect, target_resolution ) )
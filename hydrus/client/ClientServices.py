@@ -1,3 +1,5 @@
+import collections
+import concurrent.futures
 import hashlib
 import json
 import os
@@ -1111,7 +1113,7 @@ class ServiceRestricted( ServiceRemote ):
             
         
     
-    def Request( self, method, command, request_args = None, request_headers = None, report_hooks = None, temp_path = None ):
+    def Request( self, method, command, request_args = None, request_headers = None, report_hooks = None, temp_path = None, network_job_hook = None ):
         
         if request_args is None: request_args = {}
         if request_headers is None: request_headers = {}
@@ -1169,6 +1171,11 @@ class ServiceRestricted( ServiceRemote ):
             
             network_job = ClientNetworkingJobs.NetworkJobHydrus( self._service_key, method, url, body = body, temp_path = temp_path )
             
+            if network_job_hook is not None:
+                
+                network_job_hook( network_job )
+                
+            
             if command not in ( 'update', 'metadata', 'file', 'thumbnail' ):
                 
                 network_job.OverrideBandwidth()
@@ -1225,6 +1232,13 @@ class ServiceRestricted( ServiceRemote ):
             
         except Exception as e:
             
+            if isinstance( e, HydrusExceptions.CancelledException ) and network_job_hook is not None:
+                
+                # the caller has the network job and may have cancelled it themselves, so what a cancel means is up to them
+                
+                raise
+                
+            
             with self._lock:
                 
                 if isinstance( e, HydrusExceptions.ServerBusyException ):
@@ -1395,6 +1409,190 @@ class ServiceRestricted( ServiceRemote ):
             
         
     
+UPDATE_LOAD_OK = 0
+UPDATE_LOAD_MISSING = 1
+UPDATE_LOAD_INVALID = 2
+
+class RepositoryUpdatePrefetcher( object ):
+    
+    # reading, decompressing and parsing an update is slow, so we do the next few on a background thread while the db works on the current one
+    # we cap how much we hold at once, since a parsed update is a lot bigger than its file
+    
+    def __init__( self, update_hashes_and_mimes, max_num_prefetched = 8, max_prefetched_bytes = 32 * 1048576 ):
+        
+        self._update_hashes_and_mimes = list( update_hashes_and_mimes )
+        self._max_num_prefetched = max_num_prefetched
+        self._max_prefetched_bytes = max_prefetched_bytes
+        
+        self._condition = threading.Condition()
+        
+        self._update_hashes_to_results = {}
+        self._prefetched_bytes = 0
+        self._stopped = False
+        self._prefetch_error = None
+        
+        HG.client_controller.CallToThreadLongRunning( self.THREADPrefetch )
+        
+    
+    def _LoadUpdate( self, update_hash, mime ):
+        
+        try:
+            
+            update_path = HG.client_controller.client_files_manager.GetFilePath( update_hash, mime )
+            
+        except HydrusExceptions.FileMissingException:
+            
+            return ( UPDATE_LOAD_MISSING, None, 0 )
+            
+        
+        try:
+            
+            with open( update_path, 'rb' ) as f:
+                
+                update_network_bytes = f.read()
+                
+            
+        except Exception:
+            
+            return ( UPDATE_LOAD_MISSING, None, 0 )
+            
+        
+        try:
+            
+            update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+            
+        except:
+            
+            return ( UPDATE_LOAD_INVALID, None, 0 )
+            
+        
+        return ( UPDATE_LOAD_OK, update, len( update_network_bytes ) )
+        
+    
+    def _RoomForMore( self ):
+        
+        if len( self._update_hashes_to_results ) == 0:
+            
+            return True
+            
+        
+        return len( self._update_hashes_to_results ) < self._max_num_prefetched and self._prefetched_bytes < self._max_prefetched_bytes
+        
+    
+    def GetUpdate( self, update_hash, job_key = None ):
+        
+        # returns ( load_result, update )
+        
+        with self._condition:
+            
+            while update_hash not in self._update_hashes_to_results:
+                
+                if self._prefetch_error is not None:
+                    
+                    raise self._prefetch_error
+                    
+                
+                if self._stopped:
+                    
+                    raise HydrusExceptions.ShutdownException( 'Update prefetcher was stopped!' )
+                    
+                
+                if job_key is not None and job_key.IsCancelled():
+                    
+                    raise HydrusExceptions.CancelledException( 'Update processing was cancelled!' )
+                    
+                
+                self._condition.wait( 1.0 )
+                
+            
+            ( load_result, update, num_bytes ) = self._update_hashes_to_results.pop( update_hash )
+            
+            self._prefetched_bytes -= num_bytes
+            
+            self._condition.notify_all()
+            
+        
+        return ( load_result, update )
+        
+    
+    def Stop( self ):
+        
+        with self._condition:
+            
+            self._stopped = True
+            
+            self._update_hashes_to_results = {}
+            self._prefetched_bytes = 0
+            
+            self._condition.notify_all()
+            
+        
+    
+    def THREADPrefetch( self ):
+        
+        try:
+            
+            for ( update_hash, mime ) in self._update_hashes_and_mimes:
+                
+                with self._condition:
+                    
+                    while not ( self._stopped or self._RoomForMore() ):
+                        
+                        self._condition.wait( 1.0 )
+                        
+                    
+                    if self._stopped:
+                        
+                        return
+                        
+                    
+                
+                if HG.model_shutdown:
+                    
+                    self.Stop()
+                    
+                    return
+                    
+                
+                result = self._LoadUpdate( update_hash, mime )
+                
+                with self._condition:
+                    
+                    if self._stopped:
+                        
+                        return
+                        
+                    
+                    self._update_hashes_to_results[ update_hash ] = result
+                    
+                    ( load_result, update, num_bytes ) = result
+                    
+                    self._prefetched_bytes += num_bytes
+                    
+                    self._condition.notify_all()
+                    
+                
+            
+        except Exception as e:
+            
+            # whatever killed us, the processing thread should hear about it rather than wait forever
+            
+            with self._condition:
+                
+                self._prefetch_error = e
+                
+            
+        finally:
+            
+            with self._condition:
+                
+                self._stopped = True
+                
+                self._condition.notify_all()
+                
+            
+        
+    
 class ServiceRepository( ServiceRestricted ):
     
     def __init__( self, service_key, service_type, name, dictionary = None ):
@@ -1617,6 +1815,24 @@ class ServiceRepository( ServiceRestricted ):
         
         if len( update_hashes ) > 0:
             
+            # verified updates are written to the db in batches, so we are not waiting on a transaction for every little definitions update
+            MAX_BATCH_NUM = 50
+            MAX_BATCH_BYTES = 32 * 1048576
+            
+            # the network engine and its bandwidth rules still decide when each of these actually goes
+            num_concurrent = HG.client_controller.new_options.GetInteger( 'repository_update_download_num_concurrent' )
+            
+            executor = concurrent.futures.ThreadPoolExecutor( max_workers = num_concurrent )
+            
+            update_hashes_to_fetch = collections.deque( update_hashes )
+            futures = collections.deque()
+            
+            # a future that has started cannot be cancelled, so we hold on to the network jobs to stop them ourselves
+            network_jobs = []
+            
+            update_rows_to_import = []
+            num_bytes_to_import = 0
+            
             job_key = ClientThreading.JobKey( cancellable = True, stop_time = stop_time )
             
             try:
@@ -1653,9 +1869,17 @@ class ServiceRepository( ServiceRestricted ):
                         return
                         
                     
+                    # keep the pipe full. results are consumed in order, so this one is always at the front
+                    while len( update_hashes_to_fetch ) > 0 and len( futures ) < num_concurrent:
+                        
+                        futures.append( executor.submit( self.Request, HC.GET, 'update', { 'update_hash' : update_hashes_to_fetch.popleft() }, network_job_hook = network_jobs.append ) )
+                        
+                    
+                    future = futures.popleft()
+                    
                     try:
                         
-                        update_network_string = self.Request( HC.GET, 'update', { 'update_hash' : update_hash } )
+                        update_network_string = future.result()
                         
                     except HydrusExceptions.CancelledException as e:
                         
@@ -1735,22 +1959,25 @@ class ServiceRepository( ServiceRestricted ):
                         return
                         
                     
-                    try:
-                        
-                        HG.client_controller.WriteSynchronous( 'import_update', update_network_string, update_hash, mime )
+                    update_rows_to_import.append( ( update_network_string, update_hash, mime ) )
+                    num_bytes_to_import += len( update_network_string )
+                    
+                    if len( update_rows_to_import ) >= MAX_BATCH_NUM or num_bytes_to_import >= MAX_BATCH_BYTES:
                         
-                    except Exception as e:
+                        ( update_rows, update_rows_to_import, num_bytes_to_import ) = ( update_rows_to_import, [], 0 )
                         
-                        with self._lock:
+                        if not self._SyncDownloadUpdatesImportUpdates( update_rows ):
                             
-                            self._DealWithFundamentalNetworkError()
+                            return
                             
                         
-                        message = 'While downloading updates for the ' + self._name + ' repository, one failed to import! The error follows:'
-                        
-                        HydrusData.ShowText( message )
-                        
-                        HydrusData.ShowException( e )
+                    
+                
+                if len( update_rows_to_import ) > 0:
+                    
+                    ( update_rows, update_rows_to_import, num_bytes_to_import ) = ( update_rows_to_import, [], 0 )
+                    
+                    if not self._SyncDownloadUpdatesImportUpdates( update_rows ):
                         
                         return
                         
@@ -1761,12 +1988,88 @@ class ServiceRepository( ServiceRestricted ):
                 
             finally:
                 
+                for future in futures:
+                    
+                    future.cancel()
+                    
+                
+                for network_job in network_jobs:
+                    
+                    if not network_job.IsDone():
+                        
+                        network_job.Cancel( 'Update sync stopped.' )
+                        
+                    
+                
+                executor.shutdown( wait = False )
+                
+                # if we bailed out early, we still want to keep what we verified
+                if len( update_rows_to_import ) > 0:
+                    
+                    self._SyncDownloadUpdatesImportUpdates( update_rows_to_import )
+                    
+                
                 job_key.Finish()
                 job_key.Delete( 5 )
                 
             
         
     
+    def _SyncDownloadUpdatesImportUpdates( self, update_rows ):
+        
+        try:
+            
+            HG.client_controller.WriteSynchronous( 'import_updates', update_rows )
+            
+            return True
+            
+        except Exception as e:
+            
+            if len( update_rows ) == 1:
+                
+                ( failed_update_hash, failed_e ) = ( update_rows[0][1], e )
+                
+            else:
+                
+                # one bad update rolls back the whole batch, so do them again one at a time to keep the good ones and find the bad one
+                
+                ( failed_update_hash, failed_e ) = ( None, None )
+                
+                for ( update_network_string, update_hash, mime ) in update_rows:
+                    
+                    try:
+                        
+                        HG.client_controller.WriteSynchronous( 'import_update', update_network_string, update_hash, mime )
+                        
+                    except Exception as e:
+                        
+                        ( failed_update_hash, failed_e ) = ( update_hash, e )
+                        
+                        break
+                        
+                    
+                
+                if failed_e is None:
+                    
+                    return True
+                    
+                
+            
+            with self._lock:
+                
+                self._DealWithFundamentalNetworkError()
+                
+            
+            message = 'While downloading updates for the ' + self._name + ' repository, update ' + failed_update_hash.hex() + ' failed to import! The error follows:'
+            
+            HydrusData.ShowText( message )
+            
+            HydrusData.ShowException( failed_e )
+            
+            return False
+            
+        
+    
     def _SyncProcessUpdates( self, maintenance_mode = HC.MAINTENANCE_IDLE, stop_time = None ):
         
         with self._lock:
@@ -1784,6 +2087,8 @@ class ServiceRepository( ServiceRestricted ):
         
         work_done = False
         
+        update_prefetcher = None
+        
         try:
             
             job_key = ClientThreading.JobKey( cancellable = True, maintenance_mode = maintenance_mode, stop_time = stop_time )
@@ -1801,6 +2106,11 @@ class ServiceRepository( ServiceRestricted ):
             
             HydrusData.Print( title )
             
+            update_hashes_and_mimes = [ ( definition_hash, HC.APPLICATION_HYDRUS_UPDATE_DEFINITIONS ) for definition_hash in definition_hashes ]
+            update_hashes_and_mimes.extend( ( ( content_hash, HC.APPLICATION_HYDRUS_UPDATE_CONTENT ) for content_hash in content_hashes ) )
+            
+            update_prefetcher = RepositoryUpdatePrefetcher( update_hashes_and_mimes )
+            
             num_updates_done = 0
             num_updates_to_do = len( definition_hashes ) + len( content_hashes )
             
@@ -1830,27 +2140,15 @@ class ServiceRepository( ServiceRestricted ):
                     job_key.SetVariable( 'popup_text_1', status )
                     job_key.SetVariable( 'popup_gauge_1', ( num_updates_done, num_updates_to_do ) )
                     
-                    try:
-                        
-                        update_path = HG.client_controller.client_files_manager.GetFilePath( definition_hash, HC.APPLICATION_HYDRUS_UPDATE_DEFINITIONS )
-                        
-                    except HydrusExceptions.FileMissingException:
+                    ( load_result, definition_update ) = update_prefetcher.GetUpdate( definition_hash, job_key = job_key )
+                    
+                    if load_result == UPDATE_LOAD_MISSING:
                         
                         HG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE )
                         
                         raise Exception( 'An unusual error has occured during repository processing: an update file ({}) was missing. Your repository should be paused, and all update files have been scheduled for a presence check. Please permit file maintenance to check them, or tell it to do so manually, before unpausing your repository.'.format( definition_hash.hex() ) )
                         
-                    
-                    with open( update_path, 'rb' ) as f:
-                        
-                        update_network_bytes = f.read()
-                        
-                    
-                    try:
-                        
-                        definition_update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
-                        
-                    except:
+                    elif load_result == UPDATE_LOAD_INVALID:
                         
                         HG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA )
                         
@@ -1957,27 +2255,15 @@ class ServiceRepository( ServiceRestricted ):
                     job_key.SetVariable( 'popup_text_1', status )
                     job_key.SetVariable( 'popup_gauge_1', ( num_updates_done, num_updates_to_do ) )
                     
-                    try:
-                        
-                        update_path = HG.client_controller.client_files_manager.GetFilePath( content_hash, HC.APPLICATION_HYDRUS_UPDATE_CONTENT )
-                        
-                    except HydrusExceptions.FileMissingException:
+                    ( load_result, content_update ) = update_prefetcher.GetUpdate( content_hash, job_key = job_key )
+                    
+                    if load_result == UPDATE_LOAD_MISSING:
                         
                         HG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE )
                         
                         raise Exception( 'An unusual error has occured during repository processing: an update file ({}) was missing. Your repository should be paused, and all update files have been scheduled for a presence check. Please permit file maintenance to check them, or tell it to do so manually, before unpausing your repository.'.format( content_hash.hex() ) )
                         
-                    
-                    with open( update_path, 'rb' ) as f:
-                        
-                        update_network_bytes = f.read()
-                        
-                    
-                    try:
-                        
-                        content_update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
-                        
-                    except:
+                    elif load_result == UPDATE_LOAD_INVALID:
                         
                         HG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFiles.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA )
                         
@@ -2068,7 +2354,7 @@ class ServiceRepository( ServiceRestricted ):
                 self._LogFinalRowSpeed( content_start_time, total_content_rows_completed, 'content rows' )
                 
             
-        except HydrusExceptions.ShutdownException:
+        except ( HydrusExceptions.ShutdownException, HydrusExceptions.CancelledException ):
             
             return
             
@@ -2094,6 +2380,11 @@ class ServiceRepository( ServiceRestricted ):
             
         finally:
             
+            if update_prefetcher is not None:
+                
+                update_prefetcher.Stop()
+                
+            
             if work_done:
                 
                 self._is_mostly_caught_up = None
@@ -2162,6 +2453,15 @@ class ServiceRepository( ServiceRestricted ):
         HG.client_controller.pub( 'notify_new_permissions' )
         
     
+    def GetBinaryUpdates( self ) -> bool:
+        
+        with self._lock:
+            
+            # older servers do not have this option, and they only make json updates
+            return self._service_options.get( 'binary_updates', False )
+            
+        
+    
     def GetMetadata( self ):
         
         with self._lock:
@@ -0,0 +1,155 @@
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import threading
+
+from hydrus.core import HydrusData
+from hydrus.core import HydrusFileHandling
+from hydrus.core import HydrusImageHandling
+from hydrus.core import HydrusVideoHandling
+
+from hydrus.client import ClientImageHandling
+
+# these functions run in a separate process, so they cannot touch the controller, the db, or any options
+# anything they need has to come in through the args or the initialiser
+
+def InitialiseWorkerProcess( ffmpeg_path ):
+    
+    HydrusVideoHandling.FFMPEG_PATH = ffmpeg_path
+    
+def GenerateShapePerceptualHashes( path, mime, force_pil ):
+    
+    numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime, force_pil = force_pil )
+    
+    return ClientImageHandling.GenerateShapePerceptualHashesNumPy( numpy_image )
+    
+def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, percentage_in ):
+    
+    return HydrusFileHandling.GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in )
+    
+def GetExtraHashes( path ):
+    
+    return HydrusFileHandling.GetExtraHashesFromPath( path )
+    
+def GetFileInfo( path ):
+    
+    return HydrusFileHandling.GetFileInfo( path, ok_to_look_for_hydrus_updates = True )
+    
+class WorkerProcessPool( object ):
+    
+    def __init__( self, name, num_processes = 0 ):
+        
+        self._name = name
+        self._num_processes = num_processes
+        
+        self._executor = None
+        
+        self._lock = threading.Lock()
+        
+    
+    def _GetExecutor( self ):
+        
+        if self._executor is None:
+            
+            # spawn, not fork--we have a bunch of threads and a Qt event loop going that we do not want to clone
+            mp_context = multiprocessing.get_context( 'spawn' )
+            
+            self._executor = concurrent.futures.ProcessPoolExecutor( max_workers = self._num_processes, mp_context = mp_context, initializer = InitialiseWorkerProcess, initargs = ( HydrusVideoHandling.FFMPEG_PATH, ) )
+            
+        
+        return self._executor
+        
+    
+    def _ShutdownExecutor( self ):
+        
+        if self._executor is not None:
+            
+            self._executor.shutdown( wait = False )
+            
+            self._executor = None
+            
+        
+    
+    def GetNumProcesses( self ):
+        
+        with self._lock:
+            
+            return self._num_processes
+            
+        
+    
+    def GetResult( self, future, work_callable, *args ):
+        
+        # if the pool is off or fell over, we just do the work here in this process
+        
+        if future is not None:
+            
+            try:
+                
+                return future.result()
+                
+            except concurrent.futures.process.BrokenProcessPool:
+                
+                HydrusData.Print( 'The {} worker process pool broke! It will be restarted, and the job will be done in the main process.'.format( self._name ) )
+                
+                with self._lock:
+                    
+                    self._ShutdownExecutor()
+                    
+                
+            
+        
+        return work_callable( *args )
+        
+    
+    def IsActive( self ):
+        
+        with self._lock:
+            
+            return self._num_processes > 0
+            
+        
+    
+    def SetNumProcesses( self, num_processes ):
+        
+        with self._lock:
+            
+            if num_processes != self._num_processes:
+                
+                self._ShutdownExecutor()
+                
+                self._num_processes = num_processes
+                
+            
+        
+    
+    def Shutdown( self ):
+        
+        with self._lock:
+            
+            self._ShutdownExecutor()
+            
+        
+    
+    def Submit( self, work_callable, *args ):
+        
+        with self._lock:
+            
+            if self._num_processes == 0:
+                
+                return None
+                
+            
+            try:
+                
+                return self._GetExecutor().submit( work_callable, *args )
+                
+            except concurrent.futures.process.BrokenProcessPool:
+                
+                self._ShutdownExecutor()
+                
+                return None
+                
+            
+        
+    
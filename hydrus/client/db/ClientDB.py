@@ -5,6 +5,7 @@ import os
 import random
 import re
 import sqlite3
+import threading
 import time
 import traceback
 import typing
@@ -42,6 +43,7 @@ from hydrus.client.db import ClientDBRepositories
 from hydrus.client.db import ClientDBSerialisable
 from hydrus.client.db import ClientDBServices
 from hydrus.client.db import ClientDBSimilarFiles
+from hydrus.client.db import ClientDBTagCooccurrence
 from hydrus.client.importing import ClientImportFiles
 from hydrus.client.media import ClientMedia
 from hydrus.client.media import ClientMediaManagers
@@ -160,6 +162,19 @@ def ConvertWildcardToSQLiteLikeParameter( wildcard ):
     
     return like_param
     
+def ConvertWildcardToSubtagTrigrams( wildcard ):
+    
+    # anything that matches has to contain every run of text between the *s, so it has to have all their trigrams too
+    
+    trigrams = set()
+    
+    for fragment in wildcard.split( '*' ):
+        
+        trigrams.update( GetSubtagTrigrams( fragment ) )
+        
+    
+    return trigrams
+    
 def DoingAFileJoinTagSearchIsFaster( estimated_file_row_count, estimated_tag_row_count ):
     
     # ok, so there are times we want to do a tag search when we already know a superset of the file results (e.g. 'get all of these files that are tagged with samus')
@@ -201,6 +216,14 @@ def GenerateCombinedFilesIntegerSubtagsTableName( tag_service_id ):
     
     return integer_subtags_table_name
     
+def GenerateCombinedFilesSubtagTrigramsTableName( tag_service_id ):
+    
+    name = 'combined_files_subtag_trigrams_cache'
+    
+    subtag_trigrams_table_name = 'external_caches.{}_{}'.format( name, tag_service_id )
+    
+    return subtag_trigrams_table_name
+    
 def GenerateCombinedFilesSubtagsFTS4TableName( tag_service_id ):
     
     name = 'combined_files_subtags_fts4_cache'
@@ -290,6 +313,16 @@ def GenerateSpecificIntegerSubtagsTableName( file_service_id, tag_service_id ):
     
     return integer_subtags_table_name
     
+def GenerateSpecificSubtagTrigramsTableName( file_service_id, tag_service_id ):
+    
+    name = 'specific_subtag_trigrams_cache'
+    
+    suffix = '{}_{}'.format( file_service_id, tag_service_id )
+    
+    subtag_trigrams_table_name = 'external_caches.{}_{}'.format( name, suffix )
+    
+    return subtag_trigrams_table_name
+    
 def GenerateSpecificSubtagsFTS4TableName( file_service_id, tag_service_id ):
     
     name = 'specific_subtags_fts4_cache'
@@ -360,6 +393,10 @@ def GenerateTagSiblingsLookupCacheTableNames( service_id ):
     
     return ( cache_ideal_tag_siblings_lookup_table_name, cache_actual_tag_siblings_lookup_table_name )
     
+def GetSubtagTrigrams( subtag: str ):
+    
+    return { subtag[ i : i + 3 ] for i in range( len( subtag ) - 2 ) }
+    
 def WildcardHasFTS4SearchableCharacters( wildcard: str ):
     
     # fts4 says it can do alphanumeric or unicode with a value >= 128
@@ -489,6 +526,7 @@ class JobDatabaseClient( HydrusData.JobDatabase ):
 class DB( HydrusDB.HydrusDB ):
     
     READ_WRITE_ACTIONS = [ 'service_info', 'system_predicates', 'missing_thumbnail_hashes' ]
+    CONCURRENT_READ_ACTIONS = [ 'autocomplete_predicates', 'file_duplicate_hashes', 'file_duplicate_info', 'file_hashes', 'file_query_ids', 'filter_hashes', 'hash_ids_to_hashes', 'inbox_hashes', 'media_predicates', 'media_result', 'media_results', 'media_results_from_ids', 'related_tags', 'url_statuses' ]
     
     def __init__( self, controller, db_dir, db_name ):
         
@@ -498,6 +536,9 @@ class DB( HydrusDB.HydrusDB ):
         
         self._weakref_media_result_cache = ClientMediaResultCache.MediaResultCache()
         
+        # read connection threads note the media result cache generation here when they start a job
+        self._read_connection_job_data = threading.local()
+        
         self._after_job_content_update_jobs = []
         self._regen_tags_managers_hash_ids = set()
         self._regen_tags_managers_tag_ids = set()
@@ -3711,6 +3752,18 @@ class DB( HydrusDB.HydrusDB ):
         self._CacheTagParentsRegenChains( interested_tag_service_ids, tag_ids_that_changed )
         
     
+    def _CacheTagsAddSubtagTrigrams( self, file_service_id, tag_service_id, subtag_ids_and_searchable_subtags ):
+        
+        if not self._CacheTagsSubtagTrigramsIndexExists( file_service_id, tag_service_id ):
+            
+            return
+            
+        
+        subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id )
+        
+        self._c.executemany( 'INSERT OR IGNORE INTO {} ( trigram, subtag_id ) VALUES ( ?, ? );'.format( subtag_trigrams_table_name ), ( ( trigram, subtag_id ) for ( subtag_id, searchable_subtag ) in subtag_ids_and_searchable_subtags for trigram in GetSubtagTrigrams( searchable_subtag ) ) )
+        
+    
     def _CacheTagsAddTags( self, file_service_id, tag_service_id, tag_ids ):
         
         if len( tag_ids ) == 0:
@@ -3748,10 +3801,14 @@ class DB( HydrusDB.HydrusDB ):
                 subtags_searchable_map_table_name = self._CacheTagsGetSubtagsSearchableMapTableName( file_service_id, tag_service_id )
                 integer_subtags_table_name = self._CacheTagsGetIntegerSubtagsTableName( file_service_id, tag_service_id )
                 
+                subtag_ids_and_searchable_subtags = []
+                
                 for ( subtag_id, subtag ) in subtag_ids_and_subtags:
                     
                     searchable_subtag = ClientSearch.ConvertSubtagToSearchable( subtag )
                     
+                    subtag_ids_and_searchable_subtags.append( ( subtag_id, searchable_subtag ) )
+                    
                     if searchable_subtag != subtag:
                         
                         searchable_subtag_id = self.modules_tags.GetSubtagId( searchable_subtag )
@@ -3781,6 +3838,35 @@ class DB( HydrusDB.HydrusDB ):
                         
                     
                 
+                self._CacheTagsAddSubtagTrigrams( file_service_id, tag_service_id, subtag_ids_and_searchable_subtags )
+                
+            
+        
+    
+    def _CacheTagsDeleteSubtagTrigrams( self, file_service_id, tag_service_id, subtag_ids ):
+        
+        # call this before the subtags are removed from the fts4 table, since that is where we get the searchable text
+        
+        if not self._CacheTagsSubtagTrigramsIndexExists( file_service_id, tag_service_id ):
+            
+            return
+            
+        
+        subtags_fts4_table_name = self._CacheTagsGetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id )
+        
+        for subtag_id in subtag_ids:
+            
+            result = self._c.execute( 'SELECT subtag FROM {} WHERE docid = ?;'.format( subtags_fts4_table_name ), ( subtag_id, ) ).fetchone()
+            
+            if result is None:
+                
+                continue
+                
+            
+            ( searchable_subtag, ) = result
+            
+            self._c.executemany( 'DELETE FROM {} WHERE trigram = ? AND subtag_id = ?;'.format( subtag_trigrams_table_name ), ( ( trigram, subtag_id ) for trigram in GetSubtagTrigrams( searchable_subtag ) ) )
             
         
     
@@ -3825,6 +3911,8 @@ class DB( HydrusDB.HydrusDB ):
                 
                 deletee_subtag_ids = subtag_ids.difference( still_existing_subtag_ids )
                 
+                self._CacheTagsDeleteSubtagTrigrams( file_service_id, tag_service_id, deletee_subtag_ids )
+                
                 self._c.executemany( 'DELETE FROM {} WHERE docid = ?;'.format( subtags_fts4_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
                 self._c.executemany( 'DELETE FROM {} WHERE subtag_id = ?;'.format( subtags_searchable_map_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
                 self._c.executemany( 'DELETE FROM {} WHERE subtag_id = ?;'.format( integer_subtags_table_name ), ( ( subtag_id, ) for subtag_id in deletee_subtag_ids ) )
@@ -3850,6 +3938,23 @@ class DB( HydrusDB.HydrusDB ):
         
         self._c.execute( 'DROP TABLE IF EXISTS {};'.format( integer_subtags_table_name ) )
         
+        # the trigram index is opt-in, so a regen keeps it. we just empty it, and it fills back up as the tags go back in
+        # it only goes for real when the service does
+        
+        if self._CacheTagsSubtagTrigramsIndexExists( file_service_id, tag_service_id ):
+            
+            subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id )
+            
+            self._c.execute( 'DELETE FROM {};'.format( subtag_trigrams_table_name ) )
+            
+        
+    
+    def _CacheTagsDropSubtagTrigrams( self, file_service_id, tag_service_id ):
+        
+        subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id )
+        
+        self._c.execute( 'DROP TABLE IF EXISTS {};'.format( subtag_trigrams_table_name ) )
+        
     
     def _CacheTagsFileServiceIsCoveredByAllLocalFiles( self, file_service_id ):
         
@@ -3878,6 +3983,57 @@ class DB( HydrusDB.HydrusDB ):
         self._CreateIndex( integer_subtags_table_name, [ 'integer_subtag' ] )
         
     
+    def _CacheTagsGenerateSubtagTrigrams( self, file_service_id, tag_service_id, status_hook = None ):
+        
+        # this index is optional, so it is not made in the normal generate call. once it exists, it is kept up to date with the other subtag caches
+        
+        subtags_fts4_table_name = self._CacheTagsGetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id )
+        
+        self._CacheTagsDropSubtagTrigrams( file_service_id, tag_service_id )
+        
+        self._c.execute( 'CREATE TABLE IF NOT EXISTS {} ( trigram TEXT, subtag_id INTEGER, PRIMARY KEY ( trigram, subtag_id ) ) WITHOUT ROWID;'.format( subtag_trigrams_table_name ) )
+        
+        ( num_to_do, ) = self._c.execute( 'SELECT COUNT( * ) FROM {};'.format( subtags_fts4_table_name ) ).fetchone()
+        
+        num_done = 0
+        
+        BLOCK_SIZE = 10000
+        
+        # we walk the docids in blocks, getting the subtags in the same read
+        
+        query = 'SELECT docid, subtag FROM {} WHERE docid > ? ORDER BY docid LIMIT ?;'.format( subtags_fts4_table_name )
+        
+        last_subtag_id = -1
+        
+        while True:
+            
+            subtag_ids_and_searchable_subtags = self._c.execute( query, ( last_subtag_id, BLOCK_SIZE ) ).fetchall()
+            
+            if len( subtag_ids_and_searchable_subtags ) == 0:
+                
+                break
+                
+            
+            self._CacheTagsAddSubtagTrigrams( file_service_id, tag_service_id, subtag_ids_and_searchable_subtags )
+            
+            ( last_subtag_id, searchable_subtag ) = subtag_ids_and_searchable_subtags[-1]
+            
+            num_done += len( subtag_ids_and_searchable_subtags )
+            
+            message = HydrusData.ConvertValueRangeToPrettyString( num_done, num_to_do )
+            
+            self._controller.frame_splash_status.SetSubtext( message )
+            
+            if status_hook is not None:
+                
+                status_hook( message )
+                
+            
+        
+        self.modules_db_maintenance.AnalyzeTable( subtag_trigrams_table_name )
+        
+    
     def _CacheTagsGetIntegerSubtagsTableName( self, file_service_id, tag_service_id ):
         
         if file_service_id == self.modules_services.combined_file_service_id:
@@ -3897,6 +4053,56 @@ class DB( HydrusDB.HydrusDB ):
         return integer_subtags_table_name
         
     
+    def _CacheTagsGetSubtagTrigramsTableName( self, file_service_id, tag_service_id ):
+        
+        if file_service_id == self.modules_services.combined_file_service_id:
+            
+            subtag_trigrams_table_name = GenerateCombinedFilesSubtagTrigramsTableName( tag_service_id )
+            
+        else:
+            
+            if self._CacheTagsFileServiceIsCoveredByAllLocalFiles( file_service_id ):
+                
+                file_service_id = self.modules_services.combined_local_file_service_id
+                
+            
+            subtag_trigrams_table_name = GenerateSpecificSubtagTrigramsTableName( file_service_id, tag_service_id )
+            
+        
+        return subtag_trigrams_table_name
+        
+    
+    def _CacheTagsGetSubtagTrigramsWildcardQuery( self, file_service_id, tag_service_id, subtag_wildcard ):
+        
+        # for '*amus' or '*amu*', rather than LIKE-scanning every subtag, we intersect the subtags that have each trigram and only LIKE those
+        
+        if not self._CacheTagsSubtagTrigramsIndexExists( file_service_id, tag_service_id ):
+            
+            return None
+            
+        
+        trigrams = ConvertWildcardToSubtagTrigrams( subtag_wildcard )
+        
+        if len( trigrams ) == 0:
+            
+            return None
+            
+        
+        # a handful narrows it plenty, and sqlite only allows so many compound selects
+        trigrams = sorted( trigrams )[ : 16 ]
+        
+        subtags_fts4_table_name = self._CacheTagsGetSubtagsFTS4TableName( file_service_id, tag_service_id )
+        subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id )
+        
+        trigram_select = 'SELECT subtag_id FROM {} WHERE trigram = ?'.format( subtag_trigrams_table_name )
+        
+        query = 'SELECT docid FROM {} WHERE docid IN ( {} ) AND subtag LIKE ?;'.format( subtags_fts4_table_name, ' INTERSECT '.join( ( trigram_select for trigram in trigrams ) ) )
+        
+        args = tuple( trigrams ) + ( ConvertWildcardToSQLiteLikeParameter( subtag_wildcard ), )
+        
+        return ( query, args )
+        
+    
     def _CacheTagsGetSubtagsFTS4TableName( self, file_service_id, tag_service_id ):
         
         if file_service_id == self.modules_services.combined_file_service_id:
@@ -4072,6 +4278,8 @@ class DB( HydrusDB.HydrusDB ):
             
             self._c.execute( 'INSERT OR IGNORE INTO {} ( docid, subtag ) VALUES ( ?, ? );'.format( subtags_fts4_table_name ), ( subtag_id, searchable_subtag ) )
             
+            self._CacheTagsAddSubtagTrigrams( file_service_id, tag_service_id, ( ( subtag_id, searchable_subtag ), ) )
+            
             if subtag.isdecimal():
                 
                 try:
@@ -4096,6 +4304,15 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _CacheTagsSubtagTrigramsIndexExists( self, file_service_id, tag_service_id ):
+        
+        subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id ).split( '.' )[1]
+        
+        result = self._c.execute( 'SELECT 1 FROM external_caches.sqlite_master WHERE name = ?;', ( subtag_trigrams_table_name, ) ).fetchone()
+        
+        return result is not None
+        
+    
     def _CacheTagsSyncTags( self, tag_service_id, tag_ids ):
         
         if len( tag_ids ) == 0:
@@ -5416,6 +5633,8 @@ class DB( HydrusDB.HydrusDB ):
             
             self.modules_mappings_storage.DropMappingsTables( service_id )
             
+            self.modules_tag_cooccurrence.Drop( service_id )
+            
             #
             
             self._c.execute( 'DELETE FROM tag_siblings WHERE service_id = ?;', ( service_id, ) )
@@ -5427,6 +5646,7 @@ class DB( HydrusDB.HydrusDB ):
             self._CacheTagParentsDrop( service_id )
             
             self._CacheTagsDrop( self.modules_services.combined_file_service_id, service_id )
+            self._CacheTagsDropSubtagTrigrams( self.modules_services.combined_file_service_id, service_id )
             
             self._CacheCombinedFilesMappingsDrop( service_id )
             
@@ -5435,6 +5655,7 @@ class DB( HydrusDB.HydrusDB ):
             for file_service_id in file_service_ids:
                 
                 self._CacheTagsDrop( file_service_id, service_id )
+                self._CacheTagsDropSubtagTrigrams( file_service_id, service_id )
                 
             
             file_service_ids = self.modules_services.GetServiceIds( HC.AUTOCOMPLETE_CACHE_SPECIFIC_FILE_SERVICES )
@@ -5469,6 +5690,7 @@ class DB( HydrusDB.HydrusDB ):
             for tag_service_id in tag_service_ids:
                 
                 self._CacheTagsDrop( service_id, tag_service_id )
+                self._CacheTagsDropSubtagTrigrams( service_id, tag_service_id )
                 
             
         
@@ -9860,7 +10082,16 @@ class DB( HydrusDB.HydrusDB ):
         
         if sort_by is not None and file_service_id != self.modules_services.combined_file_service_id:
             
-            ( did_sort, query_hash_ids ) = self._TryToSortHashIds( file_service_id, query_hash_ids, sort_by )
+            if we_are_applying_limit:
+                
+                sort_limit = limit
+                
+            else:
+                
+                sort_limit = None
+                
+            
+            ( did_sort, query_hash_ids ) = self._TryToSortHashIds( file_service_id, query_hash_ids, sort_by, limit = sort_limit )
             
         
         #
@@ -10716,7 +10947,13 @@ class DB( HydrusDB.HydrusDB ):
                 missing_media_results.append( ClientMediaResult.MediaResult( file_info_manager, tags_manager, locations_manager, ratings_manager, notes_manager, file_viewing_stats_manager ) )
                 
             
-            self._weakref_media_result_cache.AddMediaResults( missing_media_results )
+            # on a read connection, our snapshot may predate an update the cache has already applied, and a stale result in there would never get fixed
+            generation = getattr( self._read_connection_job_data, 'media_result_cache_generation', None )
+            
+            if not self._weakref_media_result_cache.AddMediaResults( missing_media_results, generation = generation ):
+                
+                raise HydrusExceptions.DBReadConnectionStaleException( 'The media result cache changed while these results were being read!' )
+                
             
             cached_media_results.extend( missing_media_results )
             
@@ -11140,16 +11377,37 @@ class DB( HydrusDB.HydrusDB ):
     def _GetRelatedTags( self, service_key, skip_hash, search_tags, max_results, max_time_to_take ):
         
         stop_time_for_finding_files = HydrusData.GetNowPrecise() + ( max_time_to_take / 2 )
-        stop_time_for_finding_tags = HydrusData.GetNowPrecise() + ( max_time_to_take / 2 )
+        stop_time_for_finding_tags = HydrusData.GetNowPrecise() + max_time_to_take
         
         service_id = self.modules_services.GetServiceId( service_key )
         
-        skip_hash_id = self.modules_hashes_local_cache.GetHashId( skip_hash )
+        if skip_hash is None:
+            
+            skip_hash_id = None
+            
+        else:
+            
+            skip_hash_id = self.modules_hashes_local_cache.GetHashId( skip_hash )
+            
         
         ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = ClientDBMappingsStorage.GenerateMappingsTableNames( service_id )
         
         tag_ids = [ self.modules_tags.GetTagId( tag ) for tag in search_tags ]
         
+        inclusive = True
+        pending_count = 0
+        
+        if self.modules_tag_cooccurrence.IsIndexed( service_id ):
+            
+            # the precomputed index answers this in one quick lookup, no need to scan files
+            
+            results = self.modules_tag_cooccurrence.GetSuggestedTagIdsToCounts( service_id, tag_ids, max_results )
+            
+            tag_ids_to_full_counts = { tag_id : ( current_count, None, pending_count, None ) for ( tag_id, current_count ) in results }
+            
+            return self._GeneratePredicatesFromTagIdsAndCounts( ClientTags.TAG_DISPLAY_STORAGE, service_id, tag_ids_to_full_counts, inclusive )
+            
+        
         random.shuffle( tag_ids )
         
         hash_ids_counter = collections.Counter()
@@ -11192,18 +11450,34 @@ class DB( HydrusDB.HydrusDB ):
         
         random.shuffle( hash_ids )
         
-        for hash_id in hash_ids:
+        # we count in batches, letting sqlite do the counting for each batch in one go
+        # the batches start small so a slow db still gets some results in, and grow while we have time
+        
+        num_done = 0
+        batch_size = 64
+        
+        while num_done < len( hash_ids ):
+            
+            batch_hash_ids = hash_ids[ num_done : num_done + batch_size ]
             
-            for tag_id in self._STI( self._c.execute( 'SELECT tag_id FROM ' + current_mappings_table_name + ' WHERE hash_id = ?;', ( hash_id, ) ) ):
+            with HydrusDB.TemporaryIntegerTable( self._c, batch_hash_ids, 'hash_id' ) as temp_table_name:
                 
-                counter[ tag_id ] += 1
+                # temp hashes to mappings
+                for ( tag_id, count ) in self._c.execute( 'SELECT tag_id, COUNT( * ) FROM {} CROSS JOIN {} USING ( hash_id ) GROUP BY tag_id;'.format( temp_table_name, current_mappings_table_name ) ):
+                    
+                    counter[ tag_id ] += count
+                    
                 
             
+            num_done += len( batch_hash_ids )
+            
             if HydrusData.TimeHasPassedPrecise( stop_time_for_finding_tags ):
                 
                 break
                 
             
+            batch_size = min( batch_size * 2, 4096 )
+            
         
         #
         
@@ -11217,9 +11491,6 @@ class DB( HydrusDB.HydrusDB ):
         
         results = counter.most_common( max_results )
         
-        inclusive = True
-        pending_count = 0
-        
         tag_ids_to_full_counts = { tag_id : ( current_count, None, pending_count, None ) for ( tag_id, current_count ) in results }
         
         predicates = self._GeneratePredicatesFromTagIdsAndCounts( ClientTags.TAG_DISPLAY_STORAGE, service_id, tag_ids_to_full_counts, inclusive )
@@ -11584,12 +11855,23 @@ class DB( HydrusDB.HydrusDB ):
                     
                     like_param = ConvertWildcardToSQLiteLikeParameter( subtag_wildcard )
                     
+                    trigrams_query_and_args = None
+                    
                     if subtag_wildcard.startswith( '*' ) or not wildcard_has_fts4_searchable_characters:
                         
+                        trigrams_query_and_args = self._CacheTagsGetSubtagTrigramsWildcardQuery( file_service_id, search_tag_service_id, subtag_wildcard )
+                        
+                    
+                    if trigrams_query_and_args is not None:
+                        
+                        ( query, args ) = trigrams_query_and_args
+                        
+                        cursor = self._c.execute( query, args )
+                        
+                    elif subtag_wildcard.startswith( '*' ) or not wildcard_has_fts4_searchable_characters:
+                        
                         # this is a SCAN, but there we go
-                        # a potential optimisation here, in future, is to store fts4 of subtags reversed, then for '*amus', we can just search that reverse cache for 'suma*'
-                        # and this would only double the size of the fts4 cache, the largest cache in the whole db! a steal!
-                        # it also would not fix '*amu*', but with some cleverness could speed up '*amus ar*'
+                        # if this service has the optional trigram index, we go through that instead. it makes this and '*amu*' an index lookup
                         
                         query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
                         
@@ -11699,12 +11981,23 @@ class DB( HydrusDB.HydrusDB ):
                     
                     like_param = ConvertWildcardToSQLiteLikeParameter( subtag_wildcard )
                     
+                    trigrams_query_and_args = None
+                    
                     if subtag_wildcard.startswith( '*' ) or not wildcard_has_fts4_searchable_characters:
                         
+                        trigrams_query_and_args = self._CacheTagsGetSubtagTrigramsWildcardQuery( file_service_id, search_tag_service_id, subtag_wildcard )
+                        
+                    
+                    if trigrams_query_and_args is not None:
+                        
+                        ( query, args ) = trigrams_query_and_args
+                        
+                        cursor = self._c.execute( query, args )
+                        
+                    elif subtag_wildcard.startswith( '*' ) or not wildcard_has_fts4_searchable_characters:
+                        
                         # this is a SCAN, but there we go
-                        # a potential optimisation here, in future, is to store fts4 of subtags reversed, then for '*amus', we can just search that reverse cache for 'suma*'
-                        # and this would only double the size of the fts4 cache, the largest cache in the whole db! a steal!
-                        # it also would not fix '*amu*', but with some cleverness could speed up '*amus ar*'
+                        # if this service has the optional trigram index, we go through that instead. it makes this and '*amu*' an index lookup
                         
                         query = 'SELECT docid FROM {} WHERE subtag LIKE ?;'.format( subtags_fts4_table_name )
                         
@@ -12700,39 +12993,93 @@ class DB( HydrusDB.HydrusDB ):
         return file_import_status
         
     
-    def _ImportUpdate( self, update_network_bytes, update_hash, mime ):
+    def _ImportFiles( self, file_import_jobs: typing.Collection[ ClientImportFiles.FileImportJob ] ):
+        
+        # a batch from the parallel importers. we merge the content updates so the gui gets one publish for the lot, not one per file
+        
+        existing_after_job_content_update_jobs = self._after_job_content_update_jobs
+        
+        self._after_job_content_update_jobs = []
         
         try:
             
-            HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+            file_import_statuses = [ self._ImportFile( file_import_job ) for file_import_job in file_import_jobs ]
             
-        except:
+        finally:
             
-            HydrusData.ShowText( 'Was unable to parse an incoming update!' )
+            service_keys_to_content_updates = collections.defaultdict( list )
             
-            raise
+            for batch_service_keys_to_content_updates in self._after_job_content_update_jobs:
+                
+                for ( service_key, content_updates ) in batch_service_keys_to_content_updates.items():
+                    
+                    service_keys_to_content_updates[ service_key ].extend( content_updates )
+                    
+                
+            
+            self._after_job_content_update_jobs = existing_after_job_content_update_jobs
+            
+            if len( service_keys_to_content_updates ) > 0:
+                
+                self.pub_content_updates_after_commit( dict( service_keys_to_content_updates ) )
+                
             
         
-        hash_id = self.modules_hashes_local_cache.GetHashId( update_hash )
+        return file_import_statuses
         
-        size = len( update_network_bytes )
+    
+    def _ImportUpdate( self, update_network_bytes, update_hash, mime ):
         
-        width = None
-        height = None
-        duration = None
-        num_frames = None
-        has_audio = None
-        num_words = None
+        self._ImportUpdates( [ ( update_network_bytes, update_hash, mime ) ] )
+        
+    
+    def _ImportUpdates( self, update_rows ):
         
         client_files_manager = self._controller.client_files_manager
         
-        client_files_manager.LocklessAddFileFromBytes( update_hash, mime, update_network_bytes )
+        files_info_rows = []
+        hash_ids = []
         
-        self.modules_files_metadata_basic.AddFilesInfo( [ ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) ], overwrite = True )
+        for ( update_network_bytes, update_hash, mime ) in update_rows:
+            
+            try:
+                
+                HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+                
+            except:
+                
+                HydrusData.ShowText( 'Was unable to parse an incoming update!' )
+                
+                raise
+                
+            
+            hash_id = self.modules_hashes_local_cache.GetHashId( update_hash )
+            
+            size = len( update_network_bytes )
+            
+            width = None
+            height = None
+            duration = None
+            num_frames = None
+            has_audio = None
+            num_words = None
+            
+            client_files_manager.LocklessAddFileFromBytes( update_hash, mime, update_network_bytes )
+            
+            files_info_rows.append( ( hash_id, size, mime, width, height, duration, num_frames, has_audio, num_words ) )
+            hash_ids.append( hash_id )
+            
+        
+        if len( hash_ids ) == 0:
+            
+            return
+            
+        
+        self.modules_files_metadata_basic.AddFilesInfo( files_info_rows, overwrite = True )
         
         now = HydrusData.GetNow()
         
-        self._AddFiles( self.modules_services.local_update_service_id, [ ( hash_id, now ) ] )
+        self._AddFiles( self.modules_services.local_update_service_id, [ ( hash_id, now ) for hash_id in hash_ids ] )
         
     
     def _InboxFiles( self, hash_ids ):
@@ -12874,6 +13221,10 @@ class DB( HydrusDB.HydrusDB ):
         
         self._modules.append( self.modules_mappings_storage )
         
+        self.modules_tag_cooccurrence = ClientDBTagCooccurrence.ClientDBTagCooccurrence( self._c, self.modules_services )
+        
+        self._modules.append( self.modules_tag_cooccurrence )
+        
         #
         
         self.modules_similar_files = ClientDBSimilarFiles.ClientDBSimilarFiles( self._c, self.modules_services, self.modules_files_storage )
@@ -13187,7 +13538,17 @@ class DB( HydrusDB.HydrusDB ):
         num_done = 0
         still_work_to_do = True
         
-        group_of_hash_ids = self._STL( self._c.execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( 10 ) )
+        # the in-memory index does a whole batch in one vectorised pass, so we can afford to grab more at once
+        if self.modules_similar_files.UsingPHashIndex():
+            
+            group_size = 256
+            
+        else:
+            
+            group_size = 10
+            
+        
+        group_of_hash_ids = self._STL( self._c.execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( group_size ) )
         
         while len( group_of_hash_ids ) > 0:
         
@@ -13195,6 +13556,15 @@ class DB( HydrusDB.HydrusDB ):
             
             HG.client_controller.frame_splash_status.SetSubtext( text )
             
+            if group_size > 10:
+                
+                hash_ids_to_similar_hash_ids_and_distances = self.modules_similar_files.SearchMany( group_of_hash_ids, search_distance )
+                
+            else:
+                
+                hash_ids_to_similar_hash_ids_and_distances = None
+                
+            
             for ( i, hash_id ) in enumerate( group_of_hash_ids ):
                 
                 if work_time_float is not None and HydrusData.TimeHasPassedFloat( time_started_float + work_time_float ):
@@ -13221,7 +13591,16 @@ class DB( HydrusDB.HydrusDB ):
                 
                 media_id = self._DuplicatesGetMediaId( hash_id )
                 
-                potential_duplicate_media_ids_and_distances = [ ( self._DuplicatesGetMediaId( duplicate_hash_id ), distance ) for ( duplicate_hash_id, distance ) in self.modules_similar_files.Search( hash_id, search_distance ) if duplicate_hash_id != hash_id ]
+                if hash_ids_to_similar_hash_ids_and_distances is None:
+                    
+                    similar_hash_ids_and_distances = self.modules_similar_files.Search( hash_id, search_distance )
+                    
+                else:
+                    
+                    similar_hash_ids_and_distances = hash_ids_to_similar_hash_ids_and_distances[ hash_id ]
+                    
+                
+                potential_duplicate_media_ids_and_distances = [ ( self._DuplicatesGetMediaId( duplicate_hash_id ), distance ) for ( duplicate_hash_id, distance ) in similar_hash_ids_and_distances if duplicate_hash_id != hash_id ]
                 
                 self._DuplicatesAddPotentialDuplicates( media_id, potential_duplicate_media_ids_and_distances )
                 
@@ -13230,7 +13609,7 @@ class DB( HydrusDB.HydrusDB ):
                 num_done += 1
                 
             
-            group_of_hash_ids = self._STL( self._c.execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( 10 ) )
+            group_of_hash_ids = self._STL( self._c.execute( 'SELECT hash_id FROM shape_search_cache WHERE searched_distance IS NULL or searched_distance < ?;', ( search_distance, ) ).fetchmany( group_size ) )
             
         
         still_work_to_do = False
@@ -14435,6 +14814,89 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _RegenerateSubtagTrigramIndex( self, tag_service_key = None, delete = False ):
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        try:
+            
+            job_key.SetStatusTitle( 'regenerating subtag trigram index' )
+            
+            self._controller.pub( 'modal_message', job_key )
+            
+            if tag_service_key is None:
+                
+                tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+                
+            else:
+                
+                tag_service_ids = ( self.modules_services.GetServiceId( tag_service_key ), )
+                
+            
+            file_service_ids = list( self.modules_services.GetServiceIds( HC.TAG_CACHE_SPECIFIC_FILE_SERVICES ) )
+            
+            file_service_ids.append( self.modules_services.combined_file_service_id )
+            
+            def status_hook( s ):
+                
+                job_key.SetVariable( 'popup_text_2', s )
+                
+            
+            # my files and trash share a cache, so no need to do it twice
+            done_table_names = set()
+            
+            for ( file_service_id, tag_service_id ) in itertools.product( file_service_ids, tag_service_ids ):
+                
+                if job_key.IsCancelled():
+                    
+                    break
+                    
+                
+                subtag_trigrams_table_name = self._CacheTagsGetSubtagTrigramsTableName( file_service_id, tag_service_id )
+                
+                if subtag_trigrams_table_name in done_table_names:
+                    
+                    continue
+                    
+                
+                done_table_names.add( subtag_trigrams_table_name )
+                
+                if delete:
+                    
+                    message = 'deleting index {}_{}'.format( file_service_id, tag_service_id )
+                    
+                else:
+                    
+                    message = 'generating index {}_{}'.format( file_service_id, tag_service_id )
+                    
+                
+                job_key.SetVariable( 'popup_text_1', message )
+                self._controller.frame_splash_status.SetSubtext( message )
+                
+                time.sleep( 0.01 )
+                
+                if delete:
+                    
+                    self._CacheTagsDropSubtagTrigrams( file_service_id, tag_service_id )
+                    
+                else:
+                    
+                    self._CacheTagsGenerateSubtagTrigrams( file_service_id, tag_service_id, status_hook = status_hook )
+                    
+                
+            
+        finally:
+            
+            job_key.DeleteVariable( 'popup_text_2' )
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            
+            job_key.Finish()
+            
+            job_key.Delete( 5 )
+            
+        
+    
     def _RegenerateTagCacheSearchableSubtagMaps( self, tag_service_key = None ):
         
         job_key = ClientThreading.JobKey( cancellable = True )
@@ -14587,6 +15049,66 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _RegenerateTagCooccurrenceIndex( self, tag_service_key = None, delete = False ):
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        try:
+            
+            job_key.SetStatusTitle( 'regenerating tag co-occurrence index' )
+            
+            self._controller.pub( 'modal_message', job_key )
+            
+            if tag_service_key is None:
+                
+                tag_service_ids = self.modules_services.GetServiceIds( HC.REAL_TAG_SERVICES )
+                
+            else:
+                
+                tag_service_ids = ( self.modules_services.GetServiceId( tag_service_key ), )
+                
+            
+            for tag_service_id in tag_service_ids:
+                
+                if job_key.IsCancelled():
+                    
+                    break
+                    
+                
+                if delete:
+                    
+                    message = 'deleting index {}'.format( tag_service_id )
+                    
+                else:
+                    
+                    message = 'generating index {}'.format( tag_service_id )
+                    
+                
+                job_key.SetVariable( 'popup_text_1', message )
+                self._controller.frame_splash_status.SetSubtext( message )
+                
+                time.sleep( 0.01 )
+                
+                if delete:
+                    
+                    self.modules_tag_cooccurrence.Drop( tag_service_id )
+                    
+                else:
+                    
+                    self.modules_tag_cooccurrence.Generate( tag_service_id, job_key = job_key )
+                    
+                
+            
+        finally:
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            
+            job_key.Finish()
+            
+            job_key.Delete( 5 )
+            
+        
+    
     def _RegenerateTagDisplayMappingsCache( self, tag_service_key = None ):
         
         job_key = ClientThreading.JobKey( cancellable = True )
@@ -15858,237 +16380,125 @@ class DB( HydrusDB.HydrusDB ):
         self._c.executemany( 'INSERT INTO service_directory_file_map ( service_id, directory_id, hash_id ) VALUES ( ?, ?, ? );', ( ( service_id, directory_id, hash_id ) for hash_id in hash_ids ) )
         
     
-    def _TryToSortHashIds( self, file_service_id, hash_ids, sort_by: ClientMedia.MediaSort ):
+    def _StartReadConnectionJob( self ):
         
-        did_sort = False
+        self._read_connection_job_data.media_result_cache_generation = self._weakref_media_result_cache.GetGeneration()
+        
+    
+    def _TryToSortHashIds( self, file_service_id, hash_ids, sort_by: ClientMedia.MediaSort, limit = None ):
         
         ( sort_metadata, sort_data ) = sort_by.sort_type
         sort_order = sort_by.sort_order
         
-        query = None
-        select_args_iterator = None
+        # we do the whole sort in one query, joining the hash_ids to wherever the data lives, rather than fetching every row and sorting here
+        # these keys mirror the MediaSort ones, with None as -1
+        # it is a LEFT JOIN, so a file with no row, like a never-viewed file, gets the same value MediaSort would give it and lands in the same place
+        
+        table_name = None
+        join_predicate = ''
+        join_args = ()
+        order_by_expressions = None
         
         if sort_metadata == 'system':
             
-            simple_sorts = []
+            files_info_sorts_to_expressions = {}
             
-            simple_sorts.append( CC.SORT_FILES_BY_IMPORT_TIME )
-            simple_sorts.append( CC.SORT_FILES_BY_FILESIZE )
-            simple_sorts.append( CC.SORT_FILES_BY_DURATION )
-            simple_sorts.append( CC.SORT_FILES_BY_FRAMERATE )
-            simple_sorts.append( CC.SORT_FILES_BY_NUM_FRAMES )
-            simple_sorts.append( CC.SORT_FILES_BY_WIDTH )
-            simple_sorts.append( CC.SORT_FILES_BY_HEIGHT )
-            simple_sorts.append( CC.SORT_FILES_BY_RATIO )
-            simple_sorts.append( CC.SORT_FILES_BY_NUM_PIXELS )
-            simple_sorts.append( CC.SORT_FILES_BY_MEDIA_VIEWS )
-            simple_sorts.append( CC.SORT_FILES_BY_MEDIA_VIEWTIME )
-            simple_sorts.append( CC.SORT_FILES_BY_APPROX_BITRATE )
-            simple_sorts.append( CC.SORT_FILES_BY_FILE_MODIFIED_TIMESTAMP )
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_FILESIZE ] = [ 'IFNULL( size, -1 )' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_DURATION ] = [ 'IFNULL( duration, -1 )' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_NUM_FRAMES ] = [ 'IFNULL( num_frames, -1 )' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_WIDTH ] = [ 'IFNULL( width, -1 )' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_HEIGHT ] = [ 'IFNULL( height, -1 )' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_MIME ] = [ 'mime' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_HAS_AUDIO ] = [ '- IFNULL( has_audio, -1 )' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_RATIO ] = [ 'CASE WHEN width IS NULL OR height IS NULL OR width = 0 OR height = 0 THEN -1 ELSE CAST( width AS REAL ) / height END' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_NUM_PIXELS ] = [ 'CASE WHEN width IS NULL OR height IS NULL THEN -1 ELSE width * height END' ]
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_FRAMERATE ] = [ 'CASE WHEN num_frames IS NULL OR duration IS NULL OR num_frames = 0 OR duration = 0 THEN -1 ELSE CAST( num_frames AS REAL ) / duration END' ]
             
-            if sort_data in simple_sorts:
+            # ( duration bitrate, frame bitrate ). stills have no duration, so they get 0 duration bitrate and sort among themselves by size per pixel
+            files_info_sorts_to_expressions[ CC.SORT_FILES_BY_APPROX_BITRATE ] = [
+                'CASE WHEN size IS NULL OR size = 0 THEN -1 WHEN duration IS NULL OR duration = 0 THEN 0 ELSE CAST( size AS REAL ) / duration END',
+                'CASE WHEN size IS NULL OR size = 0 THEN -1 WHEN duration IS NULL OR duration = 0 THEN ( CASE WHEN width IS NULL OR height IS NULL THEN 0 WHEN width = 0 OR height = 0 THEN -1 ELSE CAST( size AS REAL ) / ( width * height ) END ) WHEN num_frames IS NULL OR num_frames = 0 THEN 0 ELSE CAST( size AS REAL ) / duration / num_frames END'
+            ]
+            
+            if sort_data in files_info_sorts_to_expressions:
                 
-                if sort_data == CC.SORT_FILES_BY_IMPORT_TIME:
-                    
-                    current_files_table_name = ClientDBFilesStorage.GenerateFilesTableName( file_service_id, HC.CONTENT_STATUS_CURRENT )
-                    
-                    query = 'SELECT hash_id, timestamp FROM {} WHERE hash_id = ?;'.format( current_files_table_name )
-                    
-                elif sort_data == CC.SORT_FILES_BY_FILESIZE:
-                    
-                    query = 'SELECT hash_id, size FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_DURATION:
-                    
-                    query = 'SELECT hash_id, duration FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_FRAMERATE:
-                    
-                    query = 'SELECT hash_id, num_frames, duration FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_NUM_FRAMES:
-                    
-                    query = 'SELECT hash_id, num_frames FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_WIDTH:
-                    
-                    query = 'SELECT hash_id, width FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_HEIGHT:
-                    
-                    query = 'SELECT hash_id, height FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_RATIO:
-                    
-                    query = 'SELECT hash_id, width, height FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_NUM_PIXELS:
-                    
-                    query = 'SELECT hash_id, width, height FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_MEDIA_VIEWS:
-                    
-                    query = 'SELECT hash_id, media_views FROM file_viewing_stats WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_MEDIA_VIEWTIME:
-                    
-                    query = 'SELECT hash_id, media_viewtime FROM file_viewing_stats WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_APPROX_BITRATE:
-                    
-                    query = 'SELECT hash_id, duration, num_frames, size, width, height FROM files_info WHERE hash_id = ?;'
-                    
-                elif sort_data == CC.SORT_FILES_BY_FILE_MODIFIED_TIMESTAMP:
-                    
-                    query = 'SELECT hash_id, file_modified_timestamp FROM file_modified_timestamps WHERE hash_id = ?;'
-                    
+                table_name = 'files_info'
+                order_by_expressions = files_info_sorts_to_expressions[ sort_data ]
                 
-                select_args_iterator = ( ( hash_id, ) for hash_id in hash_ids )
+            elif sort_data == CC.SORT_FILES_BY_IMPORT_TIME:
                 
-                if sort_data == CC.SORT_FILES_BY_RATIO:
-                    
-                    def key( row ):
-                        
-                        width = row[1]
-                        height = row[2]
-                        
-                        if width is None or height is None:
-                            
-                            return -1
-                            
-                        else:
-                            
-                            return width / height
-                            
-                        
-                    
-                elif sort_data == CC.SORT_FILES_BY_FRAMERATE:
-                    
-                    def key( row ):
-                        
-                        num_frames = row[1]
-                        duration = row[2]
-                        
-                        if num_frames is None or duration is None or num_frames == 0 or duration == 0:
-                            
-                            return -1
-                            
-                        else:
-                            
-                            return num_frames / duration
-                            
-                        
-                    
-                elif sort_data == CC.SORT_FILES_BY_NUM_PIXELS:
-                    
-                    def key( row ):
-                        
-                        width = row[1]
-                        height = row[2]
-                        
-                        if width is None or height is None or width == 0 or height == 0:
-                            
-                            return -1
-                            
-                        else:
-                            
-                            return width * height
-                            
-                        
-                    
-                elif sort_data == CC.SORT_FILES_BY_APPROX_BITRATE:
-                    
-                    def key( row ):
-                        
-                        duration = row[1]
-                        num_frames = row[2]
-                        size = row[3]
-                        width = row[4]
-                        height = row[5]
-                        
-                        if duration is None or duration == 0:
-                            
-                            if size is None or size == 0:
-                                
-                                duration_bitrate = -1
-                                frame_bitrate = -1
-                                
-                            else:
-                                
-                                duration_bitrate = 0
-                                
-                                if width is None or height is None:
-                                    
-                                    frame_bitrate = 0
-                                    
-                                else:
-                                    
-                                    num_pixels = width * height
-                                    
-                                    if size is None or size == 0 or num_pixels == 0:
-                                        
-                                        frame_bitrate = -1
-                                        
-                                    else:
-                                        
-                                        frame_bitrate = size / num_pixels
-                                        
-                                    
-                                
-                            
-                        else:
-                            
-                            if size is None or size == 0:
-                                
-                                duration_bitrate = -1
-                                frame_bitrate = -1
-                                
-                            else:
-                                
-                                duration_bitrate = size / duration
-                                
-                                if num_frames is None or num_frames == 0:
-                                    
-                                    frame_bitrate = 0
-                                    
-                                else:
-                                    
-                                    frame_bitrate = duration_bitrate / num_frames
-                                    
-                                
-                            
-                        
-                        return ( duration_bitrate, frame_bitrate )
-                        
-                    
-                else:
-                    
-                    key = lambda row: -1 if row[1] is None else row[1]
-                    
+                table_name = ClientDBFilesStorage.GenerateFilesTableName( file_service_id, HC.CONTENT_STATUS_CURRENT )
+                order_by_expressions = [ 'IFNULL( timestamp, -1 )' ]
+                
+            elif sort_data == CC.SORT_FILES_BY_FILE_MODIFIED_TIMESTAMP:
+                
+                table_name = 'file_modified_timestamps'
+                order_by_expressions = [ 'IFNULL( file_modified_timestamp, -1 )' ]
+                
+            elif sort_data == CC.SORT_FILES_BY_MEDIA_VIEWS:
                 
-                reverse = sort_order == CC.SORT_DESC
+                # no row is an empty stats manager, which is 0 views
+                table_name = 'file_viewing_stats'
+                order_by_expressions = [ 'IFNULL( media_views, 0 )' ]
+                
+            elif sort_data == CC.SORT_FILES_BY_MEDIA_VIEWTIME:
+                
+                table_name = 'file_viewing_stats'
+                order_by_expressions = [ 'IFNULL( media_viewtime, 0 )' ]
                 
             
+        elif sort_metadata == 'rating':
+            
+            try:
+                
+                rating_service_id = self.modules_services.GetServiceId( sort_data )
+                
+            except HydrusExceptions.DataMissing:
+                
+                return ( False, hash_ids )
+                
+            
+            table_name = 'local_ratings'
+            join_predicate = ' AND service_id = ?'
+            join_args = ( rating_service_id, )
+            order_by_expressions = [ 'IFNULL( rating, -1 )' ]
+            
+        
+        if table_name is None:
+            
+            return ( False, hash_ids )
+            
         
-        if query is not None:
+        if sort_order == CC.SORT_DESC:
             
-            hash_ids_and_other_data = list( self._ExecuteManySelect( query, select_args_iterator ) )
+            direction = 'DESC'
             
-            hash_ids_and_other_data.sort( key = key, reverse = reverse )
+        else:
             
-            original_hash_ids = set( hash_ids )
+            direction = 'ASC'
             
-            hash_ids = [ row[0] for row in hash_ids_and_other_data ]
+        
+        # hash_id breaks ties, so the same search always comes back in the same order
+        order_by_clause = ', '.join( ( '{} {}'.format( expression, direction ) for expression in order_by_expressions + [ 'sort_files.hash_id' ] ) )
+        
+        if limit is None:
             
-            # some stuff like media views won't have rows
-            missing_hash_ids = original_hash_ids.difference( hash_ids )
+            limit_clause = ''
             
-            hash_ids.extend( missing_hash_ids )
+        else:
             
-            did_sort = True
+            limit_clause = ' LIMIT {}'.format( int( limit ) )
             
         
-        return ( did_sort, hash_ids )
+        with HydrusDB.TemporaryIntegerTable( self._c, hash_ids, 'hash_id' ) as temp_table_name:
+            
+            # temp hashes to sort data
+            query = 'SELECT sort_files.hash_id FROM {} AS sort_files LEFT JOIN {} AS sort_table ON ( sort_table.hash_id = sort_files.hash_id{} ) ORDER BY {}{};'.format( temp_table_name, table_name, join_predicate, order_by_clause, limit_clause )
+            
+            sorted_hash_ids = self._STL( self._c.execute( query, join_args ) )
+            
+        
+        return ( True, sorted_hash_ids )
         
     
     def _UndeleteFiles( self, service_id, hash_ids ):
@@ -17498,6 +17908,8 @@ class DB( HydrusDB.HydrusDB ):
         
         filtered_hashes_generator = self._CacheSpecificMappingsGetFilteredHashesGenerator( file_service_ids, tag_service_id, hash_ids_being_altered )
         
+        tag_cooccurrence_is_indexed = self.modules_tag_cooccurrence.IsIndexed( tag_service_id )
+        
         self._c.execute( 'CREATE TABLE mem.temp_hash_ids ( hash_id INTEGER );' )
         
         self._c.executemany( 'INSERT INTO temp_hash_ids ( hash_id ) VALUES ( ? );', ( ( hash_id, ) for hash_id in hash_ids_being_altered ) )
@@ -17530,6 +17942,12 @@ class DB( HydrusDB.HydrusDB ):
                 
                 num_pending_deleted = HydrusDB.GetRowCount( self._c )
                 
+                if tag_cooccurrence_is_indexed:
+                    
+                    # the insert below ignores files that already have the tag, and they must not be counted again
+                    already_current_hash_ids = self.modules_tag_cooccurrence.FilterCurrentHashIds( tag_service_id, tag_id, hash_ids )
+                    
+                
                 self._c.executemany( 'INSERT OR IGNORE INTO ' + current_mappings_table_name + ' VALUES ( ?, ? );', ( ( tag_id, hash_id ) for hash_id in hash_ids ) )
                 
                 num_current_inserted = HydrusDB.GetRowCount( self._c )
@@ -17547,6 +17965,13 @@ class DB( HydrusDB.HydrusDB ):
                 
                 self._CacheSpecificMappingsAddMappings( tag_service_id, tag_id, hash_ids, filtered_hashes_generator )
                 
+                if tag_cooccurrence_is_indexed:
+                    
+                    newly_current_hash_ids = set( hash_ids ).difference( already_current_hash_ids )
+                    
+                    self.modules_tag_cooccurrence.AddMappings( tag_service_id, tag_id, newly_current_hash_ids )
+                    
+                
             
         
         if len( deleted_mappings_ids ) > 0:
@@ -17558,6 +17983,11 @@ class DB( HydrusDB.HydrusDB ):
                     self._CacheCombinedFilesDisplayMappingsDeleteMappingsForChained( tag_service_id, tag_id, hash_ids )
                     
                 
+                if tag_cooccurrence_is_indexed:
+                    
+                    self.modules_tag_cooccurrence.DeleteMappings( tag_service_id, tag_id, hash_ids )
+                    
+                
                 self._c.executemany( 'DELETE FROM ' + current_mappings_table_name + ' WHERE tag_id = ? AND hash_id = ?;', ( ( tag_id, hash_id ) for hash_id in hash_ids ) )
                 
                 num_current_deleted = HydrusDB.GetRowCount( self._c )
@@ -17956,7 +18386,9 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'imageboard': self.modules_serialisable.SetYAMLDump( ClientDBSerialisable.YAML_DUMP_ID_IMAGEBOARD, *args, **kwargs )
         elif action == 'ideal_client_files_locations': self._SetIdealClientFilesLocations( *args, **kwargs )
         elif action == 'import_file': result = self._ImportFile( *args, **kwargs )
+        elif action == 'import_files': result = self._ImportFiles( *args, **kwargs )
         elif action == 'import_update': self._ImportUpdate( *args, **kwargs )
+        elif action == 'import_updates': self._ImportUpdates( *args, **kwargs )
         elif action == 'local_booru_share': self.modules_serialisable.SetYAMLDump( ClientDBSerialisable.YAML_DUMP_ID_LOCAL_BOORU, *args, **kwargs )
         elif action == 'maintain_hashed_serialisables': result = self.modules_serialisable.MaintainHashedStorage( *args, **kwargs )
         elif action == 'maintain_similar_files_search_for_potential_duplicates': result = self._PHashesSearchForPotentialDuplicates( *args, **kwargs )
@@ -17971,7 +18403,9 @@ class DB( HydrusDB.HydrusDB ):
         elif action == 'regenerate_local_tag_cache': self._RegenerateLocalTagCache( *args, **kwargs )
         elif action == 'regenerate_similar_files': self.modules_similar_files.RegenerateTree( *args, **kwargs )
         elif action == 'regenerate_searchable_subtag_maps': self._RegenerateTagCacheSearchableSubtagMaps( *args, **kwargs )
+        elif action == 'regenerate_subtag_trigram_index': self._RegenerateSubtagTrigramIndex( *args, **kwargs )
         elif action == 'regenerate_tag_cache': self._RegenerateTagCache( *args, **kwargs )
+        elif action == 'regenerate_tag_cooccurrence_index': self._RegenerateTagCooccurrenceIndex( *args, **kwargs )
         elif action == 'regenerate_tag_display_mappings_cache': self._RegenerateTagDisplayMappingsCache( *args, **kwargs )
         elif action == 'regenerate_tag_display_pending_mappings_cache': self._RegenerateTagDisplayPendingMappingsCache( *args, **kwargs )
         elif action == 'regenerate_tag_mappings_cache': self._RegenerateTagMappingsCache( *args, **kwargs )
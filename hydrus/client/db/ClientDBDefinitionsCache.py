@@ -1,4 +1,5 @@
 import sqlite3
+import threading
 import typing
 
 from hydrus.core import HydrusDB
@@ -16,6 +17,9 @@ class ClientDBCacheLocalHashes( HydrusDBModule.HydrusDBModule ):
         
         self._hash_ids_to_hashes_cache = {}
         
+        # read connection threads share this cache with the main thread
+        self._hash_ids_to_hashes_cache_lock = threading.Lock()
+        
         HydrusDBModule.HydrusDBModule.__init__( self, 'client hashes local cache', cursor )
         
     
@@ -26,19 +30,26 @@ class ClientDBCacheLocalHashes( HydrusDBModule.HydrusDBModule ):
         return index_generation_tuples
         
     
-    def _PopulateHashIdsToHashesCache( self, hash_ids ):
+    def _PopulateHashIdsToHashesCache( self, hash_ids ) -> typing.Dict[ int, bytes ]:
+        
+        # we return what was asked for, since another thread's prune can empty the cache before the caller looks
         
-        if len( self._hash_ids_to_hashes_cache ) > 100000:
+        with self._hash_ids_to_hashes_cache_lock:
             
-            if not isinstance( hash_ids, set ):
+            if len( self._hash_ids_to_hashes_cache ) > 100000:
+                
+                if not isinstance( hash_ids, set ):
+                    
+                    hash_ids = set( hash_ids )
+                    
                 
-                hash_ids = set( hash_ids )
+                self._hash_ids_to_hashes_cache = { hash_id : hash for ( hash_id, hash ) in self._hash_ids_to_hashes_cache.items() if hash_id in hash_ids }
                 
             
-            self._hash_ids_to_hashes_cache = { hash_id : hash for ( hash_id, hash ) in self._hash_ids_to_hashes_cache.items() if hash_id in hash_ids }
+            hash_ids_to_hashes = { hash_id : self._hash_ids_to_hashes_cache[ hash_id ] for hash_id in hash_ids if hash_id in self._hash_ids_to_hashes_cache }
             
         
-        uncached_hash_ids = { hash_id for hash_id in hash_ids if hash_id not in self._hash_ids_to_hashes_cache }
+        uncached_hash_ids = { hash_id for hash_id in hash_ids if hash_id not in hash_ids_to_hashes }
         
         if len( uncached_hash_ids ) > 0:
             
@@ -58,18 +69,23 @@ class ClientDBCacheLocalHashes( HydrusDBModule.HydrusDBModule ):
                     
                 
             
-            self._hash_ids_to_hashes_cache.update( local_uncached_hash_ids_to_hashes )
+            hash_ids_to_hashes.update( local_uncached_hash_ids_to_hashes )
             
-            uncached_hash_ids = { hash_id for hash_id in uncached_hash_ids if hash_id not in self._hash_ids_to_hashes_cache }
+            uncached_hash_ids = { hash_id for hash_id in uncached_hash_ids if hash_id not in hash_ids_to_hashes }
             
         
         if len( uncached_hash_ids ) > 0:
             
-            hash_ids_to_hashes = self.modules_hashes.GetHashIdsToHashes( hash_ids = uncached_hash_ids )
+            hash_ids_to_hashes.update( self.modules_hashes.GetHashIdsToHashes( hash_ids = uncached_hash_ids ) )
+            
+        
+        with self._hash_ids_to_hashes_cache_lock:
             
             self._hash_ids_to_hashes_cache.update( hash_ids_to_hashes )
             
         
+        return hash_ids_to_hashes
+        
     
     def CreateInitialTables( self ):
         
@@ -104,16 +120,16 @@ class ClientDBCacheLocalHashes( HydrusDBModule.HydrusDBModule ):
     
     def GetHash( self, hash_id ) -> str:
         
-        self._PopulateHashIdsToHashesCache( ( hash_id, ) )
+        hash_ids_to_hashes = self._PopulateHashIdsToHashesCache( ( hash_id, ) )
         
-        return self._hash_ids_to_hashes_cache[ hash_id ]
+        return hash_ids_to_hashes[ hash_id ]
         
     
     def GetHashes( self, hash_ids ) -> typing.List[ bytes ]:
         
-        self._PopulateHashIdsToHashesCache( hash_ids )
+        hash_ids_to_hashes = self._PopulateHashIdsToHashesCache( hash_ids )
         
-        return [ self._hash_ids_to_hashes_cache[ hash_id ] for hash_id in hash_ids ]
+        return [ hash_ids_to_hashes[ hash_id ] for hash_id in hash_ids ]
         
     
     def GetHashId( self, hash ) -> int:
@@ -170,9 +186,7 @@ class ClientDBCacheLocalHashes( HydrusDBModule.HydrusDBModule ):
         
         if hash_ids is not None:
             
-            self._PopulateHashIdsToHashesCache( hash_ids )
-            
-            hash_ids_to_hashes = { hash_id : self._hash_ids_to_hashes_cache[ hash_id ] for hash_id in hash_ids }
+            hash_ids_to_hashes = self._PopulateHashIdsToHashesCache( hash_ids )
             
         elif hashes is not None:
             
@@ -204,6 +218,9 @@ class ClientDBCacheLocalTags( HydrusDBModule.HydrusDBModule ):
         
         self._tag_ids_to_tags_cache = {}
         
+        # read connection threads share this cache with the main thread
+        self._tag_ids_to_tags_cache_lock = threading.Lock()
+        
         HydrusDBModule.HydrusDBModule.__init__( self, 'client tags local cache', cursor )
         
     
@@ -214,19 +231,26 @@ class ClientDBCacheLocalTags( HydrusDBModule.HydrusDBModule ):
         return index_generation_tuples
         
     
-    def _PopulateTagIdsToTagsCache( self, tag_ids ):
+    def _PopulateTagIdsToTagsCache( self, tag_ids ) -> typing.Dict[ int, str ]:
         
-        if len( self._tag_ids_to_tags_cache ) > 100000:
+        # we return what was asked for, since another thread's prune can empty the cache before the caller looks
+        
+        with self._tag_ids_to_tags_cache_lock:
             
-            if not isinstance( tag_ids, set ):
+            if len( self._tag_ids_to_tags_cache ) > 100000:
+                
+                if not isinstance( tag_ids, set ):
+                    
+                    tag_ids = set( tag_ids )
+                    
                 
-                tag_ids = set( tag_ids )
+                self._tag_ids_to_tags_cache = { tag_id : tag for ( tag_id, tag ) in self._tag_ids_to_tags_cache.items() if tag_id in tag_ids }
                 
             
-            self._tag_ids_to_tags_cache = { tag_id : tag for ( tag_id, tag ) in self._tag_ids_to_tags_cache.items() if tag_id in tag_ids }
+            tag_ids_to_tags = { tag_id : self._tag_ids_to_tags_cache[ tag_id ] for tag_id in tag_ids if tag_id in self._tag_ids_to_tags_cache }
             
         
-        uncached_tag_ids = { tag_id for tag_id in tag_ids if tag_id not in self._tag_ids_to_tags_cache }
+        uncached_tag_ids = { tag_id for tag_id in tag_ids if tag_id not in tag_ids_to_tags }
         
         if len( uncached_tag_ids ) > 0:
             
@@ -246,18 +270,23 @@ class ClientDBCacheLocalTags( HydrusDBModule.HydrusDBModule ):
                     
                 
             
-            self._tag_ids_to_tags_cache.update( local_uncached_tag_ids_to_tags )
+            tag_ids_to_tags.update( local_uncached_tag_ids_to_tags )
             
-            uncached_tag_ids = { tag_id for tag_id in uncached_tag_ids if tag_id not in self._tag_ids_to_tags_cache }
+            uncached_tag_ids = { tag_id for tag_id in uncached_tag_ids if tag_id not in tag_ids_to_tags }
             
         
         if len( uncached_tag_ids ) > 0:
             
-            tag_ids_to_tags = self.modules_tags.GetTagIdsToTags( tag_ids = uncached_tag_ids )
+            tag_ids_to_tags.update( self.modules_tags.GetTagIdsToTags( tag_ids = uncached_tag_ids ) )
+            
+        
+        with self._tag_ids_to_tags_cache_lock:
             
             self._tag_ids_to_tags_cache.update( tag_ids_to_tags )
             
         
+        return tag_ids_to_tags
+        
     
     def CreateInitialTables( self ):
         
@@ -299,9 +328,9 @@ class ClientDBCacheLocalTags( HydrusDBModule.HydrusDBModule ):
     
     def GetTag( self, tag_id ) -> str:
         
-        self._PopulateTagIdsToTagsCache( ( tag_id, ) )
+        tag_ids_to_tags = self._PopulateTagIdsToTagsCache( ( tag_id, ) )
         
-        return self._tag_ids_to_tags_cache[ tag_id ]
+        return tag_ids_to_tags[ tag_id ]
         
     
     def GetTagId( self, tag ) -> int:
@@ -335,9 +364,7 @@ class ClientDBCacheLocalTags( HydrusDBModule.HydrusDBModule ):
         
         if tag_ids is not None:
             
-            self._PopulateTagIdsToTagsCache( tag_ids )
-            
-            tag_ids_to_tags = { tag_id : self._tag_ids_to_tags_cache[ tag_id ] for tag_id in tag_ids }
+            tag_ids_to_tags = self._PopulateTagIdsToTagsCache( tag_ids )
             
         elif tags is not None:
             
@@ -351,9 +378,12 @@ class ClientDBCacheLocalTags( HydrusDBModule.HydrusDBModule ):
         
         self._c.execute( 'UPDATE local_tags_cache SET tag = ? WHERE tag_id = ?;', ( tag, tag_id ) )
         
-        if tag_id in self._tag_ids_to_tags_cache:
+        with self._tag_ids_to_tags_cache_lock:
             
-            del self._tag_ids_to_tags_cache[ tag_id ]
+            if tag_id in self._tag_ids_to_tags_cache:
+                
+                del self._tag_ids_to_tags_cache[ tag_id ]
+                
             
         
     
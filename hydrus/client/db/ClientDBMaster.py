@@ -1,5 +1,6 @@
 import os
 import sqlite3
+import threading
 import typing
 
 from hydrus.core import HydrusConstants as HC
@@ -19,6 +20,9 @@ class ClientDBMasterHashes( HydrusDBModule.HydrusDBModule ):
         
         self._hash_ids_to_hashes_cache = {}
         
+        # read connection threads share this cache with the main thread
+        self._hash_ids_to_hashes_cache_lock = threading.Lock()
+        
     
     def _GetInitialIndexGenerationTuples( self ):
         
@@ -31,19 +35,26 @@ class ClientDBMasterHashes( HydrusDBModule.HydrusDBModule ):
         return index_generation_tuples
         
     
-    def _PopulateHashIdsToHashesCache( self, hash_ids, exception_on_error = False ):
+    def _PopulateHashIdsToHashesCache( self, hash_ids, exception_on_error = False ) -> typing.Dict[ int, bytes ]:
+        
+        # we return what was asked for, since another thread's prune can empty the cache before the caller looks
         
-        if len( self._hash_ids_to_hashes_cache ) > 100000:
+        with self._hash_ids_to_hashes_cache_lock:
             
-            if not isinstance( hash_ids, set ):
+            if len( self._hash_ids_to_hashes_cache ) > 100000:
                 
-                hash_ids = set( hash_ids )
+                if not isinstance( hash_ids, set ):
+                    
+                    hash_ids = set( hash_ids )
+                    
+                
+                self._hash_ids_to_hashes_cache = { hash_id : hash for ( hash_id, hash ) in self._hash_ids_to_hashes_cache.items() if hash_id in hash_ids }
                 
             
-            self._hash_ids_to_hashes_cache = { hash_id : hash for ( hash_id, hash ) in self._hash_ids_to_hashes_cache.items() if hash_id in hash_ids }
+            hash_ids_to_hashes = { hash_id : self._hash_ids_to_hashes_cache[ hash_id ] for hash_id in hash_ids if hash_id in self._hash_ids_to_hashes_cache }
             
         
-        uncached_hash_ids = { hash_id for hash_id in hash_ids if hash_id not in self._hash_ids_to_hashes_cache }
+        uncached_hash_ids = { hash_id for hash_id in hash_ids if hash_id not in hash_ids_to_hashes }
         
         if len( uncached_hash_ids ) > 0:
             
@@ -94,9 +105,16 @@ class ClientDBMasterHashes( HydrusDBModule.HydrusDBModule ):
                     
                 
             
-            self._hash_ids_to_hashes_cache.update( uncached_hash_ids_to_hashes )
+            with self._hash_ids_to_hashes_cache_lock:
+                
+                self._hash_ids_to_hashes_cache.update( uncached_hash_ids_to_hashes )
+                
+            
+            hash_ids_to_hashes.update( uncached_hash_ids_to_hashes )
             
         
+        return hash_ids_to_hashes
+        
     
     def CreateInitialTables( self ):
         
@@ -171,16 +189,16 @@ class ClientDBMasterHashes( HydrusDBModule.HydrusDBModule ):
     
     def GetHash( self, hash_id ) -> bytes:
         
-        self._PopulateHashIdsToHashesCache( ( hash_id, ) )
+        hash_ids_to_hashes = self._PopulateHashIdsToHashesCache( ( hash_id, ) )
         
-        return self._hash_ids_to_hashes_cache[ hash_id ]
+        return hash_ids_to_hashes[ hash_id ]
         
     
     def GetHashes( self, hash_ids ) -> typing.List[ bytes ]:
         
-        self._PopulateHashIdsToHashesCache( hash_ids )
+        hash_ids_to_hashes = self._PopulateHashIdsToHashesCache( hash_ids )
         
-        return [ self._hash_ids_to_hashes_cache[ hash_id ] for hash_id in hash_ids ]
+        return [ hash_ids_to_hashes[ hash_id ] for hash_id in hash_ids ]
         
     
     def GetHashId( self, hash ) -> int:
@@ -271,9 +289,7 @@ class ClientDBMasterHashes( HydrusDBModule.HydrusDBModule ):
         
         if hash_ids is not None:
             
-            self._PopulateHashIdsToHashesCache( hash_ids, exception_on_error = True )
-            
-            hash_ids_to_hashes = { hash_id : self._hash_ids_to_hashes_cache[ hash_id ] for hash_id in hash_ids }
+            hash_ids_to_hashes = self._PopulateHashIdsToHashesCache( hash_ids, exception_on_error = True )
             
         elif hashes is not None:
             
@@ -434,6 +450,9 @@ class ClientDBMasterTags( HydrusDBModule.HydrusDBModule ):
         
         self._tag_ids_to_tags_cache = {}
         
+        # read connection threads share this cache with the main thread
+        self._tag_ids_to_tags_cache_lock = threading.Lock()
+        
     
     def _GetInitialIndexGenerationTuples( self ):
         
@@ -445,19 +464,26 @@ class ClientDBMasterTags( HydrusDBModule.HydrusDBModule ):
         return index_generation_tuples
         
     
-    def _PopulateTagIdsToTagsCache( self, tag_ids ):
+    def _PopulateTagIdsToTagsCache( self, tag_ids ) -> typing.Dict[ int, str ]:
+        
+        # we return what was asked for, since another thread's prune can empty the cache before the caller looks
         
-        if len( self._tag_ids_to_tags_cache ) > 100000:
+        with self._tag_ids_to_tags_cache_lock:
             
-            if not isinstance( tag_ids, set ):
+            if len( self._tag_ids_to_tags_cache ) > 100000:
+                
+                if not isinstance( tag_ids, set ):
+                    
+                    tag_ids = set( tag_ids )
+                    
                 
-                tag_ids = set( tag_ids )
+                self._tag_ids_to_tags_cache = { tag_id : tag for ( tag_id, tag ) in self._tag_ids_to_tags_cache.items() if tag_id in tag_ids }
                 
             
-            self._tag_ids_to_tags_cache = { tag_id : tag for ( tag_id, tag ) in self._tag_ids_to_tags_cache.items() if tag_id in tag_ids }
+            tag_ids_to_tags = { tag_id : self._tag_ids_to_tags_cache[ tag_id ] for tag_id in tag_ids if tag_id in self._tag_ids_to_tags_cache }
             
         
-        uncached_tag_ids = { tag_id for tag_id in tag_ids if tag_id not in self._tag_ids_to_tags_cache }
+        uncached_tag_ids = { tag_id for tag_id in tag_ids if tag_id not in tag_ids_to_tags }
         
         if len( uncached_tag_ids ) > 0:
             
@@ -498,8 +524,15 @@ class ClientDBMasterTags( HydrusDBModule.HydrusDBModule ):
                     
                 
             
-            self._tag_ids_to_tags_cache.update( uncached_tag_ids_to_tags )
+            with self._tag_ids_to_tags_cache_lock:
+                
+                self._tag_ids_to_tags_cache.update( uncached_tag_ids_to_tags )
+                
             
+            tag_ids_to_tags.update( uncached_tag_ids_to_tags )
+            
+        
+        return tag_ids_to_tags
         
     
     def CreateInitialTables( self ):
@@ -577,9 +610,9 @@ class ClientDBMasterTags( HydrusDBModule.HydrusDBModule ):
     
     def GetTag( self, tag_id ) -> str:
         
-        self._PopulateTagIdsToTagsCache( ( tag_id, ) )
+        tag_ids_to_tags = self._PopulateTagIdsToTagsCache( ( tag_id, ) )
         
-        return self._tag_ids_to_tags_cache[ tag_id ]
+        return tag_ids_to_tags[ tag_id ]
         
     
     def GetTagId( self, tag ) -> int:
@@ -622,9 +655,7 @@ class ClientDBMasterTags( HydrusDBModule.HydrusDBModule ):
         
         if tag_ids is not None:
             
-            self._PopulateTagIdsToTagsCache( tag_ids )
-            
-            tag_ids_to_tags = { tag_id : self._tag_ids_to_tags_cache[ tag_id ] for tag_id in tag_ids }
+            tag_ids_to_tags = self._PopulateTagIdsToTagsCache( tag_ids )
             
         elif tags is not None:
             
@@ -731,10 +762,13 @@ class ClientDBMasterTags( HydrusDBModule.HydrusDBModule ):
     def UpdateTagId( self, tag_id, namespace_id, subtag_id ):
         
         self._c.execute( 'UPDATE tags SET namespace_id = ?, subtag_id = ? WHERE tag_id = ?;', ( namespace_id, subtag_id, tag_id ) )
-    
-        if tag_id in self._tag_ids_to_tags_cache:
-    
-            del self._tag_ids_to_tags_cache[ tag_id ]
+        
+        with self._tag_ids_to_tags_cache_lock:
+            
+            if tag_id in self._tag_ids_to_tags_cache:
+                
+                del self._tag_ids_to_tags_cache[ tag_id ]
+                
             
         
     
@@ -14,6 +14,7 @@ from hydrus.core import HydrusSerialisable
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client.db import ClientDBServices
+from hydrus.client.importing import ClientImporting
 
 YAML_DUMP_ID_SINGLE = 0
 YAML_DUMP_ID_REMOTE_BOORU = 1
@@ -25,6 +26,13 @@ YAML_DUMP_ID_EXPORT_FOLDER = 6
 YAML_DUMP_ID_SUBSCRIPTION = 7
 YAML_DUMP_ID_LOCAL_BOORU = 8
 
+# these store the seeds of their file seed caches and gallery logs in json_dumps_hashed, one row per seed, so a save only writes the seeds that changed
+# anything added here has to be covered by GetAllExpectedHashedJSONHashes, or maintenance will delete its seeds
+SEED_STORAGE_DUMP_TYPES = {
+    HydrusSerialisable.SERIALISABLE_TYPE_GUI_SESSION_PAGE_DATA,
+    HydrusSerialisable.SERIALISABLE_TYPE_SUBSCRIPTION_QUERY_LOG_CONTAINER
+}
+
 def ExportBrokenHashedJSONDump( db_dir, dump, dump_descriptor ):
     
     timestamp_string = time.strftime( '%Y-%m-%d %H-%M-%S' )
@@ -153,6 +161,37 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
         self.modules_services = modules_services
         
     
+    def _CreateFromSerialisableTuple( self, serialisable_tuple ):
+        
+        if ClientImporting.GetSeedStorageContext() is not None:
+            
+            # we are already inside a load
+            
+            return HydrusSerialisable.CreateFromSerialisableTuple( serialisable_tuple )
+            
+        
+        with ClientImporting.SeedStorageContext( fetch_seeds_callable = self.GetHashedJSONDumps ):
+            
+            return HydrusSerialisable.CreateFromSerialisableTuple( serialisable_tuple )
+            
+        
+    
+    def _GetExistingHashedJSONDumpHashes( self, hashes ):
+        
+        # a session page can have tens of thousands of seeds, so we check them in blocks rather than one query each
+        
+        existing_hashes = set()
+        
+        for block_of_hashes in HydrusData.SplitListIntoChunks( list( hashes ), 256 ):
+            
+            query = 'SELECT hash FROM json_dumps_hashed WHERE hash IN ( {} );'.format( ', '.join( ( '?' for hash in block_of_hashes ) ) )
+            
+            existing_hashes.update( self._STI( self._c.execute( query, [ sqlite3.Binary( hash ) for hash in block_of_hashes ] ) ) )
+            
+        
+        return existing_hashes
+        
+    
     def _GetInitialIndexGenerationTuples( self ):
         
         index_generation_tuples = []
@@ -160,6 +199,24 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
         return index_generation_tuples
         
     
+    def _GetSerialisableTuple( self, obj ):
+        
+        if obj.SERIALISABLE_TYPE not in SEED_STORAGE_DUMP_TYPES:
+            
+            return obj.GetSerialisableTuple()
+            
+        
+        with ClientImporting.SeedStorageContext() as seed_storage_context:
+            
+            serialisable_tuple = obj.GetSerialisableTuple()
+            
+        
+        # the object only refers to its seeds by hash now, so make sure they are all stored
+        self.SetHashedJSONDumps( seed_storage_context.GetStorageHashesToSeeds() )
+        
+        return serialisable_tuple
+        
+    
     def CreateInitialTables( self ):
         
         self._c.execute( 'CREATE TABLE json_dict ( name TEXT PRIMARY KEY, dump BLOB_BYTES );' )
@@ -228,6 +285,46 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
             all_expected_hashes.update( session_container.GetPageDataHashes() )
             
         
+        # page data and subscription query logs store their seeds by hash too
+        # we read the seed hashes straight from their raw json. building every object would be slow, and loads have side effects like deleting broken dumps
+        
+        dumps = []
+        
+        for page_data_hash in list( all_expected_hashes ):
+            
+            result = self._c.execute( 'SELECT dump FROM json_dumps_hashed WHERE hash = ? AND dump_type = ?;', ( sqlite3.Binary( page_data_hash ), HydrusSerialisable.SERIALISABLE_TYPE_GUI_SESSION_PAGE_DATA ) ).fetchone()
+            
+            if result is not None:
+                
+                ( dump, ) = result
+                
+                dumps.append( dump )
+                
+            
+        
+        dumps.extend( self._STI( self._c.execute( 'SELECT dump FROM json_dumps_named WHERE dump_type = ?;', ( HydrusSerialisable.SERIALISABLE_TYPE_SUBSCRIPTION_QUERY_LOG_CONTAINER, ) ) ) )
+        
+        for dump in dumps:
+            
+            try:
+                
+                if isinstance( dump, bytes ):
+                    
+                    dump = str( dump, 'utf-8' )
+                    
+                
+                serialisable_info = json.loads( dump )
+                
+            except Exception as e:
+                
+                # we cannot see what this one refers to, so we cannot say what is safe to delete
+                
+                raise HydrusExceptions.SerialisationException( 'A session page or subscription query log could not be read, so its seeds could not be found!' ) from e
+                
+            
+            all_expected_hashes.update( ClientImporting.GetSeedStorageHashesFromSerialisableInfo( serialisable_info ) )
+            
+        
         return all_expected_hashes
         
     
@@ -262,7 +359,7 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
                     message += os.linesep * 2
                     message += 'This error could be due to several factors, but is most likely a hard drive fault (perhaps your computer recently had a bad power cut?).'
                     message += os.linesep * 2
-                    message += 'Your client may have lost one or more session pages.'
+                    message += 'Your client may have lost one or more session pages, or some items from an import queue or gallery log.'
                     message += os.linesep * 2
                     message += 'Please review the \'help my db is broke.txt\' file in your install_dir/db directory as background reading, and if the situation or fix here is not obvious, please contact hydrus dev.'
                     
@@ -301,7 +398,7 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
                     message += os.linesep * 2
                     message += 'This error could be due to several factors, but is most likely a hard drive fault (perhaps your computer recently had a bad power cut?).'
                     message += os.linesep * 2
-                    message += 'The database has attempted to delete the broken object, and the object\'s dump written to your database directory. Your client may have lost one or more session pages.'
+                    message += 'The database has attempted to delete the broken object, and the object\'s dump written to your database directory. Your client may have lost one or more session pages, or some items from an import queue or gallery log.'
                     message += os.linesep * 2
                     message += 'Please review the \'help my db is broke.txt\' file in your install_dir/db directory as background reading, and if the situation or fix here is not obvious, please contact hydrus dev.'
                     
@@ -313,7 +410,7 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
                 HydrusData.Print( 'Was asked to fetch named JSON object "{}", but it was malformed!'.format( hash.hex() ) )
                 
             
-            obj = HydrusSerialisable.CreateFromSerialisableTuple( ( dump_type, version, serialisable_info ) )
+            obj = self._CreateFromSerialisableTuple( ( dump_type, version, serialisable_info ) )
             
             hashes_to_objs[ hash ] = obj
             
@@ -407,7 +504,7 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
                     
                     serialisable_info = json.loads( dump )
                     
-                    objs.append( HydrusSerialisable.CreateFromSerialisableTuple( ( dump_type, dump_name, version, serialisable_info ) ) )
+                    objs.append( self._CreateFromSerialisableTuple( ( dump_type, dump_name, version, serialisable_info ) ) )
                     
                 except:
                     
@@ -457,7 +554,7 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
                 DealWithBrokenJSONDump( self._db_dir, dump, 'dump_type {} dump_name {} timestamp {}'.format( dump_type, dump_name[:10], object_timestamp ) )
                 
             
-            return HydrusSerialisable.CreateFromSerialisableTuple( ( dump_type, dump_name, version, serialisable_info ) )
+            return self._CreateFromSerialisableTuple( ( dump_type, dump_name, version, serialisable_info ) )
             
         
     
@@ -575,7 +672,20 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
                 
             
         
-        all_expected_hashes = self.GetAllExpectedHashedJSONHashes()
+        try:
+            
+            all_expected_hashes = self.GetAllExpectedHashedJSONHashes()
+            
+        except HydrusExceptions.SerialisationException as e:
+            
+            # better to keep some junk around than to delete something that is still in use
+            
+            HydrusData.Print( 'Hashed serialisable maintenance was abandoned, to be safe: {}'.format( e ) )
+            
+            maintenance_tracker.NotifyHashedSerialisableMaintenanceDone()
+            
+            return 0
+            
         
         all_stored_hashes = self._STS( self._c.execute( 'SELECT hash FROM json_dumps_hashed;' ) )
         
@@ -606,14 +716,16 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
     
     def SetHashedJSONDumps( self, hashes_to_objs ):
         
+        existing_hashes = self._GetExistingHashedJSONDumpHashes( hashes_to_objs.keys() )
+        
         for ( hash, obj ) in hashes_to_objs.items():
             
-            if self.HaveHashedJSONDump( hash ):
+            if hash in existing_hashes:
                 
                 continue
                 
             
-            ( dump_type, version, serialisable_info ) = obj.GetSerialisableTuple()
+            ( dump_type, version, serialisable_info ) = self._GetSerialisableTuple( obj )
             
             try:
                 
@@ -661,7 +773,7 @@ class ClientDBSerialisable( HydrusDBModule.HydrusDBModule ):
         
         if isinstance( obj, HydrusSerialisable.SerialisableBaseNamed ):
             
-            ( dump_type, dump_name, version, serialisable_info ) = obj.GetSerialisableTuple()
+            ( dump_type, dump_name, version, serialisable_info ) = self._GetSerialisableTuple( obj )
             
             store_backups = False
             backup_depth = 1
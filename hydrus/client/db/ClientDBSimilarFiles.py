@@ -1,4 +1,5 @@
 import collections
+import numpy
 import random
 import sqlite3
 import typing
@@ -13,6 +14,113 @@ from hydrus.client import ClientThreading
 from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBServices
 
+# number of set bits in every possible byte, for vectorised popcount
+POPCOUNT_LOOKUP = numpy.array( [ bin( i ).count( '1' ) for i in range( 256 ) ], dtype = numpy.uint8 )
+
+def GetHammingDistances( search_phash_uint64: numpy.uint64, phashes: numpy.ndarray ) -> numpy.ndarray:
+    
+    xors = numpy.bitwise_xor( phashes, search_phash_uint64 )
+    
+    return POPCOUNT_LOOKUP[ xors.view( numpy.uint8 ) ].reshape( ( -1, 8 ) ).sum( axis = 1, dtype = numpy.uint8 )
+    
+class PHashIndex( object ):
+    
+    # a packed copy of shape_perceptual_hashes so we can brute-force xor/popcount the whole lot in one numpy pass
+    # the vptree remains the persistent structure--this is just a cache that is thrown away on exit
+    
+    def __init__( self, phash_ids_and_phashes ):
+        
+        self._phash_ids = numpy.array( [ phash_id for ( phash_id, phash ) in phash_ids_and_phashes ], dtype = numpy.int64 )
+        self._phashes = self._PackPHashes( [ phash for ( phash_id, phash ) in phash_ids_and_phashes ] )
+        
+        self._pending_phash_ids_and_phashes = []
+        self._pending_deletee_phash_ids = set()
+        
+    
+    def _Consolidate( self ):
+        
+        if len( self._pending_phash_ids_and_phashes ) > 0:
+            
+            new_phash_ids = numpy.array( [ phash_id for ( phash_id, phash ) in self._pending_phash_ids_and_phashes ], dtype = numpy.int64 )
+            new_phashes = self._PackPHashes( [ phash for ( phash_id, phash ) in self._pending_phash_ids_and_phashes ] )
+            
+            self._phash_ids = numpy.concatenate( ( self._phash_ids, new_phash_ids ) )
+            self._phashes = numpy.concatenate( ( self._phashes, new_phashes ) )
+            
+            self._pending_phash_ids_and_phashes = []
+            
+        
+        if len( self._pending_deletee_phash_ids ) > 0:
+            
+            keep_mask = numpy.isin( self._phash_ids, list( self._pending_deletee_phash_ids ), invert = True )
+            
+            self._phash_ids = self._phash_ids[ keep_mask ]
+            self._phashes = self._phashes[ keep_mask ]
+            
+            self._pending_deletee_phash_ids = set()
+            
+        
+    
+    def _PackPHashes( self, phashes ):
+        
+        # '!Q', same as Get64BitHammingDistance
+        return numpy.frombuffer( b''.join( phashes ), dtype = '>u8' ).astype( numpy.uint64 )
+        
+    
+    def AddPHash( self, phash_id, phash ):
+        
+        if phash_id in self._pending_deletee_phash_ids:
+            
+            # the id may still be in the consolidated arrays, perhaps with an old phash if sqlite reused the id, so clear it out before we re-add
+            self._Consolidate()
+            
+        
+        self._pending_phash_ids_and_phashes.append( ( phash_id, phash ) )
+        
+    
+    def DeletePHashes( self, phash_ids ):
+        
+        self._pending_phash_ids_and_phashes = [ ( phash_id, phash ) for ( phash_id, phash ) in self._pending_phash_ids_and_phashes if phash_id not in phash_ids ]
+        
+        self._pending_deletee_phash_ids.update( phash_ids )
+        
+    
+    def GetNumPHashes( self ):
+        
+        self._Consolidate()
+        
+        return len( self._phash_ids )
+        
+    
+    def Search( self, search_phashes, max_hamming_distance ):
+        
+        self._Consolidate()
+        
+        similar_phash_ids_to_distances = {}
+        
+        if len( self._phash_ids ) == 0:
+            
+            return similar_phash_ids_to_distances
+            
+        
+        for search_phash_uint64 in self._PackPHashes( search_phashes ):
+            
+            distances = GetHammingDistances( search_phash_uint64, self._phashes )
+            
+            matching_indices = numpy.flatnonzero( distances <= max_hamming_distance )
+            
+            for ( phash_id, distance ) in zip( self._phash_ids[ matching_indices ].tolist(), distances[ matching_indices ].tolist() ):
+                
+                if phash_id not in similar_phash_ids_to_distances or distance < similar_phash_ids_to_distances[ phash_id ]:
+                    
+                    similar_phash_ids_to_distances[ phash_id ] = distance
+                    
+                
+            
+        
+        return similar_phash_ids_to_distances
+        
+    
 class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
     
     def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices, modules_files_storage: ClientDBFilesStorage.ClientDBFilesStorage ):
@@ -20,6 +128,8 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
         self.modules_services = modules_services
         self.modules_files_storage = modules_files_storage
         
+        self._phash_index = None
+        
         HydrusDBModule.HydrusDBModule.__init__( self, 'client similar files', cursor )
         
     
@@ -203,6 +313,18 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
         return index_generation_tuples
         
     
+    def _GetPHashIndex( self ) -> PHashIndex:
+        
+        if self._phash_index is None:
+            
+            phash_ids_and_phashes = self._c.execute( 'SELECT phash_id, phash FROM shape_perceptual_hashes;' ).fetchall()
+            
+            self._phash_index = PHashIndex( phash_ids_and_phashes )
+            
+        
+        return self._phash_index
+        
+    
     def _GetPHashId( self, phash ):
         
         result = self._c.execute( 'SELECT phash_id FROM shape_perceptual_hashes WHERE phash = ?;', ( sqlite3.Binary( phash ), ) ).fetchone()
@@ -215,6 +337,11 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
             
             self._AddLeaf( phash_id, phash )
             
+            if self._phash_index is not None:
+                
+                self._phash_index.AddPHash( phash_id, phash )
+                
+            
         else:
             
             ( phash_id, ) = result
@@ -223,6 +350,45 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
         return phash_id
         
     
+    def _GetSimilarHashIdsToDistances( self, similar_phash_ids_to_distances ):
+        
+        # files can have multiple phashes, and phashes can refer to multiple files, so let's make sure we are setting the smallest distance we found
+        
+        similar_phash_ids = list( similar_phash_ids_to_distances.keys() )
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, similar_phash_ids, 'phash_id' ) as temp_table_name:
+            
+            # temp phashes to hash map
+            similar_phash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._c.execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
+            
+        
+        similar_hash_ids_to_distances = {}
+        
+        for ( phash_id, hash_ids ) in similar_phash_ids_to_hash_ids.items():
+            
+            distance = similar_phash_ids_to_distances[ phash_id ]
+            
+            for hash_id in hash_ids:
+                
+                if hash_id not in similar_hash_ids_to_distances:
+                    
+                    similar_hash_ids_to_distances[ hash_id ] = distance
+                    
+                else:
+                    
+                    current_distance = similar_hash_ids_to_distances[ hash_id ]
+                    
+                    if distance < current_distance:
+                        
+                        similar_hash_ids_to_distances[ hash_id ] = distance
+                        
+                    
+                
+            
+        
+        return similar_hash_ids_to_distances
+        
+    
     def _PopBestRootNode( self, node_rows ):
         
         if len( node_rows ) == 1:
@@ -346,6 +512,10 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
         
         self._c.executemany( 'DELETE FROM shape_perceptual_hashes WHERE phash_id = ?;', ( ( p_id, ) for p_id in orphan_phash_ids ) )
         
+        if self._phash_index is not None:
+            
+            self._phash_index.DeletePHashes( orphan_phash_ids )
+            
         useful_nodes = [ row for row in unbalanced_nodes if row[0] in useful_phash_ids ]
         
         useful_population = len( useful_nodes )
@@ -568,6 +738,8 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
             
             self._c.execute( 'DELETE FROM shape_perceptual_hash_map WHERE hash_id NOT IN ( SELECT hash_id FROM {} );'.format( current_files_table_name ) )
             
+            self._phash_index = None
+            
             job_key.SetVariable( 'popup_text_1', 'gathering all leaves' )
             
             self._c.execute( 'DELETE FROM shape_vptree;' )
@@ -604,6 +776,21 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
             
             similar_hash_ids_and_distances = [ ( similar_hash_id, 0 ) for similar_hash_id in similar_hash_ids ]
             
+        elif self.UsingPHashIndex():
+            
+            search = self._STL( self._c.execute( 'SELECT phash FROM shape_perceptual_hashes NATURAL JOIN shape_perceptual_hash_map WHERE hash_id = ?;', ( hash_id, ) ) )
+            
+            if len( search ) == 0:
+                
+                return []
+                
+            
+            similar_phash_ids_to_distances = self._GetPHashIndex().Search( search, max_hamming_distance )
+            
+            similar_hash_ids_to_distances = self._GetSimilarHashIdsToDistances( similar_phash_ids_to_distances )
+            
+            similar_hash_ids_and_distances = list( similar_hash_ids_to_distances.items() )
+            
         else:
             
             search_radius = max_hamming_distance
@@ -724,44 +911,71 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
                 
             
             # so, now we have phash_ids and distances. let's map that to actual files.
-            # files can have multiple phashes, and phashes can refer to multiple files, so let's make sure we are setting the smallest distance we found
             
-            similar_phash_ids = list( similar_phash_ids_to_distances.keys() )
+            similar_hash_ids_to_distances = self._GetSimilarHashIdsToDistances( similar_phash_ids_to_distances )
             
-            with HydrusDB.TemporaryIntegerTable( self._c, similar_phash_ids, 'phash_id' ) as temp_table_name:
-                
-                # temp phashes to hash map
-                similar_phash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._c.execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
-                
+            similar_hash_ids_and_distances = list( similar_hash_ids_to_distances.items() )
+            
+        
+        return similar_hash_ids_and_distances
+        
+    
+    def SearchMany( self, hash_ids, max_hamming_distance ):
+        
+        # batched version for the potential duplicates search. with the in-memory index, this is one db pass for all the search phashes and one for the results
+        
+        if not self.UsingPHashIndex() or max_hamming_distance == 0:
+            
+            return { hash_id : self.Search( hash_id, max_hamming_distance ) for hash_id in hash_ids }
+            
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, hash_ids, 'hash_id' ) as temp_table_name:
+            
+            # temp hashes to phash map to phashes
+            hash_ids_to_search_phashes = HydrusData.BuildKeyToListDict( self._c.execute( 'SELECT hash_id, phash FROM {} CROSS JOIN shape_perceptual_hash_map USING ( hash_id ) CROSS JOIN shape_perceptual_hashes USING ( phash_id );'.format( temp_table_name ) ) )
+            
+        
+        phash_index = self._GetPHashIndex()
+        
+        hash_ids_to_similar_phash_ids_to_distances = { hash_id : phash_index.Search( hash_ids_to_search_phashes[ hash_id ], max_hamming_distance ) for hash_id in hash_ids if hash_id in hash_ids_to_search_phashes }
+        
+        all_similar_phash_ids = set()
+        
+        for similar_phash_ids_to_distances in hash_ids_to_similar_phash_ids_to_distances.values():
+            
+            all_similar_phash_ids.update( similar_phash_ids_to_distances.keys() )
+            
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, all_similar_phash_ids, 'phash_id' ) as temp_table_name:
+            
+            # temp phashes to hash map
+            similar_phash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._c.execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
+            
+        
+        hash_ids_to_similar_hash_ids_and_distances = {}
+        
+        for hash_id in hash_ids:
             
             similar_hash_ids_to_distances = {}
             
-            for ( phash_id, hash_ids ) in similar_phash_ids_to_hash_ids.items():
-                
-                distance = similar_phash_ids_to_distances[ phash_id ]
+            if hash_id in hash_ids_to_similar_phash_ids_to_distances:
                 
-                for hash_id in hash_ids:
+                for ( phash_id, distance ) in hash_ids_to_similar_phash_ids_to_distances[ hash_id ].items():
                     
-                    if hash_id not in similar_hash_ids_to_distances:
-                        
-                        similar_hash_ids_to_distances[ hash_id ] = distance
-                        
-                    else:
-                        
-                        current_distance = similar_hash_ids_to_distances[ hash_id ]
+                    for similar_hash_id in similar_phash_ids_to_hash_ids.get( phash_id, [] ):
                         
-                        if distance < current_distance:
+                        if similar_hash_id not in similar_hash_ids_to_distances or distance < similar_hash_ids_to_distances[ similar_hash_id ]:
                             
-                            similar_hash_ids_to_distances[ hash_id ] = distance
+                            similar_hash_ids_to_distances[ similar_hash_id ] = distance
                             
                         
                     
                 
             
-            similar_hash_ids_and_distances = list( similar_hash_ids_to_distances.items() )
+            hash_ids_to_similar_hash_ids_and_distances[ hash_id ] = list( similar_hash_ids_to_distances.items() )
             
         
-        return similar_hash_ids_and_distances
+        return hash_ids_to_similar_hash_ids_and_distances
         
     
     def SetPHashes( self, hash_id, phashes ):
@@ -788,3 +1002,15 @@ class ClientDBSimilarFiles( HydrusDBModule.HydrusDBModule ):
         self._c.execute( 'DELETE FROM shape_search_cache WHERE hash_id = ?;', ( hash_id, ) )
         
     
+    def UsingPHashIndex( self ):
+        
+        using_index = HG.client_controller.new_options.GetBoolean( 'similar_files_use_in_memory_index' )
+        
+        if not using_index and self._phash_index is not None:
+            
+            self._phash_index = None
+            
+        
+        return using_index
+        
+    
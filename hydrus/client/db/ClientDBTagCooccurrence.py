@@ -0,0 +1,236 @@
+import sqlite3
+import typing
+
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusDB
+from hydrus.core import HydrusDBModule
+
+from hydrus.client.db import ClientDBMappingsStorage
+from hydrus.client.db import ClientDBServices
+
+# we keep the best MAX_PARTNERS_PER_TAG partners for each tag, but only prune once a tag has twice that, so the pruning does not run on every single add
+MAX_PARTNERS_PER_TAG = 100
+
+def GenerateTagCooccurrenceTableName( service_id: int ) -> str:
+    
+    return 'external_mappings.tag_cooccurrence_{}'.format( service_id )
+    
+class ClientDBTagCooccurrence( HydrusDBModule.HydrusDBModule ):
+    
+    def __init__( self, cursor: sqlite3.Cursor, modules_services: ClientDBServices.ClientDBMasterServices ):
+        
+        self.modules_services = modules_services
+        
+        HydrusDBModule.HydrusDBModule.__init__( self, 'client tag co-occurrence', cursor )
+        
+    
+    def _AdjustCounts( self, service_id: int, tag_id: int, tag_ids_to_counts: typing.Dict[ int, int ], direction: int ):
+        
+        table_name = GenerateTagCooccurrenceTableName( service_id )
+        
+        # a pair is stored in both directions so either tag can look the other up
+        rows = [ ( count, tag_id, other_tag_id ) for ( other_tag_id, count ) in tag_ids_to_counts.items() ]
+        rows.extend( [ ( count, other_tag_id, tag_id ) for ( other_tag_id, count ) in tag_ids_to_counts.items() ] )
+        
+        if direction == HC.CONTENT_UPDATE_ADD:
+            
+            self._c.executemany( 'INSERT OR IGNORE INTO {} ( tag_id, other_tag_id, count ) VALUES ( ?, ?, ? );'.format( table_name ), ( ( row_tag_id, row_other_tag_id, 0 ) for ( count, row_tag_id, row_other_tag_id ) in rows ) )
+            
+            self._c.executemany( 'UPDATE {} SET count = count + ? WHERE tag_id = ? AND other_tag_id = ?;'.format( table_name ), rows )
+            
+            self._PruneTags( service_id, set( tag_ids_to_counts.keys() ).union( ( tag_id, ) ) )
+            
+        else:
+            
+            self._c.executemany( 'UPDATE {} SET count = count - ? WHERE tag_id = ? AND other_tag_id = ?;'.format( table_name ), rows )
+            
+            self._c.executemany( 'DELETE FROM {} WHERE tag_id = ? AND other_tag_id = ? AND count <= 0;'.format( table_name ), ( ( row_tag_id, row_other_tag_id ) for ( count, row_tag_id, row_other_tag_id ) in rows ) )
+            
+        
+    
+    def _GetCooccurringTagIdsToCounts( self, service_id: int, tag_id: int, hash_ids: typing.Collection[ int ] ) -> typing.Dict[ int, int ]:
+        
+        ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = ClientDBMappingsStorage.GenerateMappingsTableNames( service_id )
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, hash_ids, 'hash_id' ) as temp_table_name:
+            
+            # temp hashes to mappings
+            tag_ids_to_counts = dict( self._c.execute( 'SELECT tag_id, COUNT( * ) FROM {} CROSS JOIN {} USING ( hash_id ) WHERE tag_id != ? GROUP BY tag_id;'.format( temp_table_name, current_mappings_table_name ), ( tag_id, ) ) )
+            
+        
+        return tag_ids_to_counts
+        
+    
+    def _GetInitialIndexGenerationTuples( self ):
+        
+        index_generation_tuples = []
+        
+        return index_generation_tuples
+        
+    
+    def _PruneTags( self, service_id: int, tag_ids: typing.Collection[ int ] ):
+        
+        table_name = GenerateTagCooccurrenceTableName( service_id )
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, tag_ids, 'tag_id' ) as temp_table_name:
+            
+            # temp tags to co-occurrence
+            bloated_tag_ids = self._STL( self._c.execute( 'SELECT tag_id FROM {} CROSS JOIN {} USING ( tag_id ) GROUP BY tag_id HAVING COUNT( * ) > ?;'.format( temp_table_name, table_name ), ( MAX_PARTNERS_PER_TAG * 2, ) ) )
+            
+        
+        for tag_id in bloated_tag_ids:
+            
+            self._c.execute( 'DELETE FROM {} WHERE tag_id = ? AND other_tag_id NOT IN ( SELECT other_tag_id FROM {} WHERE tag_id = ? ORDER BY count DESC LIMIT ? );'.format( table_name, table_name ), ( tag_id, tag_id, MAX_PARTNERS_PER_TAG ) )
+            
+        
+    
+    def AddMappings( self, service_id: int, tag_id: int, hash_ids: typing.Collection[ int ] ):
+        
+        # call this after the new mappings are in the current table, with hash_ids that were not already current
+        
+        if len( hash_ids ) == 0:
+            
+            return
+            
+        
+        tag_ids_to_counts = self._GetCooccurringTagIdsToCounts( service_id, tag_id, hash_ids )
+        
+        if len( tag_ids_to_counts ) > 0:
+            
+            self._AdjustCounts( service_id, tag_id, tag_ids_to_counts, HC.CONTENT_UPDATE_ADD )
+            
+        
+    
+    def CreateInitialTables( self ):
+        
+        pass
+        
+    
+    def DeleteMappings( self, service_id: int, tag_id: int, hash_ids: typing.Collection[ int ] ):
+        
+        # call this before the mappings are removed from the current table
+        
+        if len( hash_ids ) == 0:
+            
+            return
+            
+        
+        # a delete may be for a mapping we never had, so only count the ones that are actually going
+        current_hash_ids = self.FilterCurrentHashIds( service_id, tag_id, hash_ids )
+        
+        if len( current_hash_ids ) == 0:
+            
+            return
+            
+        
+        tag_ids_to_counts = self._GetCooccurringTagIdsToCounts( service_id, tag_id, current_hash_ids )
+        
+        if len( tag_ids_to_counts ) > 0:
+            
+            self._AdjustCounts( service_id, tag_id, tag_ids_to_counts, HC.CONTENT_UPDATE_DELETE )
+            
+        
+    
+    def Drop( self, service_id: int ):
+        
+        table_name = GenerateTagCooccurrenceTableName( service_id )
+        
+        self._c.execute( 'DROP TABLE IF EXISTS {};'.format( table_name ) )
+        
+    
+    def FilterCurrentHashIds( self, service_id: int, tag_id: int, hash_ids: typing.Collection[ int ] ) -> typing.Set[ int ]:
+        
+        ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = ClientDBMappingsStorage.GenerateMappingsTableNames( service_id )
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, hash_ids, 'hash_id' ) as temp_table_name:
+            
+            # temp hashes to mappings
+            current_hash_ids = self._STS( self._c.execute( 'SELECT hash_id FROM {} CROSS JOIN {} USING ( hash_id ) WHERE tag_id = ?;'.format( temp_table_name, current_mappings_table_name ), ( tag_id, ) ) )
+            
+        
+        return current_hash_ids
+        
+    
+    def Generate( self, service_id: int, job_key = None ):
+        
+        table_name = GenerateTagCooccurrenceTableName( service_id )
+        
+        self.Drop( service_id )
+        
+        self._c.execute( 'CREATE TABLE IF NOT EXISTS {} ( tag_id INTEGER, other_tag_id INTEGER, count INTEGER, PRIMARY KEY ( tag_id, other_tag_id ) ) WITHOUT ROWID;'.format( table_name ) )
+        
+        ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = ClientDBMappingsStorage.GenerateMappingsTableNames( service_id )
+        
+        tag_ids = self._STL( self._c.execute( 'SELECT DISTINCT tag_id FROM {};'.format( current_mappings_table_name ) ) )
+        
+        num_to_do = len( tag_ids )
+        
+        for ( i, tag_id ) in enumerate( tag_ids ):
+            
+            if job_key is not None:
+                
+                if job_key.IsCancelled():
+                    
+                    # what we have so far is still correct, just missing some tags
+                    
+                    return
+                    
+                
+                if i % 100 == 0:
+                    
+                    job_key.SetVariable( 'popup_text_2', 'tags: {}/{}'.format( i, num_to_do ) )
+                    job_key.SetVariable( 'popup_gauge_2', ( i, num_to_do ) )
+                    
+                
+            
+            # mappings to mappings, keeping the best partners
+            rows = self._c.execute( 'SELECT other_mappings.tag_id, COUNT( * ) AS pair_count FROM {} AS our_mappings CROSS JOIN {} AS other_mappings ON ( our_mappings.hash_id = other_mappings.hash_id ) WHERE our_mappings.tag_id = ? AND other_mappings.tag_id != ? GROUP BY other_mappings.tag_id ORDER BY pair_count DESC LIMIT ?;'.format( current_mappings_table_name, current_mappings_table_name ), ( tag_id, tag_id, MAX_PARTNERS_PER_TAG ) ).fetchall()
+            
+            self._c.executemany( 'INSERT OR IGNORE INTO {} ( tag_id, other_tag_id, count ) VALUES ( ?, ?, ? );'.format( table_name ), ( ( tag_id, other_tag_id, count ) for ( other_tag_id, count ) in rows ) )
+            
+        
+        if job_key is not None:
+            
+            job_key.DeleteVariable( 'popup_text_2' )
+            job_key.DeleteVariable( 'popup_gauge_2' )
+            
+        
+    
+    def GetExpectedTableNames( self ) -> typing.Collection[ str ]:
+        
+        expected_table_names = []
+        
+        return expected_table_names
+        
+    
+    def GetSuggestedTagIdsToCounts( self, service_id: int, tag_ids: typing.Collection[ int ], max_results: int ) -> typing.List[ typing.Tuple[ int, int ] ]:
+        
+        table_name = GenerateTagCooccurrenceTableName( service_id )
+        
+        with HydrusDB.TemporaryIntegerTable( self._c, tag_ids, 'tag_id' ) as temp_table_name:
+            
+            # temp tags to co-occurrence
+            rows = self._c.execute( 'SELECT other_tag_id, COUNT( * ), SUM( count ) FROM {} CROSS JOIN {} USING ( tag_id ) GROUP BY other_tag_id;'.format( temp_table_name, table_name ) ).fetchall()
+            
+        
+        tag_ids = set( tag_ids )
+        
+        rows = [ row for row in rows if row[0] not in tag_ids ]
+        
+        # much like the related tags scan does a 'soft' intersect, partners shared by more of the search tags go first, so 'eva' + 'female' does not just suggest 'touhou'
+        rows.sort( key = lambda row: ( row[1], row[2] ), reverse = True )
+        
+        # we only store pairs, so we cannot know how many distinct files a partner shares with all the search tags. the count we hand back is the sum across the search tags, which is fine for ranking
+        
+        return [ ( other_tag_id, count ) for ( other_tag_id, num_search_tags, count ) in rows[ : max_results ] ]
+        
+    
+    def IsIndexed( self, service_id: int ) -> bool:
+        
+        table_name = GenerateTagCooccurrenceTableName( service_id ).split( '.' )[1]
+        
+        result = self._c.execute( 'SELECT 1 FROM external_mappings.sqlite_master WHERE name = ?;', ( table_name, ) ).fetchone()
+        
+        return result is not None
+        
+    
@@ -666,6 +666,7 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
         library_versions.append( ( 'db cache size per file', '{}MB'.format( HG.db_cache_size ) ) )
         library_versions.append( ( 'db transaction commit period', '{}'.format( HydrusData.TimeDeltaToPrettyTimeDelta( HG.db_cache_size ) ) ) )
         library_versions.append( ( 'db synchronous value', str( HG.db_synchronous ) ) )
+        library_versions.append( ( 'db read connections', str( HG.db_num_read_connections ) ) )
         library_versions.append( ( 'db using memory for temp?', str( HG.no_db_temp_files ) ) )
         
         import locale
@@ -1543,6 +1544,16 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
         HydrusData.DebugPrint( 'garbage printing finished' )
         
     
+    def _DebugShowCacheStatistics( self ):
+        
+        for name in ( 'images', 'image_tiles', 'thumbnail' ):
+            
+            HydrusData.ShowText( self._controller.GetCache( name ).GetPrettyStatistics() )
+            
+        
+        HydrusData.ShowText( self._controller.rendered_image_disk_cache.GetPrettyStatistics() )
+        
+    
     def _DebugShowScheduledJobs( self ):
         
         self._controller.DebugShowScheduledJobs()
@@ -2856,6 +2867,65 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
             
         
     
+    def _ManageServiceOptionsBinaryUpdates( self, service_key ):
+        
+        service = self._controller.services_manager.GetService( service_key )
+        
+        binary_updates = service.GetBinaryUpdates()
+        
+        if binary_updates:
+            
+            message = 'This service currently makes its new update files in the fast binary format. Do you want to go back to json? Do this if some of your users are on very old clients.'
+            
+        else:
+            
+            message = 'This service currently makes its new update files in json. Do you want it to use the fast binary format instead? Existing update files are not changed. Clients older than this one will not be able to process the new updates, so only do this if all your users are up to date.'
+            
+        
+        result = ClientGUIDialogsQuick.GetYesNo( self, message )
+        
+        if result != QW.QDialog.Accepted:
+            
+            return
+            
+        
+        binary_updates = not binary_updates
+        
+        job_key = ClientThreading.JobKey()
+        
+        job_key.SetStatusTitle( 'setting update format' )
+        job_key.SetVariable( 'popup_text_1', 'uploading\u2026' )
+        
+        self._controller.pub( 'message', job_key )
+        
+        def work_callable():
+            
+            service.Request( HC.POST, 'options_binary_updates', { 'binary_updates' : binary_updates } )
+            
+            return 1
+            
+        
+        def publish_callable( gumpf ):
+            
+            job_key.SetVariable( 'popup_text_1', 'done!' )
+            
+            job_key.Finish()
+            
+            service.SetAccountRefreshDueNow()
+            
+        
+        def errback_ui_cleanup_callable():
+            
+            job_key.SetVariable( 'popup_text_1', 'error!' )
+            
+            job_key.Finish()
+            
+        
+        job = ClientGUIAsync.AsyncQtJob( self, work_callable, publish_callable, errback_ui_cleanup_callable = errback_ui_cleanup_callable )
+        
+        job.start()
+        
+    
     def _ManageServiceOptionsNullificationPeriod( self, service_key ):
         
         service = self._controller.services_manager.GetService( service_key )
@@ -3491,6 +3561,38 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
         self._statusbar.SetStatusText( db_status, 5, tooltip = db_tooltip )
         
     
+    def _RegenerateSubtagTrigramIndex( self, delete = False ):
+        
+        if delete:
+            
+            message = 'This will delete the subtag trigram index, so wildcard searches that start with * go back to scanning every subtag.'
+            
+        else:
+            
+            message = 'WARNING: On a large tag repository, this could take a long time and a lot of disk space!'
+            message += os.linesep * 2
+            message += 'This will create (or recreate) an index of every three-character run in every subtag. Once a service has one, searches like \'*amus\' and \'*amu*\' become quick index lookups rather than a scan of every subtag. It is kept up to date as new tags come in, which makes adding tags a little slower.'
+            message += os.linesep * 2
+            message += 'If you rarely search with a leading wildcard, this is not worth it.'
+            
+        
+        result = ClientGUIDialogsQuick.GetYesNo( self, message, yes_label = 'do it--now choose which service', no_label = 'forget it' )
+        
+        if result == QW.QDialog.Accepted:
+            
+            try:
+                
+                tag_service_key = GetTagServiceKeyForMaintenance( self )
+                
+            except HydrusExceptions.CancelledException:
+                
+                return
+                
+            
+            self._controller.Write( 'regenerate_subtag_trigram_index', tag_service_key = tag_service_key, delete = delete )
+            
+        
+    
     def _RegenerateTagCache( self ):
         
         message = 'This will delete and then recreate the fast search cache for one or all tag services.'
@@ -3548,6 +3650,38 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
             
         
     
+    def _RegenerateTagCooccurrenceIndex( self, delete = False ):
+        
+        if delete:
+            
+            message = 'This will delete the tag co-occurrence index, so related tag suggestions go back to scanning files. Tag edits will be a little faster.'
+            
+        else:
+            
+            message = 'WARNING: On a large tag repository, this could take hours to finish!'
+            message += os.linesep * 2
+            message += 'This will create (or recreate) a table of which tags commonly appear together. Once a service has one, the \'related\' tag suggestions and the Client API\'s tag suggestions are instant and use every file, not just what could be scanned in time. It is kept up to date as you add and delete tags, which makes tag edits on that service a little slower.'
+            message += os.linesep * 2
+            message += 'This is probably only worth it for your local tag services.'
+            
+        
+        result = ClientGUIDialogsQuick.GetYesNo( self, message, yes_label = 'do it--now choose which service', no_label = 'forget it' )
+        
+        if result == QW.QDialog.Accepted:
+            
+            try:
+                
+                tag_service_key = GetTagServiceKeyForMaintenance( self )
+                
+            except HydrusExceptions.CancelledException:
+                
+                return
+                
+            
+            self._controller.Write( 'regenerate_tag_cooccurrence_index', tag_service_key = tag_service_key, delete = delete )
+            
+        
+    
     def _RegenerateTagDisplayMappingsCache( self ):
         
         message = 'This will delete and then recreate the tag \'display\' mappings cache, which is used for user-presented tag searching, loading, and autocomplete counts. This is useful if miscounting (particularly related to siblings/parents) has somehow occurred.'
@@ -3861,6 +3995,15 @@ class FrameGUI( ClientGUITopLevelWindows.MainFrameThatResizes ):
         frame.SetPanel( panel )
         
     
+    def _ReviewDBJobStatistics( self ):
+        
+        frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'review db job statistics' )
+        
+        panel = ClientGUIScrolledPanelsReview.ReviewDBJobStatistics( frame, self._controller )
+        
+        frame.SetPanel( panel )
+        
+    
     def _ReviewFileMaintenance( self ):
         
         frame = ClientGUITopLevelWindowsPanels.FrameThatTakesScrollablePanel( self, 'file maintenance' )
@@ -5642,6 +5785,10 @@ The password is cleartext here but obscured in the entry dialog. Enter a blank p
             ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache', 'Delete and regenerate the cache hydrus uses for fast tag search.', self._RegenerateTagCache )
             ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (subtags repopulation)', 'Repopulate the subtags for the cache hydrus uses for fast tag search.', self._RepopulateTagCacheMissingSubtags )
             ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (searchable subtag maps)', 'Regenerate the searchable subtag maps.', self._RegenerateTagCacheSearchableSubtagsMaps )
+            ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (subtag trigram index)', 'Create or recreate the index that makes \'*amus\' and \'*amu*\' wildcard searches fast.', self._RegenerateSubtagTrigramIndex )
+            ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag text search cache (subtag trigram index) (delete)', 'Delete the index that makes \'*amus\' and \'*amu*\' wildcard searches fast.', self._RegenerateSubtagTrigramIndex, delete = True )
+            ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag co-occurrence index', 'Create or recreate the index of which tags appear together, for fast related tag suggestions.', self._RegenerateTagCooccurrenceIndex )
+            ClientGUIMenus.AppendMenuItem( regen_submenu, 'tag co-occurrence index (delete)', 'Delete the index of which tags appear together.', self._RegenerateTagCooccurrenceIndex, delete = True )
             
             ClientGUIMenus.AppendSeparator( regen_submenu )
             
@@ -5867,6 +6014,8 @@ The password is cleartext here but obscured in the entry dialog. Enter a blank p
                         
                         ClientGUIMenus.AppendMenuItem( submenu, 'change anonymisation period', 'Change the account history nullification period for this service.', self._ManageServiceOptionsNullificationPeriod, service_key )
                         
+                        ClientGUIMenus.AppendMenuItem( submenu, 'change update file format', 'Change whether this service makes its update files in json or the faster binary format.', self._ManageServiceOptionsBinaryUpdates, service_key )
+                        
                     
                     if can_overrule_services and service_type == HC.SERVER_ADMIN:
                         
@@ -6008,6 +6157,7 @@ The password is cleartext here but obscured in the entry dialog. Enter a blank p
             
             ClientGUIMenus.AppendMenuItem( profiling, 'what is this?', 'Show profile info.', QW.QMessageBox.information, self, 'Profile modes', profile_mode_message )
             ClientGUIMenus.AppendMenuCheckItem( profiling, 'profile mode', 'Run detailed \'profiles\'.', HG.profile_mode, self._SwitchBoolean, 'profile_mode' )
+            ClientGUIMenus.AppendMenuItem( profiling, 'review db job statistics', 'See how many of each db job have run this session and how long they took.', self._ReviewDBJobStatistics )
             
             ClientGUIMenus.AppendMenu( debug, profiling, 'profiling' )
             
@@ -6068,7 +6218,9 @@ The password is cleartext here but obscured in the entry dialog. Enter a blank p
             ClientGUIMenus.AppendMenuItem( memory_actions, 'run fast memory maintenance', 'Tell all the fast caches to maintain themselves.', self._controller.MaintainMemoryFast )
             ClientGUIMenus.AppendMenuItem( memory_actions, 'run slow memory maintenance', 'Tell all the slow caches to maintain themselves.', self._controller.MaintainMemorySlow )
             ClientGUIMenus.AppendMenuItem( memory_actions, 'clear image rendering cache', 'Tell the image rendering system to forget all current images. This will often free up a bunch of memory immediately.', self._controller.ClearCaches )
+            ClientGUIMenus.AppendMenuItem( memory_actions, 'clear rendered image disk cache', 'Tell the rendered image disk cache to delete everything it has stored.', self._controller.rendered_image_disk_cache.Clear )
             ClientGUIMenus.AppendMenuItem( memory_actions, 'clear thumbnail cache', 'Tell the thumbnail cache to forget everything and redraw all current thumbs.', self._controller.pub, 'reset_thumbnail_cache' )
+            ClientGUIMenus.AppendMenuItem( memory_actions, 'show cache statistics', 'Show how full the image and thumbnail caches are and how often they are hit.', self._DebugShowCacheStatistics )
             ClientGUIMenus.AppendMenuItem( memory_actions, 'print garbage', 'Print some information about the python garbage to the log.', self._DebugPrintGarbage )
             ClientGUIMenus.AppendMenuItem( memory_actions, 'take garbage snapshot', 'Capture current garbage object counts.', self._DebugTakeGarbageSnapshot )
             ClientGUIMenus.AppendMenuItem( memory_actions, 'show garbage snapshot changes', 'Show object count differences from the last snapshot.', self._DebugShowGarbageDifferences )
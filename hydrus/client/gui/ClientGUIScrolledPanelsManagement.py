@@ -314,6 +314,9 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._max_network_jobs = QP.MakeQSpinBox( general, min = 1, max = max_network_jobs_max )
             self._max_network_jobs_per_domain = QP.MakeQSpinBox( general, min = 1, max = max_network_jobs_per_domain_max )
             
+            self._repository_update_download_num_concurrent = QP.MakeQSpinBox( general, min = 1, max = max_network_jobs_per_domain_max )
+            self._repository_update_download_num_concurrent.setToolTip( 'When a repository has a lot of updates to catch up on, this many will be downloaded at once. The per-domain limit above and the service\'s bandwidth rules still apply.' )
+            
             #
             
             proxy_panel = ClientGUICommon.StaticBox( self, 'proxy settings' )
@@ -341,6 +344,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._max_network_jobs.setValue( self._new_options.GetInteger( 'max_network_jobs' ) )
             self._max_network_jobs_per_domain.setValue( self._new_options.GetInteger( 'max_network_jobs_per_domain' ) )
+            self._repository_update_download_num_concurrent.setValue( self._new_options.GetInteger( 'repository_update_download_num_concurrent' ) )
             
             #
             
@@ -364,6 +368,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Halt new jobs as long as this many network infrastructure errors on their domain (0 for never wait): ', self._domain_network_infrastructure_error_velocity ) )
             rows.append( ( 'max number of simultaneous active network jobs: ', self._max_network_jobs ) )
             rows.append( ( 'max number of simultaneous active network jobs per domain: ', self._max_network_jobs_per_domain ) )
+            rows.append( ( 'max number of simultaneous repository update downloads: ', self._repository_update_download_num_concurrent ) )
             rows.append( ( 'BUGFIX: verify regular https traffic:', self._verify_regular_https ) )
             
             gridbox = ClientGUICommon.WrapInGrid( general, rows )
@@ -426,6 +431,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'serverside_bandwidth_wait_time', self._serverside_bandwidth_wait_time.value() )
             self._new_options.SetInteger( 'max_network_jobs', self._max_network_jobs.value() )
             self._new_options.SetInteger( 'max_network_jobs_per_domain', self._max_network_jobs_per_domain.value() )
+            self._new_options.SetInteger( 'repository_update_download_num_concurrent', self._repository_update_download_num_concurrent.value() )
             
             ( number, time_delta ) = self._domain_network_infrastructure_error_velocity.GetValue()
             
@@ -1684,6 +1690,20 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            local_imports = ClientGUICommon.StaticBox( self, 'local file imports' )
+            
+            self._file_import_num_worker_threads = QP.MakeQSpinBox( local_imports, min = 1, max = 32 )
+            
+            tt = 'Hard drive imports and import folders can work on this many files at once. Hashing, thumbnailing and similar files work will then use more than one core, and the database writes are merged into fewer, bigger jobs. 1 imports one file at a time.'
+            
+            self._file_import_num_worker_threads.setToolTip( tt )
+            
+            #
+            
+            self._file_import_num_worker_threads.setValue( self._new_options.GetInteger( 'file_import_num_worker_threads' ) )
+            
+            #
+            
             rows = []
             
             rows.append( ( 'For \'quiet\' import contexts like import folders and subscriptions:', self._quiet_fios ) )
@@ -1695,9 +1715,20 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            rows = []
+            
+            rows.append( ( 'Files to import at once: ', self._file_import_num_worker_threads ) )
+            
+            gridbox = ClientGUICommon.WrapInGrid( local_imports, rows )
+            
+            local_imports.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+            
+            #
+            
             vbox = QP.VBoxLayout()
             
             QP.AddToLayout( vbox, default_fios, CC.FLAGS_EXPAND_PERPENDICULAR )
+            QP.AddToLayout( vbox, local_imports, CC.FLAGS_EXPAND_PERPENDICULAR )
             vbox.addStretch( 1 )
             
             self.setLayout( vbox )
@@ -1708,6 +1739,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetDefaultFileImportOptions( 'quiet', self._quiet_fios.GetValue() )
             self._new_options.SetDefaultFileImportOptions( 'loud', self._loud_fios.GetValue() )
             
+            self._new_options.SetInteger( 'file_import_num_worker_threads', self._file_import_num_worker_threads.value() )
+            
         
     
     class _MaintenanceAndProcessingPanel( QW.QWidget ):
@@ -1770,6 +1803,12 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._file_maintenance_idle_throttle_velocity.setToolTip( tt )
             self._file_maintenance_active_throttle_velocity.setToolTip( tt )
             
+            self._file_maintenance_num_worker_processes = QP.MakeQSpinBox( self._file_maintenance_panel, min = 0, max = 64 )
+            
+            tt = 'If this is more than 0, CPU-heavy jobs like thumbnail regeneration, metadata reparsing, other hash generation and similar files metadata generation will be farmed out to this many separate worker processes, so they can use more than one core. The throttles above still apply.'
+            
+            self._file_maintenance_num_worker_processes.setToolTip( tt )
+            
             #
             
             self._idle_normal.setChecked( HC.options[ 'idle_normal' ] )
@@ -1801,6 +1840,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             self._file_maintenance_active_throttle_velocity.SetValue( file_maintenance_active_throttle_velocity )
             
+            self._file_maintenance_num_worker_processes.setValue( self._new_options.GetInteger( 'file_maintenance_num_worker_processes' ) )
+            
             #
             
             rows = []
@@ -1875,6 +1916,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             rows.append( ( 'Idle throttle: ', self._file_maintenance_idle_throttle_velocity ) )
             rows.append( ( 'Run file maintenance during normal time: ', self._file_maintenance_during_active ) )
             rows.append( ( 'Normal throttle: ', self._file_maintenance_active_throttle_velocity ) )
+            rows.append( ( 'Worker processes for CPU-heavy jobs (0 to do everything in the main process): ', self._file_maintenance_num_worker_processes ) )
             
             gridbox = ClientGUICommon.WrapInGrid( self._file_maintenance_panel, rows )
             
@@ -1957,6 +1999,8 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._new_options.SetInteger( 'file_maintenance_active_throttle_files', file_maintenance_active_throttle_files )
             self._new_options.SetInteger( 'file_maintenance_active_throttle_time_delta', file_maintenance_active_throttle_time_delta )
             
+            self._new_options.SetInteger( 'file_maintenance_num_worker_processes', self._file_maintenance_num_worker_processes.value() )
+            
         
     
     class _MediaPanel( QW.QWidget ):
@@ -2542,6 +2586,11 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._image_tile_cache_timeout = ClientGUITime.TimeDeltaButton( image_tile_cache_panel, min = 300, hours = True, minutes = True )
             self._image_tile_cache_timeout.setToolTip( 'The amount of time after which a rendered image tile in the cache will naturally be removed, if it is not shunted out due to a new member exceeding the size limit.' )
             
+            rendered_image_disk_cache_panel = ClientGUICommon.StaticBox( self, 'rendered image disk cache' )
+            
+            self._rendered_image_disk_cache_size = ClientGUIControls.BytesControl( rendered_image_disk_cache_panel )
+            self._rendered_image_disk_cache_size.setToolTip( 'Decoded images and resized tiles are saved here, in the db directory, so reopening recently viewed big images does not need a full decode. Set to 0 to disable.' )
+            
             #
             
             buffer_panel = ClientGUICommon.StaticBox( self, 'video buffer' )
@@ -2564,6 +2613,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             self._fullscreen_cache_size.setValue( int( HC.options['fullscreen_cache_size'] // 1048576 ) )
             
             self._image_tile_cache_size.SetValue( self._new_options.GetInteger( 'image_tile_cache_size' ) )
+            self._rendered_image_disk_cache_size.SetValue( self._new_options.GetInteger( 'rendered_image_disk_cache_size' ) )
             
             self._thumbnail_cache_timeout.SetValue( self._new_options.GetInteger( 'thumbnail_cache_timeout' ) )
             self._image_cache_timeout.SetValue( self._new_options.GetInteger( 'image_cache_timeout' ) )
@@ -2690,6 +2740,26 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             
             #
             
+            text = 'Important if you often flip back through large images you viewed recently, or across restarts. This uses disk space, not memory.'
+            
+            st = ClientGUICommon.BetterStaticText( rendered_image_disk_cache_panel, text )
+            
+            st.setWordWrap( True )
+            
+            rendered_image_disk_cache_panel.Add( st, CC.FLAGS_EXPAND_PERPENDICULAR )
+            
+            rows = []
+            
+            rows.append( ( 'Disk space reserved for rendered image cache:', self._rendered_image_disk_cache_size ) )
+            
+            gridbox = ClientGUICommon.WrapInGrid( rendered_image_disk_cache_panel, rows )
+            
+            rendered_image_disk_cache_panel.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+            
+            QP.AddToLayout( vbox, rendered_image_disk_cache_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
+            
+            #
+            
             text = 'This old option does not apply to mpv! It only applies to the native hydrus animation renderer!'
             text += os.linesep
             text += 'Hydrus video rendering is CPU intensive.'
@@ -2817,6 +2887,7 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
             HC.options[ 'fullscreen_cache_size' ] = self._fullscreen_cache_size.value() * 1048576
             
             self._new_options.SetInteger( 'image_tile_cache_size', self._image_tile_cache_size.GetValue() )
+            self._new_options.SetInteger( 'rendered_image_disk_cache_size', self._rendered_image_disk_cache_size.GetValue() )
             
             self._new_options.SetInteger( 'thumbnail_cache_timeout', self._thumbnail_cache_timeout.GetValue() )
             self._new_options.SetInteger( 'image_cache_timeout', self._image_cache_timeout.GetValue() )
@@ -1737,6 +1737,101 @@ class MigrateTagsPanel( ClientGUIScrolledPanels.ReviewPanel ):
         self._UpdateMigrationControlsNewDestination()
         
     
+class ReviewDBJobStatistics( ClientGUIScrolledPanels.ReviewPanel ):
+    
+    def __init__( self, parent, controller ):
+        
+        ClientGUIScrolledPanels.ReviewPanel.__init__( self, parent )
+        
+        self._controller = controller
+        
+        self._keys_to_rows = {}
+        
+        #
+        
+        info_message = 'This shows how long each kind of database job has taken since the client booted or the statistics were last reset. Times are execution times unless they say queue wait, which is how long the job sat waiting for the database to get to it. Percentiles are approximate. Rows changed includes temporary tables.'
+        
+        st = ClientGUICommon.BetterStaticText( self, label = info_message )
+        
+        st.setWordWrap( True )
+        
+        self._since_st = ClientGUICommon.BetterStaticText( self )
+        
+        listctrl_panel = ClientGUIListCtrl.BetterListCtrlPanel( self )
+        
+        self._listctrl = ClientGUIListCtrl.BetterListCtrl( listctrl_panel, CGLC.COLUMN_LIST_DB_JOB_STATISTICS.ID, 24, self._ConvertKeyToListCtrlTuples )
+        
+        listctrl_panel.SetListCtrl( self._listctrl )
+        
+        listctrl_panel.AddButton( 'refresh', self._Refresh )
+        listctrl_panel.AddButton( 'reset', self._Reset )
+        
+        #
+        
+        self._Refresh()
+        
+        self._listctrl.Sort()
+        
+        #
+        
+        vbox = QP.VBoxLayout()
+        
+        QP.AddToLayout( vbox, st, CC.FLAGS_EXPAND_PERPENDICULAR )
+        QP.AddToLayout( vbox, self._since_st, CC.FLAGS_EXPAND_PERPENDICULAR )
+        QP.AddToLayout( vbox, listctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+        
+        self.widget().setLayout( vbox )
+        
+    
+    def _ConvertKeyToListCtrlTuples( self, key ):
+        
+        row = self._keys_to_rows[ key ]
+        
+        ( job_type, action ) = key
+        
+        execution_time = row[ 'execution_time' ]
+        queue_time = row[ 'queue_time' ]
+        
+        num_jobs = row[ 'num_jobs' ]
+        num_jobs_on_read_connections = row[ 'num_jobs_on_read_connections' ]
+        
+        pretty_num_jobs = HydrusData.ToHumanInt( num_jobs )
+        
+        if num_jobs_on_read_connections > 0:
+            
+            pretty_num_jobs = '{} ({} on read connections)'.format( pretty_num_jobs, HydrusData.ToHumanInt( num_jobs_on_read_connections ) )
+            
+        
+        sort_times = ( execution_time[ 'total' ], execution_time[ 'p50' ], execution_time[ 'p95' ], execution_time[ 'p99' ], execution_time[ 'max' ], queue_time[ 'p50' ], queue_time[ 'p95' ] )
+        pretty_times = [ HydrusData.TimeDeltaToPrettyTimeDelta( t ) for t in sort_times ]
+        
+        rows_changed = row[ 'total_rows_changed' ]
+        result_size = row[ 'total_result_size' ]
+        
+        display_tuple = ( job_type, action, pretty_num_jobs ) + tuple( pretty_times ) + ( HydrusData.ToHumanInt( rows_changed ), HydrusData.ToHumanInt( result_size ) )
+        sort_tuple = ( job_type, action, num_jobs ) + sort_times + ( rows_changed, result_size )
+        
+        return ( display_tuple, sort_tuple )
+        
+    
+    def _Refresh( self ):
+        
+        ( time_started, rows ) = self._controller.db.GetJobStatistics()
+        
+        self._since_st.setText( 'Statistics collected since {}.'.format( HydrusData.ConvertTimestampToPrettyTime( time_started ) ) )
+        
+        self._keys_to_rows = { ( row[ 'job_type' ], row[ 'action' ] ) : row for row in rows }
+        
+        self._listctrl.SetData( list( self._keys_to_rows.keys() ) )
+        
+    
+    def _Reset( self ):
+        
+        self._controller.db.ResetJobStatistics()
+        
+        self._Refresh()
+        
+    
 class ReviewDownloaderImport( ClientGUIScrolledPanels.ReviewPanel ):
     
     def __init__( self, parent, network_engine ):
@@ -3429,6 +3429,7 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
         self._tag_sort = HG.client_controller.new_options.GetDefaultTagSort()
         
         self._last_media_results = set()
+        self._last_media_list = None
         
         self._include_counts = include_counts
         
@@ -3493,10 +3494,12 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
             
             nonzero_tags = set()
             
-            if self._show_current: nonzero_tags.update( ( tag for ( tag, count ) in self._current_tags_to_count.items() if count > 0 and tag in limit_to_these_tags ) )
-            if self._show_deleted: nonzero_tags.update( ( tag for ( tag, count ) in self._deleted_tags_to_count.items() if count > 0 and tag in limit_to_these_tags ) )
-            if self._show_pending: nonzero_tags.update( ( tag for ( tag, count ) in self._pending_tags_to_count.items() if count > 0 and tag in limit_to_these_tags ) )
-            if self._show_petitioned: nonzero_tags.update( ( tag for ( tag, count ) in self._petitioned_tags_to_count.items() if count > 0 and tag in limit_to_these_tags ) )
+            # we only look at the given tags, so this costs in proportion to what changed, not to how many tags we are showing
+            
+            if self._show_current: nonzero_tags.update( ( tag for tag in limit_to_these_tags if self._current_tags_to_count.get( tag, 0 ) > 0 ) )
+            if self._show_deleted: nonzero_tags.update( ( tag for tag in limit_to_these_tags if self._deleted_tags_to_count.get( tag, 0 ) > 0 ) )
+            if self._show_pending: nonzero_tags.update( ( tag for tag in limit_to_these_tags if self._pending_tags_to_count.get( tag, 0 ) > 0 ) )
+            if self._show_petitioned: nonzero_tags.update( ( tag for tag in limit_to_these_tags if self._petitioned_tags_to_count.get( tag, 0 ) > 0 ) )
             
         
         nonzero_terms = [ self._GenerateTermFromTag( tag ) for tag in nonzero_tags ]
@@ -3551,48 +3554,6 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
         self._RegenTermsToIndices()
         
     
-    def IncrementTagsByMedia( self, media ):
-        
-        flat_media = ClientMedia.FlattenMedia( media )
-        
-        media_results = [ m.GetMediaResult() for m in flat_media ]
-        
-        self.IncrementTagsByMediaResults( media_results )
-        
-    
-    def IncrementTagsByMediaResults( self, media_results ):
-        
-        if not isinstance( media_results, set ):
-            
-            media_results = set( media_results )
-            
-        
-        media_results = media_results.difference( self._last_media_results )
-        
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( media_results, self._service_key, self._tag_display_type )
-        
-        tags_changed = set()
-        
-        if self._show_current: tags_changed.update( current_tags_to_count.keys() )
-        if self._show_deleted: tags_changed.update( deleted_tags_to_count.keys() )
-        if self._show_pending: tags_changed.update( pending_tags_to_count.keys() )
-        if self._show_petitioned: tags_changed.update( petitioned_tags_to_count.keys() )
-        
-        self._current_tags_to_count.update( current_tags_to_count )
-        self._deleted_tags_to_count.update( deleted_tags_to_count )
-        self._pending_tags_to_count.update( pending_tags_to_count )
-        self._petitioned_tags_to_count.update( petitioned_tags_to_count )
-        
-        if len( tags_changed ) > 0:
-            
-            self._UpdateTerms( tags_changed )
-            
-        
-        self._last_media_results.update( media_results )
-        
-        self._DataHasChanged()
-        
-    
     def SetTagsByMedia( self, media ):
         
         flat_media = ClientMedia.FlattenMedia( media )
@@ -3619,78 +3580,36 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
         self._UpdateTerms()
         
         self._last_media_results = media_results
+        self._last_media_list = None
         
         self._DataHasChanged()
         
     
-    def SetTagsByMediaFromMediaPanel( self, media, tags_changed ):
+    def SetTagsByMediaList( self, media_list: ClientMedia.MediaList ):
         
-        flat_media = ClientMedia.FlattenMedia( media )
+        # the media list keeps its tag counts up to date as its selection and tags change, so we only have to redo the terms that changed
         
-        media_results = [ m.GetMediaResult() for m in flat_media ]
+        ( counts, changed_tags ) = media_list.GetTagPresentationCounts( self._service_key, self._tag_display_type )
         
-        self.SetTagsByMediaResultsFromMediaPanel( media_results, tags_changed )
+        # these counters are the media list's, so we only ever read them
+        ( self._current_tags_to_count, self._deleted_tags_to_count, self._pending_tags_to_count, self._petitioned_tags_to_count ) = counts
         
-    
-    def SetTagsByMediaResultsFromMediaPanel( self, media_results, tags_changed ):
-        
-        if not isinstance( media_results, set ):
+        if media_list is not self._last_media_list:
             
-            media_results = set( media_results )
+            changed_tags = None
             
         
-        # this uses the last-set media and count cache to generate new numbers and is faster than re-counting from scratch when the tags have not changed
-        
-        selection_shrank_a_lot = len( media_results ) < len( self._last_media_results ) // 10 # if we are dropping to a much smaller selection (e.g. 5000 -> 1), we should just recalculate from scratch
-        
-        if tags_changed or selection_shrank_a_lot:
+        if changed_tags is None:
             
-            self.SetTagsByMediaResults( media_results )
+            self._UpdateTerms()
             
-            return
+        elif len( changed_tags ) > 0:
             
-        
-        removees = self._last_media_results.difference( media_results )
-        
-        if len( removees ) == 0:
-            
-            self.IncrementTagsByMediaResults( media_results )
-            
-            return
-            
-        
-        adds = media_results.difference( self._last_media_results )
-        
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( removees, self._service_key, self._tag_display_type )
-        
-        self._current_tags_to_count.subtract( current_tags_to_count )
-        self._deleted_tags_to_count.subtract( deleted_tags_to_count )
-        self._pending_tags_to_count.subtract( pending_tags_to_count )
-        self._petitioned_tags_to_count.subtract( petitioned_tags_to_count )
-        
-        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = ClientMedia.GetMediaResultsTagCount( adds, self._service_key, self._tag_display_type )
-        
-        self._current_tags_to_count.update( current_tags_to_count )
-        self._deleted_tags_to_count.update( deleted_tags_to_count )
-        self._pending_tags_to_count.update( pending_tags_to_count )
-        self._petitioned_tags_to_count.update( petitioned_tags_to_count )
-        
-        for counter in ( self._current_tags_to_count, self._deleted_tags_to_count, self._pending_tags_to_count, self._petitioned_tags_to_count ):
-            
-            tags = list( counter.keys() )
-            
-            for tag in tags:
-                
-                if counter[ tag ] == 0:
-                    
-                    del counter[ tag ]
-                    
-                
+            self._UpdateTerms( changed_tags )
             
         
-        self._UpdateTerms()
-        
-        self._last_media_results = media_results
+        self._last_media_list = media_list
+        self._last_media_results = set()
         
         self._DataHasChanged()
         
@@ -3699,7 +3618,14 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
         
         ListBoxTagsDisplayCapable.SetTagServiceKey( self, service_key )
         
-        self.SetTagsByMediaResults( self._last_media_results )
+        if self._last_media_list is None:
+            
+            self.SetTagsByMediaResults( self._last_media_results )
+            
+        else:
+            
+            self.SetTagsByMediaList( self._last_media_list )
+            
         
     
     def SetSort( self, tag_sort: ClientTagSorting.TagSort ):
@@ -3723,7 +3649,19 @@ class ListBoxTagsMedia( ListBoxTagsDisplayCapable ):
     
     def ForceTagRecalc( self ):
         
-        self.SetTagsByMediaResults( self._last_media_results )
+        if self._last_media_list is None:
+            
+            self.SetTagsByMediaResults( self._last_media_results )
+            
+        else:
+            
+            # the files' tags have been recalculated underneath the media list's counts, so it has to count again
+            
+            self._last_media_list.ResetTagCounts()
+            
+            self.SetTagsByMediaList( self._last_media_list )
+            
+        
         
     
 class StaticBoxSorterForListBoxTags( ClientGUICommon.StaticBox ):
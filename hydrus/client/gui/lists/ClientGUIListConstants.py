@@ -1465,3 +1465,40 @@ register_column_type( COLUMN_LIST_VACUUM_DATA.ID, COLUMN_LIST_VACUUM_DATA.CAN_VA
 register_column_type( COLUMN_LIST_VACUUM_DATA.ID, COLUMN_LIST_VACUUM_DATA.VACUUM_TIME_ESTIMATE, 'vacuum time estimate', False, 48, True )
 
 default_column_list_sort_lookup[ COLUMN_LIST_VACUUM_DATA.ID ] = ( COLUMN_LIST_VACUUM_DATA.NAME, True )
+
+#
+
+class COLUMN_LIST_DB_JOB_STATISTICS( COLUMN_LIST_DEFINITION ):
+    
+    ID = 67
+    
+    JOB_TYPE = 0
+    ACTION = 1
+    NUM_JOBS = 2
+    TOTAL_TIME = 3
+    P50 = 4
+    P95 = 5
+    P99 = 6
+    MAX = 7
+    QUEUE_P50 = 8
+    QUEUE_P95 = 9
+    ROWS_CHANGED = 10
+    RESULT_SIZE = 11
+    
+
+column_list_type_name_lookup[ COLUMN_LIST_DB_JOB_STATISTICS.ID ] = 'db job statistics'
+
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.JOB_TYPE, 'type', False, 6, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.ACTION, 'action', False, 32, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.NUM_JOBS, 'jobs', False, 12, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.TOTAL_TIME, 'total time', False, 16, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.P50, 'p50', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.P95, 'p95', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.P99, 'p99', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.MAX, 'max', False, 10, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.QUEUE_P50, 'queue wait p50', False, 14, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.QUEUE_P95, 'queue wait p95', False, 14, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.ROWS_CHANGED, 'rows changed', False, 12, True )
+register_column_type( COLUMN_LIST_DB_JOB_STATISTICS.ID, COLUMN_LIST_DB_JOB_STATISTICS.RESULT_SIZE, 'result size', False, 12, True )
+
+default_column_list_sort_lookup[ COLUMN_LIST_DB_JOB_STATISTICS.ID ] = ( COLUMN_LIST_DB_JOB_STATISTICS.TOTAL_TIME, False )
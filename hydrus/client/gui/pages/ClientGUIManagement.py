@@ -830,8 +830,7 @@ class ManagementPanel( QW.QScrollArea ):
         
         if self._current_selection_tags_list is not None:
             
-            media_panel.selectedMediaTagPresentationChanged.connect( self._current_selection_tags_list.SetTagsByMediaFromMediaPanel )
-            media_panel.selectedMediaTagPresentationIncremented.connect( self._current_selection_tags_list.IncrementTagsByMedia )
+            media_panel.selectedMediaTagPresentationChanged.connect( self._current_selection_tags_list.SetTagsByMediaList )
             self._media_sort.sortChanged.connect( media_panel.Sort )
             
             media_panel.PublishSelectionChange()
@@ -981,6 +980,10 @@ class ManagementPanelDuplicateFilter( ManagementPanel ):
         
         menu_items.append( ( 'check', 'search for duplicate pairs at the current distance during normal db maintenance', 'Tell the client to find duplicate pairs in its normal db maintenance cycles, whether you have that set to idle or shutdown time.', check_manager ) )
         
+        check_manager = ClientGUICommon.CheckboxManagerOptions( 'similar_files_use_in_memory_index' )
+        
+        menu_items.append( ( 'check', 'search using an in-memory index (faster, uses ~16 bytes ram per file)', 'Tell the client to load all the perceptual hashes into memory and search them in big vectorised batches rather than walking the on-disk tree. This is much faster for large searches but uses more memory.', check_manager ) )
+        
         self._cog_button = ClientGUIMenuButton.MenuBitmapButton( self._main_left_panel, CC.global_pixmaps().cog, menu_items )
         
         menu_items = []
@@ -46,8 +46,7 @@ from hydrus.client.metadata import ClientTags
 
 class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
     
-    selectedMediaTagPresentationChanged = QC.Signal( list, bool )
-    selectedMediaTagPresentationIncremented = QC.Signal( list )
+    selectedMediaTagPresentationChanged = QC.Signal( object )
     statusTextChanged = QC.Signal( str )
     
     focusMediaChanged = QC.Signal( ClientMedia.Media )
@@ -89,8 +88,6 @@ class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
         HG.client_controller.sub( self, 'SelectByTags', 'select_files_with_tags' )
         HG.client_controller.sub( self, 'LaunchMediaViewerOnFocus', 'launch_media_viewer' )
         
-        self._had_changes_to_tag_presentation_while_hidden = False
-        
         self._my_shortcut_handler = ClientGUIShortcuts.ShortcutsHandler( self, [ 'media' ] )
         
     
@@ -351,6 +348,8 @@ class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
     
     def _DeselectSelect( self, media_to_deselect, media_to_select ):
         
+        self._UpdateTagCountsForSelectionChange( media_to_deselect, media_to_select )
+        
         if len( media_to_deselect ) > 0:
             
             for m in media_to_deselect: m.Deselect()
@@ -1122,52 +1121,16 @@ class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
             
         
     
-    def _PublishSelectionChange( self, tags_changed = False ):
+    def _PublishSelectionChange( self ):
         
         if HG.client_controller.gui.IsCurrentPage( self._page_key ):
             
-            if len( self._selected_media ) == 0:
-                
-                tags_media = self._sorted_media
-                
-            else:
-                
-                tags_media = self._selected_media
-                
+            # the tag list asks us for our tag counts, which we keep up to date as the selection and tags change, even while we are hidden
             
-            tags_media = list( tags_media )
-            
-            tags_changed = tags_changed or self._had_changes_to_tag_presentation_while_hidden
-            
-            self.selectedMediaTagPresentationChanged.emit( tags_media, tags_changed )
+            self.selectedMediaTagPresentationChanged.emit( self )
             
             self.statusTextChanged.emit( self._GetPrettyStatus() )
             
-            if tags_changed:
-                
-                self._had_changes_to_tag_presentation_while_hidden = False
-                
-            
-        elif tags_changed:
-            
-            self._had_changes_to_tag_presentation_while_hidden = True
-            
-        
-    
-    def _PublishSelectionIncrement( self, medias ):
-        
-        if HG.client_controller.gui.IsCurrentPage( self._page_key ):
-            
-            medias = list( medias )
-            
-            self.selectedMediaTagPresentationIncremented.emit( medias )
-            
-            self.statusTextChanged.emit( self._GetPrettyStatus() )
-            
-        else:
-            
-            self._had_changes_to_tag_presentation_while_hidden = True
-            
         
     
     def _RecalculateVirtualSize( self, called_from_resize_event = False ):
@@ -2157,7 +2120,7 @@ class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
         
         if we_were_file_or_tag_affected:
             
-            self._PublishSelectionChange( tags_changed = True )
+            self._PublishSelectionChange()
             
         
     
@@ -2176,7 +2139,7 @@ class MediaPanel( ClientMedia.ListeningMediaList, QW.QScrollArea ):
                     self._RecalculateVirtualSize()
                     
                 
-                self._PublishSelectionChange( tags_changed = True )
+                self._PublishSelectionChange()
                 
             
         
@@ -2986,7 +2949,7 @@ class MediaPanelThumbnails( MediaPanel ):
                 
                 if len( self._selected_media ) == 0:
                     
-                    self._PublishSelectionIncrement( thumbnails )
+                    self._PublishSelectionChange()
                     
                 
             
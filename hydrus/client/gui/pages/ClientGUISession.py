@@ -3,6 +3,8 @@ import itertools
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusSerialisable
 
+from hydrus.client.importing import ClientImporting
+
 RESERVED_SESSION_NAMES = { '', 'just a blank page', 'last session', 'exit session' }
 
 class GUISessionContainer( HydrusSerialisable.SerialisableBaseNamed ):
@@ -193,7 +195,9 @@ class GUISessionPageData( HydrusSerialisable.SerialisableBase ):
             
         else:
             
-            self._management_controller = management_controller.Duplicate() # duplicate, which _should_ freeze downloaders etc.. inside the MC
+            # duplicate, which _should_ freeze downloaders etc.. inside the MC
+            # this version also fills the copy's seed hash caches, so hashing and saving this page does not have to dump every seed again
+            self._management_controller = ClientImporting.DuplicateWithSeedStorageHashes( management_controller )
             self._hashes = list( hashes )
             
         
@@ -224,4 +228,14 @@ class GUISessionPageData( HydrusSerialisable.SerialisableBase ):
         return self._management_controller
         
     
+    def GetSerialisedHash( self ):
+        
+        # the db stores our seeds by hash, so we hash that form. it is cheap, since our seed caches already know their hashes
+        
+        with ClientImporting.SeedStorageContext():
+            
+            return HydrusSerialisable.SerialisableBase.GetSerialisedHash( self )
+            
+        
+    
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_GUI_SESSION_PAGE_DATA ] = GUISessionPageData
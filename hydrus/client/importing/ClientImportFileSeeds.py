@@ -1,3 +1,4 @@
+import bisect
 import collections
 import itertools
 import os
@@ -69,6 +70,9 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         self._tags = set()
         self._hashes = {}
         
+        # the caches that hold us index us by status, so we tell them when it changes
+        self._status_change_queues = []
+        
     
     def __eq__( self, other ):
         
@@ -149,6 +153,14 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return associable_urls
         
     
+    def _NotifyStatusChanged( self ):
+        
+        for status_change_queue in self._status_change_queues:
+            
+            status_change_queue.append( self )
+            
+        
+    
     def _SetupTagImportOptions( self, given_tag_import_options: TagImportOptions.TagImportOptions ) -> TagImportOptions.TagImportOptions:
         
         if given_tag_import_options.IsDefault():
@@ -261,6 +273,14 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         self._UpdateModified()
         
     
+    def AddStatusChangeQueue( self, status_change_queue: collections.deque ):
+        
+        if True not in ( existing_status_change_queue is status_change_queue for existing_status_change_queue in self._status_change_queues ):
+            
+            self._status_change_queues.append( status_change_queue )
+            
+        
+    
     def AddTags( self, tags ):
         
         tags = HydrusTags.CleanTags( tags )
@@ -323,7 +343,7 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
             
             status_hook( 'importing file' )
             
-            self.Import( temp_path, file_import_options, status_hook = status_hook )
+            self.Import( temp_path, file_import_options, status_hook = status_hook, file_hashes = network_job.GetFileHashes() )
             
         finally:
             
@@ -592,17 +612,17 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         return self.GetHash() is not None
         
     
-    def Import( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions, status_hook = None ):
+    def Import( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions, status_hook = None, file_hashes = None, file_import_db_batcher = None ):
         
-        file_import_job = ClientImportFiles.FileImportJob( temp_path, file_import_options )
+        file_import_job = ClientImportFiles.FileImportJob( temp_path, file_import_options, file_hashes = file_hashes )
         
-        file_import_status = file_import_job.DoWork( status_hook = status_hook )
+        file_import_status = file_import_job.DoWork( status_hook = status_hook, file_import_db_batcher = file_import_db_batcher )
         
         self.SetStatus( file_import_status.status, note = file_import_status.note )
         self.SetHash( file_import_status.hash )
         
     
-    def ImportPath( self, file_seed_cache: "FileSeedCache", file_import_options: FileImportOptions.FileImportOptions, limited_mimes = None, status_hook = None ):
+    def ImportPath( self, file_seed_cache: "FileSeedCache", file_import_options: FileImportOptions.FileImportOptions, limited_mimes = None, status_hook = None, file_import_db_batcher = None ):
         
         try:
             
@@ -639,7 +659,7 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
                     raise Exception( 'File failed to copy to temp path--see log for error.' )
                     
                 
-                self.Import( temp_path, file_import_options, status_hook = status_hook )
+                self.Import( temp_path, file_import_options, status_hook = status_hook, file_import_db_batcher = file_import_db_batcher )
                 
             finally:
                 
@@ -781,6 +801,8 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
             
             self.status = file_import_status.status
             
+            self._NotifyStatusChanged()
+            
             if file_import_status.hash is not None:
                 
                 self._hashes[ 'sha256' ] = file_import_status.hash
@@ -848,6 +870,8 @@ class FileSeed( HydrusSerialisable.SerialisableBase ):
         
         self._UpdateModified()
         
+        self._NotifyStatusChanged()
+        
     
     def ShouldPresent( self, file_import_options: FileImportOptions.FileImportOptions, in_inbox = None ):
         
@@ -1528,6 +1552,15 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         
         self._file_seeds_to_indices = {}
         
+        # status -> sorted indices into _file_seeds, so finding work and counting does not scan everything
+        # our seeds put themselves in the status change queue when their status changes, and we catch up on it before we read the index
+        self._statuses_to_indices = {}
+        self._file_seeds_to_indexed_statuses = {}
+        self._file_seed_status_changes = collections.deque()
+        self._latest_added_time = 0
+        
+        self._seed_storage_hash_cache = ClientImporting.SeedStorageHashCache()
+        
         self._file_seed_cache_key = HydrusData.GenerateKey()
         
         self._status_cache = FileSeedCacheStatus()
@@ -1542,6 +1575,23 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         return len( self._file_seeds )
         
     
+    def _CatchUpFileSeedStatusChanges( self ):
+        
+        # seeds can append to this from other threads, but we are the only thing that takes from it
+        
+        if len( self._file_seed_status_changes ) == 0:
+            
+            return
+            
+        
+        while len( self._file_seed_status_changes ) > 0:
+            
+            self._UpdateFileSeedStatusIndex( self._file_seed_status_changes.popleft() )
+            
+        
+        self._SetStatusDirty()
+        
+    
     def _GenerateStatus( self ):
         
         fscs = FileSeedCacheStatus()
@@ -1562,40 +1612,73 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
             
         else:
             
-            return [ file_seed for file_seed in self._file_seeds if file_seed.status == status ]
+            return self._GetNextFileSeeds( status, len( self._file_seeds ) )
             
         
     
     def _GetLatestAddedTime( self ):
         
-        if len( self._file_seeds ) == 0:
+        return self._latest_added_time
+        
+    
+    def _GetNextFileSeed( self, status: int ) -> typing.Optional[ FileSeed ]:
+        
+        self._CatchUpFileSeedStatusChanges()
+        
+        while status in self._statuses_to_indices:
             
-            latest_timestamp = 0
+            file_seed = self._file_seeds[ self._statuses_to_indices[ status ][0] ]
             
-        else:
+            if file_seed.status == status:
+                
+                return file_seed
+                
             
-            latest_timestamp = max( ( file_seed.created for file_seed in self._file_seeds ) )
+            # this was changed and we have not been told yet, so catch up now
+            
+            self._UpdateFileSeedStatusIndex( file_seed )
             
         
-        return latest_timestamp
+        return None
         
     
-    def _GetNextFileSeed( self, status: int ) -> typing.Optional[ FileSeed ]:
+    def _GetNextFileSeeds( self, status: int, num_to_get: int ) -> typing.List[ FileSeed ]:
+        
+        self._CatchUpFileSeedStatusChanges()
+        
+        file_seeds = []
+        stale_file_seeds = []
         
-        for file_seed in self._file_seeds:
+        for index in self._statuses_to_indices.get( status, [] ):
             
-            if file_seed.status == status:
+            file_seed = self._file_seeds[ index ]
+            
+            if file_seed.status != status:
                 
-                return file_seed
+                stale_file_seeds.append( file_seed )
+                
+                continue
+                
+            
+            file_seeds.append( file_seed )
+            
+            if len( file_seeds ) >= num_to_get:
+                
+                break
                 
             
         
-        return None
+        for file_seed in stale_file_seeds:
+            
+            self._UpdateFileSeedStatusIndex( file_seed )
+            
+        
+        return file_seeds
         
     
     def _GetSerialisableInfo( self ):
         
-        return self._file_seeds.GetSerialisableTuple()
+        return ClientImporting.GetSeedsSerialisableTuple( self._file_seeds, self._seed_storage_hash_cache )
         
     
     def _GetSourceTimestamp( self, file_seed: FileSeed ):
@@ -1615,16 +1698,40 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
     
     def _GetStatusesToCounts( self ):
         
+        self._CatchUpFileSeedStatusChanges()
+        
         statuses_to_counts = collections.Counter()
         
-        for file_seed in self._file_seeds:
+        for ( status, indices ) in self._statuses_to_indices.items():
             
-            statuses_to_counts[ file_seed.status ] += 1
+            statuses_to_counts[ status ] = len( indices )
             
         
         return statuses_to_counts
         
     
+    def _IndexFileSeed( self, file_seed: FileSeed, index: int ):
+        
+        # only for seeds going on the end of the list, so each status list stays sorted
+        
+        # we listen before we read the status, so we cannot miss a change
+        file_seed.AddStatusChangeQueue( self._file_seed_status_changes )
+        
+        status = file_seed.status
+        
+        if status not in self._statuses_to_indices:
+            
+            self._statuses_to_indices[ status ] = []
+            
+        
+        self._statuses_to_indices[ status ].append( index )
+        
+        self._file_seeds_to_indices[ file_seed ] = index
+        self._file_seeds_to_indexed_statuses[ file_seed ] = status
+        
+        self._latest_added_time = max( self._latest_added_time, file_seed.created )
+        
+    
     def _HasFileSeed( self, file_seed: FileSeed ):
         
         search_file_seeds = file_seed.GetSearchFileSeeds()
@@ -1638,9 +1745,22 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
-            self._file_seeds = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_info )
+            self._file_seeds = ClientImporting.CreateSeedsFromSerialisableTuple( serialisable_info, self._seed_storage_hash_cache )
+            
+            self._ReindexFileSeeds()
             
-            self._file_seeds_to_indices = { file_seed : index for ( index, file_seed ) in enumerate( self._file_seeds ) }
+        
+    
+    def _ReindexFileSeeds( self ):
+        
+        self._file_seeds_to_indices = {}
+        self._statuses_to_indices = {}
+        self._file_seeds_to_indexed_statuses = {}
+        self._latest_added_time = 0
+        
+        for ( index, file_seed ) in enumerate( self._file_seeds ):
+            
+            self._IndexFileSeed( file_seed, index )
             
         
     
@@ -1649,6 +1769,47 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         self._status_dirty = True
         
     
+    def _UpdateFileSeedStatusIndex( self, file_seed: FileSeed ):
+        
+        if file_seed not in self._file_seeds_to_indices:
+            
+            return
+            
+        
+        index = self._file_seeds_to_indices[ file_seed ]
+        
+        # the caller may have an equal copy, so we want the status of the one we hold
+        file_seed = self._file_seeds[ index ]
+        
+        old_status = self._file_seeds_to_indexed_statuses[ file_seed ]
+        new_status = file_seed.status
+        
+        if old_status == new_status:
+            
+            return
+            
+        
+        old_indices = self._statuses_to_indices[ old_status ]
+        
+        del old_indices[ bisect.bisect_left( old_indices, index ) ]
+        
+        if len( old_indices ) == 0:
+            
+            del self._statuses_to_indices[ old_status ]
+            
+        
+        if new_status not in self._statuses_to_indices:
+            
+            self._statuses_to_indices[ new_status ] = []
+            
+        
+        bisect.insort( self._statuses_to_indices[ new_status ], index )
+        
+        self._file_seeds_to_indexed_statuses[ file_seed ] = new_status
+        
+        self._SetStatusDirty()
+        
+    
     def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
         
         if version == 1:
@@ -1888,7 +2049,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                 
                 self._file_seeds.append( file_seed )
                 
-                self._file_seeds_to_indices[ file_seed ] = len( self._file_seeds ) - 1
+                self._IndexFileSeed( file_seed, len( self._file_seeds ) - 1 )
                 
             
             self._SetStatusDirty()
@@ -1914,7 +2075,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                     self._file_seeds.insert( index - 1, file_seed )
                     
                 
-                self._file_seeds_to_indices = { file_seed : index for ( index, file_seed ) in enumerate( self._file_seeds ) }
+                self._ReindexFileSeeds()
                 
             
         
@@ -1957,6 +2118,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                 
             
             new_file_seeds = HydrusSerialisable.SerialisableList()
+            removed_file_seeds = []
             
             for file_seed in self._file_seeds[:-self.COMPACT_NUMBER]:
                 
@@ -1967,12 +2129,18 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                     
                     new_file_seeds.append( file_seed )
                     
+                else:
+                    
+                    removed_file_seeds.append( file_seed )
+                    
                 
             
             new_file_seeds.extend( self._file_seeds[-self.COMPACT_NUMBER:] )
             
             self._file_seeds = new_file_seeds
-            self._file_seeds_to_indices = { file_seed : index for ( index, file_seed ) in enumerate( self._file_seeds ) }
+            self._ReindexFileSeeds()
+            
+            self._seed_storage_hash_cache.DiscardSeeds( removed_file_seeds )
             
             self._SetStatusDirty()
             
@@ -1993,7 +2161,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                     self._file_seeds.insert( index + 1, file_seed )
                     
                 
-                self._file_seeds_to_indices = { file_seed : index for ( index, file_seed ) in enumerate( self._file_seeds ) }
+                self._ReindexFileSeeds()
                 
             
         
@@ -2094,13 +2262,9 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                 
             else:
                 
-                for file_seed in self._file_seeds:
-                    
-                    if file_seed.status == status:
-                        
-                        result += 1
-                        
-                    
+                self._CatchUpFileSeedStatusChanges()
+                
+                result = len( self._statuses_to_indices.get( status, [] ) )
                 
             
         
@@ -2156,6 +2320,15 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetNextFileSeeds( self, status: int, num_to_get: int ) -> typing.List[ FileSeed ]:
+        
+        with self._lock:
+            
+            return self._GetNextFileSeeds( status, num_to_get )
+            
+        
+        
+    
     def GetNumNewFilesSince( self, since: int ):
         
         num_files = 0
@@ -2222,6 +2395,8 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
+            self._CatchUpFileSeedStatusChanges()
+            
             if self._status_dirty:
                 
                 self._GenerateStatus()
@@ -2235,6 +2410,8 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
+            self._CatchUpFileSeedStatusChanges()
+            
             if self._status_dirty:
                 
                 self._GenerateStatus()
@@ -2281,7 +2458,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
                 index += 1
                 
             
-            self._file_seeds_to_indices = { file_seed : index for ( index, file_seed ) in enumerate( self._file_seeds ) }
+            self._ReindexFileSeeds()
             
             self._SetStatusDirty()
             
@@ -2295,6 +2472,13 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
+            for file_seed in file_seeds:
+                
+                self._UpdateFileSeedStatusIndex( file_seed )
+                
+            
+            self._seed_storage_hash_cache.DiscardSeeds( file_seeds )
+            
             self._SetStatusDirty()
             
         
@@ -2309,7 +2493,7 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
             
             self._file_seeds = HydrusSerialisable.SerialisableList( [ file_seed for file_seed in self._file_seeds if file_seed not in file_seeds_to_delete ] )
             
-            self._file_seeds_to_indices = { file_seed : index for ( index, file_seed ) in enumerate( self._file_seeds ) }
+            self._ReindexFileSeeds()
             
             self._SetStatusDirty()
             
@@ -2379,6 +2563,8 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
+            self._CatchUpFileSeedStatusChanges()
+            
             if self._status_dirty:
                 
                 self._GenerateStatus()
@@ -1,3 +1,4 @@
+import threading
 import typing
 
 from hydrus.core import HydrusConstants as HC
@@ -100,7 +101,7 @@ def CheckFileImportStatus( file_import_status: FileImportStatus ):
     
 class FileImportJob( object ):
     
-    def __init__( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions ):
+    def __init__( self, temp_path: str, file_import_options: FileImportOptions.FileImportOptions, file_hashes = None ):
         
         if HG.file_import_report_mode:
             
@@ -109,6 +110,7 @@ class FileImportJob( object ):
         
         self._temp_path = temp_path
         self._file_import_options = file_import_options
+        self._file_hashes = file_hashes
         
         self._pre_import_file_status = FileImportStatus.STATICGetUnknownStatus()
         self._post_import_file_status = FileImportStatus.STATICGetUnknownStatus()
@@ -132,7 +134,7 @@ class FileImportJob( object ):
         self._file_import_options.CheckFileIsValid( size, mime, width, height )
         
     
-    def DoWork( self, status_hook = None ) -> FileImportStatus:
+    def DoWork( self, status_hook = None, file_import_db_batcher = None ) -> FileImportStatus:
         
         if HG.file_import_report_mode:
             
@@ -188,7 +190,14 @@ class FileImportJob( object ):
                     status_hook( 'updating database' )
                     
                 
-                self._post_import_file_status = HG.client_controller.WriteSynchronous( 'import_file', self )
+                if file_import_db_batcher is None:
+                    
+                    self._post_import_file_status = HG.client_controller.WriteSynchronous( 'import_file', self )
+                    
+                else:
+                    
+                    self._post_import_file_status = file_import_db_batcher.ImportFile( self )
+                    
                 
             else:
                 
@@ -212,9 +221,20 @@ class FileImportJob( object ):
     
     def GeneratePreImportHashAndStatus( self ):
         
-        HydrusImageHandling.ConvertToPNGIfBMP( self._temp_path )
+        converted_bmp = HydrusImageHandling.ConvertToPNGIfBMP( self._temp_path )
         
-        hash = HydrusFileHandling.GetHashFromPath( self._temp_path )
+        if self._file_hashes is None or converted_bmp:
+            
+            # we get the extra hashes now too, while we are reading the file anyway
+            ( hash, md5, sha1, sha512 ) = HydrusFileHandling.GetAllHashesFromPath( self._temp_path )
+            
+        else:
+            
+            # the downloader hashed the file as it came in
+            ( hash, md5, sha1, sha512 ) = self._file_hashes
+            
+        
+        self._extra_hashes = ( md5, sha1, sha512 )
         
         if HG.file_import_report_mode:
             
@@ -272,7 +292,20 @@ class FileImportJob( object ):
                 
             
         
-        self._file_info = HydrusFileHandling.GetFileInfo( self._temp_path, mime )
+        numpy_image = None
+        
+        if mime in HC.MIMES_WE_CAN_PHASH:
+            
+            if HG.file_import_report_mode:
+                
+                HydrusData.ShowText( 'File import job loading image' )
+                
+            
+            # decode the image once and share it for the resolution, thumbnail, and phashes
+            numpy_image = ClientImageHandling.GenerateNumPyImage( self._temp_path, mime )
+            
+        
+        self._file_info = HydrusFileHandling.GetFileInfo( self._temp_path, mime, numpy_image = numpy_image )
         
         ( size, mime, width, height, duration, num_frames, has_audio, num_words ) = self._file_info
         
@@ -296,7 +329,7 @@ class FileImportJob( object ):
             
             try:
                 
-                self._thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( self._temp_path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in )
+                self._thumbnail_bytes = HydrusFileHandling.GenerateThumbnailBytes( self._temp_path, target_resolution, mime, duration, num_frames, percentage_in = percentage_in, numpy_image = numpy_image )
                 
             except Exception as e:
                 
@@ -311,7 +344,7 @@ class FileImportJob( object ):
                 HydrusData.ShowText( 'File import job generating phashes' )
                 
             
-            self._phashes = ClientImageHandling.GenerateShapePerceptualHashes( self._temp_path, mime )
+            self._phashes = ClientImageHandling.GenerateShapePerceptualHashesNumPy( numpy_image )
             
             if HG.file_import_report_mode:
                 
@@ -319,13 +352,18 @@ class FileImportJob( object ):
                 
             
         
-        if HG.file_import_report_mode:
+        del numpy_image
+        
+        if self._extra_hashes is None:
+            
+            if HG.file_import_report_mode:
+                
+                HydrusData.ShowText( 'File import job generating other hashes' )
+                
             
-            HydrusData.ShowText( 'File import job generating other hashes' )
+            self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
             
         
-        self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
-        
         self._file_modified_timestamp = HydrusFileHandling.GetFileModifiedTimestamp( self._temp_path )
         
     
@@ -375,4 +413,122 @@ class FileImportJob( object ):
             HG.client_controller.Write( 'content_updates', service_keys_to_content_updates )
             
         
-    
\ No newline at end of file
+    
+class FileImportJobDBBatcher( object ):
+    
+    # several import workers share one of these so their db writes go in as fewer, bigger jobs
+    # whichever worker arrives when no write is going becomes the writer and keeps writing batches until the queue is empty. everyone else waits for their result
+    
+    def __init__( self, max_batch_size = 64 ):
+        
+        self._max_batch_size = max_batch_size
+        
+        self._lock = threading.Lock()
+        
+        self._pending_jobs = []
+        self._jobs_to_results = {}
+        self._jobs_to_events = {}
+        self._writing = False
+        
+    
+    def _WriteBatch( self, file_import_jobs ):
+        
+        try:
+            
+            file_import_statuses = HG.client_controller.WriteSynchronous( 'import_files', file_import_jobs )
+            
+            results = [ ( file_import_status, None ) for file_import_status in file_import_statuses ]
+            
+        except Exception as e:
+            
+            if len( file_import_jobs ) == 1:
+                
+                results = [ ( None, e ) ]
+                
+            else:
+                
+                # one bad file rolls back the whole batch, so do them again one at a time to find it
+                
+                results = []
+                
+                for file_import_job in file_import_jobs:
+                    
+                    try:
+                        
+                        results.append( ( HG.client_controller.WriteSynchronous( 'import_file', file_import_job ), None ) )
+                        
+                    except Exception as e:
+                        
+                        results.append( ( None, e ) )
+                        
+                    
+                
+            
+        
+        with self._lock:
+            
+            for ( file_import_job, result ) in zip( file_import_jobs, results ):
+                
+                self._jobs_to_results[ file_import_job ] = result
+                
+                self._jobs_to_events[ file_import_job ].set()
+                
+            
+        
+    
+    def ImportFile( self, file_import_job: FileImportJob ) -> FileImportStatus:
+        
+        event = threading.Event()
+        
+        with self._lock:
+            
+            self._pending_jobs.append( file_import_job )
+            self._jobs_to_events[ file_import_job ] = event
+            
+            i_am_the_writer = not self._writing
+            
+            if i_am_the_writer:
+                
+                self._writing = True
+                
+            
+        
+        if i_am_the_writer:
+            
+            while True:
+                
+                with self._lock:
+                    
+                    file_import_jobs = self._pending_jobs[ : self._max_batch_size ]
+                    
+                    self._pending_jobs = self._pending_jobs[ self._max_batch_size : ]
+                    
+                    if len( file_import_jobs ) == 0:
+                        
+                        self._writing = False
+                        
+                        break
+                        
+                    
+                
+                self._WriteBatch( file_import_jobs )
+                
+            
+        
+        event.wait()
+        
+        with self._lock:
+            
+            ( file_import_status, e ) = self._jobs_to_results.pop( file_import_job )
+            
+            del self._jobs_to_events[ file_import_job ]
+            
+        
+        if e is not None:
+            
+            raise e
+            
+        
+        return file_import_status
+        
+    
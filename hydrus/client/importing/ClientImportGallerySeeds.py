@@ -668,6 +668,8 @@ class GallerySeedLog( HydrusSerialisable.SerialisableBase ):
         
         self._gallery_seeds_to_indices = {}
         
+        self._seed_storage_hash_cache = ClientImporting.SeedStorageHashCache()
+        
         self._gallery_seed_log_key = HydrusData.GenerateKey()
         
         self._status_cache = None
@@ -730,14 +732,14 @@ class GallerySeedLog( HydrusSerialisable.SerialisableBase ):
     
     def _GetSerialisableInfo( self ):
         
-        return self._gallery_seeds.GetSerialisableTuple()
+        return ClientImporting.GetSeedsSerialisableTuple( self._gallery_seeds, self._seed_storage_hash_cache )
         
     
     def _InitialiseFromSerialisableInfo( self, serialisable_info ):
         
         with self._lock:
             
-            self._gallery_seeds = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_info )
+            self._gallery_seeds = ClientImporting.CreateSeedsFromSerialisableTuple( serialisable_info, self._seed_storage_hash_cache )
             
             self._gallery_seeds_to_indices = { gallery_seed : index for ( index, gallery_seed ) in enumerate( self._gallery_seeds ) }
             
@@ -865,6 +867,7 @@ class GallerySeedLog( HydrusSerialisable.SerialisableBase ):
                 
             
             new_gallery_seeds = HydrusSerialisable.SerialisableList()
+            removed_gallery_seeds = []
             
             for gallery_seed in self._gallery_seeds[:-self.COMPACT_NUMBER]:
                 
@@ -875,6 +878,10 @@ class GallerySeedLog( HydrusSerialisable.SerialisableBase ):
                     
                     new_gallery_seeds.append( gallery_seed )
                     
+                else:
+                    
+                    removed_gallery_seeds.append( gallery_seed )
+                    
                 
             
             new_gallery_seeds.extend( self._gallery_seeds[-self.COMPACT_NUMBER:] )
@@ -882,6 +889,8 @@ class GallerySeedLog( HydrusSerialisable.SerialisableBase ):
             self._gallery_seeds = new_gallery_seeds
             self._gallery_seeds_to_indices = { gallery_seed : index for ( index, gallery_seed ) in enumerate( self._gallery_seeds ) }
             
+            self._seed_storage_hash_cache.DiscardSeeds( removed_gallery_seeds )
+            
             self._SetStatusDirty()
             
         
@@ -1052,6 +1061,8 @@ class GallerySeedLog( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
+            self._seed_storage_hash_cache.DiscardSeeds( gallery_seeds )
+            
             self._SetStatusDirty()
             
         
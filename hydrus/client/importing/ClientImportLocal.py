@@ -1,3 +1,4 @@
+import concurrent.futures
 import os
 import threading
 import time
@@ -17,10 +18,58 @@ from hydrus.client import ClientFiles
 from hydrus.client import ClientPaths
 from hydrus.client import ClientThreading
 from hydrus.client.importing import ClientImporting
+from hydrus.client.importing import ClientImportFiles
 from hydrus.client.importing import ClientImportFileSeeds
 from hydrus.client.importing.options import TagImportOptions
 from hydrus.client.metadata import ClientTags
 
+def GetNumFileImportWorkers():
+    
+    return max( 1, HG.client_controller.new_options.GetInteger( 'file_import_num_worker_threads' ) )
+    
+def ImportPathFileSeeds( file_seeds, file_seed_cache, file_import_options, limited_mimes = None, status_hook = None ):
+    
+    if len( file_seeds ) == 1:
+        
+        file_seeds[0].ImportPath( file_seed_cache, file_import_options, limited_mimes = limited_mimes, status_hook = status_hook )
+        
+        return
+        
+    
+    # hashing, decoding, thumbnailing and phashing mostly let go of the GIL, so plain threads get us more cores here
+    # the workers' db writes are merged into bigger jobs by the batcher
+    
+    file_import_db_batcher = ClientImportFiles.FileImportJobDBBatcher()
+    
+    if status_hook is None:
+        
+        worker_status_hook = None
+        
+    else:
+        
+        # the workers share the caller's hook, so they take turns with it
+        
+        status_hook_lock = threading.Lock()
+        
+        def worker_status_hook( text ):
+            
+            with status_hook_lock:
+                
+                status_hook( text )
+                
+            
+        
+    
+    with concurrent.futures.ThreadPoolExecutor( max_workers = len( file_seeds ) ) as executor:
+        
+        futures = [ executor.submit( file_seed.ImportPath, file_seed_cache, file_import_options, limited_mimes = limited_mimes, status_hook = worker_status_hook, file_import_db_batcher = file_import_db_batcher ) for file_seed in file_seeds ]
+        
+        for future in futures:
+            
+            future.result()
+            
+        
+    
 class HDDImport( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_HDD_IMPORT
@@ -126,20 +175,25 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
     
     def _WorkOnFiles( self, page_key ):
         
-        file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
+        file_seeds = self._file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, GetNumFileImportWorkers() )
         
-        if file_seed is None:
+        if len( file_seeds ) == 0:
             
             return
             
         
         did_substantial_work = False
         
-        path = file_seed.file_seed_data
-        
         with self._lock:
             
-            self._current_action = 'importing'
+            if len( file_seeds ) == 1:
+                
+                self._current_action = 'importing'
+                
+            else:
+                
+                self._current_action = 'importing {} files'.format( HydrusData.ToHumanInt( len( file_seeds ) ) )
+                
             
         
         def status_hook( text ):
@@ -155,45 +209,50 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
                 
             
         
-        file_seed.ImportPath( self._file_seed_cache, self._file_import_options, status_hook = status_hook )
+        ImportPathFileSeeds( file_seeds, self._file_seed_cache, self._file_import_options, status_hook = status_hook )
         
         did_substantial_work = True
         
-        if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+        for file_seed in file_seeds:
             
-            if file_seed.ShouldPresent( self._file_import_options ):
-                
-                file_seed.PresentToPage( page_key )
-                
-                did_substantial_work = True
-                
+            path = file_seed.file_seed_data
             
-            if self._delete_after_success:
+            if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
                 
-                try:
-                    
-                    ClientPaths.DeletePath( path )
+                if file_seed.ShouldPresent( self._file_import_options ):
                     
-                except Exception as e:
+                    file_seed.PresentToPage( page_key )
                     
-                    HydrusData.ShowText( 'While attempting to delete ' + path + ', the following error occurred:' )
-                    HydrusData.ShowException( e )
+                    did_substantial_work = True
                     
                 
-                txt_path = path + '.txt'
-                
-                if os.path.exists( txt_path ):
+                if self._delete_after_success:
                     
                     try:
                         
-                        ClientPaths.DeletePath( txt_path )
+                        ClientPaths.DeletePath( path )
                         
                     except Exception as e:
                         
-                        HydrusData.ShowText( 'While attempting to delete ' + txt_path + ', the following error occurred:' )
+                        HydrusData.ShowText( 'While attempting to delete ' + path + ', the following error occurred:' )
                         HydrusData.ShowException( e )
                         
                     
+                    txt_path = path + '.txt'
+                    
+                    if os.path.exists( txt_path ):
+                        
+                        try:
+                            
+                            ClientPaths.DeletePath( txt_path )
+                            
+                        except Exception as e:
+                            
+                            HydrusData.ShowText( 'While attempting to delete ' + txt_path + ', the following error occurred:' )
+                            HydrusData.ShowException( e )
+                            
+                        
+                    
                 
             
         
@@ -592,13 +651,13 @@ class ImportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         
         while True:
             
-            file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
+            file_seeds = self._file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, GetNumFileImportWorkers() )
             
             p1 = HC.options[ 'pause_import_folders_sync' ] or self._paused
             p2 = HydrusThreading.IsThreadShuttingDown()
             p3 = job_key.IsCancelled()
             
-            if file_seed is None or p1 or p2 or p3:
+            if len( file_seeds ) == 0 or p1 or p2 or p3:
                 
                 break
                 
@@ -612,92 +671,99 @@ class ImportFolder( HydrusSerialisable.SerialisableBaseNamed ):
                 time_to_save = HydrusData.GetNow() + 600
                 
             
-            gauge_num_done = num_total_done + num_files_imported + 1
+            gauge_num_done = num_total_done + num_files_imported + len( file_seeds )
             
             job_key.SetVariable( 'popup_text_1', 'importing file ' + HydrusData.ConvertValueRangeToPrettyString( gauge_num_done, num_total ) )
             job_key.SetVariable( 'popup_gauge_1', ( gauge_num_done, num_total ) )
             
-            path = file_seed.file_seed_data
-            
-            file_seed.ImportPath( self._file_seed_cache, self._file_import_options, limited_mimes = self._mimes )
+            ImportPathFileSeeds( file_seeds, self._file_seed_cache, self._file_import_options, limited_mimes = self._mimes )
             
-            if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+            for file_seed in file_seeds:
                 
-                if file_seed.HasHash():
-                    
-                    hash = file_seed.GetHash()
+                path = file_seed.file_seed_data
+                
+                if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
                     
-                    if self._tag_import_options.HasAdditionalTags():
-                        
-                        media_result = HG.client_controller.Read( 'media_result', hash )
+                    if file_seed.HasHash():
                         
-                        downloaded_tags = []
+                        hash = file_seed.GetHash()
                         
-                        service_keys_to_content_updates = self._tag_import_options.GetServiceKeysToContentUpdates( file_seed.status, media_result, downloaded_tags ) # additional tags
-                        
-                        if len( service_keys_to_content_updates ) > 0:
+                        if self._tag_import_options.HasAdditionalTags():
                             
-                            HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                            media_result = HG.client_controller.Read( 'media_result', hash )
                             
-                        
-                    
-                    service_keys_to_tags = ClientTags.ServiceKeysToTags()
-                    
-                    for ( tag_service_key, filename_tagging_options ) in list(self._tag_service_keys_to_filename_tagging_options.items()):
-                        
-                        if not HG.client_controller.services_manager.ServiceExists( tag_service_key ):
+                            downloaded_tags = []
                             
-                            continue
+                            service_keys_to_content_updates = self._tag_import_options.GetServiceKeysToContentUpdates( file_seed.status, media_result, downloaded_tags ) # additional tags
+                            
+                            if len( service_keys_to_content_updates ) > 0:
+                                
+                                HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                                
                             
                         
-                        try:
+                        service_keys_to_tags = ClientTags.ServiceKeysToTags()
+                        
+                        for ( tag_service_key, filename_tagging_options ) in list(self._tag_service_keys_to_filename_tagging_options.items()):
                             
-                            tags = filename_tagging_options.GetTags( tag_service_key, path )
+                            if not HG.client_controller.services_manager.ServiceExists( tag_service_key ):
+                                
+                                continue
+                                
                             
-                            if len( tags ) > 0:
+                            try:
+                                
+                                tags = filename_tagging_options.GetTags( tag_service_key, path )
+                                
+                                if len( tags ) > 0:
+                                    
+                                    service_keys_to_tags[ tag_service_key ] = tags
+                                    
                                 
-                                service_keys_to_tags[ tag_service_key ] = tags
+                            except Exception as e:
+                                
+                                HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
+                                
+                                HydrusData.ShowException( e )
                                 
                             
-                        except Exception as e:
+                        
+                        if len( service_keys_to_tags ) > 0:
                             
-                            HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
+                            service_keys_to_content_updates = ClientData.ConvertServiceKeysToTagsToServiceKeysToContentUpdates( { hash }, service_keys_to_tags )
                             
-                            HydrusData.ShowException( e )
+                            HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
                             
                         
                     
-                    if len( service_keys_to_tags ) > 0:
-                        
-                        service_keys_to_content_updates = ClientData.ConvertServiceKeysToTagsToServiceKeysToContentUpdates( { hash }, service_keys_to_tags )
+                    num_files_imported += 1
+                    
+                    if hash not in presentation_hashes_fast:
                         
-                        HG.client_controller.WriteSynchronous( 'content_updates', service_keys_to_content_updates )
+                        if file_seed.ShouldPresent( self._file_import_options ):
+                            
+                            presentation_hashes.append( hash )
+                            
+                            presentation_hashes_fast.add( hash )
+                            
                         
                     
-                
-                num_files_imported += 1
-                
-                if hash not in presentation_hashes_fast:
+                elif file_seed.status == CC.STATUS_ERROR:
                     
-                    if file_seed.ShouldPresent( self._file_import_options ):
-                        
-                        presentation_hashes.append( hash )
-                        
-                        presentation_hashes_fast.add( hash )
-                        
+                    HydrusData.Print( 'A file failed to import from import folder ' + self._name + ':' + path )
                     
                 
-            elif file_seed.status == CC.STATUS_ERROR:
-                
-                HydrusData.Print( 'A file failed to import from import folder ' + self._name + ':' + path )
-                
             
-            i += 1
+            # we action after the whole batch is done, so we do not move a file or its .txt before its filename tags are read
             
-            if i % 10 == 0:
+            i += len( file_seeds )
+            
+            if i >= 10:
                 
                 self._ActionPaths()
                 
+                i = 0
+                
             
         
         if num_files_imported > 0:
@@ -849,6 +849,8 @@ class URLsImport( HydrusSerialisable.SerialisableBase ):
             
             file_seed.SetStatus( status, exception = e )
             
+            self._file_seed_cache.NotifyFileSeedsUpdated( ( file_seed, ) )
+            
             time.sleep( 3 )
             
         
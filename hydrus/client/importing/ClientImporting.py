@@ -1,8 +1,13 @@
+import hashlib
 import random
+import threading
+import typing
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusSerialisable
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientParsing
@@ -32,6 +37,10 @@ DID_SUBSTANTIAL_FILE_WORK_MINIMUM_SLEEP_TIME = 0.1
 
 REPEATING_JOB_TYPICAL_PERIOD = 30.0
 
+# the db sets a SeedStorageContext on its thread while it saves or loads objects that store their seeds by hash
+# DuplicateWithSeedStorageHashes sets one too, so the copy it makes knows its seed hashes before it gets to the db
+seed_storage_thread_data = threading.local()
+
 def ConvertAllParseResultsToFileSeeds( all_parse_results, source_url, file_import_options ):
     
     file_seeds = []
@@ -64,6 +73,48 @@ def ConvertAllParseResultsToFileSeeds( all_parse_results, source_url, file_impor
     
     return file_seeds
     
+def CreateSeedsFromSerialisableTuple( serialisable_info, seed_storage_hash_cache: "SeedStorageHashCache" ) -> HydrusSerialisable.SerialisableList:
+    
+    obj = HydrusSerialisable.CreateFromSerialisableTuple( serialisable_info )
+    
+    if not isinstance( obj, SeedStorageReferences ):
+        
+        return obj
+        
+    
+    seed_storage_context = GetSeedStorageContext()
+    
+    if seed_storage_context is None:
+        
+        raise HydrusExceptions.DataMissing( 'A seed cache was stored with seed references, but it was not loaded through the database, so they could not be fetched!' )
+        
+    
+    storage_hashes_and_seeds = seed_storage_context.FetchSeeds( obj.GetStorageHashes() )
+    
+    for ( storage_hash, seed ) in storage_hashes_and_seeds:
+        
+        seed_storage_hash_cache.SetStorageHash( seed, storage_hash )
+        
+    
+    return HydrusSerialisable.SerialisableList( [ seed for ( storage_hash, seed ) in storage_hashes_and_seeds ] )
+    
+def DuplicateWithSeedStorageHashes( obj: HydrusSerialisable.SerialisableBase ):
+    
+    # a normal Duplicate dumps every seed to copy it, and then the db would have to dump them all again to hash them
+    # here each seed is hashed from the same dump it is copied from, so the copy's seed caches start out knowing every hash
+    
+    with SeedStorageContext( duplicate_seeds = True ) as seed_storage_context:
+        
+        dump = obj.DumpToString()
+        
+    
+    storage_hashes_to_seeds = seed_storage_context.GetStorageHashesToSeeds()
+    
+    with SeedStorageContext( fetch_seeds_callable = lambda storage_hashes: storage_hashes_to_seeds ):
+        
+        return HydrusSerialisable.CreateFromString( dump )
+        
+    
 def GenerateMultiplePopupNetworkJobPresentationContextFactory( job_key ):
     
     def network_job_presentation_context_factory( network_job ):
@@ -106,6 +157,101 @@ def GetRepeatingJobInitialDelay():
     
     return 0.5 + ( random.random() * 0.5 )
     
+def GetSeedStorageContext() -> typing.Optional[ "SeedStorageContext" ]:
+    
+    contexts = getattr( seed_storage_thread_data, 'contexts', None )
+    
+    if contexts is None or len( contexts ) == 0:
+        
+        return None
+        
+    
+    return contexts[-1]
+    
+def GetSeedStorageHashesFromSerialisableInfo( serialisable_info ) -> typing.Set[ bytes ]:
+    
+    # hashed storage maintenance reads seed references straight out of the raw json, so it never has to build a whole page or query log, and a load error cannot lose references
+    # a SeedStorageReferences is stored as [ type, version, [ hex hashes ] ], and everything above it is nested lists and dicts
+    
+    storage_hashes = set()
+    
+    items_to_walk = [ serialisable_info ]
+    
+    while len( items_to_walk ) > 0:
+        
+        item = items_to_walk.pop()
+        
+        if isinstance( item, dict ):
+            
+            items_to_walk.extend( item.values() )
+            
+        elif isinstance( item, list ):
+            
+            if len( item ) == 3 and item[0] == HydrusSerialisable.SERIALISABLE_TYPE_SEED_STORAGE_REFERENCES and isinstance( item[1], int ) and isinstance( item[2], list ):
+                
+                storage_hash_hexes = item[2]
+                
+                if False not in ( isinstance( storage_hash_hex, str ) and len( storage_hash_hex ) == 64 for storage_hash_hex in storage_hash_hexes ):
+                    
+                    try:
+                        
+                        storage_hashes.update( ( bytes.fromhex( storage_hash_hex ) for storage_hash_hex in storage_hash_hexes ) )
+                        
+                        continue
+                        
+                    except ValueError:
+                        
+                        pass
+                        
+                    
+                
+            
+            items_to_walk.extend( item )
+            
+        
+    
+    return storage_hashes
+    
+def GetSeedsSerialisableTuple( seeds: HydrusSerialisable.SerialisableList, seed_storage_hash_cache: "SeedStorageHashCache" ):
+    
+    seed_storage_context = GetSeedStorageContext()
+    
+    if seed_storage_context is None:
+        
+        return seeds.GetSerialisableTuple()
+        
+    
+    # the db is saving us, so we hand it our seeds by hash and it only writes the ones it does not have yet
+    # the hash cache means we only re-serialise the seeds that changed since the last save or load
+    
+    storage_hashes = []
+    
+    duplicate_seeds = seed_storage_context.DuplicatesSeeds()
+    
+    for seed in seeds:
+        
+        if duplicate_seeds:
+            
+            # we have to dump the seed to copy it anyway, and a hash of that same dump can never disagree with the copy
+            
+            seed_dump = seed.DumpToString()
+            
+            storage_hash = hashlib.sha256( bytes( seed_dump, 'utf-8' ) ).digest()
+            
+            seed = HydrusSerialisable.CreateFromString( seed_dump )
+            
+        else:
+            
+            storage_hash = seed_storage_hash_cache.GetStorageHash( seed )
+            
+        
+        seed_storage_context.StoreSeed( storage_hash, seed )
+        
+        storage_hashes.append( storage_hash )
+        
+    
+    return SeedStorageReferences( storage_hashes ).GetSerialisableTuple()
+    
 def PageImporterShouldStopWorking( page_key ):
     
     return HG.view_shutdown or not HG.client_controller.PageAlive( page_key )
@@ -393,3 +539,139 @@ class NetworkJobPresentationContext( object ):
         self._exit_call()
         
     
+class SeedStorageContext( object ):
+    
+    def __init__( self, fetch_seeds_callable = None, duplicate_seeds = False ):
+        
+        # with no fetch callable, this is only good for saving
+        
+        self._fetch_seeds_callable = fetch_seeds_callable
+        self._duplicate_seeds = duplicate_seeds
+        
+        self._storage_hashes_to_seeds = {}
+        
+    
+    def __enter__( self ):
+        
+        if not hasattr( seed_storage_thread_data, 'contexts' ):
+            
+            seed_storage_thread_data.contexts = []
+            
+        
+        seed_storage_thread_data.contexts.append( self )
+        
+        return self
+        
+    
+    def __exit__( self, exc_type, exc_val, exc_tb ):
+        
+        seed_storage_thread_data.contexts.pop()
+        
+    
+    def DuplicatesSeeds( self ):
+        
+        return self._duplicate_seeds
+        
+    
+    def FetchSeeds( self, storage_hashes ):
+        
+        if self._fetch_seeds_callable is None:
+            
+            raise HydrusExceptions.DataMissing( 'A seed cache was stored with seed references, but the current seed storage context cannot fetch them!' )
+            
+        
+        storage_hashes_to_seeds = self._fetch_seeds_callable( storage_hashes )
+        
+        # anything missing has already been reported by the fetch
+        return [ ( storage_hash, storage_hashes_to_seeds[ storage_hash ] ) for storage_hash in storage_hashes if storage_hash in storage_hashes_to_seeds ]
+        
+    
+    def GetStorageHashesToSeeds( self ):
+        
+        return self._storage_hashes_to_seeds
+        
+    
+    def StoreSeed( self, storage_hash, seed ):
+        
+        self._storage_hashes_to_seeds[ storage_hash ] = seed
+        
+    
+class SeedStorageHashCache( object ):
+    
+    def __init__( self ):
+        
+        # seed -> ( seed, modified, status, storage_hash )
+        # we hold the seed itself so an equal copy does not match, and the modified/status check catches any change we were not told about
+        
+        self._seeds_to_storage_data = {}
+        
+    
+    def DiscardSeeds( self, seeds ):
+        
+        for seed in seeds:
+            
+            if seed in self._seeds_to_storage_data:
+                
+                del self._seeds_to_storage_data[ seed ]
+                
+            
+        
+    
+    def GetStorageHash( self, seed ):
+        
+        if seed in self._seeds_to_storage_data:
+            
+            ( cached_seed, modified, status, storage_hash ) = self._seeds_to_storage_data[ seed ]
+            
+            if cached_seed is seed and modified == seed.modified and status == seed.status:
+                
+                return storage_hash
+                
+            
+        
+        storage_hash = seed.GetSerialisedHash()
+        
+        self.SetStorageHash( seed, storage_hash )
+        
+        return storage_hash
+        
+    
+    def SetStorageHash( self, seed, storage_hash ):
+        
+        self._seeds_to_storage_data[ seed ] = ( seed, seed.modified, seed.status, storage_hash )
+        
+    
+class SeedStorageReferences( HydrusSerialisable.SerialisableBase ):
+    
+    SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_SEED_STORAGE_REFERENCES
+    SERIALISABLE_NAME = 'Seed Storage References'
+    SERIALISABLE_VERSION = 1
+    
+    def __init__( self, storage_hashes = None ):
+        
+        HydrusSerialisable.SerialisableBase.__init__( self )
+        
+        if storage_hashes is None:
+            
+            storage_hashes = []
+            
+        
+        self._storage_hashes = list( storage_hashes )
+        
+    
+    def _GetSerialisableInfo( self ):
+        
+        return [ storage_hash.hex() for storage_hash in self._storage_hashes ]
+        
+    
+    def _InitialiseFromSerialisableInfo( self, serialisable_info ):
+        
+        self._storage_hashes = [ bytes.fromhex( storage_hash_hex ) for storage_hash_hex in serialisable_info ]
+        
+    
+    def GetStorageHashes( self ):
+        
+        return self._storage_hashes
+        
+    
+HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_SEED_STORAGE_REFERENCES ] = SeedStorageReferences
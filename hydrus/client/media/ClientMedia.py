@@ -810,6 +810,12 @@ class MediaList( object ):
         self._singleton_media = set( self._sorted_media )
         self._collected_media = set()
         
+        self._tag_counts_context = None
+        self._selected_tag_counts = None
+        self._unselected_tag_counts = None
+        self._last_presented_tag_counts = None
+        self._tag_counts_changed_tags = set()
+        
         self._RecalcHashes()
         
     
@@ -1015,6 +1021,8 @@ class MediaList( object ):
         
         affected_collected_media = [ media for media in self._collected_media if media.HasNoMedia() ]
         
+        self._RemoveTagCountHashes( hashes )
+        
         self._RemoveMediaDirectly( affected_singleton_media, affected_collected_media )
         
     
@@ -1033,11 +1041,56 @@ class MediaList( object ):
         self._singleton_media.difference_update( singleton_media )
         self._collected_media.difference_update( collected_media )
         
+        if self._tag_counts_context is not None:
+            
+            self._RemoveTagCountHashes( { media.GetHash() for media in FlattenMedia( singleton_media.union( collected_media ) ) } )
+            
+        
         self._sorted_media.remove_items( singleton_media.union( collected_media ) )
         
         self._RecalcAfterMediaRemove()
         
     
+    def _RemoveTagCountHashes( self, hashes ):
+        
+        if self._tag_counts_context is None:
+            
+            return
+            
+        
+        if not isinstance( hashes, set ):
+            
+            hashes = set( hashes )
+            
+        
+        self._tag_counts_changed_tags.update( self._selected_tag_counts.RemoveHashes( hashes ) )
+        self._tag_counts_changed_tags.update( self._unselected_tag_counts.RemoveHashes( hashes ) )
+        
+    
+    def _UpdateTagCountsForSelectionChange( self, media_to_deselect, media_to_select ):
+        
+        # call this before the selection is changed
+        
+        if self._tag_counts_context is None:
+            
+            return
+            
+        
+        if len( media_to_deselect ) > 0:
+            
+            hashes = { media.GetHash() for media in FlattenMedia( media_to_deselect ) }
+            
+            self._tag_counts_changed_tags.update( self._selected_tag_counts.MoveHashes( hashes, self._unselected_tag_counts ) )
+            
+        
+        if len( media_to_select ) > 0:
+            
+            hashes = { media.GetHash() for media in FlattenMedia( media_to_select ) }
+            
+            self._tag_counts_changed_tags.update( self._unselected_tag_counts.MoveHashes( hashes, self._selected_tag_counts ) )
+            
+        
+    
     def AddMedia( self, new_media ):
         
         new_media = FlattenMedia( new_media )
@@ -1064,6 +1117,11 @@ class MediaList( object ):
         self._singleton_media.update( addable_media )
         self._sorted_media.append_items( addable_media )
         
+        if self._tag_counts_context is not None:
+            
+            self._tag_counts_changed_tags.update( self._unselected_tag_counts.AddMediaResults( [ media.GetMediaResult() for media in addable_media ] ) )
+            
+        
         return new_media
         
     
@@ -1559,6 +1617,57 @@ class MediaList( object ):
         return self._sorted_media
         
     
+    def GetTagPresentationCounts( self, tag_service_key, tag_display_type ):
+        
+        # the tag counts for the selected files, or for all the files if nothing is selected
+        # these are maintained as the selection and the files' tags change, so we only have to count everything when the tag context changes
+        # changed_tags is what has changed since the last call, or None if the caller should redraw everything
+        
+        tag_counts_context = ( tag_service_key, tag_display_type )
+        
+        if tag_counts_context != self._tag_counts_context:
+            
+            selected_flat_media = FlattenMedia( self._selected_media )
+            
+            selected_hashes = { media.GetHash() for media in selected_flat_media }
+            
+            unselected_flat_media = [ media for media in FlattenMedia( self._sorted_media ) if media.GetHash() not in selected_hashes ]
+            
+            self._selected_tag_counts = TagCountAggregator( tag_service_key, tag_display_type )
+            self._unselected_tag_counts = TagCountAggregator( tag_service_key, tag_display_type )
+            
+            self._selected_tag_counts.AddMediaResults( [ media.GetMediaResult() for media in selected_flat_media ] )
+            self._unselected_tag_counts.AddMediaResults( [ media.GetMediaResult() for media in unselected_flat_media ] )
+            
+            self._tag_counts_context = tag_counts_context
+            self._last_presented_tag_counts = None
+            
+        
+        if self._selected_tag_counts.GetNumFiles() > 0:
+            
+            tag_counts = self._selected_tag_counts
+            
+        else:
+            
+            tag_counts = self._unselected_tag_counts
+            
+        
+        if tag_counts is self._last_presented_tag_counts:
+            
+            changed_tags = self._tag_counts_changed_tags
+            
+        else:
+            
+            changed_tags = None
+            
+            self._last_presented_tag_counts = tag_counts
+            
+        
+        self._tag_counts_changed_tags = set()
+        
+        return ( tag_counts.GetCounts(), changed_tags )
+        
+    
     def HasAnyOfTheseHashes( self, hashes: set ):
         
         return not hashes.isdisjoint( self._hashes )
@@ -1612,6 +1721,8 @@ class MediaList( object ):
             m.ProcessContentUpdates( service_keys_to_content_updates )
             
         
+        tag_count_hashes = set()
+        
         for ( service_key, content_updates ) in service_keys_to_content_updates.items():
             
             for content_update in content_updates:
@@ -1620,7 +1731,11 @@ class MediaList( object ):
                 
                 hashes = content_update.GetHashes()
                 
-                if data_type == HC.CONTENT_TYPE_FILES:
+                if data_type == HC.CONTENT_TYPE_MAPPINGS:
+                    
+                    tag_count_hashes.update( hashes )
+                    
+                elif data_type == HC.CONTENT_TYPE_FILES:
                     
                     if action == HC.CONTENT_UPDATE_DELETE:
                         
@@ -1649,11 +1764,21 @@ class MediaList( object ):
                 
             
         
+        if self._tag_counts_context is not None and len( tag_count_hashes ) > 0:
+            
+            # the media result cache has already updated the tags managers, so we just recount these files
+            
+            self._tag_counts_changed_tags.update( self._selected_tag_counts.RefreshHashes( tag_count_hashes ) )
+            self._tag_counts_changed_tags.update( self._unselected_tag_counts.RefreshHashes( tag_count_hashes ) )
+            
+        
         self._RecalcAfterContentUpdates( service_keys_to_content_updates )
         
     
     def ProcessServiceUpdates( self, service_keys_to_service_updates ):
         
+        self.ResetTagCounts()
+        
         for ( service_key, service_updates ) in list(service_keys_to_service_updates.items()):
             
             for service_update in service_updates:
@@ -1684,6 +1809,15 @@ class MediaList( object ):
             
         
     
+    def ResetTagCounts( self ):
+        
+        self._tag_counts_context = None
+        self._selected_tag_counts = None
+        self._unselected_tag_counts = None
+        self._last_presented_tag_counts = None
+        self._tag_counts_changed_tags = set()
+        
+    
     def Sort( self, media_sort = None ):
         
         for media in self._collected_media:
@@ -3338,3 +3472,195 @@ class SortedList( object ):
         self._DirtyIndices()
         
     
+class TagCountAggregator( object ):
+    
+    # the tag counts for a pool of files, kept up to date a file at a time
+    # we remember what each file contributed, so we can take it away again even after its tags manager has changed
+    
+    CONTENT_STATUSES = ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_DELETED, HC.CONTENT_STATUS_PENDING, HC.CONTENT_STATUS_PETITIONED )
+    
+    def __init__( self, tag_service_key, tag_display_type ):
+        
+        self._tag_service_key = tag_service_key
+        self._tag_display_type = tag_display_type
+        
+        self._hashes_to_media_results = {}
+        self._hashes_to_contributions = {}
+        
+        self._tags_to_counts = tuple( ( collections.Counter() for content_status in self.CONTENT_STATUSES ) )
+        
+    
+    def _AddContribution( self, contribution, changed_tags ):
+        
+        for ( tags_to_count, tags ) in zip( self._tags_to_counts, contribution ):
+            
+            if len( tags ) > 0:
+                
+                tags_to_count.update( tags )
+                
+                changed_tags.update( tags )
+                
+            
+        
+    
+    def _GetContribution( self, media_result ):
+        
+        statuses_to_tags = media_result.GetTagsManager().GetStatusesToTags( self._tag_service_key, self._tag_display_type )
+        
+        return tuple( ( tuple( statuses_to_tags[ content_status ] ) for content_status in self.CONTENT_STATUSES ) )
+        
+    
+    def _RemoveContribution( self, contribution, changed_tags ):
+        
+        for ( tags_to_count, tags ) in zip( self._tags_to_counts, contribution ):
+            
+            for tag in tags:
+                
+                # we do not keep zero counts, so the counters only ever hold tags that are present
+                
+                if tags_to_count[ tag ] <= 1:
+                    
+                    del tags_to_count[ tag ]
+                    
+                else:
+                    
+                    tags_to_count[ tag ] -= 1
+                    
+                
+            
+            changed_tags.update( tags )
+            
+        
+    
+    def AddMediaResults( self, media_results ):
+        
+        changed_tags = set()
+        
+        for media_result in media_results:
+            
+            hash = media_result.GetHash()
+            
+            if hash in self._hashes_to_media_results:
+                
+                continue
+                
+            
+            contribution = self._GetContribution( media_result )
+            
+            self._hashes_to_media_results[ hash ] = media_result
+            self._hashes_to_contributions[ hash ] = contribution
+            
+            self._AddContribution( contribution, changed_tags )
+            
+        
+        return changed_tags
+        
+    
+    def GetCounts( self ):
+        
+        # current, deleted, pending, petitioned. these are live objects, so do not edit them
+        
+        return self._tags_to_counts
+        
+    
+    def GetNumFiles( self ):
+        
+        return len( self._hashes_to_media_results )
+        
+    
+    def MoveHashes( self, hashes: set, destination: "TagCountAggregator" ):
+        
+        # both pools count the same tag service and display type, so the contributions can move over without asking the tags managers again
+        
+        if destination.GetNumFiles() == 0 and len( hashes ) >= len( self._hashes_to_media_results ) and self._hashes_to_media_results.keys() <= hashes:
+            
+            # everything is moving to an empty pool, which is just a swap. this is what keeps select all and deselect all cheap
+            
+            changed_tags = set()
+            
+            for tags_to_count in self._tags_to_counts:
+                
+                changed_tags.update( tags_to_count.keys() )
+                
+            
+            ( self._hashes_to_media_results, destination._hashes_to_media_results ) = ( destination._hashes_to_media_results, self._hashes_to_media_results )
+            ( self._hashes_to_contributions, destination._hashes_to_contributions ) = ( destination._hashes_to_contributions, self._hashes_to_contributions )
+            ( self._tags_to_counts, destination._tags_to_counts ) = ( destination._tags_to_counts, self._tags_to_counts )
+            
+            return changed_tags
+            
+        
+        changed_tags = set()
+        
+        for hash in hashes:
+            
+            if hash not in self._hashes_to_media_results:
+                
+                continue
+                
+            
+            media_result = self._hashes_to_media_results.pop( hash )
+            contribution = self._hashes_to_contributions.pop( hash )
+            
+            self._RemoveContribution( contribution, changed_tags )
+            
+            if hash not in destination._hashes_to_media_results:
+                
+                destination._hashes_to_media_results[ hash ] = media_result
+                destination._hashes_to_contributions[ hash ] = contribution
+                
+                destination._AddContribution( contribution, changed_tags )
+                
+            
+        
+        return changed_tags
+        
+    
+    def RefreshHashes( self, hashes ):
+        
+        changed_tags = set()
+        
+        for hash in hashes:
+            
+            if hash not in self._hashes_to_media_results:
+                
+                continue
+                
+            
+            old_contribution = self._hashes_to_contributions[ hash ]
+            new_contribution = self._GetContribution( self._hashes_to_media_results[ hash ] )
+            
+            if new_contribution != old_contribution:
+                
+                self._RemoveContribution( old_contribution, changed_tags )
+                
+                self._hashes_to_contributions[ hash ] = new_contribution
+                
+                self._AddContribution( new_contribution, changed_tags )
+                
+            
+        
+        return changed_tags
+        
+    
+    def RemoveHashes( self, hashes ):
+        
+        changed_tags = set()
+        
+        for hash in hashes:
+            
+            if hash not in self._hashes_to_media_results:
+                
+                continue
+                
+            
+            del self._hashes_to_media_results[ hash ]
+            
+            contribution = self._hashes_to_contributions.pop( hash )
+            
+            self._RemoveContribution( contribution, changed_tags )
+            
+        
+        return changed_tags
+        
+    
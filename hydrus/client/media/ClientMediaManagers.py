@@ -1,3 +1,5 @@
+import array
+import bisect
 import collections
 import itertools
 import threading
@@ -673,209 +675,416 @@ class RatingsManager( object ):
         if service_key in self._service_keys_to_ratings: del self._service_keys_to_ratings[ service_key ]
         
     
+class TagInterner( object ):
+    
+    # there is one of these for the whole client, so every tags manager can hold its tags as sorted arrays of 4-byte ids rather than its own sets of strings
+    # ids are never forgotten, which is fine, since the number of different tags we see is tiny next to the number of mappings
+    
+    def __init__( self ):
+        
+        self._tags_to_tag_ids = {}
+        self._tag_ids_to_tags = []
+        
+        self._lock = threading.Lock()
+        
+    
+    def GetTagId( self, tag, add_if_missing = True ):
+        
+        tag_id = self._tags_to_tag_ids.get( tag, None )
+        
+        if tag_id is None and add_if_missing:
+            
+            with self._lock:
+                
+                tag_id = self._tags_to_tag_ids.get( tag, None )
+                
+                if tag_id is None:
+                    
+                    tag_id = len( self._tag_ids_to_tags )
+                    
+                    # list first, so anyone who finds the id in the dict can look it up
+                    self._tag_ids_to_tags.append( tag )
+                    self._tags_to_tag_ids[ tag ] = tag_id
+                    
+                
+            
+        
+        return tag_id
+        
+    
+    def GetTagIds( self, tags ) -> array.array:
+        
+        tags_to_tag_ids = self._tags_to_tag_ids
+        
+        tag_ids = { tags_to_tag_ids[ tag ] if tag in tags_to_tag_ids else self.GetTagId( tag ) for tag in tags }
+        
+        return array.array( 'I', sorted( tag_ids ) )
+        
+    
+    def GetTags( self, tag_ids ) -> typing.Set[ str ]:
+        
+        tag_ids_to_tags = self._tag_ids_to_tags
+        
+        return { tag_ids_to_tags[ tag_id ] for tag_id in tag_ids }
+        
+    
+tag_interner = TagInterner()
+
 class TagsManager( object ):
     
+    # tags are held as service_key -> status -> sorted array of interned tag ids, with no entries for empty statuses
+    # the storage and display tags we are given are the real data. the combined service and the display types that are derived from them are computed on demand and share arrays and dicts wherever they can
+    # nothing ever edits an array in place, so that sharing is safe
+    
     def __init__(
         self,
         service_keys_to_statuses_to_storage_tags: typing.Dict[ bytes, typing.Dict[ int, typing.Set[ str ] ] ],
         service_keys_to_statuses_to_display_tags: typing.Dict[ bytes, typing.Dict[ int, typing.Set[ str ] ] ]
         ):
         
-        self._tag_display_types_to_service_keys_to_statuses_to_tags = {
-            ClientTags.TAG_DISPLAY_STORAGE : service_keys_to_statuses_to_storage_tags,
-            ClientTags.TAG_DISPLAY_ACTUAL : service_keys_to_statuses_to_display_tags
-        }
+        self._service_keys_to_statuses_to_storage_tag_ids = self._ConvertToTagIds( service_keys_to_statuses_to_storage_tags )
         
-        self._storage_cache_is_dirty = True
-        self._display_cache_is_dirty = True
-        self._single_media_cache_is_dirty = True
-        self._selection_list_cache_is_dirty = True
+        # display tags don't have petitioned or deleted, so we get those from storage
+        self._service_keys_to_statuses_to_display_tag_ids = self._ConvertToTagIds( service_keys_to_statuses_to_display_tags, statuses = ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ), shareable_service_keys_to_statuses_to_tag_ids = self._service_keys_to_statuses_to_storage_tag_ids )
+        
+        self._tag_display_types_to_service_keys_to_statuses_to_tag_ids = {}
         
         self._lock = threading.Lock()
         
     
-    def _GetServiceKeysToStatusesToTags( self, tag_display_type ):
-        
-        # this gets called a lot, so we are hardcoding some gubbins to avoid too many method calls
+    @staticmethod
+    def _AddTagId( service_keys_to_statuses_to_tag_ids, service_key, status, tag_id ):
         
-        if tag_display_type == ClientTags.TAG_DISPLAY_STORAGE and self._storage_cache_is_dirty:
-            
-            self._RecalcStorageCache()
+        if service_key not in service_keys_to_statuses_to_tag_ids:
             
-        if tag_display_type == ClientTags.TAG_DISPLAY_ACTUAL and self._display_cache_is_dirty:
+            service_keys_to_statuses_to_tag_ids[ service_key ] = {}
             
-            self._RecalcDisplayCache()
+        
+        statuses_to_tag_ids = service_keys_to_statuses_to_tag_ids[ service_key ]
+        
+        if status not in statuses_to_tag_ids:
             
-        elif tag_display_type == ClientTags.TAG_DISPLAY_SELECTION_LIST and self._selection_list_cache_is_dirty:
+            statuses_to_tag_ids[ status ] = array.array( 'I', ( tag_id, ) )
             
-            self._RecalcDisplayFilteredCache( ClientTags.TAG_DISPLAY_SELECTION_LIST )
+            return
             
-        elif tag_display_type == ClientTags.TAG_DISPLAY_SINGLE_MEDIA and self._single_media_cache_is_dirty:
+        
+        tag_ids = statuses_to_tag_ids[ status ]
+        
+        index = bisect.bisect_left( tag_ids, tag_id )
+        
+        if index < len( tag_ids ) and tag_ids[ index ] == tag_id:
             
-            self._RecalcDisplayFilteredCache( ClientTags.TAG_DISPLAY_SINGLE_MEDIA )
+            return
             
         
-        return self._tag_display_types_to_service_keys_to_statuses_to_tags[ tag_display_type ]
+        new_tag_ids = array.array( 'I', tag_ids )
         
-    
-    def _RecalcStorageCache( self ):
+        new_tag_ids.insert( index, tag_id )
         
-        service_keys_to_statuses_to_tags = self._tag_display_types_to_service_keys_to_statuses_to_tags[ ClientTags.TAG_DISPLAY_STORAGE ]
+        statuses_to_tag_ids[ status ] = new_tag_ids
         
-        # just combined service merge calculation
+    
+    @staticmethod
+    def _ConvertToTagIds( service_keys_to_statuses_to_tags, statuses = None, shareable_service_keys_to_statuses_to_tag_ids = None ):
         
-        combined_statuses_to_tags = HydrusData.default_dict_set()
+        service_keys_to_statuses_to_tag_ids = {}
         
-        for ( service_key, source_statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
+        for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
             
             if service_key == CC.COMBINED_TAG_SERVICE_KEY:
                 
                 continue
                 
             
-            for ( status, tags ) in source_statuses_to_tags.items():
+            statuses_to_tag_ids = {}
+            
+            for ( status, tags ) in statuses_to_tags.items():
+                
+                if len( tags ) == 0 or ( statuses is not None and status not in statuses ):
+                    
+                    continue
+                    
+                
+                tag_ids = tag_interner.GetTagIds( tags )
+                
+                if shareable_service_keys_to_statuses_to_tag_ids is not None:
+                    
+                    # display tags are very often the same as storage, so let's not store them twice
+                    
+                    shareable_tag_ids = shareable_service_keys_to_statuses_to_tag_ids.get( service_key, {} ).get( status, None )
+                    
+                    if shareable_tag_ids is not None and shareable_tag_ids == tag_ids:
+                        
+                        tag_ids = shareable_tag_ids
+                        
+                    
                 
-                combined_statuses_to_tags[ status ].update( tags )
+                statuses_to_tag_ids[ status ] = tag_ids
+                
+            
+            if len( statuses_to_tag_ids ) > 0:
+                
+                service_keys_to_statuses_to_tag_ids[ service_key ] = statuses_to_tag_ids
                 
             
         
-        service_keys_to_statuses_to_tags[ CC.COMBINED_TAG_SERVICE_KEY ] = combined_statuses_to_tags
-        
-        #
-        
-        self._storage_cache_is_dirty = False
+        return service_keys_to_statuses_to_tag_ids
         
     
-    def _RecalcDisplayCache( self ):
+    @staticmethod
+    def _DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, status, tag_id ):
         
-        if self._storage_cache_is_dirty:
+        if service_key not in service_keys_to_statuses_to_tag_ids:
             
-            self._RecalcStorageCache()
+            return
             
         
-        # display tags don't have petitioned or deleted, so we just copy from storage
+        statuses_to_tag_ids = service_keys_to_statuses_to_tag_ids[ service_key ]
         
-        source_service_keys_to_statuses_to_tags = self._tag_display_types_to_service_keys_to_statuses_to_tags[ ClientTags.TAG_DISPLAY_STORAGE ]
+        if status not in statuses_to_tag_ids:
+            
+            return
+            
         
-        destination_service_keys_to_statuses_to_tags = self._tag_display_types_to_service_keys_to_statuses_to_tags[ ClientTags.TAG_DISPLAY_ACTUAL ]
+        tag_ids = statuses_to_tag_ids[ status ]
         
-        combined_statuses_to_tags = HydrusData.default_dict_set()
+        index = bisect.bisect_left( tag_ids, tag_id )
         
-        for ( service_key, source_statuses_to_tags ) in source_service_keys_to_statuses_to_tags.items():
+        if index == len( tag_ids ) or tag_ids[ index ] != tag_id:
             
-            if service_key == CC.COMBINED_TAG_SERVICE_KEY:
-                
-                continue
-                
+            return
             
-            destination_statuses_to_tags = destination_service_keys_to_statuses_to_tags[ service_key ]
+        
+        if len( tag_ids ) == 1:
             
-            for status in ( HC.CONTENT_STATUS_DELETED, HC.CONTENT_STATUS_PETITIONED ):
-                
-                if status in destination_statuses_to_tags:
-                    
-                    del destination_statuses_to_tags[ status ]
-                    
-                
-                if status in source_statuses_to_tags:
-                    
-                    destination_statuses_to_tags[ status ] = set( source_statuses_to_tags[ status ] )
-                    
-                
+            del statuses_to_tag_ids[ status ]
             
-            for ( status, tags ) in destination_statuses_to_tags.items():
+            if len( statuses_to_tag_ids ) == 0:
                 
-                combined_statuses_to_tags[ status ].update( tags )
+                del service_keys_to_statuses_to_tag_ids[ service_key ]
                 
             
+            return
+            
         
-        destination_service_keys_to_statuses_to_tags[ CC.COMBINED_TAG_SERVICE_KEY ] = combined_statuses_to_tags
+        new_tag_ids = array.array( 'I', tag_ids )
         
-        #
+        del new_tag_ids[ index ]
         
-        self._display_cache_is_dirty = False
+        statuses_to_tag_ids[ status ] = new_tag_ids
         
     
-    def _RecalcDisplayFilteredCache( self, tag_display_type ):
+    @staticmethod
+    def _GetCombinedStatusesToTagIds( service_keys_to_statuses_to_tag_ids ):
         
-        if self._display_cache_is_dirty:
+        if len( service_keys_to_statuses_to_tag_ids ) == 1:
+            
+            ( statuses_to_tag_ids, ) = service_keys_to_statuses_to_tag_ids.values()
             
-            self._RecalcDisplayCache()
+            return statuses_to_tag_ids
             
         
-        # display filtering
+        statuses_to_lists_of_tag_ids = collections.defaultdict( list )
         
-        tag_display_manager = HG.client_controller.tag_display_manager
+        for statuses_to_tag_ids in service_keys_to_statuses_to_tag_ids.values():
+            
+            for ( status, tag_ids ) in statuses_to_tag_ids.items():
+                
+                statuses_to_lists_of_tag_ids[ status ].append( tag_ids )
+                
+            
         
-        source_service_keys_to_statuses_to_tags = self._tag_display_types_to_service_keys_to_statuses_to_tags[ ClientTags.TAG_DISPLAY_ACTUAL ]
+        combined_statuses_to_tag_ids = {}
         
-        destination_service_keys_to_statuses_to_tags = collections.defaultdict( HydrusData.default_dict_set )
+        for ( status, lists_of_tag_ids ) in statuses_to_lists_of_tag_ids.items():
+            
+            if len( lists_of_tag_ids ) == 1:
+                
+                combined_statuses_to_tag_ids[ status ] = lists_of_tag_ids[0]
+                
+            else:
+                
+                combined_statuses_to_tag_ids[ status ] = array.array( 'I', sorted( set( itertools.chain.from_iterable( lists_of_tag_ids ) ) ) )
+                
+            
+        
+        return combined_statuses_to_tag_ids
+        
+    
+    def _GetServiceKeysToStatusesToTagIds( self, tag_display_type ):
         
-        combined_statuses_to_tags = HydrusData.default_dict_set()
+        # this gets called a lot, so we are hardcoding some gubbins to avoid too many method calls
         
-        for ( service_key, source_statuses_to_tags ) in source_service_keys_to_statuses_to_tags.items():
+        if tag_display_type in self._tag_display_types_to_service_keys_to_statuses_to_tag_ids:
             
-            if service_key == CC.COMBINED_TAG_SERVICE_KEY:
+            return self._tag_display_types_to_service_keys_to_statuses_to_tag_ids[ tag_display_type ]
+            
+        
+        if tag_display_type == ClientTags.TAG_DISPLAY_STORAGE:
+            
+            service_keys_to_statuses_to_tag_ids = dict( self._service_keys_to_statuses_to_storage_tag_ids )
+            
+        elif tag_display_type == ClientTags.TAG_DISPLAY_ACTUAL:
+            
+            storage_service_keys_to_statuses_to_tag_ids = self._service_keys_to_statuses_to_storage_tag_ids
+            display_service_keys_to_statuses_to_tag_ids = self._service_keys_to_statuses_to_display_tag_ids
+            
+            service_keys_to_statuses_to_tag_ids = {}
+            
+            for service_key in set( storage_service_keys_to_statuses_to_tag_ids.keys() ).union( display_service_keys_to_statuses_to_tag_ids.keys() ):
                 
-                continue
+                statuses_to_tag_ids = display_service_keys_to_statuses_to_tag_ids.get( service_key, {} )
+                
+                storage_statuses_to_tag_ids = storage_service_keys_to_statuses_to_tag_ids.get( service_key, {} )
+                
+                storage_only_statuses = [ status for status in ( HC.CONTENT_STATUS_DELETED, HC.CONTENT_STATUS_PETITIONED ) if status in storage_statuses_to_tag_ids ]
+                
+                if len( storage_only_statuses ) > 0:
+                    
+                    statuses_to_tag_ids = dict( statuses_to_tag_ids )
+                    
+                    for status in storage_only_statuses:
+                        
+                        statuses_to_tag_ids[ status ] = storage_statuses_to_tag_ids[ status ]
+                        
+                    
+                
+                if len( statuses_to_tag_ids ) > 0:
+                    
+                    service_keys_to_statuses_to_tag_ids[ service_key ] = statuses_to_tag_ids
+                    
                 
             
-            if tag_display_manager.FiltersTags( tag_display_type, service_key ):
+        else:
+            
+            # display filtering
+            
+            tag_display_manager = HG.client_controller.tag_display_manager
+            
+            source_service_keys_to_statuses_to_tag_ids = self._GetServiceKeysToStatusesToTagIds( ClientTags.TAG_DISPLAY_ACTUAL )
+            
+            service_keys_to_statuses_to_tag_ids = {}
+            
+            filtered_something = False
+            
+            for ( service_key, source_statuses_to_tag_ids ) in source_service_keys_to_statuses_to_tag_ids.items():
                 
-                destination_statuses_to_tags = HydrusData.default_dict_set()
+                if service_key == CC.COMBINED_TAG_SERVICE_KEY:
+                    
+                    continue
+                    
                 
-                for ( status, source_tags ) in source_statuses_to_tags.items():
+                if tag_display_manager.FiltersTags( tag_display_type, service_key ):
                     
-                    dest_tags = tag_display_manager.FilterTags( tag_display_type, service_key, source_tags )
+                    statuses_to_tag_ids = {}
                     
-                    if len( source_tags ) != len( dest_tags ):
+                    for ( status, source_tag_ids ) in source_statuses_to_tag_ids.items():
                         
-                        if len( dest_tags ) > 0:
-                            
-                            destination_statuses_to_tags[ status ] = dest_tags
-                            
+                        source_tags = tag_interner.GetTags( source_tag_ids )
                         
-                    else:
+                        dest_tags = tag_display_manager.FilterTags( tag_display_type, service_key, source_tags )
                         
-                        destination_statuses_to_tags[ status ] = source_tags
+                        if len( source_tags ) != len( dest_tags ):
+                            
+                            filtered_something = True
+                            
+                            if len( dest_tags ) > 0:
+                                
+                                statuses_to_tag_ids[ status ] = tag_interner.GetTagIds( dest_tags )
+                                
+                            
+                        else:
+                            
+                            statuses_to_tag_ids[ status ] = source_tag_ids
+                            
                         
                     
+                else:
+                    
+                    statuses_to_tag_ids = source_statuses_to_tag_ids
+                    
                 
-            else:
+                if len( statuses_to_tag_ids ) > 0:
+                    
+                    service_keys_to_statuses_to_tag_ids[ service_key ] = statuses_to_tag_ids
+                    
+                
+            
+            if not filtered_something:
+                
+                # the usual case, so this display type is the same object as the actual display
+                
+                self._tag_display_types_to_service_keys_to_statuses_to_tag_ids[ tag_display_type ] = source_service_keys_to_statuses_to_tag_ids
                 
-                destination_statuses_to_tags = source_statuses_to_tags
+                return source_service_keys_to_statuses_to_tag_ids
                 
             
-            destination_service_keys_to_statuses_to_tags[ service_key ] = destination_statuses_to_tags
+        
+        if len( service_keys_to_statuses_to_tag_ids ) > 0:
+            
+            service_keys_to_statuses_to_tag_ids[ CC.COMBINED_TAG_SERVICE_KEY ] = self._GetCombinedStatusesToTagIds( service_keys_to_statuses_to_tag_ids )
+            
+        
+        self._tag_display_types_to_service_keys_to_statuses_to_tag_ids[ tag_display_type ] = service_keys_to_statuses_to_tag_ids
+        
+        return service_keys_to_statuses_to_tag_ids
+        
+    
+    def _GetStatusesToTags( self, service_key, tag_display_type ):
+        
+        service_keys_to_statuses_to_tag_ids = self._GetServiceKeysToStatusesToTagIds( tag_display_type )
+        
+        statuses_to_tags = HydrusData.default_dict_set()
+        
+        if service_key in service_keys_to_statuses_to_tag_ids:
             
-            for ( status, tags ) in destination_statuses_to_tags.items():
+            for ( status, tag_ids ) in service_keys_to_statuses_to_tag_ids[ service_key ].items():
                 
-                combined_statuses_to_tags[ status ].update( tags )
+                statuses_to_tags[ status ] = tag_interner.GetTags( tag_ids )
                 
             
         
-        destination_service_keys_to_statuses_to_tags[ CC.COMBINED_TAG_SERVICE_KEY ] = combined_statuses_to_tags
+        return statuses_to_tags
+        
+    
+    def _GetTagIds( self, service_key, tag_display_type, status ):
+        
+        service_keys_to_statuses_to_tag_ids = self._GetServiceKeysToStatusesToTagIds( tag_display_type )
+        
+        if service_key in service_keys_to_statuses_to_tag_ids:
+            
+            statuses_to_tag_ids = service_keys_to_statuses_to_tag_ids[ service_key ]
+            
+            if status in statuses_to_tag_ids:
+                
+                return statuses_to_tag_ids[ status ]
+                
+            
         
-        self._tag_display_types_to_service_keys_to_statuses_to_tags[ tag_display_type ] = destination_service_keys_to_statuses_to_tags
+        return ()
         
-        #
+    
+    def _HasTagId( self, tag_id, tag_display_type ):
         
-        if tag_display_type == ClientTags.TAG_DISPLAY_SELECTION_LIST:
+        for status in ( HC.CONTENT_STATUS_CURRENT, HC.CONTENT_STATUS_PENDING ):
             
-            self._selection_list_cache_is_dirty = False
+            tag_ids = self._GetTagIds( CC.COMBINED_TAG_SERVICE_KEY, tag_display_type, status )
             
-        elif tag_display_type == ClientTags.TAG_DISPLAY_SINGLE_MEDIA:
+            index = bisect.bisect_left( tag_ids, tag_id )
             
-            self._single_media_cache_is_dirty = False
+            if index < len( tag_ids ) and tag_ids[ index ] == tag_id:
+                
+                return True
+                
             
         
+        return False
+        
     
     def _SetDirty( self ):
         
-        self._storage_cache_is_dirty = True
-        self._display_cache_is_dirty = True
-        self._single_media_cache_is_dirty = True
-        self._selection_list_cache_is_dirty = True
+        self._tag_display_types_to_service_keys_to_statuses_to_tag_ids = {}
         
     
     @staticmethod
@@ -931,14 +1140,17 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
+            statuses_to_tag_ids = self._service_keys_to_statuses_to_storage_tag_ids.get( service_key, {} )
             
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
-            
-            if len( statuses_to_tags[ HC.CONTENT_STATUS_PENDING ] ) + len( statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ] ) > 0:
+            if HC.CONTENT_STATUS_PENDING in statuses_to_tag_ids or HC.CONTENT_STATUS_PETITIONED in statuses_to_tag_ids:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ] = set()
-                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ] = set()
+                statuses_to_tag_ids.pop( HC.CONTENT_STATUS_PENDING, None )
+                statuses_to_tag_ids.pop( HC.CONTENT_STATUS_PETITIONED, None )
+                
+                if len( statuses_to_tag_ids ) == 0:
+                    
+                    del self._service_keys_to_statuses_to_storage_tag_ids[ service_key ]
+                    
                 
                 self._SetDirty()
                 
@@ -951,29 +1163,10 @@ class TagsManager( object ):
             
             dupe_tags_manager = TagsManager( {}, {} )
             
-            dupe_tag_display_types_to_service_keys_to_statuses_to_tags = dict()
-            
-            for ( tag_display_type, service_keys_to_statuses_to_tags ) in self._tag_display_types_to_service_keys_to_statuses_to_tags.items():
-                
-                dupe_service_keys_to_statuses_to_tags = collections.defaultdict( HydrusData.default_dict_set )
-                
-                for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
-                    
-                    dupe_statuses_to_tags = HydrusData.default_dict_set()
-                    
-                    for ( status, tags ) in statuses_to_tags.items():
-                        
-                        dupe_statuses_to_tags[ status ] = set( tags )
-                        
-                    
-                    dupe_service_keys_to_statuses_to_tags[ service_key ] = dupe_statuses_to_tags
-                    
-                
-                dupe_tag_display_types_to_service_keys_to_statuses_to_tags[ tag_display_type ] = dupe_service_keys_to_statuses_to_tags
-                
+            # the arrays are never edited in place, so we only have to copy the dicts
             
-            dupe_tags_manager._tag_display_types_to_service_keys_to_statuses_to_tags = dupe_tag_display_types_to_service_keys_to_statuses_to_tags
-            dupe_tags_manager._display_cache_is_dirty = self._display_cache_is_dirty
+            dupe_tags_manager._service_keys_to_statuses_to_storage_tag_ids = { service_key : dict( statuses_to_tag_ids ) for ( service_key, statuses_to_tag_ids ) in self._service_keys_to_statuses_to_storage_tag_ids.items() }
+            dupe_tags_manager._service_keys_to_statuses_to_display_tag_ids = { service_key : dict( statuses_to_tag_ids ) for ( service_key, statuses_to_tag_ids ) in self._service_keys_to_statuses_to_display_tag_ids.items() }
             
             return dupe_tags_manager
             
@@ -983,14 +1176,10 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            combined_statuses_to_tags = service_keys_to_statuses_to_tags[ CC.COMBINED_TAG_SERVICE_KEY ]
-            
-            combined_current = combined_statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]
-            combined_pending = combined_statuses_to_tags[ HC.CONTENT_STATUS_PENDING ]
+            combined_current = self._GetTagIds( CC.COMBINED_TAG_SERVICE_KEY, tag_display_type, HC.CONTENT_STATUS_CURRENT )
+            combined_pending = self._GetTagIds( CC.COMBINED_TAG_SERVICE_KEY, tag_display_type, HC.CONTENT_STATUS_PENDING )
             
-            combined = combined_current.union( combined_pending )
+            combined = tag_interner.GetTags( itertools.chain( combined_current, combined_pending ) )
             
             pairs = [ HydrusTags.SplitTag( tag ) for tag in combined ]
             
@@ -1011,11 +1200,7 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
-            
-            return statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]
+            return tag_interner.GetTags( self._GetTagIds( service_key, tag_display_type, HC.CONTENT_STATUS_CURRENT ) )
             
         
     
@@ -1023,11 +1208,10 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
+            current_tag_ids = self._GetTagIds( service_key, tag_display_type, HC.CONTENT_STATUS_CURRENT )
+            pending_tag_ids = self._GetTagIds( service_key, tag_display_type, HC.CONTENT_STATUS_PENDING )
             
-            return statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].union( statuses_to_tags[ HC.CONTENT_STATUS_PENDING ] )
+            return tag_interner.GetTags( itertools.chain( current_tag_ids, pending_tag_ids ) )
             
         
     
@@ -1035,11 +1219,7 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
-            
-            return statuses_to_tags[ HC.CONTENT_STATUS_DELETED ]
+            return tag_interner.GetTags( self._GetTagIds( service_key, tag_display_type, HC.CONTENT_STATUS_DELETED ) )
             
         
     
@@ -1047,14 +1227,10 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            combined_statuses_to_tags = service_keys_to_statuses_to_tags[ CC.COMBINED_TAG_SERVICE_KEY ]
-            
-            combined_current = combined_statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]
-            combined_pending = combined_statuses_to_tags[ HC.CONTENT_STATUS_PENDING ]
+            combined_current = self._GetTagIds( CC.COMBINED_TAG_SERVICE_KEY, tag_display_type, HC.CONTENT_STATUS_CURRENT )
+            combined_pending = self._GetTagIds( CC.COMBINED_TAG_SERVICE_KEY, tag_display_type, HC.CONTENT_STATUS_PENDING )
             
-            combined = combined_current.union( combined_pending )
+            combined = tag_interner.GetTags( itertools.chain( combined_current, combined_pending ) )
             
             slice = { tag for tag in combined if True in ( tag.startswith( namespace + ':' ) for namespace in namespaces ) }
             
@@ -1070,12 +1246,8 @@ class TagsManager( object ):
             
             num_tags = 0
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ tag_search_context.service_key ]
-            
-            if tag_search_context.include_current_tags: num_tags += len( statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ] )
-            if tag_search_context.include_pending_tags: num_tags += len( statuses_to_tags[ HC.CONTENT_STATUS_PENDING ] )
+            if tag_search_context.include_current_tags: num_tags += len( self._GetTagIds( tag_search_context.service_key, tag_display_type, HC.CONTENT_STATUS_CURRENT ) )
+            if tag_search_context.include_pending_tags: num_tags += len( self._GetTagIds( tag_search_context.service_key, tag_display_type, HC.CONTENT_STATUS_PENDING ) )
             
             return num_tags
             
@@ -1085,11 +1257,7 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
-            
-            return statuses_to_tags[ HC.CONTENT_STATUS_PENDING ]
+            return tag_interner.GetTags( self._GetTagIds( service_key, tag_display_type, HC.CONTENT_STATUS_PENDING ) )
             
         
     
@@ -1097,11 +1265,7 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
-            
-            return statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ]
+            return tag_interner.GetTags( self._GetTagIds( service_key, tag_display_type, HC.CONTENT_STATUS_PETITIONED ) )
             
         
     
@@ -1109,7 +1273,14 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
+            service_keys_to_statuses_to_tag_ids = self._GetServiceKeysToStatusesToTagIds( tag_display_type )
+            
+            service_keys_to_statuses_to_tags = collections.defaultdict( HydrusData.default_dict_set )
+            
+            for service_key in service_keys_to_statuses_to_tag_ids.keys():
+                
+                service_keys_to_statuses_to_tags[ service_key ] = self._GetStatusesToTags( service_key, tag_display_type )
+                
             
             return service_keys_to_statuses_to_tags
             
@@ -1119,9 +1290,7 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            return service_keys_to_statuses_to_tags[ service_key ]
+            return self._GetStatusesToTags( service_key, tag_display_type )
             
         
     
@@ -1129,11 +1298,14 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
+            tag_id = tag_interner.GetTagId( tag, add_if_missing = False )
             
-            combined_statuses_to_tags = service_keys_to_statuses_to_tags[ CC.COMBINED_TAG_SERVICE_KEY ]
+            if tag_id is None:
+                
+                return False
+                
             
-            return tag in combined_statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ] or tag in combined_statuses_to_tags[ HC.CONTENT_STATUS_PENDING ]
+            return self._HasTagId( tag_id, tag_display_type )
             
         
     
@@ -1141,11 +1313,17 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( tag_display_type )
-            
-            combined_statuses_to_tags = service_keys_to_statuses_to_tags[ CC.COMBINED_TAG_SERVICE_KEY ]
+            for tag in tags:
+                
+                tag_id = tag_interner.GetTagId( tag, add_if_missing = False )
+                
+                if tag_id is not None and self._HasTagId( tag_id, tag_display_type ):
+                    
+                    return True
+                    
+                
             
-            return True in ( tag in combined_statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ] or tag in combined_statuses_to_tags[ HC.CONTENT_STATUS_PENDING ] for tag in tags )
+            return False
             
         
     
@@ -1161,96 +1339,92 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
-            
             ( data_type, action, row ) = content_update.ToTuple()
             
             ( tag, hashes ) = row
             
+            tag_id = tag_interner.GetTagId( tag )
+            
+            def has_current( service_keys_to_statuses_to_tag_ids ):
+                
+                tag_ids = service_keys_to_statuses_to_tag_ids.get( service_key, {} ).get( HC.CONTENT_STATUS_CURRENT, () )
+                
+                index = bisect.bisect_left( tag_ids, tag_id )
+                
+                return index < len( tag_ids ) and tag_ids[ index ] == tag_id
+                
+            
+            service_keys_to_statuses_to_tag_ids = self._service_keys_to_statuses_to_storage_tag_ids
+            
             if action == HC.CONTENT_UPDATE_ADD:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].add( tag )
+                self._AddTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_CURRENT, tag_id )
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_DELETED, tag_id )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PENDING, tag_id )
                 
             elif action == HC.CONTENT_UPDATE_DELETE:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].add( tag )
+                self._AddTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_DELETED, tag_id )
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_CURRENT, tag_id )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PETITIONED, tag_id )
                 
             elif action == HC.CONTENT_UPDATE_PEND:
                 
-                if tag not in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
+                if not has_current( service_keys_to_statuses_to_tag_ids ):
                     
-                    statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].add( tag )
+                    self._AddTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PENDING, tag_id )
                     
                 
             elif action == HC.CONTENT_UPDATE_RESCIND_PEND:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PENDING, tag_id )
                 
             elif action == HC.CONTENT_UPDATE_PETITION:
                 
-                if tag in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
+                if has_current( service_keys_to_statuses_to_tag_ids ):
                     
-                    statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].add( tag )
+                    self._AddTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PETITIONED, tag_id )
                     
                 
             elif action == HC.CONTENT_UPDATE_RESCIND_PETITION:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PETITIONED, tag_id )
                 
             elif action == HC.CONTENT_UPDATE_CLEAR_DELETE_RECORD:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_DELETED, tag_id )
                 
             
             #
             
             # this does not need to do clever sibling collapse or parent gubbins, because in that case, the db forces tagsmanager refresh
             # so this is just handling things if the content update has no sibling/parent tags
+            # display deleted and petitioned come from storage, so we only track current and pending here
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_ACTUAL )
-            
-            statuses_to_tags = service_keys_to_statuses_to_tags[ service_key ]
-            
-            ( data_type, action, row ) = content_update.ToTuple()
-            
-            ( tag, hashes ) = row
+            service_keys_to_statuses_to_tag_ids = self._service_keys_to_statuses_to_display_tag_ids
             
             if action == HC.CONTENT_UPDATE_ADD:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].add( tag )
+                self._AddTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_CURRENT, tag_id )
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PENDING, tag_id )
                 
             elif action == HC.CONTENT_UPDATE_DELETE:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].add( tag )
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ].discard( tag )
-                statuses_to_tags[ HC.CONTENT_STATUS_PETITIONED ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_CURRENT, tag_id )
                 
             elif action == HC.CONTENT_UPDATE_PEND:
                 
-                if tag not in statuses_to_tags[ HC.CONTENT_STATUS_CURRENT ]:
+                if not has_current( service_keys_to_statuses_to_tag_ids ):
                     
-                    statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].add( tag )
+                    self._AddTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PENDING, tag_id )
                     
                 
             elif action == HC.CONTENT_UPDATE_RESCIND_PEND:
                 
-                statuses_to_tags[ HC.CONTENT_STATUS_PENDING ].discard( tag )
-                
-            elif action == HC.CONTENT_UPDATE_CLEAR_DELETE_RECORD:
-                
-                statuses_to_tags[ HC.CONTENT_STATUS_DELETED ].discard( tag )
+                self._DiscardTagId( service_keys_to_statuses_to_tag_ids, service_key, HC.CONTENT_STATUS_PENDING, tag_id )
                 
             
             #
@@ -1263,11 +1437,9 @@ class TagsManager( object ):
         
         with self._lock:
             
-            service_keys_to_statuses_to_tags = self._GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
-            
-            if service_key in service_keys_to_statuses_to_tags:
+            if service_key in self._service_keys_to_statuses_to_storage_tag_ids:
                 
-                del service_keys_to_statuses_to_tags[ service_key ]
+                del self._service_keys_to_statuses_to_storage_tag_ids[ service_key ]
                 
                 self._SetDirty()
                 
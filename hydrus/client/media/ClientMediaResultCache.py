@@ -16,6 +16,9 @@ class MediaResultCache( object ):
         
         self._lock = threading.Lock()
         
+        # goes up whenever the db tells us about a change, so a db read connection can tell if its snapshot went stale while it was building results
+        self._generation = 0
+        
         self._hash_ids_to_media_results = weakref.WeakValueDictionary()
         self._hashes_to_media_results = weakref.WeakValueDictionary()
         
@@ -25,10 +28,15 @@ class MediaResultCache( object ):
         HG.client_controller.sub( self, 'NewTagDisplayRules', 'notify_new_tag_display_rules' )
         
     
-    def AddMediaResults( self, media_results: typing.Iterable[ ClientMediaResult.MediaResult ] ):
+    def AddMediaResults( self, media_results: typing.Iterable[ ClientMediaResult.MediaResult ], generation = None ) -> bool:
         
         with self._lock:
             
+            if generation is not None and generation != self._generation:
+                
+                return False
+                
+            
             for media_result in media_results:
                 
                 hash_id = media_result.GetHashId()
@@ -38,12 +46,16 @@ class MediaResultCache( object ):
                 self._hashes_to_media_results[ hash ] = media_result
                 
             
+            return True
+            
         
     
     def DropMediaResult( self, hash_id: int, hash: bytes ):
         
         with self._lock:
             
+            self._generation += 1
+            
             media_result = self._hash_ids_to_media_results.get( hash_id, None )
             
             if media_result is not None:
@@ -101,6 +113,14 @@ class MediaResultCache( object ):
             
         
     
+    def GetGeneration( self ):
+        
+        with self._lock:
+            
+            return self._generation
+            
+        
+    
     def HasFile( self, hash_id: int ):
         
         with self._lock:
@@ -126,6 +146,8 @@ class MediaResultCache( object ):
                 
                 with self._lock:
                     
+                    self._generation += 1
+                    
                     for ( hash_id, tags_manager ) in hash_ids_to_tags_managers.items():
                         
                         media_result = self._hash_ids_to_media_results.get( hash_id, None )
@@ -166,6 +188,8 @@ class MediaResultCache( object ):
         
         with self._lock:
             
+            self._generation += 1
+            
             for ( service_key, content_updates ) in service_keys_to_content_updates.items():
                 
                 for content_update in content_updates:
@@ -190,6 +214,8 @@ class MediaResultCache( object ):
         
         with self._lock:
             
+            self._generation += 1
+            
             for ( service_key, service_updates ) in service_keys_to_service_updates.items():
                 
                 for service_update in service_updates:
@@ -219,6 +245,8 @@ class MediaResultCache( object ):
         
         with self._lock:
             
+            self._generation += 1
+            
             for ( hash_id, tags_manager ) in hash_ids_to_tags_managers.items():
                 
                 media_result = self._hash_ids_to_media_results.get( hash_id, None )
@@ -64,6 +64,7 @@ class HydrusServiceClientAPI( HydrusClientService ):
         add_tags.putChild( b'add_tags', ClientLocalServerResources.HydrusResourceClientAPIRestrictedAddTagsAddTags( self._service, self._client_requests_domain ) )
         add_tags.putChild( b'clean_tags', ClientLocalServerResources.HydrusResourceClientAPIRestrictedAddTagsCleanTags( self._service, self._client_requests_domain ) )
         add_tags.putChild( b'get_tag_services', ClientLocalServerResources.HydrusResourceClientAPIRestrictedAddTagsGetTagServices( self._service, self._client_requests_domain ) )
+        add_tags.putChild( b'suggest_tags', ClientLocalServerResources.HydrusResourceClientAPIRestrictedAddTagsSuggestTags( self._service, self._client_requests_domain ) )
         
         add_urls = NoResource()
         
@@ -82,6 +83,7 @@ class HydrusServiceClientAPI( HydrusClientService ):
         get_files.putChild( b'file_metadata', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesFileMetadata( self._service, self._client_requests_domain ) )
         get_files.putChild( b'file', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesGetFile( self._service, self._client_requests_domain ) )
         get_files.putChild( b'thumbnail', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesGetThumbnail( self._service, self._client_requests_domain ) )
+        get_files.putChild( b'thumbnails', ClientLocalServerResources.HydrusResourceClientAPIRestrictedGetFilesGetThumbnails( self._service, self._client_requests_domain ) )
         
         manage_cookies = NoResource()
         
@@ -109,6 +111,7 @@ class HydrusServiceClientAPI( HydrusClientService ):
         
         root.putChild( b'manage_database', manage_database )
         
+        manage_database.putChild( b'get_job_statistics', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseGetJobStatistics( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_on', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOn( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_off', ClientLocalServerResources.HydrusResourceClientAPIRestrictedManageDatabaseLockOff( self._service, self._client_requests_domain ) )
         
@@ -1,7 +1,10 @@
+import base64
 import collections
 import collections.abc
+import concurrent.futures
 import json
 import os
+import struct
 import threading
 import time
 import traceback
@@ -37,10 +40,10 @@ LOCAL_BOORU_STRING_PARAMS = set()
 LOCAL_BOORU_JSON_PARAMS = set()
 LOCAL_BOORU_JSON_BYTE_LIST_PARAMS = set()
 
-CLIENT_API_INT_PARAMS = { 'file_id' }
+CLIENT_API_INT_PARAMS = { 'file_id', 'max_results', 'page_size' }
 CLIENT_API_BYTE_PARAMS = { 'hash', 'destination_page_key', 'page_key', 'Hydrus-Client-API-Access-Key', 'Hydrus-Client-API-Session-Key' }
-CLIENT_API_STRING_PARAMS = { 'name', 'url', 'domain' }
-CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'system_inbox', 'system_archive', 'tags', 'file_ids', 'only_return_identifiers', 'detailed_url_information', 'simple' }
+CLIENT_API_STRING_PARAMS = { 'name', 'url', 'domain', 'tag_service_name', 'continuation' }
+CLIENT_API_JSON_PARAMS = { 'basic_permissions', 'system_inbox', 'system_archive', 'tags', 'file_ids', 'only_return_identifiers', 'detailed_url_information', 'simple', 'ndjson' }
 CLIENT_API_JSON_BYTE_LIST_PARAMS = { 'hashes' }
 
 def ParseLocalBooruGETArgs( requests_args ):
@@ -183,6 +186,32 @@ def ParseClientAPIPOSTArgs( request ):
     
     return ( parsed_request_args, total_bytes_read )
     
+def ConvertContinuationToString( search_key, offset ):
+    
+    # the client does not need to know what is in here, it just hands it back
+    
+    return str( base64.urlsafe_b64encode( bytes( json.dumps( ( search_key.hex(), offset ) ), 'utf-8' ) ), 'ascii' )
+    
+def ConvertStringToContinuation( continuation_string ):
+    
+    try:
+        
+        ( search_key_hex, offset ) = json.loads( base64.urlsafe_b64decode( bytes( continuation_string, 'ascii' ) ) )
+        
+        search_key = bytes.fromhex( search_key_hex )
+        
+        if not isinstance( offset, int ) or offset < 0:
+            
+            raise Exception()
+            
+        
+    except:
+        
+        raise HydrusExceptions.BadRequestException( 'Could not understand that continuation!' )
+        
+    
+    return ( search_key, offset )
+    
 def ParseClientAPISearchPredicates( request ):
     
     default_search_values = {}
@@ -315,7 +344,7 @@ class HydrusResourceBooruFile( HydrusResourceBooru ):
             raise HydrusExceptions.NotFoundException( 'Could not find that file!' )
             
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, etag = hash.hex() )
         
         return response_context
         
@@ -1273,6 +1302,61 @@ class HydrusResourceClientAPIRestrictedAddTagsCleanTags( HydrusResourceClientAPI
         return response_context
         
     
+class HydrusResourceClientAPIRestrictedAddTagsSuggestTags( HydrusResourceClientAPIRestrictedAddTags ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        tags = request.parsed_request_args.GetValue( 'tags', list, expected_list_type = str )
+        
+        tags = HydrusTags.CleanTags( tags )
+        
+        if 'tag_service_name' in request.parsed_request_args:
+            
+            tag_service_name = request.parsed_request_args.GetValue( 'tag_service_name', str )
+            
+            try:
+                
+                tag_service_key = HG.client_controller.services_manager.GetServiceKeyFromName( HC.REAL_TAG_SERVICES, tag_service_name )
+                
+            except:
+                
+                raise HydrusExceptions.BadRequestException( 'Could not find the service "{}"!'.format( tag_service_name ) )
+                
+            
+        else:
+            
+            tag_service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY
+            
+        
+        max_results = request.parsed_request_args.GetValue( 'max_results', int, default_value = 25 )
+        
+        max_results = min( max( max_results, 1 ), 1000 )
+        
+        body_dict = {}
+        
+        if len( tags ) == 0:
+            
+            suggested_tags = []
+            
+        else:
+            
+            # if the service has a co-occurrence index, this is instant. if not, we fall back to a file scan, so give it the same time the manage tags dialog does
+            max_time_to_take = HG.client_controller.new_options.GetInteger( 'related_tags_search_1_duration_ms' ) / 1000.0
+            
+            predicates = HG.client_controller.Read( 'related_tags', tag_service_key, None, tags, max_results, max_time_to_take )
+            
+            suggested_tags = [ { 'tag' : predicate.GetValue(), 'count' : predicate.GetCount() } for predicate in predicates ]
+            
+        
+        body_dict[ 'suggested_tags' ] = suggested_tags
+        
+        body = json.dumps( body_dict )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = body )
+        
+        return response_context
+        
+    
 class HydrusResourceClientAPIRestrictedAddURLs( HydrusResourceClientAPIRestricted ):
     
     def _CheckAPIPermissions( self, request: HydrusServerRequest.HydrusRequest ):
@@ -1591,12 +1675,97 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
         # newest first
         sort_by = ClientMedia.MediaSort( sort_type = ( 'system', CC.SORT_FILES_BY_IMPORT_TIME ), sort_order = CC.SORT_DESC )
         
-        hash_ids = HG.client_controller.Read( 'file_query_ids', file_search_context, sort_by = sort_by, apply_implicit_limit = False )
+        paged = 'page_size' in request.parsed_request_args or 'continuation' in request.parsed_request_args
+        
+        if paged:
+            
+            page_size = request.parsed_request_args.GetValue( 'page_size', int, default_value = 1000 )
+            
+            page_size = min( max( page_size, 1 ), 100000 )
+            
+            if 'continuation' in request.parsed_request_args:
+                
+                ( search_key, offset ) = ConvertStringToContinuation( request.parsed_request_args.GetValue( 'continuation', str ) )
+                
+                ( hash_ids, there_are_more ) = request.client_api_permissions.GetPagedSearchResults( search_key, offset, page_size )
+                
+                request.client_api_permissions.AddLastSearchResults( hash_ids )
+                
+            else:
+                
+                # the search only runs for the first page. later pages are slices of what it found
+                
+                all_hash_ids = HG.client_controller.Read( 'file_query_ids', file_search_context, sort_by = sort_by, apply_implicit_limit = False )
+                
+                offset = 0
+                
+                if len( all_hash_ids ) <= page_size:
+                    
+                    # it all fits on one page, so there is nothing to remember
+                    
+                    search_key = None
+                    
+                    ( hash_ids, there_are_more ) = ( all_hash_ids, False )
+                    
+                else:
+                    
+                    search_key = request.client_api_permissions.StartPagedSearch( all_hash_ids )
+                    
+                    ( hash_ids, there_are_more ) = request.client_api_permissions.GetPagedSearchResults( search_key, offset, page_size )
+                    
+                
+                request.client_api_permissions.SetLastSearchResults( hash_ids )
+                
+            
+            if there_are_more:
+                
+                continuation_string = ConvertContinuationToString( search_key, offset + len( hash_ids ) )
+                
+            else:
+                
+                continuation_string = None
+                
+            
+        else:
+            
+            hash_ids = HG.client_controller.Read( 'file_query_ids', file_search_context, sort_by = sort_by, apply_implicit_limit = False )
+            
+            request.client_api_permissions.SetLastSearchResults( hash_ids )
+            
+        
+        ndjson = request.parsed_request_args.GetValue( 'ndjson', bool, default_value = False )
         
-        request.client_api_permissions.SetLastSearchResults( hash_ids )
+        if ndjson:
+            
+            # one line per file, so the client can work on them as they come in and never has to hold the whole thing
+            
+            def body_generator():
+                
+                for chunk_of_hash_ids in HydrusData.SplitListIntoChunks( list( hash_ids ), 1024 ):
+                    
+                    lines = [ json.dumps( { 'file_id' : hash_id } ) + '\n' for hash_id in chunk_of_hash_ids ]
+                    
+                    yield bytes( ''.join( lines ), 'utf-8' )
+                    
+                
+                if paged:
+                    
+                    yield bytes( json.dumps( { 'continuation' : continuation_string } ) + '\n', 'utf-8' )
+                    
+                
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_NDJSON, body_generator = body_generator() )
+            
+            return response_context
+            
         
         body_dict = { 'file_ids' : list( hash_ids ) }
         
+        if paged:
+            
+            body_dict[ 'continuation' ] = continuation_string
+            
+        
         body = json.dumps( body_dict )
         
         response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = body )
@@ -1653,7 +1822,7 @@ class HydrusResourceClientAPIRestrictedGetFilesGetFile( HydrusResourceClientAPIR
             raise HydrusExceptions.NotFoundException( 'Could not find that file!' )
             
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, etag = hash.hex() )
         
         return response_context
         
@@ -1890,7 +2059,87 @@ class HydrusResourceClientAPIRestrictedGetFilesGetThumbnail( HydrusResourceClien
             raise HydrusExceptions.NotFoundException( 'Could not find that file!' )
             
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path )
+        # thumbnails can be regenerated, so the etag needs more than just the hash
+        etag = '{}-{}'.format( media_result.GetHash().hex(), int( os.path.getmtime( path ) ) )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path, etag = etag )
+        
+        return response_context
+        
+    
+class HydrusResourceClientAPIRestrictedGetFilesGetThumbnails( HydrusResourceClientAPIRestrictedGetFiles ):
+    
+    # a gallery page wants hundreds of these at once, so we do one db hit and read the files in parallel
+    # the response is a simple container: for each file, its 32 byte sha256 hash, a 4 byte big-endian length, and then that many bytes of thumbnail
+    # a missing thumbnail gets a length of zero
+    
+    NUM_READ_THREADS = 8
+    READ_CHUNK_SIZE = 256
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        try:
+            
+            if 'file_ids' in request.parsed_request_args:
+                
+                file_ids = request.parsed_request_args.GetValue( 'file_ids', list, expected_list_type = int )
+                
+                request.client_api_permissions.CheckPermissionToSeeFiles( file_ids )
+                
+                media_results = HG.client_controller.Read( 'media_results_from_ids', file_ids )
+                
+            elif 'hashes' in request.parsed_request_args:
+                
+                request.client_api_permissions.CheckCanSeeAllFiles()
+                
+                hashes = request.parsed_request_args.GetValue( 'hashes', list, expected_list_type = bytes )
+                
+                media_results = HG.client_controller.Read( 'media_results', hashes )
+                
+            else:
+                
+                raise HydrusExceptions.BadRequestException( 'Please include a file_ids or hashes parameter!' )
+                
+            
+        except HydrusExceptions.DataMissing as e:
+            
+            raise HydrusExceptions.NotFoundException( 'One or more of those file identifiers was missing!' )
+            
+        
+        client_files_manager = HG.client_controller.client_files_manager
+        
+        def read_thumbnail( media_result ):
+            
+            try:
+                
+                path = client_files_manager.GetThumbnailPath( media_result )
+                
+                with open( path, 'rb' ) as f:
+                    
+                    thumbnail_bytes = f.read()
+                    
+                
+            except ( HydrusExceptions.FileMissingException, OSError ):
+                
+                thumbnail_bytes = b''
+                
+            
+            return media_result.GetHash() + struct.pack( '>I', len( thumbnail_bytes ) ) + thumbnail_bytes
+            
+        
+        def body_generator():
+            
+            with concurrent.futures.ThreadPoolExecutor( max_workers = self.NUM_READ_THREADS ) as executor:
+                
+                # a chunk at a time, so a huge request does not sit in memory all at once
+                for chunk_of_media_results in HydrusData.SplitListIntoChunks( media_results, self.READ_CHUNK_SIZE ):
+                    
+                    yield b''.join( executor.map( read_thumbnail, chunk_of_media_results ) )
+                    
+                
+            
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, body_generator = body_generator() )
         
         return response_context
         
@@ -2048,6 +2297,24 @@ class HydrusResourceClientAPIRestrictedManageDatabase( HydrusResourceClientAPIRe
         request.client_api_permissions.CheckPermission( ClientAPI.CLIENT_API_PERMISSION_MANAGE_DATABASE )
         
     
+class HydrusResourceClientAPIRestrictedManageDatabaseGetJobStatistics( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        ( time_started, rows ) = HG.client_controller.db.GetJobStatistics()
+        
+        body_dict = {}
+        
+        body_dict[ 'statistics_since' ] = time_started
+        body_dict[ 'job_statistics' ] = rows
+        
+        body = json.dumps( body_dict )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = body )
+        
+        return response_context
+        
+    
 class HydrusResourceClientAPIRestrictedManageDatabaseLockOn( HydrusResourceClientAPIRestrictedManageDatabase ):
     
     def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
@@ -9,6 +9,7 @@ import urllib
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusFileHandling
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusThreading
 from hydrus.core import HydrusText
@@ -191,6 +192,8 @@ class NetworkJob( object ):
         
         self._stream_io = io.BytesIO()
         
+        self._file_hashes = None
+        
         self._error_exception = Exception( 'Exception not initialised.' ) # PyLint hint, wew
         self._error_exception = None
         self._error_text = None
@@ -418,7 +421,7 @@ class NetworkJob( object ):
             
         
     
-    def _ReadResponse( self, response, stream_dest, max_allowed = None ):
+    def _ReadResponse( self, response, stream_dest, max_allowed = None, file_hashes_generator = None ):
         
         with self._lock:
             
@@ -464,6 +467,11 @@ class NetworkJob( object ):
             
             stream_dest.write( chunk )
             
+            if file_hashes_generator is not None:
+                
+                file_hashes_generator.AddBlock( chunk )
+                
+            
             total_bytes_read = response.raw.tell()
             
             if total_bytes_read == 0:
@@ -877,6 +885,16 @@ class NetworkJob( object ):
             
         
     
+    def GetFileHashes( self ):
+        
+        # sha256, md5, sha1, sha512 of what we wrote to the temp path, or None if we did not download to one
+        
+        with self._lock:
+            
+            return self._file_hashes
+            
+        
+    
     def GetCreationTime( self ):
         
         with self._lock:
@@ -1216,9 +1234,20 @@ class NetworkJob( object ):
                             
                         else:
                             
+                            # we hash the file as it comes in, so the importer does not have to read it all again
+                            file_hashes_generator = HydrusFileHandling.FileHashesGenerator()
+                            
                             with open( self._temp_path, 'wb' ) as f:
                                 
-                                self._ReadResponse( response, f )
+                                self._ReadResponse( response, f, file_hashes_generator = file_hashes_generator )
+                                
+                            
+                            if not self._IsCancelled():
+                                
+                                with self._lock:
+                                    
+                                    self._file_hashes = file_hashes_generator.GetHashes()
+                                    
                                 
                             
                         
@@ -82,7 +82,7 @@ options = {}
 
 NETWORK_VERSION = 20
 SOFTWARE_VERSION = 448
-CLIENT_API_VERSION = 18
+CLIENT_API_VERSION = 21
 
 SERVER_THUMBNAIL_DIMENSIONS = ( 200, 200 )
 
@@ -538,6 +538,7 @@ GENERAL_APPLICATION = 43
 GENERAL_ANIMATION = 44
 APPLICATION_CLIP = 45
 AUDIO_WAVE = 46
+APPLICATION_NDJSON = 47
 APPLICATION_OCTET_STREAM = 100
 APPLICATION_UNKNOWN = 101
 
@@ -618,6 +619,7 @@ mime_enum_lookup[ 'application/zip' ] = APPLICATION_ZIP
 mime_enum_lookup[ 'application/vnd.rar' ] = APPLICATION_RAR
 mime_enum_lookup[ 'application/x-7z-compressed' ] = APPLICATION_7Z
 mime_enum_lookup[ 'application/json' ] = APPLICATION_JSON
+mime_enum_lookup[ 'application/x-ndjson' ] = APPLICATION_NDJSON
 mime_enum_lookup[ 'application/hydrus-encrypted-zip' ] = APPLICATION_HYDRUS_ENCRYPTED_ZIP
 mime_enum_lookup[ 'application/hydrus-update-content' ] = APPLICATION_HYDRUS_UPDATE_CONTENT
 mime_enum_lookup[ 'application/hydrus-update-definitions' ] = APPLICATION_HYDRUS_UPDATE_DEFINITIONS
@@ -662,6 +664,7 @@ mime_string_lookup[ APPLICATION_FLASH ] = 'flash'
 mime_string_lookup[ APPLICATION_OCTET_STREAM ] = 'application/octet-stream'
 mime_string_lookup[ APPLICATION_YAML ] = 'yaml'
 mime_string_lookup[ APPLICATION_JSON ] = 'json'
+mime_string_lookup[ APPLICATION_NDJSON ] = 'ndjson'
 mime_string_lookup[ APPLICATION_PDF ] = 'pdf'
 mime_string_lookup[ APPLICATION_PSD ] = 'photoshop psd'
 mime_string_lookup[ APPLICATION_CLIP ] = 'clip'
@@ -713,6 +716,7 @@ mime_mimetype_string_lookup[ APPLICATION_FLASH ] = 'application/x-shockwave-flas
 mime_mimetype_string_lookup[ APPLICATION_OCTET_STREAM ] = 'application/octet-stream'
 mime_mimetype_string_lookup[ APPLICATION_YAML ] = 'application/x-yaml'
 mime_mimetype_string_lookup[ APPLICATION_JSON ] = 'application/json'
+mime_mimetype_string_lookup[ APPLICATION_NDJSON ] = 'application/x-ndjson'
 mime_mimetype_string_lookup[ APPLICATION_PDF ] = 'application/pdf'
 mime_mimetype_string_lookup[ APPLICATION_PSD ] = 'application/x-photoshop'
 mime_mimetype_string_lookup[ APPLICATION_CLIP ] = 'application/clip'
@@ -764,6 +768,7 @@ mime_ext_lookup[ APPLICATION_FLASH ] = '.swf'
 mime_ext_lookup[ APPLICATION_OCTET_STREAM ] = '.bin'
 mime_ext_lookup[ APPLICATION_YAML ] = '.yaml'
 mime_ext_lookup[ APPLICATION_JSON ] = '.json'
+mime_ext_lookup[ APPLICATION_NDJSON ] = '.ndjson'
 mime_ext_lookup[ APPLICATION_PDF ] = '.pdf'
 mime_ext_lookup[ APPLICATION_PSD ] = '.psd'
 mime_ext_lookup[ APPLICATION_CLIP ] = '.clip'
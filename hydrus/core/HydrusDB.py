@@ -1,8 +1,11 @@
 import collections
 import distutils.version
+import math
 import os
+import pathlib
 import queue
 import sqlite3
+import threading
 import traceback
 import time
 
@@ -275,9 +278,249 @@ class DBCursorTransactionWrapper( object ):
         return self._in_transaction and self._transaction_contains_writes and HydrusData.TimeHasPassed( self._transaction_start_time + self._transaction_commit_period )
         
     
+    def TransactionContainsWrites( self ):
+        
+        return self._in_transaction and self._transaction_contains_writes
+        
+    
+class DBCursorThreadDispatcher( object ):
+    
+    # the db modules hold onto one cursor for their whole life
+    # when we have read connections on other threads, this sends each call on to the cursor that belongs to the calling thread
+    
+    def __init__( self ):
+        
+        self._default_cursor = None
+        
+        self._thread_local = threading.local()
+        
+    
+    def __getattr__( self, name ):
+        
+        return getattr( self._GetCursor(), name )
+        
+    
+    def __iter__( self ):
+        
+        return iter( self._GetCursor() )
+        
+    
+    def _GetCursor( self ):
+        
+        return getattr( self._thread_local, 'cursor', self._default_cursor )
+        
+    
+    def execute( self, *args ):
+        
+        return self._GetCursor().execute( *args )
+        
+    
+    def executemany( self, *args ):
+        
+        return self._GetCursor().executemany( *args )
+        
+    
+    def SetDefaultCursor( self, cursor ):
+        
+        self._default_cursor = cursor
+        
+    
+    def SetThreadCursor( self, cursor ):
+        
+        self._thread_local.cursor = cursor
+        
+    
+class DBJobLatencyHistogram( object ):
+    
+    # log-spaced buckets from 0.1ms up, each about 19% wider than the last
+    # percentiles come out approximate, but recording a value is just a bit of arithmetic, so this can always be on
+    
+    MIN_VALUE = 0.0001
+    BUCKET_FACTOR = 2 ** 0.25
+    NUM_BUCKETS = 100
+    
+    def __init__( self ):
+        
+        self._counts = [ 0 ] * self.NUM_BUCKETS
+        self._num_values = 0
+        
+    
+    def AddValue( self, value ):
+        
+        if value <= self.MIN_VALUE:
+            
+            index = 0
+            
+        else:
+            
+            index = min( int( math.ceil( math.log( value / self.MIN_VALUE, self.BUCKET_FACTOR ) ) ), self.NUM_BUCKETS - 1 )
+            
+        
+        self._counts[ index ] += 1
+        self._num_values += 1
+        
+    
+    def GetPercentile( self, percentile ):
+        
+        if self._num_values == 0:
+            
+            return 0.0
+            
+        
+        target = max( 1, math.ceil( self._num_values * percentile / 100 ) )
+        
+        running_total = 0
+        
+        for ( index, count ) in enumerate( self._counts ):
+            
+            running_total += count
+            
+            if running_total >= target:
+                
+                return self.MIN_VALUE * ( self.BUCKET_FACTOR ** index )
+                
+            
+        
+        return self.MIN_VALUE * ( self.BUCKET_FACTOR ** ( self.NUM_BUCKETS - 1 ) )
+        
+    
+class DBActionStatistics( object ):
+    
+    def __init__( self ):
+        
+        self._num_jobs = 0
+        self._num_jobs_on_read_connections = 0
+        self._total_queue_time = 0.0
+        self._total_execution_time = 0.0
+        self._max_execution_time = 0.0
+        self._total_rows_changed = 0
+        self._total_result_size = 0
+        
+        self._queue_time_histogram = DBJobLatencyHistogram()
+        self._execution_time_histogram = DBJobLatencyHistogram()
+        
+    
+    def AddJob( self, queue_time, execution_time, rows_changed, result_size, on_read_connection ):
+        
+        self._num_jobs += 1
+        
+        if on_read_connection:
+            
+            self._num_jobs_on_read_connections += 1
+            
+        
+        self._total_queue_time += queue_time
+        self._total_execution_time += execution_time
+        self._max_execution_time = max( self._max_execution_time, execution_time )
+        self._total_rows_changed += rows_changed
+        self._total_result_size += result_size
+        
+        self._queue_time_histogram.AddValue( queue_time )
+        self._execution_time_histogram.AddValue( execution_time )
+        
+    
+    def GetTotalExecutionTime( self ):
+        
+        return self._total_execution_time
+        
+    
+    def ToDict( self ):
+        
+        d = {}
+        
+        d[ 'num_jobs' ] = self._num_jobs
+        d[ 'num_jobs_on_read_connections' ] = self._num_jobs_on_read_connections
+        d[ 'total_rows_changed' ] = self._total_rows_changed
+        d[ 'total_result_size' ] = self._total_result_size
+        
+        d[ 'execution_time' ] = {
+            'total' : self._total_execution_time,
+            'max' : self._max_execution_time,
+            'p50' : self._execution_time_histogram.GetPercentile( 50 ),
+            'p95' : self._execution_time_histogram.GetPercentile( 95 ),
+            'p99' : self._execution_time_histogram.GetPercentile( 99 )
+        }
+        
+        d[ 'queue_time' ] = {
+            'total' : self._total_queue_time,
+            'p50' : self._queue_time_histogram.GetPercentile( 50 ),
+            'p95' : self._queue_time_histogram.GetPercentile( 95 ),
+            'p99' : self._queue_time_histogram.GetPercentile( 99 )
+        }
+        
+        return d
+        
+    
+class DBJobStatistics( object ):
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._time_started = HydrusData.GetNow()
+        
+        self._keys_to_action_statistics = collections.defaultdict( DBActionStatistics )
+        
+    
+    def _GetResultSize( self, result ):
+        
+        if isinstance( result, ( list, set, dict, tuple, frozenset ) ):
+            
+            return len( result )
+            
+        
+        return 0
+        
+    
+    def GetStatistics( self ):
+        
+        with self._lock:
+            
+            rows = []
+            
+            for ( ( job_type, action ), action_statistics ) in sorted( self._keys_to_action_statistics.items(), key = lambda item: -item[1].GetTotalExecutionTime() ):
+                
+                d = action_statistics.ToDict()
+                
+                d[ 'job_type' ] = job_type
+                d[ 'action' ] = action
+                
+                rows.append( d )
+                
+            
+            return ( self._time_started, rows )
+            
+        
+    
+    def RecordJob( self, job_type, action, queue_time, execution_time, rows_changed, result, on_read_connection ):
+        
+        if job_type == 'read_write':
+            
+            job_type = 'read'
+            
+        
+        result_size = self._GetResultSize( result )
+        
+        with self._lock:
+            
+            self._keys_to_action_statistics[ ( job_type, action ) ].AddJob( queue_time, execution_time, rows_changed, result_size, on_read_connection )
+            
+        
+    
+    def Reset( self ):
+        
+        with self._lock:
+            
+            self._time_started = HydrusData.GetNow()
+            
+            self._keys_to_action_statistics = collections.defaultdict( DBActionStatistics )
+            
+        
+    
 class HydrusDB( object ):
     
     READ_WRITE_ACTIONS = []
+    CONCURRENT_READ_ACTIONS = []
     UPDATE_WAIT = 2
     
     def __init__( self, controller, db_dir, db_name ):
@@ -325,8 +568,16 @@ class HydrusDB( object ):
         self._could_not_initialise = False
         
         self._jobs = queue.Queue()
+        self._read_connection_jobs = queue.Queue()
         self._pubsubs = []
         
+        self._num_read_connections = HG.db_num_read_connections if HG.db_journal_mode == 'WAL' else 0
+        self._num_active_read_connections = 0
+        self._num_write_jobs_queued = 0
+        self._read_connections_lock = threading.Lock()
+        
+        self._job_statistics = DBJobStatistics()
+        
         self._currently_doing_job = False
         self._current_status = ''
         self._current_job_name = ''
@@ -335,6 +586,15 @@ class HydrusDB( object ):
         self._c = None
         self._is_connected = False
         
+        if self._num_read_connections > 0:
+            
+            self._cursor_dispatcher = DBCursorThreadDispatcher()
+            
+        else:
+            
+            self._cursor_dispatcher = None
+            
+        
         self._cursor_transaction_wrapper = None
         
         if os.path.exists( os.path.join( self._db_dir, self._db_filenames[ 'main' ] ) ):
@@ -626,11 +886,22 @@ class HydrusDB( object ):
             
             self._db = sqlite3.connect( db_path, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
             
-            self._c = self._db.cursor()
+            c = self._db.cursor()
+            
+            if self._cursor_dispatcher is None:
+                
+                self._c = c
+                
+            else:
+                
+                self._cursor_dispatcher.SetDefaultCursor( c )
+                
+                self._c = self._cursor_dispatcher
+                
             
             self._is_connected = True
             
-            self._cursor_transaction_wrapper = DBCursorTransactionWrapper( self._c, HG.db_transaction_commit_period )
+            self._cursor_transaction_wrapper = DBCursorTransactionWrapper( c, HG.db_transaction_commit_period )
             
             self._LoadModules()
             
@@ -696,6 +967,50 @@ class HydrusDB( object ):
             
         
     
+    def _InitReadConnectionDBCursor( self ):
+        
+        # a read connection opens everything read-only, so anything that tries to write through it fails fast and can be sent back to the main thread
+        # it gets its own mem db for temp tables
+        
+        def get_read_only_uri( filename ):
+            
+            return pathlib.Path( os.path.join( self._db_dir, filename ) ).as_uri() + '?mode=ro'
+            
+        
+        db = sqlite3.connect( get_read_only_uri( self._db_filenames[ 'main' ] ), uri = True, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
+        
+        c = db.cursor()
+        
+        if HG.no_db_temp_files:
+            
+            c.execute( 'PRAGMA temp_store = 2;' )
+            
+        
+        for ( name, filename ) in self._db_filenames.items():
+            
+            if name == 'main':
+                
+                continue
+                
+            
+            c.execute( 'ATTACH ? AS ' + name + ';', ( get_read_only_uri( filename ), ) )
+            
+        
+        c.execute( 'ATTACH ":memory:" AS mem;' )
+        
+        # these connections all hit the same pages, so no need to give each the full cache
+        cache_size = max( 16, HG.db_cache_size // 4 ) * 1024
+        
+        for name in self._db_filenames.keys():
+            
+            c.execute( 'PRAGMA {}.cache_size = -{};'.format( name, cache_size ) )
+            
+        
+        self._cursor_dispatcher.SetThreadCursor( c )
+        
+        return ( db, c )
+        
+    
     def _InitExternalDatabases( self ):
         
         pass
@@ -717,6 +1032,11 @@ class HydrusDB( object ):
         
         ( action, args, kwargs ) = job.GetCallableTuple()
         
+        result = None
+        
+        time_started = HydrusData.GetNowPrecise()
+        total_changes_started = self._db.total_changes
+        
         try:
             
             if job_type in ( 'read_write', 'write' ):
@@ -786,6 +1106,99 @@ class HydrusDB( object ):
             
             self.publish_status_update()
             
+            if job_type in ( 'read_write', 'write' ):
+                
+                with self._read_connections_lock:
+                    
+                    self._num_write_jobs_queued -= 1
+                    
+                
+            
+            rows_changed = max( 0, self._db.total_changes - total_changes_started ) if self._db is not None else 0
+            
+            self._job_statistics.RecordJob( job_type, action, time_started - job.GetCreationTime(), HydrusData.GetNowPrecise() - time_started, rows_changed, result, False )
+            
+        
+    
+    def _ProcessReadConnectionJob( self, job, c ):
+        
+        ( action, args, kwargs ) = job.GetCallableTuple()
+        
+        result = None
+        
+        time_started = HydrusData.GetNowPrecise()
+        total_changes_started = c.connection.total_changes
+        
+        try:
+            
+            self._StartReadConnectionJob()
+            
+            # the main connection may have applied writes to the shared caches that it has not committed yet, and our snapshot would not see them
+            # we check this after the job start notes are made, so any write that lands after the check is caught by those notes
+            cursor_transaction_wrapper = self._cursor_transaction_wrapper
+            
+            if cursor_transaction_wrapper is None or cursor_transaction_wrapper.TransactionContainsWrites():
+                
+                raise HydrusExceptions.DBReadConnectionStaleException( 'The main connection has uncommitted writes!' )
+                
+            
+            # one read transaction per job, so the whole job sees the same snapshot of the db
+            c.execute( 'BEGIN DEFERRED;' )
+            
+            try:
+                
+                result = self._Read( action, *args, **kwargs )
+                
+            finally:
+                
+                c.execute( 'COMMIT;' )
+                
+            
+            job.PutResult( result )
+            
+        except sqlite3.OperationalError as e:
+            
+            if 'readonly' in str( e ):
+                
+                # this job wanted to write something after all, so let the main thread do it
+                
+                self._PutJobOnMainQueue( job )
+                
+                return
+                
+            
+            self._ManageDBError( job, e )
+            
+        except HydrusExceptions.DBReadConnectionStaleException:
+            
+            # a write landed before or while we were reading, and our answer would be out of date, so let the main thread do it
+            
+            self._PutJobOnMainQueue( job )
+            
+            return
+            
+        except Exception as e:
+            
+            self._ManageDBError( job, e )
+            
+        
+        # reads only change temp tables, but that is still work
+        rows_changed = c.connection.total_changes - total_changes_started
+        
+        self._job_statistics.RecordJob( job.GetType(), action, time_started - job.GetCreationTime(), HydrusData.GetNowPrecise() - time_started, rows_changed, result, True )
+        
+    
+    def _PutJobOnMainQueue( self, job ):
+        
+        if job.GetType() in ( 'read_write', 'write' ):
+            
+            with self._read_connections_lock:
+                
+                self._num_write_jobs_queued += 1
+                
+            
+        
+        self._jobs.put( job )
         
     
     def _Read( self, action, *args, **kwargs ):
@@ -818,6 +1231,13 @@ class HydrusDB( object ):
         self._c.execute( 'PRAGMA shrink_memory;' )
         
     
+    def _StartReadConnectionJob( self ):
+        
+        # called on a read connection thread just before its job's read transaction starts
+        
+        pass
+        
+    
     def _STI( self, iterable_cursor ):
         
         # strip singleton tuples to an iterator
@@ -877,6 +1297,33 @@ class HydrusDB( object ):
         return self._currently_doing_job
         
     
+    def CanUseReadConnections( self ):
+        
+        # read connections only see committed data, so if the main thread has any write work in the pipe, reads go through it to stay consistent
+        
+        if self._pause_and_disconnect:
+            
+            return False
+            
+        
+        with self._read_connections_lock:
+            
+            if self._num_active_read_connections == 0 or self._num_write_jobs_queued > 0:
+                
+                return False
+                
+            
+        
+        cursor_transaction_wrapper = self._cursor_transaction_wrapper
+        
+        if cursor_transaction_wrapper is None or cursor_transaction_wrapper.TransactionContainsWrites():
+            
+            return False
+            
+        
+        return True
+        
+    
     def GetApproxTotalFileSize( self ):
         
         total = 0
@@ -891,6 +1338,11 @@ class HydrusDB( object ):
         return total
         
     
+    def GetJobStatistics( self ):
+        
+        return self._job_statistics.GetStatistics()
+        
+    
     def GetSSLPaths( self ):
         
         # create ssl keys
@@ -939,7 +1391,9 @@ class HydrusDB( object ):
     
     def LoopIsFinished( self ):
         
-        return self._loop_finished
+        with self._read_connections_lock:
+            
+            return self._loop_finished and self._num_active_read_connections == 0
         
     
     def JobsQueueEmpty( self ):
@@ -966,6 +1420,11 @@ class HydrusDB( object ):
         
         self._ready_to_serve_requests = True
         
+        for i in range( self._num_read_connections ):
+            
+            self._controller.CallToThreadLongRunning( self.ReadConnectionLoop )
+            
+        
         error_count = 0
         
         while not ( ( self._local_shutdown or HG.model_shutdown ) and self._jobs.empty() ):
@@ -1010,7 +1469,7 @@ class HydrusDB( object ):
                         raise
                         
                     
-                    self._jobs.put( job ) # couldn't lock db; put job back on queue
+                    self._PutJobOnMainQueue( job ) # couldn't lock db; put job back on queue
                     
                     time.sleep( 5 )
                     
@@ -1026,6 +1485,12 @@ class HydrusDB( object ):
                     
                     self._cursor_transaction_wrapper.CommitAndBegin()
                     
+                elif self._num_active_read_connections > 0 and self._cursor_transaction_wrapper.TransactionContainsWrites():
+                    
+                    # the read connections cannot be used until our writes are committed, so when things are quiet, let them back in
+                    
+                    self._cursor_transaction_wrapper.CommitAndBegin()
+                    
                 
             
             if self._pause_and_disconnect:
@@ -1080,16 +1545,108 @@ class HydrusDB( object ):
             raise HydrusExceptions.ShutdownException( 'Application has shut down!' )
             
         
-        self._jobs.put( job )
+        if action in self.CONCURRENT_READ_ACTIONS and self.CanUseReadConnections():
+            
+            self._read_connection_jobs.put( job )
+            
+        else:
+            
+            self._PutJobOnMainQueue( job )
+            
         
         return job.GetResult()
         
     
+    def ReadConnectionLoop( self ):
+        
+        with self._read_connections_lock:
+            
+            self._num_active_read_connections += 1
+            
+        
+        ( db, c ) = ( None, None )
+        
+        try:
+            
+            ( db, c ) = self._InitReadConnectionDBCursor()
+            
+            while not ( ( self._local_shutdown or HG.model_shutdown ) and self._read_connection_jobs.empty() ):
+                
+                try:
+                    
+                    job = self._read_connection_jobs.get( timeout = 1 )
+                    
+                    self._ProcessReadConnectionJob( job, c )
+                    
+                except queue.Empty:
+                    
+                    pass
+                    
+                
+                if self._pause_and_disconnect:
+                    
+                    c.close()
+                    db.close()
+                    
+                    ( db, c ) = ( None, None )
+                    
+                    while self._pause_and_disconnect:
+                        
+                        if self._local_shutdown or HG.model_shutdown:
+                            
+                            break
+                            
+                        
+                        time.sleep( 1 )
+                        
+                    
+                    ( db, c ) = self._InitReadConnectionDBCursor()
+                    
+                
+            
+        except Exception as e:
+            
+            HydrusData.Print( 'A db read connection failed! Its work will go to the main db thread. Error follows:' )
+            
+            HydrusData.PrintException( e )
+            
+        finally:
+            
+            if db is not None:
+                
+                c.close()
+                db.close()
+                
+            
+            with self._read_connections_lock:
+                
+                self._num_active_read_connections -= 1
+                
+                no_read_connections_left = self._num_active_read_connections == 0
+                
+            
+            if no_read_connections_left:
+                
+                # anything that slipped in while we were going down still needs doing
+                
+                while not self._read_connection_jobs.empty():
+                    
+                    self._PutJobOnMainQueue( self._read_connection_jobs.get() )
+                    
+                
+            
+        
+    
     def ReadyToServeRequests( self ):
         
         return self._ready_to_serve_requests
         
     
+    def ResetJobStatistics( self ):
+        
+        self._job_statistics.Reset()
+        
+    
     def Shutdown( self ):
         
         self._local_shutdown = True
@@ -1106,7 +1663,7 @@ class HydrusDB( object ):
             raise HydrusExceptions.ShutdownException( 'Application has shut down!' )
             
         
-        self._jobs.put( job )
+        self._PutJobOnMainQueue( job )
         
         if synchronous: return job.GetResult()
         
@@ -1119,8 +1676,8 @@ class TemporaryIntegerTableNameCache( object ):
         
         TemporaryIntegerTableNameCache.my_instance = self
         
-        self._column_names_to_table_names = collections.defaultdict( collections.deque )
-        self._column_names_counter = collections.Counter()
+        # each connection has its own mem db, so each thread gets its own names
+        self._thread_local = threading.local()
         
     
     @staticmethod
@@ -1136,15 +1693,27 @@ class TemporaryIntegerTableNameCache( object ):
             
         
     
+    def _GetThreadStructures( self ):
+        
+        if not hasattr( self._thread_local, 'column_names_to_table_names' ):
+            
+            self.Clear()
+            
+        
+        return ( self._thread_local.column_names_to_table_names, self._thread_local.column_names_counter )
+        
+    
     def Clear( self ):
         
-        self._column_names_to_table_names = collections.defaultdict( collections.deque )
-        self._column_names_counter = collections.Counter()
+        self._thread_local.column_names_to_table_names = collections.defaultdict( collections.deque )
+        self._thread_local.column_names_counter = collections.Counter()
         
     
     def GetName( self, column_name ):
         
-        table_names = self._column_names_to_table_names[ column_name ]
+        ( column_names_to_table_names, column_names_counter ) = self._GetThreadStructures()
+        
+        table_names = column_names_to_table_names[ column_name ]
         
         initialised = True
         
@@ -1152,13 +1721,13 @@ class TemporaryIntegerTableNameCache( object ):
             
             initialised = False
             
-            i = self._column_names_counter[ column_name ]
+            i = column_names_counter[ column_name ]
             
             table_name = 'mem.temp_int_{}_{}'.format( column_name, i )
             
             table_names.append( table_name )
             
-            self._column_names_counter[ column_name ] += 1
+            column_names_counter[ column_name ] += 1
             
         
         table_name = table_names.pop()
@@ -1168,7 +1737,9 @@ class TemporaryIntegerTableNameCache( object ):
     
     def ReleaseName( self, column_name, table_name ):
         
-        self._column_names_to_table_names[ column_name ].append( table_name )
+        ( column_names_to_table_names, column_names_counter ) = self._GetThreadStructures()
+        
+        column_names_to_table_names[ column_name ].append( table_name )
         
     
 class TemporaryIntegerTable( object ):
@@ -1841,6 +1841,8 @@ class JobDatabase( object ):
         
         self._result_ready = threading.Event()
         
+        self._creation_time = GetNowPrecise()
+        
     
     def __str__( self ):
         
@@ -1857,6 +1859,11 @@ class JobDatabase( object ):
         return ( self._action, self._args, self._kwargs )
         
     
+    def GetCreationTime( self ):
+        
+        return self._creation_time
+        
+    
     def GetResult( self ):
         
         time.sleep( 0.00001 ) # this one neat trick can save hassle on superquick jobs as event.wait can be laggy
@@ -44,6 +44,7 @@ class DBException( HydrusException ):
         
     
 class DBAccessException( HydrusException ): pass
+class DBReadConnectionStaleException( HydrusException ): pass
 class DBCredentialsException( HydrusException ): pass
 class FileMissingException( HydrusException ): pass
 class DirectoryMissingException( HydrusException ): pass
@@ -56,11 +56,11 @@ headers_and_mime = [
     ( ( ( 0, b'\x30\x26\xB2\x75\x8E\x66\xCF\x11\xA6\xD9\x00\xAA\x00\x62\xCE\x6C' ), ), HC.UNDETERMINED_WM )
     ]
 
-def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, percentage_in = 35 ):
+def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames, percentage_in = 35, numpy_image = None ):
     
     if mime in ( HC.IMAGE_JPEG, HC.IMAGE_PNG, HC.IMAGE_GIF, HC.IMAGE_WEBP, HC.IMAGE_TIFF, HC.IMAGE_ICON ): # not apng atm
         
-        thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime )
+        thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, numpy_image = numpy_image )
         
     elif mime == HC.APPLICATION_PSD:
         
@@ -135,6 +135,22 @@ def GenerateThumbnailBytes( path, target_resolution, mime, duration, num_frames,
     
     return thumbnail_bytes
     
+def GetAllHashesFromPath( path ):
+    
+    # one read of the file for everything, rather than a read for the sha256 and another for the rest
+    
+    file_hashes_generator = FileHashesGenerator()
+    
+    with open( path, 'rb' ) as f:
+        
+        for block in HydrusPaths.ReadFileLikeAsBlocks( f ):
+            
+            file_hashes_generator.AddBlock( block )
+            
+        
+    
+    return file_hashes_generator.GetHashes()
+    
 def GetExtraHashesFromPath( path ):
     
     h_md5 = hashlib.md5()
@@ -157,7 +173,7 @@ def GetExtraHashesFromPath( path ):
     
     return ( md5, sha1, sha512 )
     
-def GetFileInfo( path, mime = None, ok_to_look_for_hydrus_updates = False ):
+def GetFileInfo( path, mime = None, ok_to_look_for_hydrus_updates = False, numpy_image = None ):
     
     size = os.path.getsize( path )
     
@@ -195,7 +211,7 @@ def GetFileInfo( path, mime = None, ok_to_look_for_hydrus_updates = False ):
     
     if mime in ( HC.IMAGE_JPEG, HC.IMAGE_PNG, HC.IMAGE_GIF, HC.IMAGE_WEBP, HC.IMAGE_TIFF, HC.IMAGE_ICON ):
         
-        ( ( width, height ), duration, num_frames ) = HydrusImageHandling.GetImageProperties( path, mime )
+        ( ( width, height ), duration, num_frames ) = HydrusImageHandling.GetImageProperties( path, mime, numpy_image = numpy_image )
         
     elif mime == HC.APPLICATION_FLASH:
         
@@ -383,3 +399,33 @@ def GetMime( path, ok_to_look_for_hydrus_updates = False ):
     
     return HC.APPLICATION_UNKNOWN
     
+class FileHashesGenerator( object ):
+    
+    # for when the bytes are going past anyway, e.g. a download being written to disk
+    
+    def __init__( self ):
+        
+        self._h_sha256 = hashlib.sha256()
+        self._h_md5 = hashlib.md5()
+        self._h_sha1 = hashlib.sha1()
+        self._h_sha512 = hashlib.sha512()
+        
+    
+    def AddBlock( self, block ):
+        
+        self._h_sha256.update( block )
+        self._h_md5.update( block )
+        self._h_sha1.update( block )
+        self._h_sha512.update( block )
+        
+    
+    def GetHashes( self ):
+        
+        sha256 = self._h_sha256.digest()
+        md5 = self._h_md5.digest()
+        sha1 = self._h_sha1.digest()
+        sha512 = self._h_sha512.digest()
+        
+        return ( sha256, md5, sha1, sha512 )
+        
+    
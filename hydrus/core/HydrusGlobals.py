@@ -19,6 +19,12 @@ boot_debug = False
 db_cache_size = 200
 db_transaction_commit_period = 30
 
+# extra read-only connections, on their own threads, that can serve reads while the main db thread is busy. WAL only
+db_num_read_connections = 0
+
+# serve files on plain http with os.sendfile. experimental, since twisted has no public hook for it
+server_sendfile = False
+
 # if this is set to 1, transactions are not immediately synced to the journal so multiple can be undone following a power-loss
 # if set to 2, all transactions are synced, so once a new one starts you know the last one is on disk
 # corruption cannot occur either way, but since we have multiple ATTACH dbs with diff journals, let's not mess around when power-cut during heavy file import or w/e
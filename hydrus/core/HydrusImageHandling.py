@@ -133,6 +133,10 @@ def ConvertToPNGIfBMP( path ):
             HydrusPaths.CleanUpTempPath( os_file_handle, temp_path )
             
         
+        return True
+        
+    
+    return False
     
 def Dequantize( pil_image ):
     
@@ -358,11 +362,14 @@ def GeneratePILImageFromNumPyImage( numpy_image ):
     
     return pil_image
     
-def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime ):
+def GenerateThumbnailBytesFromStaticImagePath( path, target_resolution, mime, numpy_image = None ):
     
     if OPENCV_OK:
         
-        numpy_image = GenerateNumPyImage( path, mime )
+        if numpy_image is None:
+            
+            numpy_image = GenerateNumPyImage( path, mime )
+            
         
         thumbnail_numpy_image = ResizeNumPyImage( numpy_image, target_resolution )
         
@@ -508,11 +515,14 @@ def GetImagePixelHash( path, mime ):
     
     return hashlib.sha256( numpy_image.data.tobytes() ).digest()
     
-def GetImageProperties( path, mime ):
+def GetImageProperties( path, mime, numpy_image = None ):
     
     if OPENCV_OK and mime not in PIL_ONLY_MIMETYPES: # webp here too maybe eventually, or offload it all to ffmpeg
         
-        numpy_image = GenerateNumPyImage( path, mime )
+        if numpy_image is None:
+            
+            numpy_image = GenerateNumPyImage( path, mime )
+            
         
         ( width, height ) = GetResolutionNumPy( numpy_image )
         
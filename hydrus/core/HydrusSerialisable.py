@@ -1,6 +1,7 @@
 import hashlib
 import json
 import os
+import struct
 import zlib
 
 LZ4_OK = False
@@ -128,11 +129,68 @@ SERIALISABLE_TYPE_GUI_SESSION_CONTAINER = 104
 SERIALISABLE_TYPE_GUI_SESSION_PAGE_DATA = 105
 SERIALISABLE_TYPE_GUI_SESSION_CONTAINER_PAGE_NOTEBOOK = 106
 SERIALISABLE_TYPE_GUI_SESSION_CONTAINER_PAGE_SINGLE = 107
+SERIALISABLE_TYPE_SEED_STORAGE_REFERENCES = 108
 
 SERIALISABLE_TYPES_TO_OBJECT_TYPES = {}
 
+# big objects that are mostly ids, like repository updates, can also go over the network as packed binary, which is much faster to make and parse than json
+# network bytes that start with this prefix are that. zlib and lz4 output never starts with it
+BINARY_NETWORK_BYTES_PREFIX = b'hydrus binary\x00'
+
+BINARY_FORMAT_VERSION = 1
+
+BINARY_COMPRESSION_ZLIB = 0
+BINARY_COMPRESSION_LZ4 = 1
+
+# for 'None' in a list of integers
+BINARY_NULL_INTEGER = -2 ** 63
+
+def CreateFromBinaryNetworkBytes( network_bytes ):
+    
+    offset = len( BINARY_NETWORK_BYTES_PREFIX )
+    
+    ( binary_format_version, compression_type ) = struct.unpack_from( '<BB', network_bytes, offset )
+    
+    if binary_format_version > BINARY_FORMAT_VERSION:
+        
+        raise HydrusExceptions.SerialisationException( 'This object was packed with binary format version {}, but this program only understands up to {}! Please update your client.'.format( binary_format_version, BINARY_FORMAT_VERSION ) )
+        
+    
+    compressed_bytes = network_bytes[ offset + 2 : ]
+    
+    if compression_type == BINARY_COMPRESSION_ZLIB:
+        
+        obj_bytes = zlib.decompress( compressed_bytes )
+        
+    elif compression_type == BINARY_COMPRESSION_LZ4 and LZ4_OK:
+        
+        obj_bytes = lz4.block.decompress( compressed_bytes )
+        
+    else:
+        
+        raise HydrusExceptions.SerialisationException( 'Could not decompress a binary object, compression type {}!'.format( compression_type ) )
+        
+    
+    ( serialisable_type, ) = struct.unpack_from( '<H', obj_bytes, 0 )
+    
+    if serialisable_type not in SERIALISABLE_TYPES_TO_OBJECT_TYPES:
+        
+        raise HydrusExceptions.SerialisationException( 'Could not unpack a binary object of unknown serialisable type {}! Perhaps it is from a newer version of the program?'.format( serialisable_type ) )
+        
+    
+    obj = SERIALISABLE_TYPES_TO_OBJECT_TYPES[ serialisable_type ]()
+    
+    obj.InitialiseFromBinaryInfo( BinaryReader( obj_bytes[ 2 : ] ) )
+    
+    return obj
+    
 def CreateFromNetworkBytes( network_string, raise_error_on_future_version = False ):
     
+    if network_string.startswith( BINARY_NETWORK_BYTES_PREFIX ):
+        
+        return CreateFromBinaryNetworkBytes( network_string )
+        
+    
     try:
         
         obj_bytes = zlib.decompress( network_string )
@@ -240,6 +298,18 @@ class SerialisableBase( object ):
         return old_serialisable_info
         
     
+    def DumpToBinaryNetworkBytes( self ):
+        
+        binary_writer = BinaryWriter()
+        
+        self.WriteBinaryInfo( binary_writer )
+        
+        obj_bytes = struct.pack( '<H', self.SERIALISABLE_TYPE ) + binary_writer.GetBytes()
+        
+        # a fast compression level. the packed ints do not squash much smaller at 9, and 9 is slow
+        return BINARY_NETWORK_BYTES_PREFIX + struct.pack( '<BB', BINARY_FORMAT_VERSION, BINARY_COMPRESSION_ZLIB ) + zlib.compress( obj_bytes, 1 )
+        
+    
     def DumpToNetworkBytes( self ):
         
         obj_string = self.DumpToString()
@@ -284,6 +354,11 @@ class SerialisableBase( object ):
         return ( self.SERIALISABLE_TYPE, self.SERIALISABLE_VERSION, serialisable_info )
         
     
+    def InitialiseFromBinaryInfo( self, binary_reader ):
+        
+        raise NotImplementedError()
+        
+    
     def InitialiseFromSerialisableInfo( self, version, serialisable_info, raise_error_on_future_version = False ):
         
         if version > self.SERIALISABLE_VERSION:
@@ -312,6 +387,11 @@ class SerialisableBase( object ):
         self._InitialiseFromSerialisableInfo( serialisable_info )
         
     
+    def WriteBinaryInfo( self, binary_writer ):
+        
+        raise NotImplementedError()
+        
+    
 class SerialisableBaseNamed( SerialisableBase ):
     
     SERIALISABLE_TYPE = SERIALISABLE_TYPE_BASE_NAMED
@@ -603,3 +683,107 @@ class SerialisableList( SerialisableBase, list ):
         
     
 SERIALISABLE_TYPES_TO_OBJECT_TYPES[ SERIALISABLE_TYPE_LIST ] = SerialisableList
+
+class BinaryReader( object ):
+    
+    def __init__( self, data: bytes ):
+        
+        self._data = data
+        self._offset = 0
+        
+    
+    def _ReadCount( self ):
+        
+        ( count, ) = struct.unpack_from( '<I', self._data, self._offset )
+        
+        self._offset += 4
+        
+        return count
+        
+    
+    def ReadBytesList( self ):
+        
+        lengths = self.ReadIntegers()
+        
+        bytes_list = []
+        
+        for length in lengths:
+            
+            bytes_list.append( self._data[ self._offset : self._offset + length ] )
+            
+            self._offset += length
+            
+        
+        return bytes_list
+        
+    
+    def ReadInteger( self ):
+        
+        ( integer, ) = struct.unpack_from( '<q', self._data, self._offset )
+        
+        self._offset += 8
+        
+        return integer
+        
+    
+    def ReadIntegers( self ):
+        
+        count = self._ReadCount()
+        
+        integers = list( struct.unpack_from( '<{}q'.format( count ), self._data, self._offset ) )
+        
+        self._offset += 8 * count
+        
+        return integers
+        
+    
+    def ReadNoneableIntegers( self ):
+        
+        return [ None if integer == BINARY_NULL_INTEGER else integer for integer in self.ReadIntegers() ]
+        
+    
+    def ReadStrings( self ):
+        
+        return [ str( b, 'utf-8' ) for b in self.ReadBytesList() ]
+        
+    
+class BinaryWriter( object ):
+    
+    def __init__( self ):
+        
+        self._chunks = []
+        
+    
+    def AddBytesList( self, bytes_list ):
+        
+        self.AddIntegers( [ len( b ) for b in bytes_list ] )
+        
+        self._chunks.extend( bytes_list )
+        
+    
+    def AddInteger( self, integer ):
+        
+        self._chunks.append( struct.pack( '<q', integer ) )
+        
+    
+    def AddIntegers( self, integers ):
+        
+        self._chunks.append( struct.pack( '<I', len( integers ) ) )
+        self._chunks.append( struct.pack( '<{}q'.format( len( integers ) ), *integers ) )
+        
+    
+    def AddNoneableIntegers( self, integers ):
+        
+        self.AddIntegers( [ BINARY_NULL_INTEGER if integer is None else integer for integer in integers ] )
+        
+    
+    def AddStrings( self, strings ):
+        
+        self.AddBytesList( [ bytes( s, 'utf-8' ) for s in strings ] )
+        
+    
+    def GetBytes( self ):
+        
+        return b''.join( self._chunks )
+        
+    
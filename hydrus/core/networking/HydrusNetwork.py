@@ -1579,6 +1579,105 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
         return num
         
     
+    def InitialiseFromBinaryInfo( self, binary_reader ):
+        
+        num_blocks = binary_reader.ReadInteger()
+        
+        for i in range( num_blocks ):
+            
+            content_type = binary_reader.ReadInteger()
+            action = binary_reader.ReadInteger()
+            
+            if content_type == HC.CONTENT_TYPE_FILES and action == HC.CONTENT_UPDATE_ADD:
+                
+                columns = [ binary_reader.ReadNoneableIntegers() for j in range( 9 ) ]
+                
+                datas = list( zip( *columns ) )
+                
+            elif content_type == HC.CONTENT_TYPE_FILES:
+                
+                datas = binary_reader.ReadIntegers()
+                
+            elif content_type == HC.CONTENT_TYPE_MAPPINGS:
+                
+                tag_ids = binary_reader.ReadIntegers()
+                num_hash_ids = binary_reader.ReadIntegers()
+                all_hash_ids = binary_reader.ReadIntegers()
+                
+                datas = []
+                
+                offset = 0
+                
+                for ( tag_id, num ) in zip( tag_ids, num_hash_ids ):
+                    
+                    datas.append( ( tag_id, all_hash_ids[ offset : offset + num ] ) )
+                    
+                    offset += num
+                    
+                
+            elif content_type in ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_TYPE_TAG_SIBLINGS ):
+                
+                left_ids = binary_reader.ReadIntegers()
+                right_ids = binary_reader.ReadIntegers()
+                
+                datas = list( zip( left_ids, right_ids ) )
+                
+            else:
+                
+                raise HydrusExceptions.SerialisationException( 'Did not understand binary content update data of type {}!'.format( content_type ) )
+                
+            
+            if content_type not in self._content_data:
+                
+                self._content_data[ content_type ] = {}
+                
+            
+            self._content_data[ content_type ][ action ] = datas
+            
+        
+    
+    def WriteBinaryInfo( self, binary_writer ):
+        
+        # each block is written column by column, which packs and compresses far better than row tuples
+        
+        blocks = [ ( content_type, action, datas ) for ( content_type, actions_to_datas ) in self._content_data.items() for ( action, datas ) in actions_to_datas.items() ]
+        
+        binary_writer.AddInteger( len( blocks ) )
+        
+        for ( content_type, action, datas ) in blocks:
+            
+            binary_writer.AddInteger( content_type )
+            binary_writer.AddInteger( action )
+            
+            if content_type == HC.CONTENT_TYPE_FILES and action == HC.CONTENT_UPDATE_ADD:
+                
+                for j in range( 9 ):
+                    
+                    binary_writer.AddNoneableIntegers( [ data[ j ] for data in datas ] )
+                    
+                
+            elif content_type == HC.CONTENT_TYPE_FILES:
+                
+                binary_writer.AddIntegers( datas )
+                
+            elif content_type == HC.CONTENT_TYPE_MAPPINGS:
+                
+                binary_writer.AddIntegers( [ tag_id for ( tag_id, hash_ids ) in datas ] )
+                binary_writer.AddIntegers( [ len( hash_ids ) for ( tag_id, hash_ids ) in datas ] )
+                binary_writer.AddIntegers( [ hash_id for ( tag_id, hash_ids ) in datas for hash_id in hash_ids ] )
+                
+            elif content_type in ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_TYPE_TAG_SIBLINGS ):
+                
+                binary_writer.AddIntegers( [ left_id for ( left_id, right_id ) in datas ] )
+                binary_writer.AddIntegers( [ right_id for ( left_id, right_id ) in datas ] )
+                
+            else:
+                
+                raise HydrusExceptions.SerialisationException( 'Cannot write binary content update data of type {}!'.format( content_type ) )
+                
+            
+        
+    
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_CONTENT_UPDATE ] = ContentUpdate
 
 class Credentials( HydrusSerialisable.SerialisableBase ):
@@ -1866,6 +1965,28 @@ class DefinitionsUpdate( HydrusSerialisable.SerialisableBase ):
         return self._tag_ids_to_tags
         
     
+    def InitialiseFromBinaryInfo( self, binary_reader ):
+        
+        hash_ids = binary_reader.ReadIntegers()
+        hashes = binary_reader.ReadBytesList()
+        
+        self._hash_ids_to_hashes = dict( zip( hash_ids, hashes ) )
+        
+        tag_ids = binary_reader.ReadIntegers()
+        tags = binary_reader.ReadStrings()
+        
+        self._tag_ids_to_tags = dict( zip( tag_ids, tags ) )
+        
+    
+    def WriteBinaryInfo( self, binary_writer ):
+        
+        binary_writer.AddIntegers( list( self._hash_ids_to_hashes.keys() ) )
+        binary_writer.AddBytesList( list( self._hash_ids_to_hashes.values() ) )
+        
+        binary_writer.AddIntegers( list( self._tag_ids_to_tags.keys() ) )
+        binary_writer.AddStrings( list( self._tag_ids_to_tags.values() ) )
+        
+    
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_DEFINITIONS_UPDATE ] = DefinitionsUpdate
 
 class Metadata( HydrusSerialisable.SerialisableBase ):
@@ -2623,6 +2744,11 @@ class ServerServiceRepository( ServerServiceRestricted ):
             self._service_options[ 'nullification_period' ] = 90 * 86400
             
         
+        if 'binary_updates' not in self._service_options:
+            
+            self._service_options[ 'binary_updates' ] = False
+            
+        
         if 'next_nullification_update_index' not in dictionary:
             
             dictionary[ 'next_nullification_update_index' ] = 0
@@ -2633,6 +2759,14 @@ class ServerServiceRepository( ServerServiceRestricted ):
         self._metadata = dictionary[ 'metadata' ]
         
     
+    def GetBinaryUpdates( self ) -> bool:
+        
+        with self._lock:
+            
+            return self._service_options[ 'binary_updates' ]
+            
+        
+    
     def GetMetadata( self ):
         
         with self._lock:
@@ -2771,6 +2905,16 @@ class ServerServiceRepository( ServerServiceRestricted ):
             
         
     
+    def SetBinaryUpdates( self, binary_updates: bool ):
+        
+        with self._lock:
+            
+            self._service_options[ 'binary_updates' ] = binary_updates
+            
+            self._SetDirty()
+            
+        
+    
     def SetNullificationPeriod( self, nullification_period: int ):
         
         with self._lock:
@@ -2827,10 +2971,11 @@ class ServerServiceRepository( ServerServiceRestricted ):
                         
                     
                     update_period = self._service_options[ 'update_period' ]
+                    binary_updates = self._service_options[ 'binary_updates' ]
                     
                     end = begin + update_period
                     
-                    update_hashes = HG.server_controller.WriteSynchronous( 'create_update', service_key, begin, end )
+                    update_hashes = HG.server_controller.WriteSynchronous( 'create_update', service_key, begin, end, binary_updates = binary_updates )
                     
                     update_created = True
                     
@@ -2960,17 +3105,32 @@ class ServerServiceAdmin( ServerServiceRestricted ):
     
 class UpdateBuilder( object ):
     
-    def __init__( self, update_class, max_rows ):
+    def __init__( self, update_class, max_rows, finished_update_callable = None ):
         
         self._update_class = update_class
         self._max_rows = max_rows
         
+        # if this is set, full updates are handed off as soon as they are done rather than all kept in memory
+        self._finished_update_callable = finished_update_callable
+        
         self._updates = []
         
         self._current_update = self._update_class()
         self._current_num_rows = 0
         
     
+    def _FinishUpdate( self, update ):
+        
+        if self._finished_update_callable is None:
+            
+            self._updates.append( update )
+            
+        else:
+            
+            self._finished_update_callable( update )
+            
+        
+    
     def AddRow( self, row, row_weight = 1 ):
         
         self._current_update.AddRow( row )
@@ -2978,7 +3138,7 @@ class UpdateBuilder( object ):
         
         if self._current_num_rows > self._max_rows:
             
-            self._updates.append( self._current_update )
+            self._FinishUpdate( self._current_update )
             
             self._current_update = self._update_class()
             self._current_num_rows = 0
@@ -2989,7 +3149,7 @@ class UpdateBuilder( object ):
         
         if self._current_update.GetNumRows() > 0:
             
-            self._updates.append( self._current_update )
+            self._FinishUpdate( self._current_update )
             
         
         self._current_update = None
@@ -1,9 +1,14 @@
+import concurrent.futures
+import gzip
+import hashlib
 import os
+import selectors
+import threading
 import time
 import traceback
 
-from twisted.internet import reactor, defer
-from twisted.internet.threads import deferToThread
+from twisted.internet import reactor, defer, tcp
+from twisted.internet.threads import blockingCallFromThread, deferToThread
 from twisted.web.server import NOT_DONE_YET
 from twisted.web.resource import Resource
 from twisted.web.static import File as FileResource, NoRangeStaticProducer, SingleRangeStaticProducer, MultipleRangeStaticProducer
@@ -16,6 +21,48 @@ from hydrus.core import HydrusPaths
 from hydrus.core import HydrusSerialisable
 from hydrus.core.networking import HydrusServerRequest
 
+# small bodies are not worth the cpu
+MIN_BYTES_TO_COMPRESS = 1024
+
+COMPRESSIBLE_MIMES = { HC.APPLICATION_JSON, HC.TEXT_HTML, HC.TEXT_PLAIN }
+
+# a multipart response of many overlapping ranges is a cheap way to make us send a lot of data, so let's not go crazy
+MAX_RANGES_PER_REQUEST = 32
+
+SENDFILE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# each sendfile response holds a thread for as long as the client takes to download it, so we only run a few at once
+MAX_SENDFILE_THREADS = 8
+
+def CoalesceByteRanges( offset_and_block_size_pairs ):
+    
+    # overlapping and touching ranges become one, in file order, so asking for the same bytes many times does not make us send them many times. RFC 7233 4.1 is happy with this
+    
+    coalesced_pairs = []
+    
+    for ( range_start, range_end, offset, block_size ) in sorted( offset_and_block_size_pairs, key = lambda pair: pair[2] ):
+        
+        if len( coalesced_pairs ) > 0:
+            
+            ( previous_range_start, previous_range_end, previous_offset, previous_block_size ) = coalesced_pairs[-1]
+            
+            previous_end = previous_offset + previous_block_size
+            
+            if offset <= previous_end:
+                
+                coalesced_block_size = max( previous_end, offset + block_size ) - previous_offset
+                
+                coalesced_pairs[-1] = ( previous_offset, previous_offset + coalesced_block_size - 1, previous_offset, coalesced_block_size )
+                
+                continue
+                
+            
+        
+        coalesced_pairs.append( ( range_start, range_end, offset, block_size ) )
+        
+    
+    return coalesced_pairs
+    
 def GenerateEris( service ):
     
     name = service.GetName()
@@ -263,6 +310,9 @@ class HydrusDomain( object ):
     
 class HydrusResource( Resource ):
     
+    # whether a big json/text body may be gzipped for clients that ask for it
+    COMPRESS_RESPONSES = True
+    
     def __init__( self, service, domain ):
         
         Resource.__init__( self )
@@ -381,6 +431,29 @@ class HydrusResource( Resource ):
         return request
         
     
+    def _callbackPrepareResponseContext( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        response_context = request.hydrus_response_context
+        
+        if not ( self._responseWantsETag( request, response_context ) or self._responseWantsCompression( request, response_context ) ):
+            
+            return request
+            
+        
+        if len( response_context.GetBodyBytes() ) < MIN_BYTES_TO_COMPRESS:
+            
+            # not worth a thread
+            
+            return self._threadPrepareResponseContext( request )
+            
+        
+        # hashing and compressing a big json body is real work, so it happens off the reactor
+        
+        d = deferToThread( self._threadPrepareResponseContext, request )
+        
+        return d
+        
+    
     def _callbackRenderResponseContext( self, request: HydrusServerRequest.HydrusRequest ):
         
         self._CleanUpTempFile( request )
@@ -403,6 +476,28 @@ class HydrusResource( Resource ):
         
         response_context = request.hydrus_response_context
         
+        if response_context.HasETag():
+            
+            request.setHeader( 'ETag', response_context.GetETagHeaderValue() )
+            
+            if response_context.GetStatusCode() == 200 and self._requestETagMatches( request, response_context ):
+                
+                request.setResponseCode( 304 )
+                
+                if response_context.HasPath():
+                    
+                    request.setHeader( 'Cache-Control', 'max-age={}'.format( 86400 * 365 ) )
+                    
+                
+                self._reportDataUsed( request, 0 )
+                self._reportRequestUsed( request )
+                
+                request.finish()
+                
+                return
+                
+            
+        
         if response_context.HasPath():
             
             path = response_context.GetPath()
@@ -458,40 +553,76 @@ class HydrusResource( Resource ):
             request.setHeader( 'Expires', time.strftime( '%a, %d %b %Y %H:%M:%S GMT', time.gmtime( time.time() + 86400 * 365 ) ) )
             request.setHeader( 'Cache-Control', 'max-age={}'.format( 86400 * 365 ) )
             
-            if len( offset_and_block_size_pairs ) <= 1:
+            # a list of ( preamble_bytes, offset, block_size ) parts
+            file_parts = []
+            
+            if len( offset_and_block_size_pairs ) == 0:
+                
+                content_length = filesize
                 
                 request.setHeader( 'Content-Type', str( content_type ) )
+                request.setHeader( 'Content-Length', str( content_length ) )
                 
-                if len( offset_and_block_size_pairs ) == 0:
-                    
-                    content_length = filesize
-                    
-                    request.setHeader( 'Content-Length', str( content_length ) )
-                    
-                    producer = NoRangeStaticProducer( request, fileObject )
-                    
-                elif len( offset_and_block_size_pairs ) == 1:
-                    
-                    ( range_start, range_end, offset, block_size ) = offset_and_block_size_pairs[0]
-                    
-                    header_range_end = filesize - 1 if range_end is None else range_end
+                file_parts.append( ( b'', 0, filesize ) )
+                
+            elif len( offset_and_block_size_pairs ) == 1:
+                
+                ( range_start, range_end, offset, block_size ) = offset_and_block_size_pairs[0]
+                
+                content_length = block_size
+                
+                request.setHeader( 'Content-Type', str( content_type ) )
+                request.setHeader( 'Accept-Ranges', 'bytes' )
+                request.setHeader( 'Content-Range', 'bytes {}-{}/{}'.format( offset, offset + block_size - 1, filesize ) )
+                request.setHeader( 'Content-Length', str( content_length ) )
+                
+                file_parts.append( ( b'', offset, block_size ) )
+                
+            else:
+                
+                # multipart/byteranges. each part gets its own little header block, and the boundaries have to be exactly right or clients will choke
+                
+                boundary = HydrusData.GenerateKey().hex()
+                
+                content_length = 0
+                
+                for ( range_start, range_end, offset, block_size ) in offset_and_block_size_pairs:
                     
-                    content_length = block_size
+                    part_preamble = '\r\n--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n'.format( boundary, content_type, offset, offset + block_size - 1, filesize ).encode( 'utf-8' )
                     
-                    request.setHeader( 'Accept-Ranges', 'bytes' )
-                    request.setHeader( 'Content-Range', 'bytes {}-{}/{}'.format( offset, header_range_end, filesize ) )
-                    request.setHeader( 'Content-Length', str( content_length ) )
+                    file_parts.append( ( part_preamble, offset, block_size ) )
                     
-                    producer = SingleRangeStaticProducer( request, fileObject, offset, block_size )
+                    content_length += len( part_preamble ) + block_size
                     
                 
-            else:
+                closing_boundary = '\r\n--{}--\r\n'.format( boundary ).encode( 'utf-8' )
+                
+                file_parts.append( ( closing_boundary, 0, 0 ) )
+                
+                content_length += len( closing_boundary )
+                
+                request.setHeader( 'Content-Type', 'multipart/byteranges; boundary={}'.format( boundary ) )
+                request.setHeader( 'Accept-Ranges', 'bytes' )
+                request.setHeader( 'Content-Length', str( content_length ) )
+                
+            
+            if self._canSendfile( request ) and SendfileProducer.ReserveThread():
+                
+                producer = SendfileProducer( request, fileObject, file_parts )
+                
+            elif len( offset_and_block_size_pairs ) == 0:
+                
+                producer = NoRangeStaticProducer( request, fileObject )
+                
+            elif len( offset_and_block_size_pairs ) == 1:
+                
+                ( preamble, offset, block_size ) = file_parts[0]
                 
-                # hey, what a surprise, an http data transmission standard turned out to be a massive PITA
-                # MultipleRangeStaticProducer is the lad to use, but you have to figure out your own separation bits, which have even more finicky rules. more than I can deal with with the current time I have
-                # if/when you want to do this, check out the FileResource, it does it in its internal gubbins
+                producer = SingleRangeStaticProducer( request, fileObject, offset, block_size )
                 
-                raise HydrusExceptions.RangeNotSatisfiableException( 'Can only support Single Range requests at the moment!' )
+            else:
+                
+                producer = MultipleRangeStaticProducer( request, fileObject, file_parts )
                 
             
             producer.start()
@@ -514,8 +645,37 @@ class HydrusResource( Resource ):
             request.setHeader( 'Content-Length', str( content_length ) )
             request.setHeader( 'Content-Disposition', content_disposition )
             
+            if self.COMPRESS_RESPONSES and mime in COMPRESSIBLE_MIMES:
+                
+                request.setHeader( 'Vary', 'Accept-Encoding' )
+                
+            
+            if response_context.GetContentEncoding() is not None:
+                
+                request.setHeader( 'Content-Encoding', response_context.GetContentEncoding() )
+                
+            
             request.write( body_bytes )
             
+        elif response_context.HasBodyGenerator():
+            
+            mime = response_context.GetMime()
+            
+            content_type = HC.mime_mimetype_string_lookup[ mime ]
+            
+            # no Content-Length, so this goes out chunked and the client can start on it before we are done
+            
+            request.setHeader( 'Content-Type', content_type )
+            request.setHeader( 'Content-Disposition', 'inline' )
+            
+            # the generator can take a while to get through a big result, so it runs off the reactor thread. data used is reported when it is done
+            
+            content_length = 0
+            
+            deferToThread( self._threadWriteBodyGenerator, request, response_context.GetBodyGenerator() )
+            
+            do_finish = False
+            
         else:
             
             content_length = 0
@@ -535,6 +695,30 @@ class HydrusResource( Resource ):
             
         
     
+    def _canSendfile( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        # sendfile hands the file straight from the page cache to the socket, so it cannot go through TLS, which has to encrypt in userspace
+        
+        if not HG.server_sendfile or not hasattr( os, 'sendfile' ):
+            
+            return False
+            
+        
+        if request.isSecure() or request.method == b'HEAD':
+            
+            return False
+            
+        
+        if request.channel is None:
+            
+            return False
+            
+        
+        transport = request.channel.transport
+        
+        return SendfileProducer.TransportIsSupported( transport )
+        
+    
     def _checkService( self, request: HydrusServerRequest.HydrusRequest ):
         
         return request
@@ -588,6 +772,49 @@ class HydrusResource( Resource ):
             
         
     
+    def _clientAcceptsGZip( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        if not request.requestHeaders.hasHeader( 'Accept-Encoding' ):
+            
+            return False
+            
+        
+        for header_value in request.requestHeaders.getRawHeaders( 'Accept-Encoding' ):
+            
+            for coding in header_value.split( ',' ):
+                
+                ( name, *params ) = [ part.strip() for part in coding.split( ';' ) ]
+                
+                if name.lower() not in ( 'gzip', '*' ):
+                    
+                    continue
+                    
+                
+                for param in params:
+                    
+                    if param.startswith( 'q=' ):
+                        
+                        try:
+                            
+                            if float( param[2:] ) == 0:
+                                
+                                return False
+                                
+                            
+                        except ValueError:
+                            
+                            return False
+                            
+                        
+                    
+                
+                return True
+                
+            
+        
+        return False
+        
+    
     def _profileJob( self, call, request: HydrusServerRequest.HydrusRequest ):
         
         HydrusData.Profile( 'Profiling client api: {}'.format( request.path ), 'request.result_lmao = call( request )', globals(), locals(), min_duration_ms = HG.server_profile_min_job_time_ms )
@@ -748,6 +975,11 @@ class HydrusResource( Resource ):
             
             range_pair_strings = range_pairs_string.split( ',' )
             
+            if len( range_pair_strings ) > MAX_RANGES_PER_REQUEST:
+                
+                raise HydrusExceptions.RangeNotSatisfiableException( 'Sorry, that Range header had too many ranges!' )
+                
+            
             if True in ( '-' not in range_pair_string for range_pair_string in range_pair_strings ):
                 
                 raise HydrusExceptions.RangeNotSatisfiableException( 'Did not understand the Range header\'s range pair(s)!' )
@@ -789,6 +1021,11 @@ class HydrusResource( Resource ):
                 
                 if range_start is None:
                     
+                    if range_end > filesize:
+                        
+                        range_end = filesize
+                        
+                    
                     offset = filesize - range_end
                     block_size = range_end
                     
@@ -818,6 +1055,8 @@ class HydrusResource( Resource ):
                 offset_and_block_size_pairs.append( ( range_start, range_end, offset, block_size ) )
                 
             
+            offset_and_block_size_pairs = CoalesceByteRanges( offset_and_block_size_pairs )
+            
         
         return offset_and_block_size_pairs
         
@@ -836,6 +1075,64 @@ class HydrusResource( Resource ):
         HG.controller.ReportRequestUsed()
         
     
+    def _requestETagMatches( self, request: HydrusServerRequest.HydrusRequest, response_context: "ResponseContext" ):
+        
+        if request.method not in ( b'GET', b'HEAD' ) or not request.requestHeaders.hasHeader( 'If-None-Match' ):
+            
+            return False
+            
+        
+        etag = response_context.GetETag()
+        
+        for header_value in request.requestHeaders.getRawHeaders( 'If-None-Match' ):
+            
+            for request_etag in header_value.split( ',' ):
+                
+                request_etag = request_etag.strip()
+                
+                if request_etag == '*':
+                    
+                    return True
+                    
+                
+                # If-None-Match uses the weak comparison, so a W/ on either side does not matter
+                if request_etag.startswith( 'W/' ):
+                    
+                    request_etag = request_etag[2:]
+                    
+                
+                if request_etag.strip( '"' ) == etag:
+                    
+                    return True
+                    
+                
+            
+        
+        return False
+        
+    
+    def _responseWantsCompression( self, request: HydrusServerRequest.HydrusRequest, response_context: "ResponseContext" ):
+        
+        if not self.COMPRESS_RESPONSES or not response_context.HasBody() or response_context.GetStatusCode() != 200:
+            
+            return False
+            
+        
+        if response_context.GetMime() not in COMPRESSIBLE_MIMES or len( response_context.GetBodyBytes() ) < MIN_BYTES_TO_COMPRESS:
+            
+            return False
+            
+        
+        return self._clientAcceptsGZip( request )
+        
+    
+    def _responseWantsETag( self, request: HydrusServerRequest.HydrusRequest, response_context: "ResponseContext" ):
+        
+        # only a GET 200 can ever become a 304, so nothing else is worth hashing
+        
+        return request.method == b'GET' and response_context.HasBody() and response_context.GetStatusCode() == 200 and not response_context.HasETag()
+        
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         raise HydrusExceptions.NotFoundException( 'This service does not support that request!' )
@@ -891,6 +1188,63 @@ class HydrusResource( Resource ):
         raise HydrusExceptions.NotFoundException( 'This service does not support that request!' )
         
     
+    def _threadPrepareResponseContext( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        response_context = request.hydrus_response_context
+        
+        if self._responseWantsETag( request, response_context ):
+            
+            # a content digest, so a client polling the same thing over and over can get a 304
+            # it is weak since the gzipped and plain versions share it
+            response_context.SetETag( hashlib.sha256( response_context.GetBodyBytes() ).hexdigest()[:32], weak = True )
+            
+        
+        if self._responseWantsCompression( request, response_context ):
+            
+            response_context.SetCompressedBodyBytes( gzip.compress( response_context.GetBodyBytes(), compresslevel = 6 ), 'gzip' )
+            
+        
+        return request
+        
+    
+    def _threadWriteBodyGenerator( self, request: HydrusServerRequest.HydrusRequest, body_generator ):
+        
+        num_bytes = 0
+        
+        try:
+            
+            for chunk in body_generator:
+                
+                if request.channel is None:
+                    
+                    # Connection was lost, it seems.
+                    
+                    return
+                    
+                
+                blockingCallFromThread( reactor, request.write, chunk )
+                
+                num_bytes += len( chunk )
+                
+            
+        except Exception as e:
+            
+            # we already sent a 200, so all we can do is stop early
+            
+            HydrusData.Print( 'A streamed response failed halfway through!' )
+            HydrusData.PrintException( e )
+            
+        finally:
+            
+            self._reportDataUsed( request, num_bytes )
+            
+            if request.channel is not None:
+                
+                reactor.callFromThread( request.finish )
+                
+            
+        
+    
     def _CleanUpTempFile( self, request: HydrusServerRequest.HydrusRequest ):
         
         if hasattr( request, 'temp_file_info' ):
@@ -919,6 +1273,8 @@ class HydrusResource( Resource ):
         
         d.addCallback( self._callbackDoGETJob )
         
+        d.addCallback( self._callbackPrepareResponseContext )
+        
         d.addCallback( self._callbackRenderResponseContext )
         
         d.addErrback( self._errbackHandleProcessingError, request )
@@ -965,6 +1321,8 @@ class HydrusResource( Resource ):
         
         d.addCallback( self._callbackDoPOSTJob )
         
+        d.addCallback( self._callbackPrepareResponseContext )
+        
         d.addCallback( self._callbackRenderResponseContext )
         
         d.addErrback( self._errbackHandleProcessingError, request )
@@ -1001,7 +1359,7 @@ class HydrusResourceWelcome( HydrusResource ):
     
 class ResponseContext( object ):
     
-    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None ):
+    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None, body_generator = None, etag = None ):
         
         if body is None:
             
@@ -1035,6 +1393,13 @@ class ResponseContext( object ):
         self._body_bytes = body_bytes
         self._path = path
         self._cookies = cookies
+        self._body_generator = body_generator
+        
+        # for files, the hash is a perfect etag
+        self._etag = etag
+        self._etag_is_weak = False
+        
+        self._content_encoding = None
         
     
     def GetBodyBytes( self ):
@@ -1042,8 +1407,35 @@ class ResponseContext( object ):
         return self._body_bytes
         
     
+    def GetBodyGenerator( self ):
+        
+        return self._body_generator
+        
+    
+    def GetContentEncoding( self ):
+        
+        return self._content_encoding
+        
+    
     def GetCookies( self ): return self._cookies
     
+    def GetETag( self ):
+        
+        return self._etag
+        
+    
+    def GetETagHeaderValue( self ):
+        
+        header_value = '"{}"'.format( self._etag )
+        
+        if self._etag_is_weak:
+            
+            header_value = 'W/' + header_value
+            
+        
+        return header_value
+        
+    
     def GetMime( self ): return self._mime
     
     def GetPath( self ): return self._path
@@ -1052,5 +1444,255 @@ class ResponseContext( object ):
     
     def HasBody( self ): return self._body_bytes is not None
     
+    def HasBodyGenerator( self ): return self._body_generator is not None
+    
+    def HasETag( self ): return self._etag is not None
+    
     def HasPath( self ): return self._path is not None
     
+    def SetCompressedBodyBytes( self, body_bytes, content_encoding ):
+        
+        self._body_bytes = body_bytes
+        self._content_encoding = content_encoding
+        
+    
+    def SetETag( self, etag, weak = False ):
+        
+        self._etag = etag
+        self._etag_is_weak = weak
+        
+    
+class SendfileProducer( object ):
+    
+    # twisted's static producers read the file into python a buffer at a time and then queue that on the transport
+    # on a plain tcp connection we can skip all that and have the kernel copy straight from the file to the socket on a worker thread
+    # twisted leaves the socket alone while we work, since nothing else is written to a connection until its current request is finished
+    # the threads are a small shared pool. whoever makes us has to ReserveThread first, and if they cannot, twisted's producers do the job
+    
+    _thread_pool = concurrent.futures.ThreadPoolExecutor( max_workers = MAX_SENDFILE_THREADS, thread_name_prefix = 'sendfile' )
+    _thread_slots = threading.BoundedSemaphore( MAX_SENDFILE_THREADS )
+    
+    def __init__( self, request: HydrusServerRequest.HydrusRequest, file_object, file_parts ):
+        
+        self._request = request
+        self._file_object = file_object
+        self._file_parts = file_parts
+        
+        self._socket_fd = None
+        
+        self._stop_event = threading.Event()
+        
+        self._thread_reserved = True
+        self._thread_reserved_lock = threading.Lock()
+        
+    
+    def _Abort( self ):
+        
+        # we may have sent half a body, so the only honest thing to do is drop the connection
+        
+        if self._request.channel is not None:
+            
+            self._request.unregisterProducer()
+            
+            self._request.channel.transport.abortConnection()
+            
+        
+    
+    def _Finish( self ):
+        
+        if self._request.channel is not None:
+            
+            self._request.unregisterProducer()
+            
+            self._request.finish()
+            
+        
+    
+    def _ReleaseThread( self ):
+        
+        with self._thread_reserved_lock:
+            
+            if self._thread_reserved:
+                
+                self._thread_reserved = False
+                
+                SendfileProducer._thread_slots.release()
+                
+            
+        
+    
+    def _ResetChannelTimeout( self ):
+        
+        if self._request.channel is not None:
+            
+            self._request.channel.resetTimeout()
+            
+        
+    
+    def _StartWhenTransportIsDrained( self ):
+        
+        if self._stop_event.is_set() or self._request.channel is None:
+            
+            self._file_object.close()
+            
+            self._ReleaseThread()
+            
+            return
+            
+        
+        transport = self._request.channel.transport
+        
+        # the headers are still sitting in twisted's buffer, and they have to go first
+        # there is no public way to ask about this, hence the peeking
+        
+        if len( transport.dataBuffer ) - transport.offset > 0 or transport._tempDataLen > 0:
+            
+            reactor.callLater( 0.005, self._StartWhenTransportIsDrained )
+            
+            return
+            
+        
+        # our own handle on the socket, so if twisted closes its fd underneath us, we cannot end up writing to whatever gets that number next
+        self._socket_fd = os.dup( transport.fileno() )
+        
+        SendfileProducer._thread_pool.submit( self._THREADSendParts )
+        
+    
+    def _THREADSendParts( self ):
+        
+        selector = selectors.DefaultSelector()
+        
+        try:
+            
+            # the socket is non-blocking, and that is shared with twisted's fd, so we wait on it rather than change it
+            selector.register( self._socket_fd, selectors.EVENT_WRITE )
+            
+            file_fd = self._file_object.fileno()
+            
+            for ( preamble, offset, block_size ) in self._file_parts:
+                
+                preamble_view = memoryview( preamble )
+                
+                while len( preamble_view ) > 0:
+                    
+                    try:
+                        
+                        num_sent = os.write( self._socket_fd, preamble_view )
+                        
+                    except BlockingIOError:
+                        
+                        self._THREADWaitUntilWritable( selector )
+                        
+                        continue
+                        
+                    
+                    preamble_view = preamble_view[ num_sent : ]
+                    
+                
+                while block_size > 0:
+                    
+                    try:
+                        
+                        num_sent = os.sendfile( self._socket_fd, file_fd, offset, min( block_size, SENDFILE_CHUNK_SIZE ) )
+                        
+                    except BlockingIOError:
+                        
+                        self._THREADWaitUntilWritable( selector )
+                        
+                        continue
+                        
+                    
+                    if num_sent == 0:
+                        
+                        raise HydrusExceptions.FileMissingException( 'The file being sent was shorter than expected!' )
+                        
+                    
+                    offset += num_sent
+                    block_size -= num_sent
+                    
+                    reactor.callFromThread( self._ResetChannelTimeout )
+                    
+                
+            
+            reactor.callFromThread( self._Finish )
+            
+        except Exception as e:
+            
+            if not isinstance( e, ( HydrusExceptions.ShutdownException, ConnectionError ) ):
+                
+                HydrusData.ShowException( e )
+                
+            
+            reactor.callFromThread( self._Abort )
+            
+        finally:
+            
+            selector.close()
+            
+            os.close( self._socket_fd )
+            
+            self._file_object.close()
+            
+            self._ReleaseThread()
+            
+        
+    
+    def _THREADWaitUntilWritable( self, selector ):
+        
+        while len( selector.select( timeout = 1.0 ) ) == 0:
+            
+            if self._stop_event.is_set():
+                
+                raise HydrusExceptions.ShutdownException( 'Connection was lost.' )
+                
+            
+        
+    
+    def pauseProducing( self ):
+        
+        # we do not go through twisted's buffer, so it never needs to hold us back
+        
+        pass
+        
+    
+    @staticmethod
+    def ReserveThread():
+        
+        return SendfileProducer._thread_slots.acquire( blocking = False )
+        
+    
+    def resumeProducing( self ):
+        
+        pass
+        
+    
+    def start( self ):
+        
+        self._request.registerProducer( self, True )
+        
+        # this writes the status line and headers
+        self._request.write( b'' )
+        
+        self._StartWhenTransportIsDrained()
+        
+    
+    def stopProducing( self ):
+        
+        self._stop_event.set()
+        
+    
+    @staticmethod
+    def TransportIsSupported( transport ):
+        
+        # a plain tcp socket. TLS wraps the transport in a protocol, so it never gets here
+        
+        if not isinstance( transport, tcp.Connection ):
+            
+            return False
+            
+        
+        # we peek at twisted's write buffer to know when the headers are out, so if a twisted update moves it, we use the normal producers
+        
+        return all( ( hasattr( transport, name ) for name in ( 'dataBuffer', 'offset', '_tempDataLen' ) ) )
+        
+    
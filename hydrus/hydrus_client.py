@@ -35,10 +35,12 @@ try:
     argparser.add_argument( '--db_journal_mode', default = 'WAL', choices = [ 'WAL', 'TRUNCATE', 'PERSIST', 'MEMORY' ], help = 'change db journal mode (default=WAL)' )
     argparser.add_argument( '--db_cache_size', type = int, help = 'override SQLite cache_size per db file, in MB (default=200)' )
     argparser.add_argument( '--db_transaction_commit_period', type = int, help = 'override how often (in seconds) database changes are saved to disk (default=30,min=10)' )
+    argparser.add_argument( '--db_num_read_connections', type = int, help = 'number of extra read-only db connections that can serve some reads in parallel, WAL only (default=0,max=8)' )
     argparser.add_argument( '--db_synchronous_override', type = int, choices = range(4), help = 'override SQLite Synchronous PRAGMA (default=2)' )
     argparser.add_argument( '--no_db_temp_files', action='store_true', help = 'run db temp operations entirely in memory' )
     argparser.add_argument( '--boot_debug', action='store_true', help = 'print additional bootup information to the log' )
     argparser.add_argument( '--no_daemons', action='store_true', help = 'run without background daemons' )
+    argparser.add_argument( '--sendfile', action='store_true', help = 'EXPERIMENTAL: serve files on non-https connections with os.sendfile' )
     argparser.add_argument( '--no_wal', action='store_true', help = 'OBSOLETE: run using TRUNCATE db journaling' )
     argparser.add_argument( '--db_memory_journaling', action='store_true', help = 'OBSOLETE: run using MEMORY db journaling (DANGEROUS)' )
     
@@ -115,6 +117,11 @@ try:
         HG.db_transaction_commit_period = 30
         
     
+    if result.db_num_read_connections is not None and HG.db_journal_mode == 'WAL':
+        
+        HG.db_num_read_connections = min( max( 0, result.db_num_read_connections ), 8 )
+        
+    
     if result.db_synchronous_override is not None:
         
         HG.db_synchronous = int( result.db_synchronous_override )
@@ -135,6 +142,8 @@ try:
     
     HG.boot_debug = result.boot_debug
     
+    HG.server_sendfile = result.sendfile
+    
     try:
         
         from twisted.internet import reactor
@@ -48,6 +48,7 @@ try:
     argparser.add_argument( '--no_db_temp_files', action='store_true', help = 'run db temp operations entirely in memory' )
     argparser.add_argument( '--boot_debug', action='store_true', help = 'print additional bootup information to the log' )
     argparser.add_argument( '--no_daemons', action='store_true', help = 'run without background daemons' )
+    argparser.add_argument( '--sendfile', action='store_true', help = 'EXPERIMENTAL: serve files on non-https connections with os.sendfile' )
     argparser.add_argument( '--no_wal', action='store_true', help = 'OBSOLETE: run using TRUNCATE db journaling' )
     argparser.add_argument( '--db_memory_journaling', action='store_true', help = 'OBSOLETE: run using MEMORY db journaling (DANGEROUS)' )
     
@@ -146,6 +147,8 @@ try:
     
     HG.boot_debug = result.boot_debug
     
+    HG.server_sendfile = result.sendfile
+    
     if result.temp_dir is not None:
         
         HydrusPaths.SetEnvTempDir( result.temp_dir )
@@ -1,5 +1,6 @@
 import collections
 import hashlib
+import itertools
 import json
 import os
 import random
@@ -1794,7 +1795,7 @@ class DB( HydrusDB.HydrusDB ):
         self._c.execute( 'CREATE TABLE ' + update_table_name + ' ( master_hash_id INTEGER PRIMARY KEY );' )
         
     
-    def _RepositoryCreateUpdate( self, service_key, begin, end ):
+    def _RepositoryCreateUpdate( self, service_key, begin, end, binary_updates = False ):
         
         service_id = self._GetServiceId( service_key )
         
@@ -1802,41 +1803,22 @@ class DB( HydrusDB.HydrusDB ):
         
         HydrusData.Print( 'Creating update for ' + repr( name ) + ' from ' + HydrusData.ConvertTimestampToPrettyTime( begin, in_utc = True ) + ' to ' + HydrusData.ConvertTimestampToPrettyTime( end, in_utc = True ) )
         
-        updates = self._RepositoryGenerateUpdates( service_id, begin, end )
+        # each finished update is packed and written while we keep reading rows for the next, so we only ever hold a few in memory
+        update_file_writer = ServerFiles.UpdateFileWriter( binary_updates )
         
-        update_hashes = []
+        try:
+            
+            self._RepositoryGenerateUpdates( service_id, begin, end, finished_update_callable = update_file_writer.AddUpdate )
+            
+        finally:
+            
+            update_hashes = update_file_writer.Finish()
+            
         
-        total_definition_rows = 0
-        total_content_rows = 0
         
-        if len( updates ) > 0:
-            
-            for update in updates:
-                
-                num_rows = update.GetNumRows()
-                
-                if isinstance( update, HydrusNetwork.DefinitionsUpdate ):
-                    
-                    total_definition_rows += num_rows
-                    
-                elif isinstance( update, HydrusNetwork.ContentUpdate ):
-                    
-                    total_content_rows += num_rows
-                    
-                
-                update_bytes = update.DumpToNetworkBytes()
-                
-                update_hash = hashlib.sha256( update_bytes ).digest()
-                
-                dest_path = ServerFiles.GetExpectedFilePath( update_hash )
-                
-                with open( dest_path, 'wb' ) as f:
-                    
-                    f.write( update_bytes )
-                    
-                
-                update_hashes.append( update_hash )
-                
+        ( total_definition_rows, total_content_rows ) = update_file_writer.GetNumRows()
+        
+        if len( update_hashes ) > 0:
             
             ( update_table_name ) = GenerateRepositoryUpdateTableName( service_id )
             
@@ -1845,7 +1827,7 @@ class DB( HydrusDB.HydrusDB ):
             self._c.executemany( 'INSERT OR IGNORE INTO ' + update_table_name + ' ( master_hash_id ) VALUES ( ? );', ( ( master_hash_id, ) for master_hash_id in master_hash_ids ) )
             
         
-        HydrusData.Print( 'Update OK. ' + HydrusData.ToHumanInt( total_definition_rows ) + ' definition rows and ' + HydrusData.ToHumanInt( total_content_rows ) + ' content rows in ' + HydrusData.ToHumanInt( len( updates ) ) + ' update files.' )
+        HydrusData.Print( 'Update OK. ' + HydrusData.ToHumanInt( total_definition_rows ) + ' definition rows and ' + HydrusData.ToHumanInt( total_content_rows ) + ' content rows in ' + HydrusData.ToHumanInt( len( update_hashes ) ) + ' update files.' )
         
         return update_hashes
         
@@ -1991,17 +1973,18 @@ class DB( HydrusDB.HydrusDB ):
         return updates
         
     
-    def _RepositoryGenerateUpdates( self, service_id, begin, end ):
+    def _RepositoryGenerateUpdates( self, service_id, begin, end, finished_update_callable = None ):
+        
+        # the queries here are iterated as cursors, not fetched, so a huge update period streams through the builders rather than sitting in memory
+        # this means we cannot run any other query until each loop is done
         
         MAX_DEFINITIONS_ROWS = 50000
         MAX_CONTENT_ROWS = 250000
         
         MAX_CONTENT_CHUNK = 25000
         
-        updates = []
-        
-        definitions_update_builder = HydrusNetwork.UpdateBuilder( HydrusNetwork.DefinitionsUpdate, MAX_DEFINITIONS_ROWS )
-        content_update_builder = HydrusNetwork.UpdateBuilder( HydrusNetwork.ContentUpdate, MAX_CONTENT_ROWS )
+        definitions_update_builder = HydrusNetwork.UpdateBuilder( HydrusNetwork.DefinitionsUpdate, MAX_DEFINITIONS_ROWS, finished_update_callable = finished_update_callable )
+        content_update_builder = HydrusNetwork.UpdateBuilder( HydrusNetwork.ContentUpdate, MAX_CONTENT_ROWS, finished_update_callable = finished_update_callable )
         
         ( service_hash_ids_table_name, service_tag_ids_table_name ) = GenerateRepositoryMasterMapTableNames( service_id )
         
@@ -2021,8 +2004,6 @@ class DB( HydrusDB.HydrusDB ):
         
         definitions_update_builder.Finish()
         
-        updates.extend( definitions_update_builder.GetUpdates() )
-        
         #
         
         ( current_files_table_name, deleted_files_table_name, pending_files_table_name, petitioned_files_table_name, ip_addresses_table_name ) = GenerateRepositoryFilesTableNames( service_id )
@@ -2036,9 +2017,7 @@ class DB( HydrusDB.HydrusDB ):
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, file_row ) )
             
         
-        service_hash_ids = [ service_hash_id for ( service_hash_id, ) in self._c.execute( 'SELECT service_hash_id FROM ' + deleted_files_table_name + ' WHERE file_timestamp BETWEEN ? AND ?;', ( begin, end ) ) ]
-        
-        for service_hash_id in service_hash_ids:
+        for ( service_hash_id, ) in self._c.execute( 'SELECT service_hash_id FROM ' + deleted_files_table_name + ' WHERE file_timestamp BETWEEN ? AND ?;', ( begin, end ) ):
             
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, service_hash_id ) )
             
@@ -2047,27 +2026,21 @@ class DB( HydrusDB.HydrusDB ):
         
         ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = GenerateRepositoryMappingsTableNames( service_id )
         
-        service_tag_ids_to_service_hash_ids = HydrusData.BuildKeyToListDict( self._c.execute( 'SELECT service_tag_id, service_hash_id FROM ' + current_mappings_table_name + ' WHERE mapping_timestamp BETWEEN ? AND ?;', ( begin, end ) ) )
-        
-        for ( service_tag_id, service_hash_ids ) in list(service_tag_ids_to_service_hash_ids.items()):
+        for ( mappings_table_name, action ) in ( ( current_mappings_table_name, HC.CONTENT_UPDATE_ADD ), ( deleted_mappings_table_name, HC.CONTENT_UPDATE_DELETE ) ):
             
-            for block_of_service_hash_ids in HydrusData.SplitListIntoChunks( service_hash_ids, MAX_CONTENT_CHUNK ):
-                
-                row_weight = len( block_of_service_hash_ids )
-                
-                content_update_builder.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( service_tag_id, block_of_service_hash_ids ) ), row_weight )
-                
+            # ordering by tag means each tag comes out in one run, so we make as few rows as the old grouped dict did
+            # sqlite's sorter spills to disk for a huge period, so memory stays bounded
             
-        
-        service_tag_ids_to_service_hash_ids = HydrusData.BuildKeyToListDict( self._c.execute( 'SELECT service_tag_id, service_hash_id FROM ' + deleted_mappings_table_name + ' WHERE mapping_timestamp BETWEEN ? AND ?;', ( begin, end ) ) )
-        
-        for ( service_tag_id, service_hash_ids ) in list(service_tag_ids_to_service_hash_ids.items()):
+            cursor = self._c.execute( 'SELECT service_tag_id, service_hash_id FROM ' + mappings_table_name + ' WHERE mapping_timestamp BETWEEN ? AND ? ORDER BY service_tag_id;', ( begin, end ) )
             
-            for block_of_service_hash_ids in HydrusData.SplitListIntoChunks( service_hash_ids, MAX_CONTENT_CHUNK ):
+            for ( service_tag_id, rows ) in itertools.groupby( cursor, key = lambda row: row[0] ):
                 
-                row_weight = len( block_of_service_hash_ids )
-                
-                content_update_builder.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( service_tag_id, block_of_service_hash_ids ) ), row_weight )
+                for block_of_service_hash_ids in HydrusData.SplitIteratorIntoChunks( ( service_hash_id for ( service_tag_id_gumpf, service_hash_id ) in rows ), MAX_CONTENT_CHUNK ):
+                    
+                    row_weight = len( block_of_service_hash_ids )
+                    
+                    content_update_builder.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, action, ( service_tag_id, block_of_service_hash_ids ) ), row_weight )
+                    
                 
             
         
@@ -2075,16 +2048,12 @@ class DB( HydrusDB.HydrusDB ):
         
         ( current_tag_parents_table_name, deleted_tag_parents_table_name, pending_tag_parents_table_name, petitioned_tag_parents_table_name ) = GenerateRepositoryTagParentsTableNames( service_id )
         
-        pairs = self._c.execute( 'SELECT child_service_tag_id, parent_service_tag_id FROM ' + current_tag_parents_table_name + ' WHERE parent_timestamp BETWEEN ? AND ?;', ( begin, end ) ).fetchall()
-        
-        for pair in pairs:
+        for pair in self._c.execute( 'SELECT child_service_tag_id, parent_service_tag_id FROM ' + current_tag_parents_table_name + ' WHERE parent_timestamp BETWEEN ? AND ?;', ( begin, end ) ):
             
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, pair ) )
             
         
-        pairs = self._c.execute( 'SELECT child_service_tag_id, parent_service_tag_id FROM ' + deleted_tag_parents_table_name + ' WHERE parent_timestamp BETWEEN ? AND ?;', ( begin, end ) ).fetchall()
-        
-        for pair in pairs:
+        for pair in self._c.execute( 'SELECT child_service_tag_id, parent_service_tag_id FROM ' + deleted_tag_parents_table_name + ' WHERE parent_timestamp BETWEEN ? AND ?;', ( begin, end ) ):
             
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_DELETE, pair ) )
             
@@ -2093,16 +2062,12 @@ class DB( HydrusDB.HydrusDB ):
         
         ( current_tag_siblings_table_name, deleted_tag_siblings_table_name, pending_tag_siblings_table_name, petitioned_tag_siblings_table_name ) = GenerateRepositoryTagSiblingsTableNames( service_id )
         
-        pairs = self._c.execute( 'SELECT bad_service_tag_id, good_service_tag_id FROM ' + current_tag_siblings_table_name + ' WHERE sibling_timestamp BETWEEN ? AND ?;', ( begin, end ) ).fetchall()
-        
-        for pair in pairs:
+        for pair in self._c.execute( 'SELECT bad_service_tag_id, good_service_tag_id FROM ' + current_tag_siblings_table_name + ' WHERE sibling_timestamp BETWEEN ? AND ?;', ( begin, end ) ):
             
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, pair ) )
             
         
-        pairs = self._c.execute( 'SELECT bad_service_tag_id, good_service_tag_id FROM ' + deleted_tag_siblings_table_name + ' WHERE sibling_timestamp BETWEEN ? AND ?;', ( begin, end ) ).fetchall()
-        
-        for pair in pairs:
+        for pair in self._c.execute( 'SELECT bad_service_tag_id, good_service_tag_id FROM ' + deleted_tag_siblings_table_name + ' WHERE sibling_timestamp BETWEEN ? AND ?;', ( begin, end ) ):
             
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE, pair ) )
             
@@ -2111,9 +2076,8 @@ class DB( HydrusDB.HydrusDB ):
         
         content_update_builder.Finish()
         
-        updates.extend( content_update_builder.GetUpdates() )
-        
-        return updates
+        # if we had a finished_update_callable, these are empty
+        return definitions_update_builder.GetUpdates() + content_update_builder.GetUpdates()
         
     
     def _RepositoryGetAccountInfo( self, service_id, account_id ):
@@ -1,16 +1,24 @@
+import concurrent.futures
+import concurrent.futures.process
+import hashlib
+import multiprocessing
 import os
 
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core.networking import HydrusNetwork
 
 def GetAllHashes( file_type ):
     
     return { bytes.fromhex( os.path.split( path )[1] ) for path in IterateAllPaths( file_type ) }
     
-def GetExpectedFilePath( hash ):
+def GetExpectedFilePath( hash, files_dir = None ):
     
-    files_dir = HG.server_controller.GetFilesDir()
+    if files_dir is None:
+        
+        files_dir = HG.server_controller.GetFilesDir()
+        
     
     hash_encoded = hash.hex()
     
@@ -79,3 +87,157 @@ def IterateAllPaths( file_type ):
             
         
     
+def WriteUpdateFile( update, binary_updates, files_dir ):
+    
+    # this may run in a worker process, so it cannot touch the controller
+    
+    if binary_updates:
+        
+        update_bytes = update.DumpToBinaryNetworkBytes()
+        
+    else:
+        
+        update_bytes = update.DumpToNetworkBytes()
+        
+    
+    update_hash = hashlib.sha256( update_bytes ).digest()
+    
+    dest_path = GetExpectedFilePath( update_hash, files_dir = files_dir )
+    
+    with open( dest_path, 'wb' ) as f:
+        
+        f.write( update_bytes )
+        
+    
+    return update_hash
+    
+class UpdateFileWriter( object ):
+    
+    # small updates are not worth the process startup and pickling, so they are written here
+    MIN_ROWS_FOR_WORKER_PROCESS = 20000
+    
+    def __init__( self, binary_updates, num_processes = 4 ):
+        
+        self._binary_updates = binary_updates
+        self._num_processes = num_processes
+        
+        self._files_dir = HG.server_controller.GetFilesDir()
+        
+        self._executor = None
+        
+        # update hashes, or futures that will give them, in the order the updates came in
+        self._results = []
+        self._futures_to_updates = {}
+        
+        self._num_definition_rows = 0
+        self._num_content_rows = 0
+        
+    
+    def _GetExecutor( self ):
+        
+        if self._executor is None:
+            
+            mp_context = multiprocessing.get_context( 'spawn' )
+            
+            self._executor = concurrent.futures.ProcessPoolExecutor( max_workers = self._num_processes, mp_context = mp_context )
+            
+        
+        return self._executor
+        
+    
+    def _GetResult( self, future ):
+        
+        try:
+            
+            update_hash = future.result()
+            
+        except concurrent.futures.process.BrokenProcessPool:
+            
+            HydrusData.Print( 'The update packing worker process pool broke! The update will be written in the main process.' )
+            
+            update_hash = WriteUpdateFile( self._futures_to_updates[ future ], self._binary_updates, self._files_dir )
+            
+        
+        del self._futures_to_updates[ future ]
+        
+        return update_hash
+        
+    
+    def _WaitForFreeWorker( self ):
+        
+        # the updates waiting in the pipe are still in memory, so we do not let the db thread get too far ahead
+        
+        while len( self._futures_to_updates ) >= self._num_processes * 2:
+            
+            concurrent.futures.wait( list( self._futures_to_updates.keys() ), return_when = concurrent.futures.FIRST_COMPLETED )
+            
+            for ( i, result ) in enumerate( self._results ):
+                
+                if isinstance( result, concurrent.futures.Future ) and result.done():
+                    
+                    self._results[ i ] = self._GetResult( result )
+                    
+                
+            
+        
+    
+    def AddUpdate( self, update ):
+        
+        num_rows = update.GetNumRows()
+        
+        if isinstance( update, HydrusNetwork.DefinitionsUpdate ):
+            
+            self._num_definition_rows += num_rows
+            
+        elif isinstance( update, HydrusNetwork.ContentUpdate ):
+            
+            self._num_content_rows += num_rows
+            
+        
+        if num_rows >= self.MIN_ROWS_FOR_WORKER_PROCESS and self._num_processes > 0:
+            
+            self._WaitForFreeWorker()
+            
+            try:
+                
+                future = self._GetExecutor().submit( WriteUpdateFile, update, self._binary_updates, self._files_dir )
+                
+                self._futures_to_updates[ future ] = update
+                
+                self._results.append( future )
+                
+                return
+                
+            except concurrent.futures.process.BrokenProcessPool:
+                
+                self._num_processes = 0
+                
+            
+        
+        self._results.append( WriteUpdateFile( update, self._binary_updates, self._files_dir ) )
+        
+    
+    def Finish( self ):
+        
+        try:
+            
+            update_hashes = [ self._GetResult( result ) if isinstance( result, concurrent.futures.Future ) else result for result in self._results ]
+            
+        finally:
+            
+            if self._executor is not None:
+                
+                self._executor.shutdown()
+                
+                self._executor = None
+                
+            
+        
+        return update_hashes
+        
+    
+    def GetNumRows( self ):
+        
+        return ( self._num_definition_rows, self._num_content_rows )
+        
+    
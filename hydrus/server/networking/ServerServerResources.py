@@ -36,6 +36,9 @@ class HydrusResourceHydrusNetwork( HydrusServerResources.HydrusResource ):
     
     BLOCKED_WHEN_BUSY = True
     
+    # our bodies are already zlibbed network bytes
+    COMPRESS_RESPONSES = False
+    
     def _callbackParseGETArgs( self, request: HydrusServerRequest.HydrusRequest ):
         
         parsed_request_args = HydrusNetworkVariableHandling.ParseHydrusNetworkGETArgs( request.args )
@@ -381,6 +384,32 @@ class HydrusResourceRestrictedOptionsModify( HydrusResourceRestricted ):
         request.hydrus_account.CheckPermission( HC.CONTENT_TYPE_OPTIONS, HC.PERMISSION_ACTION_MODERATE )
         
     
+class HydrusResourceRestrictedOptionsModifyBinaryUpdates( HydrusResourceRestrictedOptionsModify ):
+    
+    def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        binary_updates = bool( request.parsed_request_args[ 'binary_updates' ] )
+        
+        old_binary_updates = self._service.GetBinaryUpdates()
+        
+        if old_binary_updates != binary_updates:
+            
+            self._service.SetBinaryUpdates( binary_updates )
+            
+            HydrusData.Print(
+                'Account {} changed the binary updates option from "{}" to "{}".'.format(
+                    request.hydrus_account.GetAccountKey().hex(),
+                    old_binary_updates,
+                    binary_updates
+                )
+            )
+            
+        
+        response_context = HydrusServerResources.ResponseContext( 200 )
+        
+        return response_context
+        
+    
 class HydrusResourceRestrictedOptionsModifyNullificationPeriod( HydrusResourceRestrictedOptionsModify ):
     
     def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
@@ -1017,7 +1046,7 @@ class HydrusResourceRestrictedRepositoryFile( HydrusResourceRestricted ):
         
         path = ServerFiles.GetFilePath( hash )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, path = path, etag = hash.hex() )
         
         return response_context
         
@@ -1071,7 +1100,7 @@ class HydrusResourceRestrictedRepositoryThumbnail( HydrusResourceRestricted ):
         
         path = ServerFiles.GetThumbnailPath( hash )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path, etag = hash.hex() )
         
         return response_context
         
@@ -1148,7 +1177,7 @@ class HydrusResourceRestrictedUpdate( HydrusResourceRestricted ):
         
         path = ServerFiles.GetFilePath( update_hash )
         
-        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path )
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path, etag = update_hash.hex() )
         
         return response_context
         
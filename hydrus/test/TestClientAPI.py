@@ -1,10 +1,12 @@
 import collections
+import gzip
 import hashlib
 import http.client
 import json
 import os
 import random
 import shutil
+import struct
 import time
 import unittest
 import urllib
@@ -17,6 +19,7 @@ from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusTags
 from hydrus.core import HydrusText
+from hydrus.core.networking import HydrusServerResources
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientAPI
@@ -114,6 +117,27 @@ class TestClientAPI( unittest.TestCase ):
         self.assertEqual( response_json[ 'version' ], HC.CLIENT_API_VERSION )
         self.assertEqual( response_json[ 'hydrus_version' ], HC.SOFTWARE_VERSION )
         
+        etag = response.getheader( 'ETag' )
+        
+        self.assertTrue( etag.startswith( 'W/"' ) )
+        
+        connection.request( 'GET', '/api_version', headers = { 'If-None-Match' : etag } )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 304 )
+        self.assertEqual( data, b'' )
+        
+        connection.request( 'GET', '/api_version', headers = { 'If-None-Match' : 'W/"abcd"' } )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
         # /request_new_permissions
         
         def format_request_new_permissions_query( name, basic_permissions ):
@@ -908,6 +932,37 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( d, expected_answer )
         
+        # suggest tags
+        
+        predicates = []
+        
+        predicates.append( ClientSearch.Predicate( predicate_type = ClientSearch.PREDICATE_TYPE_TAG, value = 'clothing:bodysuit', min_current_count = 12 ) )
+        predicates.append( ClientSearch.Predicate( predicate_type = ClientSearch.PREDICATE_TYPE_TAG, value = 'clothing:helmet', min_current_count = 5 ) )
+        
+        HG.test_controller.SetRead( 'related_tags', predicates )
+        
+        json_tags = json.dumps( [ 'samus aran', 'series:metroid' ] )
+        
+        path = '/add_tags/suggest_tags?tags={}&max_results=2'.format( urllib.parse.quote( json_tags, safe = '' ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        expected_answer = {}
+        
+        expected_answer[ 'suggested_tags' ] = [ { 'tag' : 'clothing:bodysuit', 'count' : 12 }, { 'tag' : 'clothing:helmet', 'count' : 5 } ]
+        
+        self.assertEqual( d, expected_answer )
+        
         # add tags
         
         headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex, 'Content-Type' : HC.mime_mimetype_string_lookup[ HC.APPLICATION_JSON ] }
@@ -1703,6 +1758,44 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertFalse( HG.client_busy.locked() )
         
+        #
+        
+        HG.test_controller.db_job_statistics.Reset()
+        
+        HG.test_controller.db_job_statistics.RecordJob( 'read', 'media_results', 0.01, 0.5, 0, [ 1, 2, 3 ], False )
+        HG.test_controller.db_job_statistics.RecordJob( 'read', 'media_results', 0.01, 1.5, 0, [ 1, 2, 3 ], True )
+        HG.test_controller.db_job_statistics.RecordJob( 'write', 'content_updates', 0.0, 0.1, 50, None, False )
+        
+        path = '/manage_database/get_job_statistics'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        job_statistics = d[ 'job_statistics' ]
+        
+        self.assertEqual( [ ( row[ 'job_type' ], row[ 'action' ] ) for row in job_statistics ], [ ( 'read', 'media_results' ), ( 'write', 'content_updates' ) ] )
+        
+        media_results_row = job_statistics[0]
+        
+        self.assertEqual( media_results_row[ 'num_jobs' ], 2 )
+        self.assertEqual( media_results_row[ 'num_jobs_on_read_connections' ], 1 )
+        self.assertEqual( media_results_row[ 'total_result_size' ], 6 )
+        self.assertAlmostEqual( media_results_row[ 'execution_time' ][ 'total' ], 2.0 )
+        self.assertEqual( media_results_row[ 'execution_time' ][ 'max' ], 1.5 )
+        self.assertTrue( 0.5 <= media_results_row[ 'execution_time' ][ 'p50' ] < 0.6 )
+        self.assertTrue( 1.5 <= media_results_row[ 'execution_time' ][ 'p99' ] < 1.8 )
+        
+        self.assertEqual( job_statistics[1][ 'total_rows_changed' ], 50 )
+        
     
     def _test_manage_pages( self, connection, set_up_permissions ):
         
@@ -1823,6 +1916,83 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( d, expected_answer )
         
+        # paged
+        
+        HG.test_controller.SetRead( 'file_query_ids', [ 10, 5, 4, 3, 2, 1 ] )
+        
+        path = '/get_files/search_files?tags={}&page_size=3'.format( urllib.parse.quote( json.dumps( tags ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        self.assertEqual( d[ 'file_ids' ], [ 10, 5, 4 ] )
+        
+        continuation = d[ 'continuation' ]
+        
+        ( search_key, offset ) = ClientLocalServerResources.ConvertStringToContinuation( continuation )
+        
+        self.assertEqual( offset, 3 )
+        
+        # later pages do not run the search again
+        
+        HG.test_controller.SetRead( 'file_query_ids', [] )
+        
+        path = '/get_files/search_files?tags={}&page_size=3&continuation={}&ndjson=true'.format( urllib.parse.quote( json.dumps( tags ) ), continuation )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        self.assertEqual( response.getheader( 'Content-Type' ), 'application/x-ndjson' )
+        
+        lines = [ json.loads( line ) for line in text.splitlines() ]
+        
+        self.assertEqual( lines, [ { 'file_id' : 3 }, { 'file_id' : 2 }, { 'file_id' : 1 }, { 'continuation' : None } ] )
+        
+        # both pages are ok to look at
+        
+        request_permissions = set_up_permissions[ 'search_green_files' ]
+        
+        request_permissions.CheckPermissionToSeeFiles( [ 10, 5, 4, 3, 2, 1 ] )
+        
+        # the search is forgotten once its last page is out
+        
+        path = '/get_files/search_files?tags={}&page_size=3&continuation={}'.format( urllib.parse.quote( json.dumps( tags ) ), continuation )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 400 )
+        
+        HG.test_controller.SetRead( 'file_query_ids', set( hash_ids ) )
+        
+        path = '/get_files/search_files?tags={}&continuation={}'.format( urllib.parse.quote( json.dumps( tags ) ), 'not a continuation' )
+        
+        connection.request( 'GET', path.replace( ' ', '%20' ), headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 400 )
+        
         # some file search param parsing
         
         class PretendRequest( object ):
@@ -2302,6 +2472,22 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( hashlib.sha256( data ).digest(), hash )
         
+        # conditional request
+        
+        self.assertEqual( response.getheader( 'ETag' ), '"{}"'.format( hash.hex() ) )
+        
+        conditional_headers = dict( headers )
+        conditional_headers[ 'If-None-Match' ] = '"{}"'.format( hash.hex() )
+        
+        connection.request( 'GET', path, headers = conditional_headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 304 )
+        self.assertEqual( data, b'' )
+        
         # range request
         
         path = '/get_files/file?file_id={}'.format( 1 )
@@ -2387,7 +2573,7 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( response.status, 416 )
         
-        # multi range request, not currently supported
+        # multi range request
         
         path = '/get_files/file?file_id={}'.format( 1 )
         
@@ -2400,8 +2586,112 @@ class TestClientAPI( unittest.TestCase ):
         
         data = response.read()
         
+        self.assertEqual( response.status, 206 )
+        
+        content_type = response.getheader( 'Content-Type' )
+        
+        self.assertTrue( content_type.startswith( 'multipart/byteranges; boundary=' ) )
+        
+        boundary = content_type.split( 'boundary=', 1 )[1].encode( 'utf-8' )
+        
+        self.assertEqual( len( data ), int( response.getheader( 'Content-Length' ) ) )
+        
+        with open( file_path, 'rb' ) as f:
+            
+            file_data = f.read()
+            
+        
+        parts = data.split( b'\r\n--' + boundary )
+        
+        self.assertEqual( parts[0], b'' )
+        self.assertEqual( parts[-1], b'--\r\n' )
+        
+        for ( part, ( offset, block_size ) ) in zip( parts[1:-1], ( ( 100, 100 ), ( 300, 100 ) ) ):
+            
+            ( part_headers, part_data ) = part.split( b'\r\n\r\n', 1 )
+            
+            self.assertIn( 'Content-Range: bytes {}-{}/{}'.format( offset, offset + block_size - 1, len( file_data ) ).encode( 'utf-8' ), part_headers )
+            
+            self.assertEqual( part_data, file_data[ offset : offset + block_size ] )
+            
+        
+        # sendfile is opt-in, and should send exactly the same
+        
+        HG.server_sendfile = True
+        
+        try:
+            
+            connection.request( 'GET', path, headers = partial_headers )
+            
+            response = connection.getresponse()
+            
+            sendfile_data = response.read()
+            
+        finally:
+            
+            HG.server_sendfile = False
+            
+        
+        self.assertEqual( response.status, 206 )
+        
+        sendfile_boundary = response.getheader( 'Content-Type' ).split( 'boundary=', 1 )[1].encode( 'utf-8' )
+        
+        self.assertEqual( sendfile_data.replace( sendfile_boundary, boundary ), data )
+        
+        # too many ranges
+        
+        partial_headers = dict( headers )
+        partial_headers[ 'Range' ] = 'bytes=' + ','.join( ( '{}-{}'.format( i, i ) for i in range( 100 ) ) )
+        
+        connection.request( 'GET', path, headers = partial_headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
         self.assertEqual( response.status, 416 )
         
+        # repeated and overlapping ranges are only sent once
+        
+        partial_headers = dict( headers )
+        partial_headers[ 'Range' ] = 'bytes=' + ','.join( ( '0-' for i in range( 10 ) ) )
+        
+        connection.request( 'GET', path, headers = partial_headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 206 )
+        self.assertEqual( response.getheader( 'Content-Range' ), 'bytes 0-{}/{}'.format( len( file_data ) - 1, len( file_data ) ) )
+        self.assertEqual( data, file_data )
+        
+        partial_headers = dict( headers )
+        partial_headers[ 'Range' ] = 'bytes=300-399,100-199,150-249,250-250'
+        
+        connection.request( 'GET', path, headers = partial_headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 206 )
+        
+        boundary = response.getheader( 'Content-Type' ).split( 'boundary=', 1 )[1].encode( 'utf-8' )
+        
+        parts = data.split( b'\r\n--' + boundary )
+        
+        self.assertEqual( len( parts ), 4 )
+        
+        for ( part, ( offset, block_size ) ) in zip( parts[1:-1], ( ( 100, 151 ), ( 300, 100 ) ) ):
+            
+            ( part_headers, part_data ) = part.split( b'\r\n\r\n', 1 )
+            
+            self.assertIn( 'Content-Range: bytes {}-{}/{}'.format( offset, offset + block_size - 1, len( file_data ) ).encode( 'utf-8' ), part_headers )
+            
+            self.assertEqual( part_data, file_data[ offset : offset + block_size ] )
+            
+        
         #
         
         path = '/get_files/thumbnail?file_id={}'.format( 1 )
@@ -2416,6 +2706,26 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( hashlib.sha256( data ).digest(), thumb_hash )
         
+        # batch thumbnails
+        
+        path = '/get_files/thumbnails?file_ids={}'.format( urllib.parse.quote( json.dumps( [ 1 ] ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        self.assertEqual( data[ : 32 ], hash )
+        
+        ( thumbnail_length, ) = struct.unpack( '>I', data[ 32 : 36 ] )
+        
+        self.assertEqual( len( data ), 36 + thumbnail_length )
+        
+        self.assertEqual( hashlib.sha256( data[ 36 : ] ).digest(), thumb_hash )
+        
         #
         
         api_permissions = set_up_permissions[ 'everything' ]
@@ -2507,6 +2817,70 @@ class TestClientAPI( unittest.TestCase ):
         os.unlink( thumb_path )
         
     
+    def _test_response_compression( self, connection, set_up_permissions ):
+        
+        api_permissions = set_up_permissions[ 'everything' ]
+        
+        access_key_hex = api_permissions.GetAccessKey().hex()
+        
+        hash_ids = list( range( 1, 1001 ) )
+        
+        HG.test_controller.SetRead( 'file_query_ids', set( hash_ids ) )
+        
+        path = '/get_files/search_files?tags={}'.format( urllib.parse.quote( json.dumps( [ 'kino' ] ) ) )
+        
+        # no Accept-Encoding, no gzip
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex }
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        self.assertIsNone( response.getheader( 'Content-Encoding' ) )
+        self.assertEqual( response.getheader( 'Vary' ), 'Accept-Encoding' )
+        self.assertGreater( len( data ), HydrusServerResources.MIN_BYTES_TO_COMPRESS )
+        
+        plain_file_ids = json.loads( str( data, 'utf-8' ) )[ 'file_ids' ]
+        
+        self.assertEqual( set( plain_file_ids ), set( hash_ids ) )
+        
+        # gzip
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex, 'Accept-Encoding' : 'gzip' }
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        self.assertEqual( response.getheader( 'Content-Encoding' ), 'gzip' )
+        self.assertEqual( response.getheader( 'Vary' ), 'Accept-Encoding' )
+        self.assertEqual( len( data ), int( response.getheader( 'Content-Length' ) ) )
+        
+        gzip_file_ids = json.loads( str( gzip.decompress( data ), 'utf-8' ) )[ 'file_ids' ]
+        
+        self.assertEqual( gzip_file_ids, plain_file_ids )
+        
+        # small bodies are not worth it, but they still vary
+        
+        connection.request( 'GET', '/api_version', headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        self.assertIsNone( response.getheader( 'Content-Encoding' ) )
+        self.assertEqual( response.getheader( 'Vary' ), 'Accept-Encoding' )
+        self.assertEqual( json.loads( str( data, 'utf-8' ) )[ 'version' ], HC.CLIENT_API_VERSION )
+        
+    
     def _test_permission_failures( self, connection, set_up_permissions ):
         
         pass
@@ -2532,6 +2906,7 @@ class TestClientAPI( unittest.TestCase ):
         self._test_manage_cookies( connection, set_up_permissions )
         self._test_manage_pages( connection, set_up_permissions )
         self._test_search_files( connection, set_up_permissions )
+        self._test_response_compression( connection, set_up_permissions )
         self._test_permission_failures( connection, set_up_permissions )
         self._test_cors_fails( connection )
         
@@ -2546,3 +2921,47 @@ class TestClientAPI( unittest.TestCase ):
         self._test_cors_succeeds( connection )
         
     
+    def test_client_api_paged_searches( self ):
+        
+        api_permissions = ClientAPI.APIPermissions( name = 'paged search test' )
+        
+        search_keys = [ api_permissions.StartPagedSearch( range( 10 ) ) for i in range( ClientAPI.MAX_PAGED_SEARCHES ) ]
+        
+        # using the oldest search makes it the most recently used, so the next new search pushes out the second oldest instead
+        
+        ( page_hash_ids, there_are_more ) = api_permissions.GetPagedSearchResults( search_keys[0], 0, 3 )
+        
+        self.assertEqual( page_hash_ids, [ 0, 1, 2 ] )
+        self.assertTrue( there_are_more )
+        
+        api_permissions.StartPagedSearch( range( 10 ) )
+        
+        api_permissions.GetPagedSearchResults( search_keys[0], 3, 3 )
+        
+        with self.assertRaises( HydrusExceptions.BadRequestException ):
+            
+            api_permissions.GetPagedSearchResults( search_keys[1], 0, 3 )
+            
+        
+        # one big search pushes out everything else, but is kept itself
+        
+        big_search_key = api_permissions.StartPagedSearch( range( ClientAPI.MAX_PAGED_SEARCH_FILE_IDS + 1 ) )
+        
+        with self.assertRaises( HydrusExceptions.BadRequestException ):
+            
+            api_permissions.GetPagedSearchResults( search_keys[0], 6, 3 )
+            
+        
+        ( page_hash_ids, there_are_more ) = api_permissions.GetPagedSearchResults( big_search_key, ClientAPI.MAX_PAGED_SEARCH_FILE_IDS - 1, 3 )
+        
+        self.assertEqual( page_hash_ids, [ ClientAPI.MAX_PAGED_SEARCH_FILE_IDS - 1, ClientAPI.MAX_PAGED_SEARCH_FILE_IDS ] )
+        self.assertFalse( there_are_more )
+        
+        # and the last page forgets it
+        
+        with self.assertRaises( HydrusExceptions.BadRequestException ):
+            
+            api_permissions.GetPagedSearchResults( big_search_key, 0, 3 )
+            
+        
+    
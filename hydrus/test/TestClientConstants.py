@@ -1,12 +1,15 @@
+import time
 import unittest
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientManagers
 from hydrus.client import ClientServices
+from hydrus.client import ClientThreading
 
 class TestManagers( unittest.TestCase ):
     
@@ -121,3 +124,217 @@ class TestManagers( unittest.TestCase ):
         self.assertEqual( ( 'undo archive 2 files', None ), undo_manager.GetUndoRedoStrings() )
         
     
+class TestRepositoryUpdatePrefetcher( unittest.TestCase ):
+    
+    class _TestPrefetcher( ClientServices.RepositoryUpdatePrefetcher ):
+        
+        # loads fake updates, and can be told to hold or fail on a particular one
+        
+        def __init__( self, update_hashes_and_mimes, hashes_to_hold = None, hashes_to_exceptions = None, update_num_bytes = 1, **kwargs ):
+            
+            if hashes_to_hold is None:
+                
+                hashes_to_hold = set()
+                
+            
+            if hashes_to_exceptions is None:
+                
+                hashes_to_exceptions = {}
+                
+            
+            self.loaded_hashes = []
+            self.hashes_to_hold = hashes_to_hold
+            self.hashes_to_exceptions = hashes_to_exceptions
+            self.update_num_bytes = update_num_bytes
+            
+            ClientServices.RepositoryUpdatePrefetcher.__init__( self, update_hashes_and_mimes, **kwargs )
+            
+        
+        def _LoadUpdate( self, update_hash, mime ):
+            
+            while update_hash in self.hashes_to_hold:
+                
+                time.sleep( 0.01 )
+                
+            
+            if update_hash in self.hashes_to_exceptions:
+                
+                raise self.hashes_to_exceptions[ update_hash ]
+                
+            
+            self.loaded_hashes.append( update_hash )
+            
+            return ( ClientServices.UPDATE_LOAD_OK, 'update {}'.format( update_hash.hex() ), self.update_num_bytes )
+            
+        
+    
+    def _get_update_hashes_and_mimes( self, num_updates ):
+        
+        return [ ( HydrusData.GenerateKey(), HC.APPLICATION_HYDRUS_UPDATE_CONTENT ) for i in range( num_updates ) ]
+        
+    
+    def _wait_for( self, test_callable ):
+        
+        give_up_time = HydrusData.GetNowPrecise() + 5
+        
+        while not test_callable():
+            
+            if HydrusData.GetNowPrecise() > give_up_time:
+                
+                raise Exception( 'Timed out waiting on the update prefetcher!' )
+                
+            
+            time.sleep( 0.01 )
+            
+        
+    
+    def test_ordering( self ):
+        
+        update_hashes_and_mimes = self._get_update_hashes_and_mimes( 20 )
+        
+        prefetcher = self._TestPrefetcher( update_hashes_and_mimes, max_num_prefetched = 3 )
+        
+        for ( update_hash, mime ) in update_hashes_and_mimes:
+            
+            self.assertEqual( prefetcher.GetUpdate( update_hash ), ( ClientServices.UPDATE_LOAD_OK, 'update {}'.format( update_hash.hex() ) ) )
+            
+        
+        self.assertEqual( prefetcher.loaded_hashes, [ update_hash for ( update_hash, mime ) in update_hashes_and_mimes ] )
+        
+        prefetcher.Stop()
+        
+    
+    def test_count_budget( self ):
+        
+        update_hashes_and_mimes = self._get_update_hashes_and_mimes( 10 )
+        
+        update_hashes = [ update_hash for ( update_hash, mime ) in update_hashes_and_mimes ]
+        
+        prefetcher = self._TestPrefetcher( update_hashes_and_mimes, max_num_prefetched = 3 )
+        
+        self._wait_for( lambda: len( prefetcher.loaded_hashes ) == 3 )
+        
+        time.sleep( 0.2 )
+        
+        self.assertEqual( prefetcher.loaded_hashes, update_hashes[:3] )
+        
+        # taking one makes room for exactly one more
+        
+        prefetcher.GetUpdate( update_hashes[0] )
+        
+        self._wait_for( lambda: len( prefetcher.loaded_hashes ) == 4 )
+        
+        time.sleep( 0.2 )
+        
+        self.assertEqual( prefetcher.loaded_hashes, update_hashes[:4] )
+        
+        prefetcher.Stop()
+        
+    
+    def test_byte_budget( self ):
+        
+        update_hashes_and_mimes = self._get_update_hashes_and_mimes( 10 )
+        
+        update_hashes = [ update_hash for ( update_hash, mime ) in update_hashes_and_mimes ]
+        
+        prefetcher = self._TestPrefetcher( update_hashes_and_mimes, update_num_bytes = 10, max_num_prefetched = 8, max_prefetched_bytes = 25 )
+        
+        self._wait_for( lambda: len( prefetcher.loaded_hashes ) == 3 )
+        
+        time.sleep( 0.2 )
+        
+        self.assertEqual( prefetcher.loaded_hashes, update_hashes[:3] )
+        
+        prefetcher.GetUpdate( update_hashes[0] )
+        prefetcher.GetUpdate( update_hashes[1] )
+        
+        self._wait_for( lambda: len( prefetcher.loaded_hashes ) == 5 )
+        
+        time.sleep( 0.2 )
+        
+        self.assertEqual( prefetcher.loaded_hashes, update_hashes[:5] )
+        
+        # one update bigger than the whole budget still gets through on its own
+        
+        prefetcher.update_num_bytes = 100
+        
+        prefetcher.GetUpdate( update_hashes[2] )
+        prefetcher.GetUpdate( update_hashes[3] )
+        prefetcher.GetUpdate( update_hashes[4] )
+        
+        self._wait_for( lambda: len( prefetcher.loaded_hashes ) == 6 )
+        
+        time.sleep( 0.2 )
+        
+        self.assertEqual( prefetcher.loaded_hashes, update_hashes[:6] )
+        
+        prefetcher.Stop()
+        
+    
+    def test_stop( self ):
+        
+        update_hashes_and_mimes = self._get_update_hashes_and_mimes( 10 )
+        
+        update_hashes = [ update_hash for ( update_hash, mime ) in update_hashes_and_mimes ]
+        
+        prefetcher = self._TestPrefetcher( update_hashes_and_mimes, max_num_prefetched = 3 )
+        
+        self._wait_for( lambda: len( prefetcher.loaded_hashes ) == 3 )
+        
+        prefetcher.Stop()
+        
+        with self.assertRaises( HydrusExceptions.ShutdownException ):
+            
+            prefetcher.GetUpdate( update_hashes[0] )
+            
+        
+        time.sleep( 0.2 )
+        
+        self.assertEqual( prefetcher.loaded_hashes, update_hashes[:3] )
+        
+    
+    def test_cancel( self ):
+        
+        update_hashes_and_mimes = self._get_update_hashes_and_mimes( 3 )
+        
+        update_hashes = [ update_hash for ( update_hash, mime ) in update_hashes_and_mimes ]
+        
+        prefetcher = self._TestPrefetcher( update_hashes_and_mimes, hashes_to_hold = { update_hashes[0] } )
+        
+        job_key = ClientThreading.JobKey( cancellable = True )
+        
+        job_key.Cancel()
+        
+        with self.assertRaises( HydrusExceptions.CancelledException ):
+            
+            prefetcher.GetUpdate( update_hashes[0], job_key = job_key )
+            
+        
+        prefetcher.Stop()
+        
+        prefetcher.hashes_to_hold.clear()
+        
+    
+    def test_producer_error( self ):
+        
+        update_hashes_and_mimes = self._get_update_hashes_and_mimes( 3 )
+        
+        update_hashes = [ update_hash for ( update_hash, mime ) in update_hashes_and_mimes ]
+        
+        prefetcher = self._TestPrefetcher( update_hashes_and_mimes, hashes_to_exceptions = { update_hashes[1] : MemoryError( 'test memory error' ) } )
+        
+        # the one before the failure is still good, but then we hear about the error rather than wait forever
+        
+        self.assertEqual( prefetcher.GetUpdate( update_hashes[0] )[0], ClientServices.UPDATE_LOAD_OK )
+        
+        with self.assertRaises( MemoryError ):
+            
+            prefetcher.GetUpdate( update_hashes[1] )
+            
+        
+        with self.assertRaises( MemoryError ):
+            
+            prefetcher.GetUpdate( update_hashes[2] )
+            
+        
+    
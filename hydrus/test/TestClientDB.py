@@ -1,3 +1,5 @@
+import hashlib
+import json
 import os
 import time
 import unittest
@@ -21,7 +23,11 @@ from hydrus.client.gui.pages import ClientGUIPages
 from hydrus.client.gui.pages import ClientGUISession
 from hydrus.client.importing import ClientImportLocal
 from hydrus.client.importing import ClientImportFiles
+from hydrus.client.importing import ClientImportFileSeeds
+from hydrus.client.importing import ClientImporting
+from hydrus.client.importing import ClientImportSubscriptionQuery
 from hydrus.client.importing.options import FileImportOptions
+from hydrus.client.media import ClientMedia
 from hydrus.client.metadata import ClientTags
 
 from hydrus.test import TestController
@@ -1255,6 +1261,113 @@ class TestClientDB( unittest.TestCase ):
             self.assertEqual( mr_num_words, num_words )
             
         
+        # sorted and limited in the db
+        
+        predicates = [ ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_EVERYTHING ), ClientSearch.Predicate( ClientSearch.PREDICATE_TYPE_SYSTEM_LIMIT, 3 ) ]
+        
+        location_search_context = ClientSearch.LocationSearchContext( current_service_keys = [ CC.LOCAL_FILE_SERVICE_KEY ] )
+        
+        search_context = ClientSearch.FileSearchContext( location_search_context = location_search_context, predicates = predicates )
+        
+        sort_by = ClientMedia.MediaSort( sort_type = ( 'system', CC.SORT_FILES_BY_FILESIZE ), sort_order = CC.SORT_DESC )
+        
+        file_query_ids = self._read( 'file_query_ids', search_context, sort_by = sort_by )
+        
+        hash_ids_to_hashes = self._read( 'hash_ids_to_hashes', hash_ids = file_query_ids )
+        
+        expected_hex_hashes = [ hex_hash for ( filename, hex_hash, size, mime, width, height, durations, num_frames, has_audio, num_words ) in sorted( test_files, key = lambda row: row[2], reverse = True )[ : 3 ] ]
+        
+        self.assertEqual( [ hash_ids_to_hashes[ hash_id ].hex() for hash_id in file_query_ids ], expected_hex_hashes )
+        
+        # files with no sort row go where MediaSort would put them, in either direction
+        
+        viewed_hash = bytes.fromhex( test_files[0][1] )
+        
+        content_update = HydrusData.ContentUpdate( HC.CONTENT_TYPE_FILE_VIEWING_STATS, HC.CONTENT_UPDATE_ADD, ( viewed_hash, 0, 0, 1, 5 ) )
+        
+        self._write( 'content_updates', { CC.COMBINED_LOCAL_FILE_SERVICE_KEY : [ content_update ] } )
+        
+        sort_by = ClientMedia.MediaSort( sort_type = ( 'system', CC.SORT_FILES_BY_MEDIA_VIEWS ), sort_order = CC.SORT_DESC )
+        
+        file_query_ids = self._read( 'file_query_ids', search_context, sort_by = sort_by )
+        
+        hash_ids_to_hashes = self._read( 'hash_ids_to_hashes', hash_ids = file_query_ids )
+        
+        self.assertEqual( len( file_query_ids ), 3 )
+        self.assertEqual( hash_ids_to_hashes[ file_query_ids[0] ], viewed_hash )
+        
+        sort_by = ClientMedia.MediaSort( sort_type = ( 'system', CC.SORT_FILES_BY_MEDIA_VIEWS ), sort_order = CC.SORT_ASC )
+        
+        file_query_ids = self._read( 'file_query_ids', search_context, sort_by = sort_by )
+        
+        hash_ids_to_hashes = self._read( 'hash_ids_to_hashes', hash_ids = file_query_ids )
+        
+        self.assertEqual( len( file_query_ids ), 3 )
+        self.assertNotIn( viewed_hash, [ hash_ids_to_hashes[ hash_id ] for hash_id in file_query_ids ] )
+        
+    
+    def test_import_files_batch( self ):
+        
+        TestClientDB._clear_db()
+        
+        file_import_options = HG.client_controller.new_options.GetDefaultFileImportOptions( 'loud' )
+        
+        file_import_jobs = []
+        
+        for filename in ( 'muh_jpg.jpg', 'muh_png.png' ):
+            
+            HG.test_controller.SetRead( 'hash_status', ClientImportFiles.FileImportStatus.STATICGetUnknownStatus() )
+            
+            path = os.path.join( HC.STATIC_DIR, 'testing', filename )
+            
+            file_import_job = ClientImportFiles.FileImportJob( path, file_import_options )
+            
+            file_import_job.GeneratePreImportHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            file_import_jobs.append( file_import_job )
+            
+        
+        file_import_statuses = self._write( 'import_files', file_import_jobs )
+        
+        self.assertEqual( [ file_import_status.status for file_import_status in file_import_statuses ], [ CC.STATUS_SUCCESSFUL_AND_NEW, CC.STATUS_SUCCESSFUL_AND_NEW ] )
+        self.assertEqual( [ file_import_status.hash for file_import_status in file_import_statuses ], [ file_import_job.GetHash() for file_import_job in file_import_jobs ] )
+        
+        file_import_statuses = self._write( 'import_files', file_import_jobs )
+        
+        self.assertEqual( [ file_import_status.status for file_import_status in file_import_statuses ], [ CC.STATUS_SUCCESSFUL_BUT_REDUNDANT, CC.STATUS_SUCCESSFUL_BUT_REDUNDANT ] )
+        
+    
+    def test_import_updates_batch( self ):
+        
+        definitions_update = HydrusNetwork.DefinitionsUpdate()
+        
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, 1, 'batch update test' ) )
+        
+        content_update = HydrusNetwork.ContentUpdate()
+        
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 1, [ 1, 2, 3 ] ) ) )
+        
+        update_rows = []
+        
+        for ( update, mime ) in ( ( definitions_update, HC.APPLICATION_HYDRUS_UPDATE_DEFINITIONS ), ( content_update, HC.APPLICATION_HYDRUS_UPDATE_CONTENT ) ):
+            
+            update_network_bytes = update.DumpToNetworkBytes()
+            
+            update_rows.append( ( update_network_bytes, hashlib.sha256( update_network_bytes ).digest(), mime ) )
+            
+        
+        result = self._read( 'service_info', CC.LOCAL_UPDATE_SERVICE_KEY )
+        
+        num_files_before = result[ HC.SERVICE_INFO_NUM_FILES ]
+        
+        self._write( 'import_updates', update_rows )
+        
+        result = self._read( 'service_info', CC.LOCAL_UPDATE_SERVICE_KEY )
+        
+        self.assertEqual( result[ HC.SERVICE_INFO_NUM_FILES ], num_files_before + 2 )
+        
     
     def test_import_folders( self ):
         
@@ -1579,6 +1692,191 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( result, [ pixiv_id, password ] )
         
     
+    def test_related_tags( self ):
+        
+        TestClientDB._clear_db()
+        
+        ( skip_hash, hash_1, hash_2, hash_3 ) = [ HydrusData.GenerateKey() for i in range( 4 ) ]
+        
+        service_keys_to_content_updates = {}
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'samus aran', ( skip_hash, hash_1, hash_2, hash_3 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'series:metroid', ( skip_hash, hash_1, hash_2 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'clothing:bodysuit', ( skip_hash, hash_1, hash_2 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'clothing:helmet', ( hash_1, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'smash bros', ( hash_3, ) ) ) )
+        
+        service_keys_to_content_updates[ CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ] = content_updates
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        # hash_3 only has one of the two search tags, so its tags should not come through
+        
+        result = self._read( 'related_tags', CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, skip_hash, [ 'samus aran', 'series:metroid' ], 10, 5.0 )
+        
+        tags_to_counts = { predicate.GetValue() : predicate.GetCount( HC.CONTENT_STATUS_CURRENT ) for predicate in result }
+        
+        self.assertEqual( tags_to_counts, { 'clothing:bodysuit' : 2, 'clothing:helmet' : 1 } )
+        
+    
+    def test_related_tags_cooccurrence_index( self ):
+        
+        TestClientDB._clear_db()
+        
+        ( hash_1, hash_2, hash_3 ) = [ HydrusData.GenerateKey() for i in range( 3 ) ]
+        
+        service_keys_to_content_updates = {}
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'samus aran', ( hash_1, hash_2, hash_3 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'series:metroid', ( hash_1, hash_2 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'smash bros', ( hash_3, ) ) ) )
+        
+        service_keys_to_content_updates[ CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ] = content_updates
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        self._write( 'regenerate_tag_cooccurrence_index', tag_service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        def get_tags_to_counts( search_tags ):
+            
+            result = self._read( 'related_tags', CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, None, search_tags, 10, 5.0 )
+            
+            return { predicate.GetValue() : predicate.GetCount( HC.CONTENT_STATUS_CURRENT ) for predicate in result }
+            
+        
+        self.assertEqual( get_tags_to_counts( [ 'samus aran' ] ), { 'series:metroid' : 2, 'smash bros' : 1 } )
+        
+        # now the index keeps up with new mappings
+        
+        service_keys_to_content_updates = {}
+        
+        content_updates = []
+        
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'clothing:bodysuit', ( hash_1, hash_2, hash_3 ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'smash bros', ( hash_3, ) ) ) )
+        content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 'series:metroid', ( hash_3, ) ) ) )
+        
+        service_keys_to_content_updates[ CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ] = content_updates
+        
+        self._write( 'content_updates', service_keys_to_content_updates )
+        
+        self.assertEqual( get_tags_to_counts( [ 'samus aran' ] ), { 'series:metroid' : 2, 'clothing:bodysuit' : 3 } )
+        self.assertEqual( get_tags_to_counts( [ 'series:metroid' ] ), { 'samus aran' : 2, 'clothing:bodysuit' : 2 } )
+        
+        # adding mappings that already exist does not count them again
+        
+        for i in range( 2 ):
+            
+            service_keys_to_content_updates = {}
+            
+            content_updates = []
+            
+            content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'clothing:bodysuit', ( hash_1, hash_2, hash_3 ) ) ) )
+            content_updates.append( HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'series:metroid', ( hash_1, ) ) ) )
+            
+            service_keys_to_content_updates[ CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ] = content_updates
+            
+            self._write( 'content_updates', service_keys_to_content_updates )
+            
+        
+        self.assertEqual( get_tags_to_counts( [ 'samus aran' ] ), { 'series:metroid' : 2, 'clothing:bodysuit' : 3 } )
+        self.assertEqual( get_tags_to_counts( [ 'series:metroid' ] ), { 'samus aran' : 2, 'clothing:bodysuit' : 2 } )
+        
+        # partners shared by more of the search tags go first
+        
+        result = self._read( 'related_tags', CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, None, [ 'samus aran', 'series:metroid' ], 1, 5.0 )
+        
+        self.assertEqual( [ predicate.GetValue() for predicate in result ], [ 'clothing:bodysuit' ] )
+        
+        self._write( 'regenerate_tag_cooccurrence_index', tag_service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, delete = True )
+        
+        self.assertEqual( get_tags_to_counts( [ 'samus aran' ] ), { 'series:metroid' : 2, 'clothing:bodysuit' : 3 } )
+        
+    
+    def test_subtag_trigram_index( self ):
+        
+        TestClientDB._clear_db()
+        
+        tag_search_context = ClientSearch.TagSearchContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        ( hash_1, hash_2 ) = [ HydrusData.GenerateKey() for i in range( 2 ) ]
+        
+        def add_tags( tags_and_hashes, action = HC.CONTENT_UPDATE_ADD ):
+            
+            content_updates = [ HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, action, ( tag, hashes ) ) for ( tag, hashes ) in tags_and_hashes ]
+            
+            self._write( 'content_updates', { CC.DEFAULT_LOCAL_TAG_SERVICE_KEY : content_updates } )
+            
+        
+        def get_tags( search_text ):
+            
+            result = self._read( 'autocomplete_predicates', ClientTags.TAG_DISPLAY_STORAGE, tag_search_context, CC.COMBINED_FILE_SERVICE_KEY, search_text = search_text )
+            
+            return { predicate.GetValue() for predicate in result }
+            
+        
+        add_tags( [ ( 'samus aran', ( hash_1, hash_2 ) ), ( 'character:samus', ( hash_1, ) ), ( 'series:metroid', ( hash_1, ) ), ( 'amusement park', ( hash_2, ) ) ] )
+        
+        search_texts = [ '*amus', '*amu*', '*aran', '*etro*', '*us*ar*', '*xyz*' ]
+        
+        scanned_results = { search_text : get_tags( search_text ) for search_text in search_texts }
+        
+        self.assertIn( 'samus aran', scanned_results[ '*amu*' ] )
+        self.assertIn( 'amusement park', scanned_results[ '*amu*' ] )
+        self.assertEqual( scanned_results[ '*xyz*' ], set() )
+        
+        self._write( 'regenerate_subtag_trigram_index', tag_service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        for search_text in search_texts:
+            
+            self.assertEqual( get_tags( search_text ), scanned_results[ search_text ] )
+            
+        
+        # it keeps up with new and deleted tags
+        
+        add_tags( [ ( 'hamuster', ( hash_2, ) ) ] )
+        
+        self.assertIn( 'hamuster', get_tags( '*amu*' ) )
+        
+        add_tags( [ ( 'hamuster', ( hash_2, ) ), ( 'amusement park', ( hash_2, ) ) ], action = HC.CONTENT_UPDATE_DELETE )
+        
+        indexed_result = get_tags( '*amu*' )
+        
+        # regenerating the tag search cache keeps the index, and fills it back up
+        
+        self._write( 'regenerate_tag_cache', tag_service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        trigram_queries_and_args = []
+        
+        original_get_trigrams_query = ClientDB.DB._CacheTagsGetSubtagTrigramsWildcardQuery
+        
+        def get_trigrams_query( db, *args, **kwargs ):
+            
+            result = original_get_trigrams_query( db, *args, **kwargs )
+            
+            trigram_queries_and_args.append( result )
+            
+            return result
+            
+        
+        with patch.object( ClientDB.DB, '_CacheTagsGetSubtagTrigramsWildcardQuery', get_trigrams_query ):
+            
+            self.assertEqual( get_tags( '*amu*' ), indexed_result )
+            self.assertEqual( get_tags( '*etro*' ), scanned_results[ '*etro*' ] )
+            
+        
+        self.assertTrue( len( trigram_queries_and_args ) > 0 )
+        self.assertNotIn( None, trigram_queries_and_args )
+        
+        self._write( 'regenerate_subtag_trigram_index', tag_service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, delete = True )
+        
+        self.assertEqual( indexed_result, get_tags( '*amu*' ) )
+        
+    
     def test_services( self ):
         
         result = self._read( 'services', ( HC.LOCAL_FILE_DOMAIN, HC.LOCAL_FILE_TRASH_DOMAIN, HC.COMBINED_LOCAL_FILE, HC.LOCAL_TAG ) )
@@ -1663,3 +1961,98 @@ class TestClientDB( unittest.TestCase ):
             
         
     
+    def test_seed_storage_duplicate( self ):
+        
+        file_seed_cache = ClientImportFileSeeds.FileSeedCache()
+        
+        file_seed_cache.AddFileSeeds( [ ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, 'https://example.com/post/{}'.format( i ) ) for i in range( 20 ) ] )
+        
+        dupe_file_seed_cache = ClientImporting.DuplicateWithSeedStorageHashes( file_seed_cache )
+        
+        self.assertEqual( dupe_file_seed_cache.DumpToString(), file_seed_cache.DumpToString() )
+        
+        for ( file_seed, dupe_file_seed ) in zip( file_seed_cache.GetFileSeeds(), dupe_file_seed_cache.GetFileSeeds() ):
+            
+            self.assertIsNot( dupe_file_seed, file_seed )
+            
+        
+        # the copy already knows its seed hashes, and they are the same ones the original works out
+        
+        with ClientImporting.SeedStorageContext() as seed_storage_context:
+            
+            file_seed_cache.DumpToString()
+            
+        
+        with ClientImporting.SeedStorageContext() as dupe_seed_storage_context:
+            
+            dupe_file_seed_cache.DumpToString()
+            
+        
+        self.assertEqual( set( dupe_seed_storage_context.GetStorageHashesToSeeds().keys() ), set( seed_storage_context.GetStorageHashesToSeeds().keys() ) )
+        
+        for ( storage_hash, dupe_file_seed ) in dupe_seed_storage_context.GetStorageHashesToSeeds().items():
+            
+            self.assertIn( dupe_file_seed, dupe_file_seed_cache.GetFileSeeds() )
+            self.assertEqual( dupe_file_seed.GetSerialisedHash(), storage_hash )
+            
+        
+        # and hashed storage maintenance can read those hashes back out of the raw json
+        
+        with ClientImporting.SeedStorageContext():
+            
+            dump = dupe_file_seed_cache.DumpToString()
+            
+        
+        self.assertEqual( ClientImporting.GetSeedStorageHashesFromSerialisableInfo( json.loads( dump ) ), set( dupe_seed_storage_context.GetStorageHashesToSeeds().keys() ) )
+        
+    
+    def test_subscription_query_log_containers( self ):
+        
+        query_log_container = ClientImportSubscriptionQuery.SubscriptionQueryLogContainer( 'test query log' )
+        
+        file_seed_cache = query_log_container.GetFileSeedCache()
+        
+        file_seed_cache.AddFileSeeds( [ ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, 'https://example.com/post/{}'.format( i ) ) for i in range( 20 ) ] )
+        
+        self._write( 'serialisable', query_log_container )
+        
+        # clear out anything earlier tests left lying around
+        self._write( 'maintain_hashed_serialisables', force_start = True )
+        
+        result = self._read( 'serialisable_named', HydrusSerialisable.SERIALISABLE_TYPE_SUBSCRIPTION_QUERY_LOG_CONTAINER, 'test query log' )
+        
+        self.assertEqual( result.DumpToString(), query_log_container.DumpToString() )
+        
+        #
+        
+        file_seed_cache = result.GetFileSeedCache()
+        
+        file_seed = file_seed_cache.GetFileSeeds()[5]
+        
+        file_seed.SetStatus( CC.STATUS_ERROR, note = 'test error' )
+        
+        file_seed_cache.NotifyFileSeedsUpdated( ( file_seed, ) )
+        
+        self._write( 'serialisable', result )
+        
+        # the old version of the changed seed is no longer referenced by anything
+        
+        num_deleted = self._write( 'maintain_hashed_serialisables', force_start = True )
+        
+        self.assertEqual( num_deleted, 1 )
+        
+        result_2 = self._read( 'serialisable_named', HydrusSerialisable.SERIALISABLE_TYPE_SUBSCRIPTION_QUERY_LOG_CONTAINER, 'test query log' )
+        
+        self.assertEqual( result_2.DumpToString(), result.DumpToString() )
+        
+        self.assertEqual( result_2.GetFileSeedCache().GetFileSeeds()[5].note, 'test error' )
+        
+        #
+        
+        self._write( 'delete_serialisable_named', HydrusSerialisable.SERIALISABLE_TYPE_SUBSCRIPTION_QUERY_LOG_CONTAINER, 'test query log' )
+        
+        num_deleted = self._write( 'maintain_hashed_serialisables', force_start = True )
+        
+        self.assertEqual( num_deleted, 20 )
+        
+    
@@ -1,6 +1,151 @@
+import numpy
+import os
+import tempfile
 import unittest
 
 from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusPaths
 
+from hydrus.client import ClientCaches
 from hydrus.client import ClientConstants as CC
+
+class FakeCacheData( object ):
+    
+    def __init__( self, num_bytes ):
+        
+        self._num_bytes = num_bytes
+        
+    
+    def GetEstimatedMemoryFootprint( self ):
+        
+        return self._num_bytes
+        
+    
+class TestDataCache( unittest.TestCase ):
+    
+    def test_lru( self ):
+        
+        data_cache = ClientCaches.DataCache( HG.test_controller, 'test cache', 100 )
+        
+        data_cache.AddData( 'a', FakeCacheData( 40 ) )
+        data_cache.AddData( 'b', FakeCacheData( 40 ) )
+        
+        data_cache.GetData( 'a' )
+        
+        data_cache.AddData( 'c', FakeCacheData( 40 ) )
+        
+        self.assertTrue( data_cache.HasData( 'a' ) )
+        self.assertFalse( data_cache.HasData( 'b' ) )
+        self.assertTrue( data_cache.HasData( 'c' ) )
+        
+        self.assertEqual( data_cache.GetIfHasData( 'b' ), None )
+        
+        statistics = data_cache.GetStatistics()
+        
+        self.assertEqual( statistics[ 'num_items' ], 2 )
+        self.assertEqual( statistics[ 'size' ], 80 )
+        self.assertEqual( statistics[ 'num_hits' ], 1 )
+        self.assertEqual( statistics[ 'num_misses' ], 1 )
+        self.assertEqual( statistics[ 'num_evictions' ], 1 )
+        
+        data_cache.DeleteData( 'a' )
+        
+        self.assertEqual( data_cache.GetStatistics()[ 'size' ], 40 )
+        
+        data_cache.AddData( 'd', FakeCacheData( 100 ) )
+        
+        self.assertFalse( data_cache.HasData( 'c' ) )
+        self.assertTrue( data_cache.HasData( 'd' ) )
+        self.assertEqual( data_cache.GetStatistics()[ 'size' ], 100 )
+        
+        data_cache.SetCacheSizeAndTimeout( 50, 1200 )
+        
+        self.assertFalse( data_cache.HasData( 'd' ) )
+        self.assertEqual( data_cache.GetStatistics()[ 'size' ], 0 )
+        
+    
+    def test_slru( self ):
+        
+        data_cache = ClientCaches.DataCache( HG.test_controller, 'test cache', 100, eviction_policy = ClientCaches.DataCacheEvictionPolicySLRU() )
+        
+        data_cache.AddData( 'a', FakeCacheData( 30 ) )
+        
+        data_cache.GetData( 'a' )
+        
+        # a flood of one-off data should not push out the data that has been hit
+        
+        for key in ( 'b', 'c', 'd', 'e', 'f' ):
+            
+            data_cache.AddData( key, FakeCacheData( 30 ) )
+            
+        
+        self.assertTrue( data_cache.HasData( 'a' ) )
+        self.assertFalse( data_cache.HasData( 'b' ) )
+        self.assertTrue( data_cache.HasData( 'f' ) )
+        
+        self.assertEqual( data_cache.GetStatistics()[ 'size' ], 90 )
+        
+    
+    
+class TestRenderedImageDiskCache( unittest.TestCase ):
+    
+    def test_disk_cache( self ):
+        
+        cache_dir = tempfile.mkdtemp()
+        
+        try:
+            
+            disk_cache = ClientCaches.RenderedImageDiskCache( HG.test_controller, cache_dir, 1024 * 1024 )
+            
+            numpy_image = numpy.arange( 64 * 32 * 3, dtype = numpy.uint8 ).reshape( ( 64, 32, 3 ) )
+            
+            self.assertEqual( disk_cache.GetNumPyImage( ( b'hash', 1 ) ), None )
+            
+            disk_cache.AddNumPyImage( ( b'hash', 1 ), numpy_image )
+            
+            self.assertTrue( numpy.array_equal( disk_cache.GetNumPyImage( ( b'hash', 1 ) ), numpy_image ) )
+            self.assertEqual( disk_cache.GetNumPyImage( ( b'hash', 2 ) ), None )
+            
+            # too big for a quarter of the cache
+            
+            big_numpy_image = numpy.zeros( ( 512, 512, 3 ), dtype = numpy.uint8 )
+            
+            disk_cache.AddNumPyImage( ( b'big hash', 1 ), big_numpy_image )
+            
+            self.assertEqual( disk_cache.GetNumPyImage( ( b'big hash', 1 ) ), None )
+            
+            disk_cache.Clear()
+            
+            self.assertEqual( disk_cache.GetNumPyImage( ( b'hash', 1 ) ), None )
+            
+            # temp files from interrupted writes are cleared, but not ones that may still be being written
+            
+            old_temp_path = os.path.join( cache_dir, 'old.npy.1234.tmp' )
+            young_temp_path = os.path.join( cache_dir, 'young.npy.1234.tmp' )
+            
+            for path in ( old_temp_path, young_temp_path ):
+                
+                with open( path, 'wb' ) as f:
+                    
+                    f.write( b'half a numpy' )
+                    
+                
+            
+            two_hours_ago = HydrusData.GetNow() - 7200
+            
+            os.utime( old_temp_path, ( two_hours_ago, two_hours_ago ) )
+            
+            disk_cache._InitialiseIndex()
+            
+            self.assertFalse( os.path.exists( old_temp_path ) )
+            self.assertTrue( os.path.exists( young_temp_path ) )
+            
+        finally:
+            
+            HydrusPaths.DeletePath( cache_dir )
+            
+        
+    
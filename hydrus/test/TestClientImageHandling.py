@@ -2,9 +2,13 @@ import os
 import unittest
 
 from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+from hydrus.core import HydrusFileHandling
+from hydrus.core import HydrusImageHandling
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientImageHandling
+from hydrus.client.db import ClientDBSimilarFiles
 
 class TestImageHandling( unittest.TestCase ):
     
@@ -22,3 +26,74 @@ class TestImageHandling( unittest.TestCase ):
         
         self.assertEqual( phashes, set( [ b'\xb4M\xc7\xb2M\xcb8\x1c' ] ) )
         
+    
+    def test_shared_import_work( self ):
+        
+        path = os.path.join( HC.STATIC_DIR, 'hydrus.png' )
+        
+        ( sha256, md5, sha1, sha512 ) = HydrusFileHandling.GetAllHashesFromPath( path )
+        
+        self.assertEqual( sha256, HydrusFileHandling.GetHashFromPath( path ) )
+        self.assertEqual( ( md5, sha1, sha512 ), HydrusFileHandling.GetExtraHashesFromPath( path ) )
+        
+        numpy_image = HydrusImageHandling.GenerateNumPyImage( path, HC.IMAGE_PNG )
+        
+        self.assertEqual( HydrusFileHandling.GetFileInfo( path, HC.IMAGE_PNG, numpy_image = numpy_image ), HydrusFileHandling.GetFileInfo( path, HC.IMAGE_PNG ) )
+        
+        self.assertEqual( ClientImageHandling.GenerateShapePerceptualHashesNumPy( numpy_image ), ClientImageHandling.GenerateShapePerceptualHashes( path, HC.IMAGE_PNG ) )
+        
+        thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath( path, ( 100, 100 ), HC.IMAGE_PNG, numpy_image = numpy_image )
+        
+        self.assertEqual( thumbnail_bytes, HydrusImageHandling.GenerateThumbnailBytesFromStaticImagePath( path, ( 100, 100 ), HC.IMAGE_PNG ) )
+        
+    
+    def test_phash_index( self ):
+        
+        phashes = [ os.urandom( 8 ) for i in range( 200 ) ]
+        
+        phash_ids_and_phashes = list( enumerate( phashes ) )
+        
+        phash_index = ClientDBSimilarFiles.PHashIndex( phash_ids_and_phashes[ : 150 ] )
+        
+        for ( phash_id, phash ) in phash_ids_and_phashes[ 150 : ]:
+            
+            phash_index.AddPHash( phash_id, phash )
+            
+        
+        phash_index.DeletePHashes( { 3, 160 } )
+        
+        self.assertEqual( phash_index.GetNumPHashes(), 198 )
+        
+        search_phash = phashes[ 0 ]
+        
+        for max_hamming_distance in ( 0, 8, 32, 64 ):
+            
+            expected = { phash_id : HydrusData.Get64BitHammingDistance( search_phash, phash ) for ( phash_id, phash ) in phash_ids_and_phashes if phash_id not in ( 3, 160 ) }
+            
+            expected = { phash_id : distance for ( phash_id, distance ) in expected.items() if distance <= max_hamming_distance }
+            
+            self.assertEqual( phash_index.Search( [ search_phash ], max_hamming_distance ), expected )
+            
+        
+        # re-adding a consolidated id that has a delete pending should not double it up
+        
+        phash_index.DeletePHashes( { 5 } )
+        
+        phash_index.AddPHash( 5, phashes[ 5 ] )
+        
+        self.assertEqual( phash_index.GetNumPHashes(), 198 )
+        self.assertEqual( phash_index.Search( [ phashes[ 5 ] ], 0 ), { 5 : 0 } )
+        
+        # and an id that comes back with a different phash only has the new one
+        
+        new_phash = os.urandom( 8 )
+        
+        phash_index.DeletePHashes( { 6 } )
+        
+        phash_index.AddPHash( 6, new_phash )
+        
+        self.assertEqual( phash_index.GetNumPHashes(), 198 )
+        self.assertEqual( phash_index.Search( [ new_phash ], 0 ), { 6 : 0 } )
+        self.assertNotIn( 6, phash_index.Search( [ phashes[ 6 ] ], 0 ) )
+        
+    
@@ -0,0 +1,175 @@
+import unittest
+
+from hydrus.core import HydrusData
+
+from hydrus.client import ClientConstants as CC
+from hydrus.client.importing import ClientImportFileSeeds
+
+class TestFileSeedCache( unittest.TestCase ):
+    
+    def _check_status_index( self, file_seed_cache ):
+        
+        # everything the status index answers should match a plain scan of the seeds
+        
+        all_file_seeds = file_seed_cache.GetFileSeeds()
+        
+        for status in ( CC.STATUS_UNKNOWN, CC.STATUS_SUCCESSFUL_AND_NEW, CC.STATUS_ERROR, CC.STATUS_VETOED ):
+            
+            expected_file_seeds = [ file_seed for file_seed in all_file_seeds if file_seed.status == status ]
+            
+            self.assertEqual( file_seed_cache.GetFileSeeds( status ), expected_file_seeds )
+            self.assertEqual( file_seed_cache.GetFileSeedCount( status ), len( expected_file_seeds ) )
+            self.assertEqual( file_seed_cache.GetNextFileSeeds( status, 3 ), expected_file_seeds[:3] )
+            
+            if len( expected_file_seeds ) == 0:
+                
+                self.assertIsNone( file_seed_cache.GetNextFileSeed( status ) )
+                
+            else:
+                
+                self.assertIs( file_seed_cache.GetNextFileSeed( status ), expected_file_seeds[0] )
+                
+            
+            self.assertEqual( file_seed_cache.GetStatus().GetStatusesToCounts()[ status ], len( expected_file_seeds ) )
+            
+        
+        self.assertEqual( file_seed_cache.GetFileSeedCount(), len( all_file_seeds ) )
+        
+    
+    def _get_file_seeds( self, num_file_seeds, url_prefix = 'https://example.com/post/' ):
+        
+        return [ ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_URL, '{}{}'.format( url_prefix, i ) ) for i in range( num_file_seeds ) ]
+        
+    
+    def test_status_index( self ):
+        
+        file_seed_cache = ClientImportFileSeeds.FileSeedCache()
+        
+        file_seeds = self._get_file_seeds( 10 )
+        
+        file_seed_cache.AddFileSeeds( file_seeds )
+        
+        self._check_status_index( file_seed_cache )
+        
+        # status changes, with and without anyone telling the cache
+        
+        file_seeds[0].SetStatus( CC.STATUS_SUCCESSFUL_AND_NEW )
+        file_seeds[3].SetStatus( CC.STATUS_ERROR, note = 'test error' )
+        
+        self._check_status_index( file_seed_cache )
+        
+        file_seeds[5].SetStatus( CC.STATUS_VETOED )
+        
+        file_seed_cache.NotifyFileSeedsUpdated( ( file_seeds[5], ) )
+        
+        self._check_status_index( file_seed_cache )
+        
+        self.assertIs( file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN ), file_seeds[1] )
+        
+        # a seed that moves back to unknown takes its place in the list again
+        
+        file_seeds[0].SetStatus( CC.STATUS_UNKNOWN )
+        
+        self.assertIs( file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN ), file_seeds[0] )
+        
+        self._check_status_index( file_seed_cache )
+        
+        # reorder
+        
+        file_seed_cache.DelayFileSeed( file_seeds[0] )
+        file_seed_cache.AdvanceFileSeed( file_seeds[3] )
+        
+        self._check_status_index( file_seed_cache )
+        
+        for i in range( 3 ):
+            
+            file_seed_cache.AdvanceFileSeed( file_seeds[2] )
+            
+        
+        self.assertEqual( file_seed_cache.GetFileSeedIndex( file_seeds[2] ), 0 )
+        
+        self.assertIs( file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN ), file_seeds[2] )
+        
+        self._check_status_index( file_seed_cache )
+        
+        # insert
+        
+        inserted_file_seeds = self._get_file_seeds( 3, url_prefix = 'https://example.com/inserted/' )
+        
+        file_seed_cache.InsertFileSeeds( 2, inserted_file_seeds )
+        
+        self.assertEqual( file_seed_cache.GetFileSeedIndex( inserted_file_seeds[0] ), 2 )
+        
+        inserted_file_seeds[1].SetStatus( CC.STATUS_ERROR )
+        
+        self._check_status_index( file_seed_cache )
+        
+        # remove
+        
+        file_seed_cache.RemoveFileSeeds( ( file_seeds[2], inserted_file_seeds[1] ) )
+        
+        self._check_status_index( file_seed_cache )
+        
+        # a removed seed that changes is nothing to do with us any more
+        
+        file_seeds[2].SetStatus( CC.STATUS_ERROR )
+        
+        self._check_status_index( file_seed_cache )
+        
+        self.assertNotIn( file_seeds[2], file_seed_cache.GetFileSeeds() )
+        
+        file_seed_cache.RemoveFileSeedsByStatus( ( CC.STATUS_VETOED, ) )
+        
+        self._check_status_index( file_seed_cache )
+        
+        file_seed_cache.RetryFailed()
+        
+        self.assertEqual( file_seed_cache.GetFileSeedCount( CC.STATUS_ERROR ), 0 )
+        
+        self._check_status_index( file_seed_cache )
+        
+    
+    def test_status_index_compact( self ):
+        
+        file_seed_cache = ClientImportFileSeeds.FileSeedCache()
+        
+        num_old = 50
+        
+        file_seeds = self._get_file_seeds( num_old + ClientImportFileSeeds.FileSeedCache.COMPACT_NUMBER )
+        
+        for file_seed in file_seeds[ : num_old ]:
+            
+            file_seed.created = HydrusData.GetNow() - 86400 * 365
+            
+        
+        file_seed_cache.AddFileSeeds( file_seeds )
+        
+        # old done seeds go, but an old seed that is still to do stays
+        
+        for file_seed in file_seeds[ 1 : num_old ]:
+            
+            file_seed.SetStatus( CC.STATUS_SUCCESSFUL_AND_NEW )
+            
+        
+        file_seeds[ num_old + 5 ].SetStatus( CC.STATUS_ERROR )
+        
+        self._check_status_index( file_seed_cache )
+        
+        file_seed_cache.Compact( HydrusData.GetNow() - 86400 )
+        
+        self.assertEqual( len( file_seed_cache ), ClientImportFileSeeds.FileSeedCache.COMPACT_NUMBER + 1 )
+        self.assertEqual( file_seed_cache.GetFileSeedCount( CC.STATUS_SUCCESSFUL_AND_NEW ), 0 )
+        self.assertIs( file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN ), file_seeds[0] )
+        self.assertIs( file_seed_cache.GetNextFileSeed( CC.STATUS_ERROR ), file_seeds[ num_old + 5 ] )
+        
+        self._check_status_index( file_seed_cache )
+        
+        # and the compacted cache still hears about changes
+        
+        file_seeds[0].SetStatus( CC.STATUS_SUCCESSFUL_AND_NEW )
+        
+        self.assertIs( file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN ), file_seeds[ num_old ] )
+        
+        self._check_status_index( file_seed_cache )
+        
+    
@@ -0,0 +1,231 @@
+import threading
+import time
+import unittest
+
+from mock import patch
+
+from hydrus.core import HydrusGlobals as HG
+
+from hydrus.client.importing import ClientImportFiles
+
+class TestFileImportJobDBBatcher( unittest.TestCase ):
+    
+    class _FakeFileImportJob( object ):
+        
+        def __init__( self, name ):
+            
+            self.name = name
+            
+        
+    
+    class _FakeDB( object ):
+        
+        # records the batches it is given, can hold the first one until we say so, and fails the jobs we tell it to
+        
+        def __init__( self, bad_names = None, hold_first_batch = False ):
+            
+            if bad_names is None:
+                
+                bad_names = set()
+                
+            
+            self.bad_names = bad_names
+            
+            self.batches = []
+            self.singles = []
+            
+            self.first_batch_started = threading.Event()
+            self.release_first_batch = threading.Event()
+            
+            if not hold_first_batch:
+                
+                self.release_first_batch.set()
+                
+            
+        
+        def WriteSynchronous( self, action, *args, **kwargs ):
+            
+            if action == 'import_files':
+                
+                ( file_import_jobs, ) = args
+                
+                self.batches.append( [ file_import_job.name for file_import_job in file_import_jobs ] )
+                
+                if len( self.batches ) == 1:
+                    
+                    self.first_batch_started.set()
+                    
+                    self.release_first_batch.wait( 5 )
+                    
+                
+                if True in ( file_import_job.name in self.bad_names for file_import_job in file_import_jobs ):
+                    
+                    raise Exception( 'Batch failed!' )
+                    
+                
+                return [ 'status {}'.format( file_import_job.name ) for file_import_job in file_import_jobs ]
+                
+            elif action == 'import_file':
+                
+                ( file_import_job, ) = args
+                
+                self.singles.append( file_import_job.name )
+                
+                if file_import_job.name in self.bad_names:
+                    
+                    raise Exception( 'failed {}'.format( file_import_job.name ) )
+                    
+                
+                return 'status {}'.format( file_import_job.name )
+                
+            
+        
+    
+    def _import_in_threads( self, batcher, names, names_to_results ):
+        
+        def do_it( name ):
+            
+            try:
+                
+                names_to_results[ name ] = ( batcher.ImportFile( self._FakeFileImportJob( name ) ), None )
+                
+            except Exception as e:
+                
+                names_to_results[ name ] = ( None, e )
+                
+            
+        
+        threads = [ threading.Thread( target = do_it, args = ( name, ) ) for name in names ]
+        
+        for thread in threads:
+            
+            thread.start()
+            
+        
+        return threads
+        
+    
+    def _wait_for_pending( self, batcher, num_pending ):
+        
+        give_up_time = time.time() + 5
+        
+        while len( batcher._pending_jobs ) < num_pending:
+            
+            if time.time() > give_up_time:
+                
+                raise Exception( 'Timed out waiting on the batcher!' )
+                
+            
+            time.sleep( 0.01 )
+            
+        
+    
+    def test_shared_batches( self ):
+        
+        fake_db = self._FakeDB( hold_first_batch = True )
+        
+        batcher = ClientImportFiles.FileImportJobDBBatcher( max_batch_size = 3 )
+        
+        names_to_results = {}
+        
+        with patch.object( HG.client_controller, 'WriteSynchronous', fake_db.WriteSynchronous ):
+            
+            threads = self._import_in_threads( batcher, [ 'a' ], names_to_results )
+            
+            self.assertTrue( fake_db.first_batch_started.wait( 5 ) )
+            
+            # while 'a' is being written, everyone else piles up behind it
+            
+            threads.extend( self._import_in_threads( batcher, [ 'b', 'c', 'd', 'e' ], names_to_results ) )
+            
+            self._wait_for_pending( batcher, 4 )
+            
+            fake_db.release_first_batch.set()
+            
+            for thread in threads:
+                
+                thread.join( 5 )
+                
+            
+        
+        self.assertEqual( fake_db.batches[0], [ 'a' ] )
+        self.assertEqual( [ len( batch ) for batch in fake_db.batches[1:] ], [ 3, 1 ] )
+        self.assertEqual( sorted( name for batch in fake_db.batches for name in batch ), [ 'a', 'b', 'c', 'd', 'e' ] )
+        self.assertEqual( fake_db.singles, [] )
+        
+        for name in ( 'a', 'b', 'c', 'd', 'e' ):
+            
+            self.assertEqual( names_to_results[ name ], ( 'status {}'.format( name ), None ) )
+            
+        
+        self.assertEqual( batcher._jobs_to_results, {} )
+        self.assertEqual( batcher._jobs_to_events, {} )
+        self.assertFalse( batcher._writing )
+        
+    
+    def test_failed_batch_falls_back_to_single_files( self ):
+        
+        fake_db = self._FakeDB( bad_names = { 'c' }, hold_first_batch = True )
+        
+        batcher = ClientImportFiles.FileImportJobDBBatcher()
+        
+        names_to_results = {}
+        
+        with patch.object( HG.client_controller, 'WriteSynchronous', fake_db.WriteSynchronous ):
+            
+            threads = self._import_in_threads( batcher, [ 'a' ], names_to_results )
+            
+            self.assertTrue( fake_db.first_batch_started.wait( 5 ) )
+            
+            threads.extend( self._import_in_threads( batcher, [ 'b', 'c', 'd' ], names_to_results ) )
+            
+            self._wait_for_pending( batcher, 3 )
+            
+            fake_db.release_first_batch.set()
+            
+            for thread in threads:
+                
+                thread.join( 5 )
+                
+            
+        
+        self.assertEqual( len( fake_db.batches ), 2 )
+        self.assertEqual( sorted( fake_db.singles ), [ 'b', 'c', 'd' ] )
+        
+        # everyone wakes up with their own result, and only the bad file gets an error
+        
+        for name in ( 'a', 'b', 'd' ):
+            
+            self.assertEqual( names_to_results[ name ], ( 'status {}'.format( name ), None ) )
+            
+        
+        ( file_import_status, e ) = names_to_results[ 'c' ]
+        
+        self.assertIsNone( file_import_status )
+        self.assertEqual( str( e ), 'failed c' )
+        
+    
+    def test_failed_single_file( self ):
+        
+        fake_db = self._FakeDB( bad_names = { 'a' } )
+        
+        batcher = ClientImportFiles.FileImportJobDBBatcher()
+        
+        with patch.object( HG.client_controller, 'WriteSynchronous', fake_db.WriteSynchronous ):
+            
+            with self.assertRaises( Exception ) as context:
+                
+                batcher.ImportFile( self._FakeFileImportJob( 'a' ) )
+                
+            
+            self.assertEqual( str( context.exception ), 'Batch failed!' )
+            
+            # and the batcher is fine afterwards
+            
+            self.assertEqual( batcher.ImportFile( self._FakeFileImportJob( 'b' ) ), 'status b' )
+            
+        
+        self.assertEqual( fake_db.batches, [ [ 'a' ], [ 'b' ] ] )
+        self.assertEqual( fake_db.singles, [] )
+        
+    
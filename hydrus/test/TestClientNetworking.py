@@ -1,3 +1,4 @@
+import hashlib
 import time
 import unittest
 
@@ -8,6 +9,7 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusPaths
 from hydrus.core.networking import HydrusNetworking
 
 from hydrus.client import ClientConstants as CC
@@ -489,9 +491,9 @@ class TestNetworkingEngine( unittest.TestCase ):
     
 class TestNetworkingJob( unittest.TestCase ):
     
-    def _GetJob( self, for_login = False ):
+    def _GetJob( self, for_login = False, temp_path = None ):
         
-        job = ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL )
+        job = ClientNetworkingJobs.NetworkJob( 'GET', MOCK_URL, temp_path = temp_path )
         
         job.SetForLogin( for_login )
         
@@ -666,6 +668,39 @@ class TestNetworkingJob( unittest.TestCase ):
             
         
     
+    def test_done_ok_temp_path( self ):
+        
+        ( os_file_handle, temp_path ) = HydrusPaths.GetTempPath()
+        
+        try:
+            
+            with HTTMock( catch_all ):
+                
+                with HTTMock( catch_wew_ok ):
+                    
+                    job = self._GetJob( temp_path = temp_path )
+                    
+                    job.Start()
+                    
+                    self.assertFalse( job.HasError() )
+                    
+                    with open( temp_path, 'rb' ) as f:
+                        
+                        self.assertEqual( f.read(), GOOD_RESPONSE )
+                        
+                    
+                    expected_file_hashes = tuple( h( GOOD_RESPONSE ).digest() for h in ( hashlib.sha256, hashlib.md5, hashlib.sha1, hashlib.sha512 ) )
+                    
+                    self.assertEqual( job.GetFileHashes(), expected_file_hashes )
+                    
+                
+            
+        finally:
+            
+            HydrusPaths.CleanUpTempPath( os_file_handle, temp_path )
+            
+        
+    
     def test_error( self ):
         
         with HTTMock( catch_all ):
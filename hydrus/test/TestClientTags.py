@@ -13,6 +13,7 @@ from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientManagers
 from hydrus.client import ClientSearch
 from hydrus.client import ClientSearchParseSystemPredicates
+from hydrus.client.media import ClientMedia
 from hydrus.client.media import ClientMediaManagers
 from hydrus.client.metadata import ClientTags
 from hydrus.client.metadata import ClientTagsHandling
@@ -176,6 +177,25 @@ class TestTagsManager( unittest.TestCase ):
         self.assertEqual( self._other_tags_manager.GetPetitioned( self._pending_service_key, ClientTags.TAG_DISPLAY_STORAGE ), set() )
         
     
+    def test_duplicate( self ):
+        
+        tags_manager = self._tags_manager.Duplicate()
+        
+        self.assertEqual( tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE ), self._tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE ) )
+        
+        # the dupe shares its tag arrays with the original, so check an edit does not leak back
+        
+        tags_manager.ProcessContentUpdate( self._first_key, HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'duplicate test', ( HydrusData.GenerateKey(), ) ) ) )
+        
+        self.assertIn( 'duplicate test', tags_manager.GetCurrent( self._first_key, ClientTags.TAG_DISPLAY_STORAGE ) )
+        self.assertIn( 'duplicate test', tags_manager.GetCurrent( CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_ACTUAL ) )
+        
+        self.assertNotIn( 'duplicate test', self._tags_manager.GetCurrent( self._first_key, ClientTags.TAG_DISPLAY_STORAGE ) )
+        self.assertNotIn( 'duplicate test', self._tags_manager.GetCurrent( CC.COMBINED_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_ACTUAL ) )
+        
+        self.assertFalse( self._tags_manager.HasTag( 'duplicate test', ClientTags.TAG_DISPLAY_STORAGE ) )
+        
+    
     def test_get_current( self ):
         
         self.assertEqual( self._tags_manager.GetCurrent( self._first_key, ClientTags.TAG_DISPLAY_STORAGE ), { 'current', '\u2835', 'creator:tsutomu nihei', 'series:blame!', 'title:test title', 'volume:3', 'chapter:2', 'page:1' } )
@@ -1928,3 +1948,100 @@ class TestTagObjects( unittest.TestCase ):
         
         self.assertEqual( tag_autocomplete_options.GetExactMatchCharacterThreshold(), 2 )
         
+class TestTagCountAggregator( unittest.TestCase ):
+    
+    class _FakeMediaResult( object ):
+        
+        def __init__( self, hash, tags_manager ):
+            
+            self._hash = hash
+            self._tags_manager = tags_manager
+            
+        
+        def GetHash( self ):
+            
+            return self._hash
+            
+        
+        def GetTagsManager( self ):
+            
+            return self._tags_manager
+            
+        
+    
+    def _GetMediaResult( self, current_tags, pending_tags = None ):
+        
+        if pending_tags is None:
+            
+            pending_tags = set()
+            
+        
+        service_keys_to_statuses_to_tags = collections.defaultdict( HydrusData.default_dict_set )
+        
+        service_keys_to_statuses_to_tags[ CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ][ HC.CONTENT_STATUS_CURRENT ] = set( current_tags )
+        service_keys_to_statuses_to_tags[ CC.DEFAULT_LOCAL_TAG_SERVICE_KEY ][ HC.CONTENT_STATUS_PENDING ] = set( pending_tags )
+        
+        tags_manager = ClientMediaManagers.TagsManager( service_keys_to_statuses_to_tags, service_keys_to_statuses_to_tags )
+        
+        return self._FakeMediaResult( HydrusData.GenerateKey(), tags_manager )
+        
+    
+    def test_counts( self ):
+        
+        one = self._GetMediaResult( { 'a', 'b' } )
+        two = self._GetMediaResult( { 'b', 'c' }, pending_tags = { 'd' } )
+        three = self._GetMediaResult( { 'c' } )
+        
+        selected = ClientMedia.TagCountAggregator( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_STORAGE )
+        unselected = ClientMedia.TagCountAggregator( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientTags.TAG_DISPLAY_STORAGE )
+        
+        changed_tags = unselected.AddMediaResults( [ one, two, three ] )
+        
+        self.assertEqual( changed_tags, { 'a', 'b', 'c', 'd' } )
+        
+        ( current_tags_to_count, deleted_tags_to_count, pending_tags_to_count, petitioned_tags_to_count ) = unselected.GetCounts()
+        
+        self.assertEqual( dict( current_tags_to_count ), { 'a' : 1, 'b' : 2, 'c' : 2 } )
+        self.assertEqual( dict( pending_tags_to_count ), { 'd' : 1 } )
+        
+        # moving some
+        
+        changed_tags = unselected.MoveHashes( { one.GetHash() }, selected )
+        
+        self.assertEqual( changed_tags, { 'a', 'b' } )
+        self.assertEqual( selected.GetNumFiles(), 1 )
+        self.assertEqual( unselected.GetNumFiles(), 2 )
+        
+        self.assertEqual( dict( selected.GetCounts()[0] ), { 'a' : 1, 'b' : 1 } )
+        self.assertEqual( dict( unselected.GetCounts()[0] ), { 'b' : 1, 'c' : 2 } )
+        
+        # moving everything to an empty pool
+        
+        selected.MoveHashes( { one.GetHash() }, unselected )
+        unselected.MoveHashes( { one.GetHash(), two.GetHash(), three.GetHash() }, selected )
+        
+        self.assertEqual( selected.GetNumFiles(), 3 )
+        self.assertEqual( unselected.GetNumFiles(), 0 )
+        
+        self.assertEqual( dict( selected.GetCounts()[0] ), { 'a' : 1, 'b' : 2, 'c' : 2 } )
+        self.assertEqual( dict( unselected.GetCounts()[0] ), {} )
+        
+        # tags changing underneath
+        
+        three.GetTagsManager().ProcessContentUpdate( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, HydrusData.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'a', ( three.GetHash(), ) ) ) )
+        
+        changed_tags = selected.RefreshHashes( { three.GetHash() } )
+        
+        self.assertIn( 'a', changed_tags )
+        self.assertEqual( dict( selected.GetCounts()[0] ), { 'a' : 2, 'b' : 2, 'c' : 2 } )
+        
+        # removing
+        
+        changed_tags = selected.RemoveHashes( { two.GetHash() } )
+        
+        self.assertEqual( changed_tags, { 'b', 'c', 'd' } )
+        
+        self.assertEqual( dict( selected.GetCounts()[0] ), { 'a' : 2, 'b' : 1, 'c' : 1 } )
+        self.assertEqual( dict( selected.GetCounts()[2] ), {} )
+        
+    
@@ -13,6 +13,7 @@ from qtpy import QtGui as QG
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDB
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
@@ -49,6 +50,8 @@ from hydrus.test import TestClientDB
 from hydrus.test import TestClientDBDuplicates
 from hydrus.test import TestClientDBTags
 from hydrus.test import TestClientImageHandling
+from hydrus.test import TestClientImportFiles
+from hydrus.test import TestClientImportFileSeeds
 from hydrus.test import TestClientImportOptions
 from hydrus.test import TestClientImportSubscriptions
 from hydrus.test import TestClientListBoxes
@@ -227,6 +230,8 @@ class Controller( object ):
         
         self._param_reads = {}
         
+        self.db_job_statistics = HydrusDB.DBJobStatistics()
+        
         self.example_tag_repo_service_key = HydrusData.GenerateKey()
         
         services = []
@@ -291,6 +296,8 @@ class Controller( object ):
         
         self._caches = {}
         
+        self.rendered_image_disk_cache = ClientCaches.RenderedImageDiskCache( self, os.path.join( self.db_dir, 'client_render_cache' ), self.new_options.GetInteger( 'rendered_image_disk_cache_size' ) )
+        
         self._caches[ 'images' ] = ClientCaches.ImageRendererCache( self )
         self._caches[ 'image_tiles' ] = ClientCaches.ImageTileCache( self )
         self._caches[ 'thumbnail' ] = ClientCaches.ThumbnailCache( self )
@@ -564,6 +571,11 @@ class Controller( object ):
         return self._server_files_dir
         
     
+    def GetJobStatistics( self ):
+        
+        return self.db_job_statistics.GetStatistics()
+        
+    
     def GetMainTLW( self ):
         
         return self.win
@@ -732,6 +744,8 @@ class Controller( object ):
             TestClientDaemons,
             TestClientConstants,
             TestClientData,
+            TestClientImportFiles,
+            TestClientImportFileSeeds,
             TestClientImportOptions,
             TestClientParsing,
             TestClientTags,
@@ -769,6 +783,8 @@ class Controller( object ):
         module_lookup[ 'data' ] = [
             TestClientConstants,
             TestClientData,
+            TestClientImportFiles,
+            TestClientImportFileSeeds,
             TestClientImportOptions,
             TestClientParsing,
             TestClientTags,
@@ -1,9 +1,13 @@
+import struct
 import unittest
+import zlib
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTags
+from hydrus.core.networking import HydrusNetwork
 
 from hydrus.client import ClientApplicationCommand as CAC
 from hydrus.client import ClientConstants as CC
@@ -130,6 +134,66 @@ class TestSerialisables( unittest.TestCase ):
         self._dump_and_load_and_test( db, test )
         
     
+    def test_binary_repository_updates( self ):
+        
+        definitions_update = HydrusNetwork.DefinitionsUpdate()
+        
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_HASHES, 1, HydrusData.GenerateKey() ) )
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_HASHES, 2, HydrusData.GenerateKey() ) )
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, 3, 'character:samus aran' ) )
+        definitions_update.AddRow( ( HC.DEFINITIONS_TYPE_TAGS, 4, '\u30b5\u30e0\u30b9' ) )
+        
+        network_bytes = definitions_update.DumpToBinaryNetworkBytes()
+        
+        self.assertTrue( network_bytes.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_PREFIX ) )
+        
+        dupe_definitions_update = HydrusSerialisable.CreateFromNetworkBytes( network_bytes )
+        
+        self.assertIsInstance( dupe_definitions_update, HydrusNetwork.DefinitionsUpdate )
+        self.assertEqual( dupe_definitions_update.GetHashIdsToHashes(), definitions_update.GetHashIdsToHashes() )
+        self.assertEqual( dupe_definitions_update.GetTagIdsToTags(), definitions_update.GetTagIdsToTags() )
+        
+        #
+        
+        content_update = HydrusNetwork.ContentUpdate()
+        
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( 1, 65536, HC.IMAGE_PNG, 1600000000, 640, 480, None, None, None ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, 2 ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 3, [ 1, 2 ] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 4, [ 1 ] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( 4, [ 2 ] ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, ( 3, 4 ) ) )
+        content_update.AddRow( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE, ( 4, 3 ) ) )
+        
+        dupe_content_update = HydrusSerialisable.CreateFromNetworkBytes( content_update.DumpToBinaryNetworkBytes() )
+        
+        self.assertIsInstance( dupe_content_update, HydrusNetwork.ContentUpdate )
+        self.assertEqual( dupe_content_update.GetNumRows(), content_update.GetNumRows() )
+        self.assertEqual( [ tuple( row ) for row in dupe_content_update.GetNewFiles() ], [ ( 1, 65536, HC.IMAGE_PNG, 1600000000, 640, 480, None, None, None ) ] )
+        self.assertEqual( list( dupe_content_update.GetDeletedFiles() ), [ 2 ] )
+        self.assertEqual( [ ( tag_id, list( hash_ids ) ) for ( tag_id, hash_ids ) in dupe_content_update.GetNewMappings() ], [ ( 3, [ 1, 2 ] ), ( 4, [ 1 ] ) ] )
+        self.assertEqual( [ ( tag_id, list( hash_ids ) ) for ( tag_id, hash_ids ) in dupe_content_update.GetDeletedMappings() ], [ ( 4, [ 2 ] ) ] )
+        self.assertEqual( [ tuple( pair ) for pair in dupe_content_update.GetNewTagParents() ], [ ( 3, 4 ) ] )
+        self.assertEqual( [ tuple( pair ) for pair in dupe_content_update.GetDeletedTagSiblings() ], [ ( 4, 3 ) ] )
+        
+        # the json path still works for old peers
+        
+        dupe_content_update = HydrusSerialisable.CreateFromNetworkBytes( content_update.DumpToNetworkBytes() )
+        
+        self.assertEqual( dupe_content_update.GetNumRows(), content_update.GetNumRows() )
+        
+        # a type we do not know is a clean error
+        
+        unknown_type_bytes = HydrusSerialisable.BINARY_NETWORK_BYTES_PREFIX + struct.pack( '<BB', HydrusSerialisable.BINARY_FORMAT_VERSION, HydrusSerialisable.BINARY_COMPRESSION_ZLIB ) + zlib.compress( struct.pack( '<H', 65535 ) )
+        
+        with self.assertRaises( HydrusExceptions.SerialisationException ) as context:
+            
+            HydrusSerialisable.CreateFromNetworkBytes( unknown_type_bytes )
+            
+        
+        self.assertIn( '65535', str( context.exception ) )
+        
+    
     def test_SERIALISABLE_TYPE_APPLICATION_COMMAND( self ):
         
         def test( obj, dupe_obj ):
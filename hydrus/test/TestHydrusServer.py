@@ -1,5 +1,7 @@
+import gzip
 import hashlib
 import http.client
+import json
 import os
 import random
 import ssl
@@ -8,6 +10,7 @@ import unittest
 
 from twisted.internet import reactor
 import twisted.internet.ssl
+from twisted.web.http_headers import Headers
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
@@ -17,7 +20,9 @@ from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusPaths
 from hydrus.core.networking import HydrusNetwork
 from hydrus.core.networking import HydrusNetworking
+from hydrus.core.networking import HydrusServer
 from hydrus.core.networking import HydrusServerRequest
+from hydrus.core.networking import HydrusServerResources
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientServices
@@ -27,6 +32,7 @@ from hydrus.client.networking import ClientLocalServer
 
 from hydrus.server import ServerFiles
 from hydrus.server.networking import ServerServer
+from hydrus.server.networking import ServerServerResources
 
 from hydrus.test import TestController
 
@@ -39,6 +45,103 @@ with open( os.path.join( HC.STATIC_DIR, 'hydrus_small.png' ), 'rb' ) as f_g:
     
     EXAMPLE_THUMBNAIL = f_g.read()
     
+class TestResponseCompression( unittest.TestCase ):
+    
+    class _FakeRequest( object ):
+        
+        def __init__( self, response_context, accept_encoding = None ):
+            
+            self.method = b'GET'
+            self.requestHeaders = Headers()
+            
+            if accept_encoding is not None:
+                
+                self.requestHeaders.setRawHeaders( 'Accept-Encoding', [ accept_encoding ] )
+                
+            
+            self.hydrus_response_context = response_context
+            
+        
+    
+    @classmethod
+    def setUpClass( cls ):
+        
+        cls._service = HydrusNetwork.GenerateService( HydrusData.GenerateKey(), HC.TAG_REPOSITORY, 'tag repo', HC.DEFAULT_SERVICE_PORT )
+        
+    
+    def _get_big_json( self ):
+        
+        return json.dumps( { 'numbers' : list( range( 1000 ) ) } )
+        
+    
+    def test_gzip( self ):
+        
+        resource = HydrusServerResources.HydrusResource( self._service, HydrusServer.REMOTE_DOMAIN )
+        
+        body = self._get_big_json()
+        
+        self.assertGreater( len( body ), HydrusServerResources.MIN_BYTES_TO_COMPRESS )
+        
+        for accept_encoding in ( 'gzip', 'deflate, gzip', 'gzip;q=0.5', '*' ):
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = body )
+            
+            request = self._FakeRequest( response_context, accept_encoding = accept_encoding )
+            
+            self.assertTrue( resource._responseWantsCompression( request, response_context ) )
+            
+            resource._threadPrepareResponseContext( request )
+            
+            self.assertEqual( response_context.GetContentEncoding(), 'gzip' )
+            self.assertEqual( gzip.decompress( response_context.GetBodyBytes() ), bytes( body, 'utf-8' ) )
+            
+        
+        # not asked for, not worth it, or not something we compress
+        
+        for accept_encoding in ( None, 'deflate', 'gzip;q=0', 'identity' ):
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = body )
+            
+            request = self._FakeRequest( response_context, accept_encoding = accept_encoding )
+            
+            self.assertFalse( resource._responseWantsCompression( request, response_context ) )
+            
+            resource._threadPrepareResponseContext( request )
+            
+            self.assertIsNone( response_context.GetContentEncoding() )
+            self.assertEqual( response_context.GetBodyBytes(), bytes( body, 'utf-8' ) )
+            
+        
+        for response_context in ( HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = '{}' ), HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, body = body ), HydrusServerResources.ResponseContext( 404, mime = HC.APPLICATION_JSON, body = body ) ):
+            
+            request = self._FakeRequest( response_context, accept_encoding = 'gzip' )
+            
+            self.assertFalse( resource._responseWantsCompression( request, response_context ) )
+            
+        
+    
+    def test_no_gzip_for_hydrus_network( self ):
+        
+        # these bodies are already compressed network bytes, so doing it again is a waste
+        
+        self.assertFalse( ServerServerResources.HydrusResourceHydrusNetwork.COMPRESS_RESPONSES )
+        
+        resource = ServerServerResources.HydrusResourceHydrusNetwork( self._service, HydrusServer.REMOTE_DOMAIN )
+        
+        body = self._get_big_json()
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_JSON, body = body )
+        
+        request = self._FakeRequest( response_context, accept_encoding = 'gzip' )
+        
+        self.assertFalse( resource._responseWantsCompression( request, response_context ) )
+        
+        resource._threadPrepareResponseContext( request )
+        
+        self.assertIsNone( response_context.GetContentEncoding() )
+        self.assertEqual( response_context.GetBodyBytes(), bytes( body, 'utf-8' ) )
+        
+    
 class TestServer( unittest.TestCase ):
     
     @classmethod
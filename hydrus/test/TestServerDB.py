@@ -5,10 +5,12 @@ from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusSerialisable
 from hydrus.core.networking import HydrusNetwork
 from hydrus.core.networking import HydrusNetworking
 
 from hydrus.server import ServerDB
+from hydrus.server import ServerFiles
 
 from hydrus.test import TestController
 
@@ -253,9 +255,39 @@ class TestServerDB( unittest.TestCase ):
         
         client_to_server_update.AddContent( HC.CONTENT_UPDATE_PEND, mappings_content )
         
-        self._write( 'update', self._tag_service_key, self._tag_service_regular_account, client_to_server_update, HydrusData.GetNow() )
+        now = HydrusData.GetNow()
         
-        # can extend this to generate and fetch an actual update given a timespan
+        self._write( 'update', self._tag_service_key, self._tag_service_regular_account, client_to_server_update, now )
+        
+        #
+        
+        for binary_updates in ( False, True ):
+            
+            update_hashes = self._write( 'create_update', self._tag_service_key, now - 10, now + 10, binary_updates = binary_updates )
+            
+            self.assertGreater( len( update_hashes ), 0 )
+            
+            tags = set()
+            
+            for update_hash in update_hashes:
+                
+                with open( ServerFiles.GetExpectedFilePath( update_hash ), 'rb' ) as f:
+                    
+                    update_network_bytes = f.read()
+                    
+                
+                self.assertEqual( update_network_bytes.startswith( HydrusSerialisable.BINARY_NETWORK_BYTES_PREFIX ), binary_updates )
+                
+                update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+                
+                if isinstance( update, HydrusNetwork.DefinitionsUpdate ):
+                    
+                    tags.update( update.GetTagIdsToTags().values() )
+                    
+                
+            
+            self.assertIn( tag, tags )
+            
         
         #
         
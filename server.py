@@ -4,9 +4,14 @@
 # You just DO WHAT THE FUCK YOU WANT TO.
 # https://github.com/sirkris/WTFPL/blob/master/WTFPL.md
 
-from hydrus import hydrus_server
+import multiprocessing
 
 if __name__ == '__main__':
     
+    # big repository updates are packed in spawned worker processes, so they re-import this file. keep the boot stuff in here so they don't try to start a whole server
+    multiprocessing.freeze_support()
+    
+    from hydrus import hydrus_server
+    
     hydrus_server.boot()
     